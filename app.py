@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
@@ -17,6 +18,7 @@ from src.utils import (
     get_regiao_nomes,
     get_regiao_nomes_curtos
 )
+from src.utils.tempo import agora_ms, para_epoch_ms, formatar_ms, fuso_local, MS_POR_DIA
 
 # Configuração da página
 st.set_page_config(
@@ -425,6 +427,17 @@ if pagina == "🩺 Triagem Médica":
                  "desnutricao", "hiv", "cancer", "tuberculose", "hepatite", "doenca_renal",
                  "gestante", "lactante", "vacinacao_incompleta", "contato_doente"]
             )
+            
+            st.subheader("🎲 Incerteza das Medições")
+            analisar_incerteza = st.checkbox(
+                "Analisar sensibilidade ao erro de medição (Monte Carlo)",
+                help="Sorteia 1000 versões dos sinais vitais com o erro do instrumento e mostra a probabilidade de cada diagnóstico e nível de urgência"
+            )
+            desvio_temperatura = st.slider(
+                "Erro do termômetro (desvio, °C)", 0.05, 1.0,
+                0.3 if temperatura_iot else 0.2, 0.05
+            )
+            desvio_pressao = st.slider("Erro da pressão sistólica (desvio, mmHg)", 1.0, 15.0, 6.0, 1.0)
         
         # Botão de submissão
         submitted = st.form_submit_button("🔍 Processar Triagem", use_container_width=True)
@@ -477,7 +490,7 @@ if pagina == "🩺 Triagem Médica":
             
             # Adicionar informações de segurança ao resultado
             resultado['processed_by'] = st.session_state['user_name']
-            resultado['processed_at'] = datetime.now().isoformat()
+            resultado['processed_at'] = agora_ms()
             resultado['patient_hash'] = security.hash_patient_id(dados_paciente)
             
             # Verifica se é paciente saudável para exibição especial
@@ -597,7 +610,61 @@ if pagina == "🩺 Triagem Médica":
                         with col4:
                             st.metric("Score Gravidade", f"{detalhes.get('gravidade', 0):.2f}")
                         
-                        st.write("*Fórmula: (Sintomas × 45%) + (Climático × 25%) + (População × 15%) + (Gravidade × 15%)*")
+                        pesos = triagem.obter_pesos(dados_paciente['regiao_geografica'])
+                        st.write(
+                            f"*Fórmula: (Sintomas × {pesos[0]:.0%}) + (Climático × {pesos[1]:.0%}) + "
+                            f"(População × {pesos[2]:.0%}) + (Gravidade × {pesos[3]:.0%})*"
+                        )
+            
+            # Incerteza das medições (Monte Carlo sobre os sinais vitais)
+            if analisar_incerteza:
+                incerteza = triagem.analisar_incerteza(
+                    dados_paciente,
+                    amostras=1000,
+                    ruido={
+                        'temperatura': {'tipo': 'normal', 'desvio': desvio_temperatura},
+                        'pressao_sistolica': {'tipo': 'normal', 'desvio': desvio_pressao},
+                        'pressao_diastolica': {'tipo': 'normal', 'desvio': desvio_pressao * 0.7}
+                    }
+                )
+                
+                st.subheader("🎲 Incerteza das Medições")
+                st.caption(
+                    f"{incerteza['amostras']} amostras dos sinais vitais com erro de medição · "
+                    f"Temperatura 95%: {incerteza['intervalos_vitais']['temperatura'][0]}–"
+                    f"{incerteza['intervalos_vitais']['temperatura'][1]}°C · calculado em {incerteza['tempo_ms']} ms"
+                )
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_incerteza_diag = px.bar(
+                        x=list(incerteza['diagnosticos'].values()),
+                        y=list(incerteza['diagnosticos'].keys()),
+                        orientation='h',
+                        title="Probabilidade de cada diagnóstico ficar em 1º",
+                        labels={'x': 'Probabilidade', 'y': 'Diagnóstico'}
+                    )
+                    fig_incerteza_diag.update_xaxes(tickformat='.0%', range=[0, 1])
+                    st.plotly_chart(fig_incerteza_diag, use_container_width=True)
+                
+                with col2:
+                    fig_incerteza_urg = px.bar(
+                        x=list(incerteza['urgencias'].keys()),
+                        y=list(incerteza['urgencias'].values()),
+                        title="Probabilidade de cada nível de urgência",
+                        labels={'x': 'Urgência', 'y': 'Probabilidade'},
+                        color=list(incerteza['urgencias'].keys()),
+                        color_discrete_map={'CRÍTICA': '#ff4444', 'ALTA': '#ff8800', 'MÉDIA': '#ffaa00', 'BAIXA': '#00aa00'}
+                    )
+                    fig_incerteza_urg.update_yaxes(tickformat='.0%', range=[0, 1])
+                    st.plotly_chart(fig_incerteza_urg, use_container_width=True)
+                
+                probabilidade_principal = incerteza['diagnosticos'].get(resultado['diagnostico_principal'], 0.0)
+                if probabilidade_principal < 0.8:
+                    st.warning(
+                        f"⚠️ Resultado sensível ao erro de medição: o diagnóstico principal se mantém em "
+                        f"apenas {probabilidade_principal:.0%} das amostras. Considere repetir a aferição."
+                    )
 
 elif pagina == "📊 Estatísticas":
     auth.require_permission('estatisticas')
@@ -671,6 +738,194 @@ elif pagina == "📊 Estatísticas":
             )
             st.plotly_chart(fig_clima, use_container_width=True)
 
+        # Drill-down sobre o cubo pré-agregado
+        st.subheader("🔎 Análise Multidimensional (Drill-down)")
+
+        cubo = triagem.cubo
+        nomes_dimensoes = {
+            'regiao': 'Região',
+            'diagnostico': 'Diagnóstico',
+            'urgencia': 'Urgência',
+            'evento': 'Evento Climático',
+            'faixa_etaria': 'Faixa Etária',
+            'dia': 'Período'
+        }
+        regiao_nomes = get_regiao_nomes()
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            dimensao_linhas = st.selectbox(
+                "Agrupar por", list(nomes_dimensoes), index=1,
+                format_func=lambda d: nomes_dimensoes[d]
+            )
+
+        with col2:
+            opcoes_colunas = [None] + [d for d in nomes_dimensoes if d != dimensao_linhas]
+            dimensao_colunas = st.selectbox(
+                "Detalhar por", opcoes_colunas,
+                format_func=lambda d: "Nenhum" if d is None else nomes_dimensoes[d]
+            )
+
+        with col3:
+            granularidade = st.selectbox(
+                "Granularidade do período", ['dia', 'mes', 'ano'], index=1,
+                format_func=lambda g: {'dia': 'Dia', 'mes': 'Mês', 'ano': 'Ano'}[g]
+            )
+
+        # Slice/dice: filtros por dimensão
+        filtros_cubo = {}
+        colunas_filtro = st.columns(5)
+        for coluna, dimensao in zip(colunas_filtro, ['regiao', 'diagnostico', 'urgencia', 'evento', 'faixa_etaria']):
+            with coluna:
+                selecionados = st.multiselect(
+                    nomes_dimensoes[dimensao], cubo.valores(dimensao),
+                    format_func=lambda v, d=dimensao: regiao_nomes.get(v, v) if d == 'regiao' else v
+                )
+                if selecionados:
+                    filtros_cubo[dimensao] = selecionados
+
+        dias_cubo = cubo.valores('dia')
+        col1, col2 = st.columns(2)
+        with col1:
+            inicio_cubo = st.selectbox("De", dias_cubo, index=0)
+        with col2:
+            fim_cubo = st.selectbox("Até", dias_cubo, index=len(dias_cubo) - 1)
+
+        agrupar = (dimensao_linhas,) if dimensao_colunas is None else (dimensao_linhas, dimensao_colunas)
+        resultado_cubo = cubo.consultar(
+            agrupar=agrupar, filtros=filtros_cubo,
+            inicio=inicio_cubo, fim=fim_cubo, granularidade=granularidade
+        )
+
+        if resultado_cubo:
+            df_cubo = pd.DataFrame([
+                dict(zip(agrupar, grupo), Atendimentos=medidas['contagem'],
+                     **{'Idade Média': round(medidas['idade_media'], 1)})
+                for grupo, medidas in resultado_cubo.items()
+            ])
+
+            if dimensao_colunas is None:
+                fig_cubo = px.bar(
+                    df_cubo, x=dimensao_linhas, y='Atendimentos',
+                    labels={dimensao_linhas: nomes_dimensoes[dimensao_linhas]},
+                    title=f"Atendimentos por {nomes_dimensoes[dimensao_linhas]}"
+                )
+                st.plotly_chart(fig_cubo, use_container_width=True)
+                st.dataframe(df_cubo.rename(columns=nomes_dimensoes), use_container_width=True)
+            else:
+                fig_cubo = px.bar(
+                    df_cubo, x=dimensao_linhas, y='Atendimentos', color=dimensao_colunas,
+                    labels={d: nomes_dimensoes[d] for d in agrupar},
+                    title=f"Atendimentos por {nomes_dimensoes[dimensao_linhas]} e {nomes_dimensoes[dimensao_colunas]}"
+                )
+                st.plotly_chart(fig_cubo, use_container_width=True)
+
+                tabela_pivot = df_cubo.pivot_table(
+                    index=dimensao_linhas, columns=dimensao_colunas,
+                    values='Atendimentos', aggfunc='sum', fill_value=0
+                )
+                st.dataframe(tabela_pivot, use_container_width=True)
+        else:
+            st.info("Nenhum atendimento para a combinação de filtros selecionada.")
+
+        with st.expander("⚙️ Manutenção do Cubo"):
+            st.write(f"**Células agregadas:** {len(cubo.celulas)} · **Atendimentos cobertos:** {cubo.total_agregado}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                dias_detalhe = st.number_input("Manter detalhe diário (dias)", min_value=30, value=365, step=30)
+                if st.button("🗜️ Compactar dias antigos em meses"):
+                    removidas = cubo.compactar(dias_detalhe=int(dias_detalhe))
+                    auth._log_audit('CUBO_COMPACTADO', st.session_state['username'], f"{removidas} células removidas")
+                    st.success(f"✅ {removidas} células compactadas")
+            with col2:
+                if st.button("🔄 Reconstruir a partir do histórico"):
+                    cubo.reconstruir()
+                    auth._log_audit('CUBO_RECONSTRUIDO', st.session_state['username'])
+                    st.success("✅ Cubo reconstruído")
+
+        # Coocorrência de sintomas (matrizes incrementais por região)
+        st.subheader("🧬 Coocorrência de Sintomas")
+
+        coocorrencia = triagem.coocorrencia
+        regioes_cooc = sorted(coocorrencia.regioes)
+
+        if regioes_cooc:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                regiao_cooc = st.selectbox(
+                    "Região", regioes_cooc, format_func=lambda r: regiao_nomes.get(r, r), key="regiao_cooc"
+                )
+            with col2:
+                janela_cooc = st.radio(
+                    "Janela", ["Recente", "Todo o histórico"], horizontal=True,
+                    help=f"Recente: contagens com decaimento exponencial (meia-vida de {coocorrencia.meia_vida_ms // MS_POR_DIA} dias)"
+                )
+            with col3:
+                metrica_cooc = st.radio("Métrica", ["Lift", "Contagem"], horizontal=True)
+
+            dados_cooc = coocorrencia.matrizes(regiao_cooc, decaido=janela_cooc == "Recente")
+            presentes = np.nonzero(np.diag(dados_cooc['sintoma_sintoma']) > 0)[0]
+
+            if len(presentes) > 1:
+                nomes_sintomas = [dados_cooc['sintomas'][i].replace('_', ' ').title() for i in presentes]
+                if metrica_cooc == "Lift":
+                    matriz = coocorrencia.lift(dados_cooc['sintoma_sintoma'], dados_cooc['total'])
+                else:
+                    matriz = dados_cooc['sintoma_sintoma']
+                matriz = matriz[np.ix_(presentes, presentes)]
+
+                fig_cooc = px.imshow(
+                    np.round(matriz, 2), x=nomes_sintomas, y=nomes_sintomas,
+                    color_continuous_scale='Reds', aspect='auto',
+                    title=f"Sintoma × Sintoma ({metrica_cooc.lower()})"
+                )
+                st.plotly_chart(fig_cooc, use_container_width=True)
+
+                diagnosticos_presentes = np.nonzero(dados_cooc['sintoma_diagnostico'].sum(axis=0) > 0)[0]
+                fig_diag_cooc = px.imshow(
+                    np.round(dados_cooc['sintoma_diagnostico'][np.ix_(presentes, diagnosticos_presentes)], 1),
+                    x=[dados_cooc['diagnosticos'][j] for j in diagnosticos_presentes], y=nomes_sintomas,
+                    color_continuous_scale='Blues', aspect='auto',
+                    title="Sintoma × Diagnóstico"
+                )
+                st.plotly_chart(fig_diag_cooc, use_container_width=True)
+
+            st.write("**⚠️ Agrupamentos emergentes sem perfil conhecido**")
+            clusters = coocorrencia.clusters_emergentes(regiao_cooc)
+            if clusters:
+                st.dataframe(pd.DataFrame([
+                    {
+                        'Sintomas': ', '.join(s.replace('_', ' ') for s in c['sintomas']),
+                        'Suporte recente': c['suporte'],
+                        'Lift': c['lift'],
+                        'Tendência': c['tendencia'],
+                        'Doença mais próxima': c['doenca_mais_proxima'] or '-',
+                        'Cobertura': f"{c['cobertura']:.0%}"
+                    }
+                    for c in clusters
+                ]), use_container_width=True)
+            else:
+                st.success("✅ Nenhum agrupamento recente fora dos perfis conhecidos")
+
+        # Prevalência regional dinâmica (priori bayesiana atualizada por desfechos)
+        st.subheader("📈 Prevalência Regional Dinâmica")
+        regiao_prev = st.selectbox(
+            "Região", list(triagem.prevalencia.regioes), format_func=lambda r: regiao_nomes.get(r, r), key="regiao_prev"
+        )
+        st.dataframe(pd.DataFrame([
+            {
+                'Doença': triagem._formatar_nome_doenca(linha['doenca']),
+                'Priori': f"{linha['priori']:.1%}",
+                'Posteriori': f"{linha['posteriori']:.1%}",
+                'Observações recentes': round(linha['observacoes_recentes'], 2),
+                'Modificador estático': linha['modificador_estatico'],
+                'Modificador atual': round(linha['modificador'], 3)
+            }
+            for linha in triagem.prevalencia.resumo(regiao_prev)
+        ]), use_container_width=True)
+
 elif pagina == "📋 Histórico":
     auth.require_permission('historico')
     st.header("📋 Histórico de Atendimentos")
@@ -678,37 +933,76 @@ elif pagina == "📋 Histórico":
     # Log da ação
     auth._log_audit('HISTORICO_ACESSADO', st.session_state['username'])
     
-    historico = triagem.obter_historico()
+    total_registros = len(triagem.historico)
     
-    if not historico:
+    if not total_registros:
         st.info("📝 Nenhum atendimento registrado ainda.")
     else:
-        # Filtros
+        # Filtros (valores disponíveis lidos do índice de busca, sem varrer o histórico)
+        indice_busca = triagem.indice
+        regiao_nomes = get_regiao_nomes()
+        
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            diagnosticos_unicos = list(set([item['resultado']['diagnostico_principal'] for item in historico]))
-            filtro_diagnostico = st.selectbox("Filtrar por diagnóstico", ["Todos"] + diagnosticos_unicos)
+            filtro_diagnostico = st.selectbox("Filtrar por diagnóstico", ["Todos"] + list(indice_busca.valores('diagnostico')))
+            filtro_regiao = st.selectbox(
+                "Filtrar por região", ["Todas"] + list(indice_busca.valores('regiao')),
+                format_func=lambda r: regiao_nomes.get(r, r)
+            )
+        
+        with col2:
+            filtro_urgencia = st.selectbox("Filtrar por urgência", ["Todas"] + list(indice_busca.valores('urgencia')))
+            filtro_faixa = st.selectbox("Filtrar por faixa etária", ["Todas"] + list(indice_busca.valores('faixa_etaria')))
+        
+        with col3:
+            filtro_periodo = st.selectbox(
+                "Período", [0, 1, 7, 14, 30, 90],
+                format_func=lambda d: "Todo o histórico" if d == 0 else f"Últimos {d} dias"
+            )
+            st.write(f"**Total de registros:** {total_registros}")
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        
+        with col1:
+            filtro_sintomas = st.multiselect(
+                "Sintomas (todos presentes)", list(indice_busca.valores('sintoma')),
+                format_func=lambda s: s.replace('_', ' ').title()
+            )
         
         with col2:
-            urgencias_unicas = list(set([item['resultado']['nivel_urgencia'] for item in historico]))
-            filtro_urgencia = st.selectbox("Filtrar por urgência", ["Todas"] + urgencias_unicas)
+            filtro_texto = st.text_input("Busca textual", placeholder="Ex.: doxiciclina enchentes")
         
         with col3:
-            st.write(f"**Total de registros:** {len(historico)}")
+            pagina_historico = st.number_input("Página", min_value=1, value=1, step=1)
+        
+        # Consulta por interseção das listas do índice
+        registros_por_pagina = 20
+        pagina_resultado = triagem.buscar_atendimentos(
+            offset=(pagina_historico - 1) * registros_por_pagina,
+            limite=registros_por_pagina,
+            sintomas=filtro_sintomas,
+            diagnostico=None if filtro_diagnostico == "Todos" else filtro_diagnostico,
+            urgencia=None if filtro_urgencia == "Todas" else filtro_urgencia,
+            regiao=None if filtro_regiao == "Todas" else filtro_regiao,
+            faixa_etaria=None if filtro_faixa == "Todas" else filtro_faixa,
+            texto=filtro_texto or None,
+            ultimos_dias=filtro_periodo or None
+        )
         
-        # Aplicar filtros
-        historico_filtrado = historico
-        if filtro_diagnostico != "Todos":
-            historico_filtrado = [item for item in historico_filtrado if item['resultado']['diagnostico_principal'] == filtro_diagnostico]
-        if filtro_urgencia != "Todas":
-            historico_filtrado = [item for item in historico_filtrado if item['resultado']['nivel_urgencia'] == filtro_urgencia]
+        total_paginas = max(1, -(-pagina_resultado['total'] // registros_por_pagina))
+        st.caption(f"🔎 {pagina_resultado['total']} atendimentos encontrados · página {pagina_historico} de {total_paginas}")
         
-        # Exibir histórico
-        for i, item in enumerate(reversed(historico_filtrado[-20:])):  # Últimos 20 registros
-            timestamp = datetime.fromisoformat(item['timestamp'])
+        if not pagina_resultado['itens']:
+            st.info("Nenhum registro encontrado nesta página com os filtros aplicados.")
+        
+        desfechos = triagem.obter_desfechos()
+        
+        # Exibir página do histórico (mais recentes primeiro)
+        for indice, item in pagina_resultado['itens']:
+            timestamp = formatar_ms(item['timestamp'])
             
-            with st.expander(f"🏥 Atendimento {len(historico_filtrado)-i} - {timestamp.strftime('%d/%m/%Y %H:%M')}"):
+            with st.expander(f"🏥 Atendimento {indice + 1} - {timestamp}"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -728,6 +1022,28 @@ elif pagina == "📋 Histórico":
                     # Mostrar informações de segurança se disponíveis
                     if 'processed_by' in item['resultado']:
                         st.write(f"• Processado por: {item['resultado']['processed_by']}")
+                
+                # Desfecho confirmado pelo clínico (usado na calibração dos pesos)
+                regiao_item = item['dados_paciente'].get('regiao_geografica', 'brasil_norte')
+                doencas_item = [
+                    triagem._formatar_nome_doenca(d)
+                    for d in triagem.base_conhecimento['regioes'][regiao_item]['doencas']
+                ]
+                if indice in desfechos:
+                    st.success(f"✅ Diagnóstico confirmado: {desfechos[indice]}")
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    confirmado = st.selectbox(
+                        "Diagnóstico confirmado", doencas_item + ["Outro (fora do perfil regional)"],
+                        key=f"desfecho_{indice}"
+                    )
+                with col2:
+                    st.write("")
+                    if st.button("✅ Confirmar", key=f"confirmar_desfecho_{indice}"):
+                        triagem.registrar_desfecho(indice, confirmado, st.session_state['username'])
+                        auth._log_audit('DESFECHO_CONFIRMADO', st.session_state['username'],
+                                        f"Atendimento {indice + 1}: {confirmado}")
+                        st.success("Desfecho registrado")
 
 elif pagina == "🔍 Log de Auditoria":
     auth.require_permission('audit_log')
@@ -769,7 +1085,10 @@ elif pagina == "🔍 Log de Auditoria":
                 # Criar DataFrame para melhor visualização
                 df_audit = pd.DataFrame(audit_filtrado[-50:])  # Últimos 50 registros
                 if not df_audit.empty:
-                    df_audit['timestamp'] = pd.to_datetime(df_audit['timestamp'])
+                    if df_audit['timestamp'].dtype == object:
+                        # Compatibilidade com registros antigos em ISO
+                        df_audit['timestamp'] = df_audit['timestamp'].map(para_epoch_ms)
+                    df_audit['timestamp'] = pd.to_datetime(df_audit['timestamp'], unit='ms', utc=True).dt.tz_convert(fuso_local())
                     df_audit = df_audit.sort_values('timestamp', ascending=False)
                     
                     # Mascarar informações sensíveis
@@ -830,7 +1149,72 @@ elif pagina == "💊 Gestão de Medicamentos":
     Esta funcionalidade analisa o histórico de triagens para calcular as necessidades de medicamentos
     e gerar listas de compras inteligentes baseadas em dados reais de atendimento.
     """)
-    
+
+    # Estoque atual (livro-razão atualizado a cada triagem)
+    st.subheader("📦 Estoque Atual")
+
+    alertas_estoque = triagem.estoque.obter_alertas()
+    for alerta in alertas_estoque:
+        if alerta['nivel'] == 'RUPTURA':
+            st.error(alerta['mensagem'])
+        else:
+            st.warning(alerta['mensagem'])
+
+    saldos = triagem.estoque.obter_saldos()
+    if saldos:
+        df_estoque = pd.DataFrame([
+            {
+                'Medicamento': medicamento,
+                'Saldo': dados['saldo'],
+                'Consumo/dia': dados['consumo_medio_diario'],
+                'Dias de cobertura': dados['dias_cobertura'] if dados['dias_cobertura'] is not None else '—',
+                'Ponto de reposição': dados['ponto_reposicao'],
+                'Status': dados['status']
+            }
+            for medicamento, dados in sorted(saldos.items())
+        ])
+        st.dataframe(df_estoque, use_container_width=True)
+    else:
+        st.info("📦 Nenhum medicamento com estoque cadastrado ainda")
+
+    nao_controlados = triagem.estoque.obter_nao_controlados()
+    if nao_controlados:
+        st.caption("Dispensados sem estoque cadastrado: " + ", ".join(
+            f"{medicamento} ({dados['quantidade']:g})" for medicamento, dados in sorted(nao_controlados.items())
+        ))
+
+    with st.expander("➕ Registrar Estoque Inicial / Entrada", expanded=False):
+        with st.form("movimento_estoque"):
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                tipo_movimento = st.selectbox("Tipo", ["Entrada", "Estoque inicial"])
+            with col2:
+                # Estoque controlado em unidades da apresentação (as mesmas baixadas na triagem)
+                medicamento_movimento = st.selectbox(
+                    "Apresentação", sorted(produto['descricao'] for produto in triagem.posologia.produtos)
+                )
+            with col3:
+                quantidade_movimento = st.number_input("Quantidade", min_value=0, value=0, step=1)
+
+            prazo_reposicao = st.number_input("Prazo de reposição (dias)", min_value=1, value=7, step=1)
+
+            if st.form_submit_button("💾 Registrar", use_container_width=True):
+                if medicamento_movimento:
+                    if tipo_movimento == "Entrada":
+                        triagem.estoque.registrar_entrada(medicamento_movimento, quantidade_movimento)
+                    else:
+                        triagem.estoque.definir_estoque_inicial(medicamento_movimento, quantidade_movimento,
+                                                                prazo_reposicao_dias=prazo_reposicao)
+                    auth._log_audit('ESTOQUE_MOVIMENTADO', st.session_state['username'],
+                                  f"{tipo_movimento}: {medicamento_movimento} ({quantidade_movimento})")
+                    st.success(f"✅ {tipo_movimento} registrada para {medicamento_movimento}")
+                    st.rerun()
+                else:
+                    st.error("❌ Informe a apresentação")
+
+    st.divider()
+
     # Configurações de análise
     st.subheader("⚙️ Configurações da Análise")
     
@@ -912,7 +1296,9 @@ elif pagina == "💊 Gestão de Medicamentos":
                     with col1:
                         st.write(f"**{med['medicamento']}**")
                     with col2:
-                        st.write(f"**{med['quantidade']} unidades**")
+                        st.write(f"**{med['quantidade']} prescrições**")
+                        if med['apresentacoes']:
+                            st.caption(" · ".join(f"{apresentacao}: {unidades}" for apresentacao, unidades in med['apresentacoes'].items()))
                     with col3:
                         st.write(f"{med['frequencia']}% dos casos")
                     with col4:
@@ -930,7 +1316,9 @@ elif pagina == "💊 Gestão de Medicamentos":
                     with col1:
                         st.write(f"**{med['medicamento']}**")
                     with col2:
-                        st.write(f"**{med['quantidade']} unidades**")
+                        st.write(f"**{med['quantidade']} prescrições**")
+                        if med['apresentacoes']:
+                            st.caption(" · ".join(f"{apresentacao}: {unidades}" for apresentacao, unidades in med['apresentacoes'].items()))
                     with col3:
                         st.write(f"{med['frequencia']}% dos casos")
                     with col4:
@@ -948,7 +1336,9 @@ elif pagina == "💊 Gestão de Medicamentos":
                         with col1:
                             st.write(f"**{med['medicamento']}**")
                         with col2:
-                            st.write(f"{med['quantidade']} unidades")
+                            st.write(f"{med['quantidade']} prescrições")
+                            if med['apresentacoes']:
+                                st.caption(" · ".join(f"{apresentacao}: {unidades}" for apresentacao, unidades in med['apresentacoes'].items()))
                         with col3:
                             st.write(f"{med['frequencia']}% dos casos")
                         with col4:
@@ -964,27 +1354,45 @@ elif pagina == "💊 Gestão de Medicamentos":
                         with col1:
                             st.write(f"**{med['medicamento']}**")
                         with col2:
-                            st.write(f"{med['quantidade']} unidades")
+                            st.write(f"{med['quantidade']} prescrições")
+                            if med['apresentacoes']:
+                                st.caption(" · ".join(f"{apresentacao}: {unidades}" for apresentacao, unidades in med['apresentacoes'].items()))
                         with col3:
                             st.write(f"{med['frequencia']}% dos casos")
                         with col4:
                             st.write(f"Usado {med['usado_periodo']}x")
             
+            # Compra em unidades (comprimidos, frascos-ampola, sachês) pela posologia e peso dos pacientes
+            if lista_compras.get('apresentacoes'):
+                st.subheader("📦 Compra por Apresentação")
+                st.caption("Unidades calculadas pela dosagem, frequência e duração de cada esquema e pelo peso dos pacientes (projeção + 20%)")
+                df_apresentacoes = pd.DataFrame(lista_compras['apresentacoes'])[
+                    ['apresentacao', 'unidades', 'saldo_estoque', 'comprar', 'prioridade']
+                ]
+                df_apresentacoes.columns = ['Apresentação', 'Unidades', 'Estoque', 'Comprar', 'Prioridade']
+                st.dataframe(df_apresentacoes, use_container_width=True, hide_index=True)
+            
             # Lista de compras formatada
             st.subheader("📝 Lista de Compras Formatada")
             
             lista_texto = "LISTA DE COMPRAS - MEDICAMENTOS\n"
             lista_texto += f"Período: {lista_compras['periodo_analise']}\n"
             lista_texto += f"Projeção: {lista_compras['projecao_para']}\n"
-            lista_texto += f"Total estimado: {resumo['total_unidades_estimadas']} unidades\n\n"
+            lista_texto += f"Total estimado: {resumo['total_unidades_estimadas']} unidades\n"
+            lista_texto += f"Total a comprar (descontado o estoque): {resumo['total_unidades_comprar']} unidades\n\n"
             
             for prioridade in ['CRÍTICA', 'ALTA', 'MÉDIA', 'BAIXA']:
                 if medicamentos_por_prioridade[prioridade]:
                     lista_texto += f"=== PRIORIDADE {prioridade} ===\n"
                     for med in medicamentos_por_prioridade[prioridade]:
-                        lista_texto += f"• {med['medicamento']}: {med['quantidade']} unidades\n"
+                        lista_texto += f"• {med['medicamento']}: {med['quantidade']} prescrições\n"
                     lista_texto += "\n"
             
+            if lista_compras.get('apresentacoes'):
+                lista_texto += "=== COMPRA POR APRESENTAÇÃO ===\n"
+                for item in lista_compras['apresentacoes']:
+                    lista_texto += f"• {item['apresentacao']}: {item['comprar']} (necessidade {item['unidades']})\n"
+            
             st.text_area("Lista para copiar:", lista_texto, height=300)
             
             # Botão para download
@@ -1050,7 +1458,9 @@ elif pagina == "💊 Gestão de Medicamentos":
                     2. **Frequência de Uso**: Calculamos quantas vezes cada medicamento foi prescrito
                     3. **Projeção Estatística**: Baseamos a projeção na média diária de triagens
                     4. **Margem de Segurança**: Adicionamos 20% extra para evitar falta de estoque
-                    5. **Priorização Clínica**: Classificamos por criticidade médica e frequência de uso
+                    5. **Unidades de Compra**: Convertemos cada prescrição em comprimidos, frascos-ampola e sachês pela dosagem, frequência, duração e peso do paciente
+                    6. **Estoque Atual**: Descontamos o saldo do livro-razão de estoque (em unidades de cada apresentação) da quantidade a comprar
+                    7. **Priorização Clínica**: Classificamos por criticidade médica e frequência de uso
                     
                     **Critérios de Prioridade:**
                     - **CRÍTICA**: Medicamentos essenciais (Artesunato, Quinina, Ceftriaxona, etc.)
@@ -1058,7 +1468,7 @@ elif pagina == "💊 Gestão de Medicamentos":
                     - **MÉDIA**: Frequência ≥5% ou 1+ caso urgente  
                     - **BAIXA**: Demais medicamentos
                     
-                    **Fórmula**: `Necessidade = (Frequência × Projeção) + 20% margem`
+                    **Fórmula**: `Necessidade = (Frequência × Projeção) + 20% margem` · `Comprar = Necessidade − Estoque`
                     """)
     
     # Informações adicionais
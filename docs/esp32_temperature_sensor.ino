@@ -151,9 +151,18 @@ void conectarMQTT() {
     Serial.print("Conectando MQTT...");
     espClient.setInsecure();
     
-    if (client.connect("TermometroESP32", mqtt_user, mqtt_password)) {
+    // Presença: o broker publica o last-will (retido) se a conexão cair sem aviso
+    String presenceTopic = String(status_topic) + "/" + deviceID;
+    String willPayload = "{\"device_id\":\"" + deviceID + "\",\"status\":\"offline\"}";
+    
+    if (client.connect(("TermometroESP32-" + deviceID).c_str(), mqtt_user, mqtt_password,
+                       presenceTopic.c_str(), 1, true, willPayload.c_str())) {
       Serial.println("MQTT conectado!");
       
+      // Status retido: quem assinar depois já recebe "online"
+      String onlinePayload = "{\"device_id\":\"" + deviceID + "\",\"status\":\"online\"}";
+      client.publish(presenceTopic.c_str(), onlinePayload.c_str(), true);
+      
       // Subscrever ao tópico de comandos
       client.subscribe(command_topic);
       Serial.println("📡 Subscrito ao tópico de comandos: " + String(command_topic));
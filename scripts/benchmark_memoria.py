@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Mede a memória por registro das leituras IoT e dos atendimentos em memória:
+dicionários decodificados do JSON (antes) contra registros compactos com
+__slots__ e strings internadas (depois).
+
+Uso:
+    python scripts/benchmark_memoria.py [--registros 5000] [--historico historico_atendimentos.jsonl]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import gc
+import io
+import json
+import random
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+from src.core.registros import RegistroAtendimento
+from src.iot.registros import LeituraSensor
+from src.utils.tempo import agora_ms
+
+
+def medir(linhas, converter):
+    """Bytes alocados por registro ao manter todos os registros em uma lista"""
+    gc.collect()
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    registros = [converter(json.loads(linha)) for linha in linhas]
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del registros
+    return (atual - inicio) / len(linhas)
+
+
+def gerar_leituras(quantidade, semente=42):
+    """Leituras no formato JSON de transporte de alguns termômetros ESP32"""
+    gerador = random.Random(semente)
+    dispositivos = [
+        (f"ESP32_TERMOMETRO_{i:03d}", gerador.choice(["UBS Centro", "Posto Ribeirinho", "Hospital Regional"]))
+        for i in range(8)
+    ]
+    agora = agora_ms()
+    linhas = []
+    for i in range(quantidade):
+        device_id, local = gerador.choice(dispositivos)
+        linhas.append(json.dumps({
+            'device_id': device_id,
+            'sensor_type': 'temperature',
+            'value': round(gerador.uniform(35.5, 40.0), 1),
+            'unit': '°C',
+            'location': local,
+            'battery_level': gerador.randint(20, 100),
+            'firmware_version': '2.0.0',
+            'status': 'online',
+            'timestamp': agora - (quantidade - i) * 1000,
+            'processed': False
+        }, ensure_ascii=False))
+    return linhas
+
+
+def gerar_atendimentos(quantidade, semente=42):
+    """Atendimentos reais do motor de triagem para pacientes sintéticos (em diretório temporário)"""
+    from src.core.triagem_model import TriagemMedica
+
+    gerador = random.Random(semente)
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.chdir(diretorio)
+        try:
+            with redirect_stdout(io.StringIO()):
+                triagem = TriagemMedica()
+                regioes = triagem.base_conhecimento['regioes']
+                for _ in range(quantidade):
+                    regiao = gerador.choice(list(regioes))
+                    sintomas = sorted({s for d in regioes[regiao]['doencas'].values() for s in d['sintomas']})
+                    triagem.processar_triagem({
+                        'idade': gerador.randint(0, 90),
+                        'sexo': gerador.choice(['Masculino', 'Feminino']),
+                        'peso': round(gerador.uniform(10, 100), 1),
+                        'temperatura': round(gerador.uniform(36.0, 40.5), 1),
+                        'pressao_sistolica': gerador.randint(85, 170),
+                        'pressao_diastolica': gerador.randint(55, 100),
+                        'frequencia_cardiaca': gerador.randint(55, 130),
+                        'sintomas': gerador.sample(sintomas, gerador.randint(1, 5)),
+                        'evento_climatico': gerador.choice(['enchentes', 'secas', 'chuvas_intensas', '']),
+                        'tempo_sintomas': gerador.randint(1, 14),
+                        'historico_medico': gerador.sample(['hipertensao', 'diabetes', 'gestante'], gerador.randint(0, 1)),
+                        'populacao_vulneravel': gerador.random() < 0.3,
+                        'regiao_geografica': regiao
+                    })
+            with open(triagem.historico_file, 'r', encoding='utf-8') as f:
+                return [linha for linha in f if linha.strip()]
+        finally:
+            os.chdir(diretorio_original)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória dos registros em memória")
+    parser.add_argument('--registros', type=int, default=5000, help="Quantidade de registros por tipo")
+    parser.add_argument('--historico', help="Histórico JSON Lines existente (padrão: atendimentos sintéticos)")
+    args = parser.parse_args()
+
+    if args.historico:
+        with open(args.historico, 'r', encoding='utf-8') as f:
+            linhas_atendimentos = [linha for linha in f if linha.strip()][-args.registros:]
+    else:
+        print(f"🏥 Gerando {args.registros} atendimentos sintéticos...")
+        linhas_atendimentos = gerar_atendimentos(args.registros)
+    linhas_leituras = gerar_leituras(args.registros)
+
+    print(f"\n📊 Memória por registro ({args.registros} registros)")
+    print(f"{'Tipo':<14}{'dict (antes)':>16}{'compacto (depois)':>20}{'redução':>10}")
+    for nome, linhas, classe in (
+        ('Leitura IoT', linhas_leituras, LeituraSensor),
+        ('Atendimento', linhas_atendimentos, RegistroAtendimento)
+    ):
+        antes = medir(linhas, lambda dados: dados)
+        depois = medir(linhas, classe.de_dict)
+        print(f"{nome:<14}{antes:>14.0f} B{depois:>18.0f} B{1 - depois / antes:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
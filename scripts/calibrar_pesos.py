@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Calibra os pesos do score de triagem por região contra desfechos confirmados.
+
+Usa os diagnósticos confirmados registrados no histórico ou um arquivo JSON
+Lines com objetos {"dados_paciente": {...}, "diagnostico_confirmado": "..."}.
+
+Uso:
+    python scripts/calibrar_pesos.py [--casos casos.jsonl] [--passo 0.05] [--min-casos 30]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+
+from src.core.triagem_model import TriagemMedica
+from src.core.calibracao import CalibradorPesos
+
+
+def ler_casos(caminho):
+    """Lê casos rotulados de um arquivo JSON Lines"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                caso = json.loads(linha)
+                yield caso['dados_paciente'], caso['diagnostico_confirmado']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibração vetorizada dos pesos do score de triagem")
+    parser.add_argument('--casos', help="Arquivo JSON Lines com casos rotulados (padrão: desfechos do histórico)")
+    parser.add_argument('--passo', type=float, default=0.05, help="Resolução da grade de pesos")
+    parser.add_argument('--min-casos', type=int, default=30, help="Casos mínimos por região")
+    parser.add_argument('--peso-minimo', type=float, default=0.0, help="Peso mínimo de cada fator")
+    parser.add_argument('--saida', default='pesos_regionais.json', help="Arquivo de perfis de pesos")
+    parser.add_argument('--simular', action='store_true', help="Apenas exibe o relatório, sem gravar")
+    args = parser.parse_args()
+
+    triagem = TriagemMedica()
+    calibrador = CalibradorPesos(triagem)
+    casos = ler_casos(args.casos) if args.casos else triagem.casos_confirmados()
+
+    print("⚖️ Calibrando pesos do score de triagem...")
+    inicio = time.time()
+    perfis = calibrador.calibrar(casos, passo=args.passo, minimo_casos=args.min_casos,
+                                 peso_minimo=args.peso_minimo)
+    duracao = time.time() - inicio
+
+    if not perfis:
+        print("❌ Nenhum caso confirmado encontrado")
+        return
+
+    for regiao, perfil in perfis.items():
+        print(f"\n🌍 {regiao}: {perfil['casos']} casos ({perfil['descartados']} fora do perfil da região)")
+        print(f"   Padrão:    top-1 {perfil['top1_padrao']:.1%} | top-3 {perfil['top3_padrao']:.1%}")
+        if 'top1' in perfil:
+            print(f"   Calibrado: top-1 {perfil['top1']:.1%} | top-3 {perfil['top3']:.1%}")
+        else:
+            print(f"   ⚠️ {perfil['observacao']}")
+        print("   Pesos: " + " | ".join(f"{fator} {peso:.2f}" for fator, peso in perfil['pesos'].items()))
+
+    print(f"\n⏱️ {perfis[next(iter(perfis))]['candidatos_avaliados']} candidatos avaliados em {duracao:.2f}s")
+
+    if not args.simular:
+        calibrador.salvar_perfis(perfis, args.saida)
+        print(f"✅ Perfis salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
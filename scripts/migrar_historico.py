@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Migra o histórico de atendimentos para resultados codificados (modelo com
+parâmetros). Atendimentos já codificados e resultados que não correspondem a
+uma doença da base são mantidos como estão. A ordem e a quantidade de linhas
+não mudam, então índice, cubo e coocorrência continuam válidos.
+
+Execute com o painel parado.
+
+Uso:
+    python scripts/migrar_historico.py [--arquivo historico_atendimentos.jsonl] [--expandir] [--simular]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import io
+import json
+import time
+from contextlib import redirect_stdout
+
+from src.core.triagem_model import TriagemMedica
+from src.core.codificacao import CodificadorResultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codificação dos resultados do histórico de atendimentos")
+    parser.add_argument('--arquivo', default='historico_atendimentos.jsonl', help="Histórico em JSON Lines")
+    parser.add_argument('--expandir', action='store_true', help="Reverte para resultados completos (formato antigo)")
+    parser.add_argument('--simular', action='store_true', help="Apenas exibe o relatório, sem gravar")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.arquivo):
+        print(f"❌ Arquivo não encontrado: {args.arquivo}")
+        return 1
+
+    with redirect_stdout(io.StringIO()):
+        codificador = CodificadorResultados(TriagemMedica())
+
+    inicio = time.perf_counter()
+    tamanho_original = os.path.getsize(args.arquivo)
+    temporario = args.arquivo + '.tmp'
+    convertidos = 0
+    mantidos = 0
+    tamanho_novo = 0
+
+    with open(args.arquivo, 'r', encoding='utf-8') as entrada, \
+            open(os.devnull if args.simular else temporario, 'w', encoding='utf-8') as saida:
+        for linha in entrada:
+            if not linha.strip():
+                continue
+            atendimento = json.loads(linha)
+            if args.expandir:
+                novo = codificador.expandir(atendimento)
+            else:
+                novo = codificador.codificar(atendimento)
+            if novo is atendimento:
+                mantidos += 1
+            else:
+                convertidos += 1
+            nova_linha = json.dumps(novo, ensure_ascii=False) + '\n'
+            tamanho_novo += len(nova_linha.encode('utf-8'))
+            saida.write(nova_linha)
+
+    if not args.simular:
+        os.replace(temporario, args.arquivo)
+
+    operacao = "expandidos" if args.expandir else "codificados"
+    print(f"✅ {convertidos} atendimentos {operacao}, {mantidos} mantidos ({time.perf_counter() - inicio:.1f}s)")
+    print(f"📦 Tamanho: {tamanho_original / 1024:.1f} KB → {tamanho_novo / 1024:.1f} KB "
+          f"({tamanho_novo / max(tamanho_original, 1):.0%} do original)")
+    if args.simular:
+        print("ℹ️ Simulação: arquivo não alterado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Migração única dos timestamps gravados em ISO para epoch em milissegundos.
+
+Reescreve os arquivos de dados do diretório atual (ou do informado como
+argumento). É idempotente: registros já em ms são mantidos. Cada arquivo é
+gravado em um temporário e substituído de forma atômica.
+
+Uso:
+    python scripts/migrar_timestamps.py [diretorio_dados]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from src.utils.tempo import para_epoch_ms
+
+
+def converter_campos(registro, campos):
+    """Converte os campos de timestamp de um registro; retorna quantos mudaram"""
+    alterados = 0
+    for campo in campos:
+        valor = registro.get(campo)
+        if isinstance(valor, str) and valor:
+            registro[campo] = para_epoch_ms(valor)
+            alterados += 1
+    return alterados
+
+
+def gravar_atomico(caminho, conteudo):
+    """Grava em arquivo temporário e substitui o original"""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def migrar_lista_json(caminho, campos):
+    """Migra arquivo JSON contendo lista de registros"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        registros = json.load(f)
+    alterados = sum(converter_campos(r, campos) for r in registros)
+    if alterados:
+        gravar_atomico(caminho, json.dumps(registros, ensure_ascii=False, indent=2))
+    return alterados
+
+
+def migrar_dict_json(caminho, campos):
+    """Migra arquivo JSON contendo dict de registros (usuários, sessões, dispositivos, estoque)"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        registros = json.load(f)
+    alterados = sum(converter_campos(r, campos) for r in registros.values() if isinstance(r, dict))
+    if alterados:
+        gravar_atomico(caminho, json.dumps(registros, ensure_ascii=False, indent=2))
+    return alterados
+
+
+def migrar_jsonl(caminho, campos):
+    """Migra arquivo JSON Lines linha a linha"""
+    linhas = []
+    alterados = 0
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            alterados += converter_campos(registro, campos)
+            linhas.append(json.dumps(registro, ensure_ascii=False) + '\n')
+    if alterados:
+        gravar_atomico(caminho, ''.join(linhas))
+    return alterados
+
+
+ARQUIVOS = [
+    ('historico_atendimentos.jsonl', migrar_jsonl, ['timestamp']),
+    ('historico_atendimentos.json', migrar_lista_json, ['timestamp']),
+    ('estoque_movimentos.jsonl', migrar_jsonl, ['timestamp']),
+    ('estoque_medicamentos.json', migrar_dict_json, ['atualizado_em']),
+    ('iot_readings.json', migrar_lista_json, ['timestamp']),
+    ('iot_devices.json', migrar_dict_json, ['registered_at', 'last_seen']),
+    ('audit_log.json', migrar_lista_json, ['timestamp']),
+    ('users.json', migrar_dict_json, ['created_at']),
+    ('sessions.json', migrar_dict_json, ['created_at', 'expires_at']),
+]
+
+
+def main():
+    diretorio = sys.argv[1] if len(sys.argv) > 1 else '.'
+    print(f"🕐 Migrando timestamps em: {os.path.abspath(diretorio)}")
+
+    total = 0
+    for nome, migrar, campos in ARQUIVOS:
+        caminho = os.path.join(diretorio, nome)
+        if not os.path.exists(caminho):
+            continue
+        try:
+            alterados = migrar(caminho, campos)
+        except Exception as e:
+            print(f"❌ {nome}: {str(e)}")
+            continue
+        total += alterados
+        print(f"✅ {nome}: {alterados} campos convertidos")
+
+    print(f"📊 Total: {total} campos convertidos")
+
+
+if __name__ == "__main__":
+    main()
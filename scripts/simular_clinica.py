@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Simula o fluxo de pacientes da clínica para planejamento de equipe.
+
+Exemplos:
+    python scripts/simular_clinica.py --dias 30 --chegadas-dia 300 --equipe 8
+    python scripts/simular_clinica.py --equipe 3,3,3,3,3,3,3,8,8,8,8,8,8,8,8,8,8,8,8,8,4,4,4,4 \\
+        --surto enchentes:10:7:2.0 --tempo-atendimento ALTA=30 --json simulacao.json
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import io
+import json
+from contextlib import redirect_stdout
+
+from src.core.triagem_model import TriagemMedica
+from src.core.simulacao import SimuladorClinica
+
+
+def ler_surto(texto):
+    """evento:inicio_dia:duracao_dias[:multiplicador]"""
+    partes = texto.split(':')
+    if len(partes) not in (3, 4):
+        raise argparse.ArgumentTypeError("Use evento:inicio_dia:duracao_dias[:multiplicador]")
+    surto = {'evento': partes[0], 'inicio_dia': float(partes[1]), 'duracao_dias': float(partes[2])}
+    if len(partes) == 4:
+        surto['multiplicador'] = float(partes[3])
+    return surto
+
+
+def ler_equipe(texto):
+    """Um inteiro ou 24 inteiros separados por vírgula (um por hora do dia)"""
+    valores = [int(v) for v in texto.split(',')]
+    if len(valores) == 1:
+        return valores[0]
+    if len(valores) != 24:
+        raise argparse.ArgumentTypeError("Informe um valor ou 24 valores (um por hora)")
+    return valores
+
+
+def ler_tempo(texto):
+    """NIVEL=minutos"""
+    nivel, _, minutos = texto.partition('=')
+    return nivel.upper(), float(minutos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação de eventos discretos do fluxo da clínica")
+    parser.add_argument('--regiao', default='brasil_norte', help="Região da clínica")
+    parser.add_argument('--dias', type=float, default=30, help="Dias simulados")
+    parser.add_argument('--chegadas-dia', type=float, default=300, help="Média de chegadas por dia fora de surtos")
+    parser.add_argument('--equipe', type=ler_equipe, default=8, help="Profissionais (um valor ou 24 por hora)")
+    parser.add_argument('--surto', type=ler_surto, action='append', default=[],
+                        help="Surto evento:inicio_dia:duracao_dias[:multiplicador] (repetível)")
+    parser.add_argument('--evento-base', default='', help="Evento climático fora dos surtos")
+    parser.add_argument('--tempo-atendimento', type=ler_tempo, action='append', default=[],
+                        help="Tempo médio NIVEL=minutos (repetível)")
+    parser.add_argument('--semente', type=int, help="Semente do gerador")
+    parser.add_argument('--json', help="Grava o relatório completo neste arquivo")
+    args = parser.parse_args()
+
+    with redirect_stdout(io.StringIO()):
+        triagem = TriagemMedica()
+
+    simulador = SimuladorClinica(
+        triagem,
+        regiao=args.regiao,
+        chegadas_por_dia=args.chegadas_dia,
+        equipe=args.equipe,
+        tempos_atendimento=dict(args.tempo_atendimento),
+        surtos=args.surto,
+        evento_base=args.evento_base,
+        semente=args.semente
+    )
+    print(f"🏥 Simulando {args.dias:g} dias em {args.regiao}...")
+    relatorio = simulador.executar(args.dias)
+
+    print(f"✅ {relatorio['pacientes']} pacientes ({relatorio['saudaveis']} saudáveis) "
+          f"em {relatorio['tempo_execucao_s']}s")
+    print(f"👩‍⚕️ Utilização da equipe: {relatorio['utilizacao_equipe']:.0%}")
+    print("\n⏱️ Espera por nível de urgência (minutos)")
+    print(f"{'Nível':<10}{'Pacientes':>10}{'Média':>9}{'P90':>9}{'Máx':>9}{'Meta':>7}{'Na meta':>9}{'Fila máx':>10}")
+    for nivel, dados in relatorio['urgencias'].items():
+        if not dados['pacientes']:
+            continue
+        print(f"{nivel:<10}{dados['pacientes']:>10}{dados['espera_media_min']:>9.1f}{dados['espera_p90_min']:>9.1f}"
+              f"{dados['espera_maxima_min']:>9.1f}{dados['meta_min']:>7.0f}{dados['dentro_meta']:>9.0%}{dados['fila_maxima']:>10}")
+
+    print("\n💊 Medicamentos prescritos")
+    for nome, quantidade in relatorio['medicamentos'].items():
+        print(f"   {nome}: {quantidade}")
+
+    print("\n📦 Consumo em unidades de compra")
+    for apresentacao, unidades in relatorio['unidades'].items():
+        print(f"   {apresentacao}: {unidades:g}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Relatório gravado em {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -68,11 +68,11 @@ else
 fi
 
 # Arquivo de leituras IoT
-if [ ! -f "iot_readings.json" ]; then
-    echo '[]' > iot_readings.json
-    echo "✅ iot_readings.json criado"
+if [ ! -f "iot_readings.jsonl" ]; then
+    touch iot_readings.jsonl
+    echo "✅ iot_readings.jsonl criado"
 else
-    echo "✅ iot_readings.json já existe"
+    echo "✅ iot_readings.jsonl já existe"
 fi
 
 # Arquivo de histórico de atendimentos
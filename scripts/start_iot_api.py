@@ -29,6 +29,7 @@ def main():
         print("   GET  /                     - Informações da API")
         print("   POST /webhook             - Webhook para ESP32")
         print("   POST /api/sensor-data     - Receber dados de sensores")
+        print("   POST /api/sensor-data/batch - Receber lote (JSON array ou NDJSON)")
         print("   GET  /api/health          - Health check")
         print("   GET  /api/device-status/<id> - Status do dispositivo")
         print(f"\n🌡️ Para o ESP32, configure a URL:")
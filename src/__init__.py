@@ -11,6 +11,7 @@ Módulos:
 - iot: Integração com sensores IoT via MQTT
 - utils: Utilitários e funções auxiliares
 - config: Configurações do sistema
+- campo: Runtime de triagem sem interface gráfica para kits de campo
 """
 
 __version__ = "3.0.0"
@@ -2,8 +2,8 @@ import streamlit as st
 import hashlib
 import json
 import os
-from datetime import datetime, timedelta
 import secrets
+from ..utils.tempo import agora_ms, para_epoch_ms, MS_POR_HORA
 
 class AuthManager:
     def __init__(self):
@@ -20,21 +20,21 @@ class AuthManager:
                     'password_hash': self._hash_password('admin123'),
                     'role': 'administrador',
                     'name': 'Administrador do Sistema',
-                    'created_at': datetime.now().isoformat(),
+                    'created_at': agora_ms(),
                     'active': True
                 },
                 'medico': {
                     'password_hash': self._hash_password('medico123'),
                     'role': 'medico',
                     'name': 'Médico Responsável',
-                    'created_at': datetime.now().isoformat(),
+                    'created_at': agora_ms(),
                     'active': True
                 },
                 'enfermeiro': {
                     'password_hash': self._hash_password('enfermeiro123'),
                     'role': 'enfermeiro',
                     'name': 'Enfermeiro(a)',
-                    'created_at': datetime.now().isoformat(),
+                    'created_at': agora_ms(),
                     'active': True
                 }
             }
@@ -61,7 +61,7 @@ class AuthManager:
     def _log_audit(self, action, username, details=""):
         """Registra ações no log de auditoria"""
         audit_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': agora_ms(),
             'action': action,
             'username': username,
             'ip_address': st.session_state.get('client_ip', 'unknown'),
@@ -131,8 +131,8 @@ class AuthManager:
         
         sessions[token] = {
             'username': username,
-            'created_at': datetime.now().isoformat(),
-            'expires_at': (datetime.now() + timedelta(hours=8)).isoformat()
+            'created_at': agora_ms(),
+            'expires_at': agora_ms() + 8 * MS_POR_HORA
         }
         
         with open(self.sessions_file, 'w') as f:
@@ -160,9 +160,9 @@ class AuthManager:
             return False
         
         session = sessions[token]
-        expires_at = datetime.fromisoformat(session['expires_at'])
+        expires_at = para_epoch_ms(session['expires_at'])
         
-        if datetime.now() > expires_at:
+        if agora_ms() > expires_at:
             # Sessão expirada
             self.logout()
             return False
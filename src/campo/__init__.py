@@ -0,0 +1,19 @@
+"""
+Módulo Campo - Runtime de Triagem sem Interface Gráfica
+======================================================
+
+Motor de triagem leve para kits de campo (ex.: Raspberry Pi), sem
+Streamlit, Flask, MQTT ou Plotly. Depende apenas da biblioteca padrão e
+do NumPy.
+
+Uso:
+    python -m src.campo                 # REPL interativo
+    python -m src.campo --json < in     # JSON Lines na entrada e na saída
+
+Classes principais:
+- RuntimeCampo: Motor de triagem com interface REPL e JSON
+"""
+
+from .runtime import RuntimeCampo
+
+__all__ = ['RuntimeCampo']
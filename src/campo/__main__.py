@@ -0,0 +1,27 @@
+"""
+Ponto de entrada do runtime de campo: python -m src.campo
+"""
+
+import argparse
+import sys
+
+from .runtime import RuntimeCampo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triagem médica sem interface gráfica")
+    parser.add_argument('--json', action='store_true',
+                        help="Lê pacientes em JSON Lines da entrada padrão e escreve resultados em JSON Lines")
+    parser.add_argument('--dados', default=None,
+                        help="Diretório dos arquivos de dados (padrão: diretório atual)")
+    args = parser.parse_args()
+
+    runtime = RuntimeCampo(diretorio_dados=args.dados)
+    if args.json:
+        runtime.processar_json(sys.stdin, sys.stdout)
+    else:
+        runtime.repl()
+
+
+if __name__ == "__main__":
+    main()
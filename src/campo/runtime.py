@@ -0,0 +1,171 @@
+"""
+Runtime de Triagem para Kits de Campo
+=====================================
+
+Motor de triagem sem dashboard: importa apenas a biblioteca padrão, NumPy e
+o núcleo de triagem. Estruturas analíticas (índice, cubo, coocorrência) não
+são carregadas; elas alcançam o histórico quando os dados forem abertos no
+painel.
+"""
+
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+
+from ..core.triagem_model import TriagemMedica
+from ..utils.detection import detectar_febre_automatica
+
+
+# Valores padrão usados pelo formulário do painel
+PADROES_PACIENTE = {
+    'idade': 30,
+    'sexo': 'Não informado',
+    'peso': 70.0,
+    'temperatura': 36.5,
+    'pressao_sistolica': 120,
+    'pressao_diastolica': 80,
+    'frequencia_cardiaca': 70,
+    'sintomas': [],
+    'evento_climatico': '',
+    'tempo_sintomas': 1,
+    'historico_medico': [],
+    'populacao_vulneravel': False,
+    'regiao_geografica': 'brasil_norte'
+}
+
+CAMPOS_NUMERICOS = {
+    'idade': int, 'peso': float, 'temperatura': float, 'pressao_sistolica': int,
+    'pressao_diastolica': int, 'frequencia_cardiaca': int, 'tempo_sintomas': int
+}
+
+
+class RuntimeCampo:
+    def __init__(self, diretorio_dados=None):
+        """Inicializa o motor de triagem no diretório de dados informado"""
+        if diretorio_dados:
+            os.makedirs(diretorio_dados, exist_ok=True)
+            os.chdir(diretorio_dados)
+        self.triagem = TriagemMedica()
+
+    def regioes(self):
+        """Retorna as regiões disponíveis na base de conhecimento"""
+        return {codigo: regiao['nome'] for codigo, regiao in self.triagem.base_conhecimento['regioes'].items()}
+
+    def sintomas(self, regiao):
+        """Retorna os sintomas conhecidos pelas doenças de uma região"""
+        doencas = self.triagem.base_conhecimento['regioes'][regiao]['doencas']
+        return sorted({sintoma for doenca in doencas.values() for sintoma in doenca['sintomas']})
+
+    def preparar_paciente(self, dados):
+        """
+        Completa e normaliza os dados de um paciente
+
+        Args:
+            dados (dict): Campos informados (os ausentes recebem os padrões do formulário)
+
+        Returns:
+            dict: Dados prontos para processar_triagem
+        """
+        paciente = dict(PADROES_PACIENTE)
+        paciente.update(dados)
+
+        for campo, tipo in CAMPOS_NUMERICOS.items():
+            paciente[campo] = tipo(paciente[campo])
+        if isinstance(paciente['sintomas'], str):
+            paciente['sintomas'] = [s.strip() for s in paciente['sintomas'].split(',') if s.strip()]
+        if isinstance(paciente['historico_medico'], str):
+            paciente['historico_medico'] = [h.strip() for h in paciente['historico_medico'].split(',') if h.strip()]
+        if paciente['regiao_geografica'] not in self.triagem.base_conhecimento['regioes']:
+            raise ValueError(f"Região desconhecida: {paciente['regiao_geografica']}")
+
+        # Mesma detecção automática de febre do painel
+        sintomas = list(detectar_febre_automatica(paciente['temperatura']))
+        sintomas.extend(s for s in paciente['sintomas'] if s not in sintomas)
+        paciente['sintomas'] = sintomas
+        return paciente
+
+    def triar(self, dados):
+        """Processa a triagem de um paciente e retorna o resultado"""
+        return self.triagem.processar_triagem(self.preparar_paciente(dados))
+
+    def processar_json(self, entrada=sys.stdin, saida=sys.stdout):
+        """
+        Processa pacientes em JSON Lines: um objeto por linha na entrada,
+        um resultado por linha na saída
+
+        Returns:
+            int: Quantidade de linhas processadas
+        """
+        processadas = 0
+        for linha in entrada:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                # Mensagens de log vão para stderr para não corromper a saída JSON
+                with redirect_stdout(sys.stderr):
+                    resposta = {'resultado': self.triar(json.loads(linha))}
+            except (ValueError, KeyError, TypeError) as e:
+                resposta = {'erro': str(e)}
+            saida.write(json.dumps(resposta, ensure_ascii=False) + '\n')
+            saida.flush()
+            processadas += 1
+        return processadas
+
+    def repl(self):
+        """Interface interativa simples no terminal"""
+        print("🏥 Triagem Médica - Runtime de Campo")
+        print("Comandos: 'regioes', 'sintomas <regiao>', 'sair'. Enter vazio usa o valor padrão.\n")
+
+        while True:
+            try:
+                comando = input("triagem> ").strip()
+            except EOFError:
+                print()
+                return
+
+            if comando in ('sair', 'exit', 'quit'):
+                return
+            if comando == 'regioes':
+                for codigo, nome in self.regioes().items():
+                    print(f"  {codigo}: {nome}")
+                continue
+            if comando.startswith('sintomas'):
+                partes = comando.split()
+                regiao = partes[1] if len(partes) > 1 else PADROES_PACIENTE['regiao_geografica']
+                if regiao not in self.regioes():
+                    print(f"❌ Região desconhecida: {regiao}")
+                    continue
+                print("  " + ", ".join(self.sintomas(regiao)))
+                continue
+            if comando not in ('', 'nova', 'triagem') and not comando.startswith('{'):
+                print("❓ Comando desconhecido")
+                continue
+
+            try:
+                dados = json.loads(comando) if comando.startswith('{') else self._perguntar_paciente()
+                self._imprimir_resultado(self.triar(dados))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"❌ Dados inválidos: {str(e)}")
+
+    def _perguntar_paciente(self):
+        dados = {}
+        for campo in ('regiao_geografica', 'idade', 'sexo', 'temperatura', 'pressao_sistolica',
+                      'frequencia_cardiaca', 'sintomas', 'evento_climatico', 'historico_medico'):
+            padrao = PADROES_PACIENTE[campo]
+            valor = input(f"  {campo} [{padrao}]: ").strip()
+            if valor:
+                dados[campo] = valor
+        return dados
+
+    @staticmethod
+    def _imprimir_resultado(resultado):
+        print(f"\n🩺 Diagnóstico: {resultado['diagnostico_principal']} ({resultado['probabilidade']}%)")
+        print(f"🚨 Urgência: {resultado['nivel_urgencia']}")
+        print(f"💊 Medicamento: {resultado['medicamentos']} - {resultado['dosagem']} ({resultado['frequencia']})")
+        for diferencial in resultado.get('diagnosticos_diferenciais', []):
+            print(f"   • Diferencial: {diferencial['nome']} ({diferencial['probabilidade']}%)")
+        for recomendacao in resultado.get('recomendacoes', []):
+            print(f"   → {recomendacao}")
+        print()
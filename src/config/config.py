@@ -3,7 +3,6 @@ Configurações do Sistema de Triagem Médica IoT
 """
 
 import os
-import streamlit as st
 from datetime import datetime
 
 class Config:
@@ -49,6 +48,30 @@ class Config:
         f"http://127.0.0.1:{IOT_API_PORT}/webhook"
     ]
 
+    # Servidor HTTP de ingestão IoT: 'async' (asyncio, padrão) ou 'flask' (servidor de desenvolvimento)
+    IOT_API_SERVER = os.getenv('IOT_API_SERVER', 'async')
+    IOT_API_MAX_CONNECTIONS = int(os.getenv('IOT_API_MAX_CONNECTIONS', '10000'))
+    IOT_API_MAX_CONCURRENCY = int(os.getenv('IOT_API_MAX_CONCURRENCY', '256'))
+
+    # Fila de ingestão IoT entre transportes e armazenamento
+    # Política com a fila cheia: 'bloquear', 'descartar_antigas' ou 'rejeitar' (HTTP 503)
+    IOT_QUEUE_CAPACITY = int(os.getenv('IOT_QUEUE_CAPACITY', '20000'))
+    IOT_QUEUE_POLICY = os.getenv('IOT_QUEUE_POLICY', 'rejeitar')
+    IOT_QUEUE_BATCH_SIZE = int(os.getenv('IOT_QUEUE_BATCH_SIZE', '500'))
+    IOT_QUEUE_BLOCK_TIMEOUT = float(os.getenv('IOT_QUEUE_BLOCK_TIMEOUT', '2.0'))
+
+    # Histórico durável de leituras IoT (segmentos diários)
+    IOT_SERIES_DIR = os.getenv('IOT_SERIES_DIR', 'iot_series')
+    IOT_RETENTION_DAYS = int(os.getenv('IOT_RETENTION_DAYS', '90'))
+
+    # Regras de alerta IoT (limites por local/dispositivo, histerese, supressão)
+    IOT_ALERT_RULES_FILE = os.getenv('IOT_ALERT_RULES_FILE', 'iot_alert_rules.json')
+    # Central de alertas IoT (log compartilhado entre sessões e processos)
+    IOT_ALERTS_FILE = os.getenv('IOT_ALERTS_FILE', 'iot_alerts.jsonl')
+    IOT_ALERTS_CAPACITY = int(os.getenv('IOT_ALERTS_CAPACITY', '1000'))
+    # Minutos sem leituras até um dispositivo ser considerado offline
+    IOT_DEVICE_TIMEOUT_MIN = float(os.getenv('IOT_DEVICE_TIMEOUT_MIN', '10'))
+
     # Configurações de temperatura para alertas
     TEMPERATURE_THRESHOLDS = {
         'NORMAL_MIN': 35.1,
@@ -62,6 +85,8 @@ class Config:
     def init_app():
         """Inicializa configurações da aplicação"""
         try:
+            import streamlit as st
+            
             # Configurações da página
             st.set_page_config(
                 page_title="Sistema de Triagem Médica IoT",
@@ -115,7 +140,3 @@ class Config:
     def get_version():
         """Retorna versão da aplicação"""
         return "2.0.0-local"
-
-# Inicializar configurações ao importar
-if __name__ != "__main__":
-    Config.init_app() 
\ No newline at end of file
@@ -8,8 +8,42 @@ processamento de dados clínicos.
 
 Classes principais:
 - TriagemMedica: Classe principal para processamento de triagem
+- EstoqueMedicamentos: Livro-razão de estoque de medicamentos
+- HistoricoAtendimentos: Acesso paginado ao histórico em disco
+- IndiceAtendimentos: Índice invertido para busca combinada no histórico
+- CuboAtendimentos: Cubo OLAP pré-agregado para análises de drill-down
+- CoocorrenciaSintomas: Matrizes de coocorrência de sintomas por região
+- CalibradorPesos: Calibração vetorizada dos pesos do score por região
+- AnaliseIncerteza: Incerteza diagnóstica por Monte Carlo sobre os sinais vitais
+- PrevalenciaRegional: Prevalência regional dinâmica (priori de Dirichlet com esquecimento)
+- RegrasTriagem: Regras declarativas de população, gravidade e urgência compiladas na carga
+- RegistroAtendimento: Registro compacto (__slots__) de atendimento em memória
+- CodificadorResultados: Resultados do histórico gravados como modelo com parâmetros
+- TriagemLote: Triagem vetorizada de lotes de pacientes, sem efeitos colaterais
+- SimuladorClinica: Simulação de eventos discretos do fluxo de pacientes da clínica
+- Posologia: Regimes estruturados de dosagem e consumo em unidades de compra
 """
 
 from .triagem_model import TriagemMedica
+from .estoque import EstoqueMedicamentos
+from .historico import HistoricoAtendimentos
+from .indice import IndiceAtendimentos
+from .cubo import CuboAtendimentos
+from .coocorrencia import CoocorrenciaSintomas
+from .calibracao import CalibradorPesos
+from .incerteza import AnaliseIncerteza
+from .prevalencia import PrevalenciaRegional
+from .regras import RegrasTriagem
+from .registros import RegistroAtendimento
+from .codificacao import CodificadorResultados
+from .lote import TriagemLote
+from .simulacao import SimuladorClinica
+from .posologia import Posologia
 
-__all__ = ['TriagemMedica'] 
\ No newline at end of file
+__all__ = [
+    'TriagemMedica', 'EstoqueMedicamentos', 'HistoricoAtendimentos',
+    'IndiceAtendimentos', 'CuboAtendimentos', 'CoocorrenciaSintomas',
+    'CalibradorPesos', 'AnaliseIncerteza', 'PrevalenciaRegional',
+    'RegrasTriagem', 'RegistroAtendimento', 'CodificadorResultados',
+    'TriagemLote', 'SimuladorClinica', 'Posologia'
+] 
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Calibração dos Pesos de Score
+=============================
+
+Ajusta os pesos dos fatores do score (sintomas, climático, população,
+gravidade) contra desfechos confirmados por clínicos. O tensor de fatores
+casos × doenças × 4 é calculado uma única vez; milhares de vetores de pesos
+candidatos são avaliados numa só operação matricial, em blocos.
+"""
+
+import json
+import os
+from itertools import product
+
+import numpy as np
+
+from .triagem_model import FATORES_SCORE, PESOS_PADRAO, TriagemMedica
+from ..utils.tempo import agora_ms
+
+
+class CalibradorPesos:
+    def __init__(self, triagem):
+        """Inicializa o calibrador com o modelo de triagem (fórmulas e base de conhecimento)"""
+        self.triagem = triagem
+
+    def _rotulos_regiao(self, regiao):
+        """Mapeia chave ou nome formatado da doença para a chave da base de conhecimento"""
+        rotulos = {}
+        for chave in self.triagem.base_conhecimento['regioes'][regiao]['doencas']:
+            rotulos[chave] = chave
+            rotulos[self.triagem._formatar_nome_doenca(chave)] = chave
+        return rotulos
+
+    def montar_tensores(self, casos):
+        """
+        Calcula o tensor de fatores por região
+
+        Args:
+            casos: Iterável de pares (dados_paciente, diagnóstico confirmado)
+
+        Returns:
+            dict: regiao -> {'doencas', 'fatores' (N×D×4), 'rotulos' (N,), 'descartados'}
+        """
+        por_regiao = {}
+        for dados_paciente, diagnostico in casos:
+            regiao = dados_paciente.get('regiao_geografica', 'brasil_norte')
+            if regiao not in self.triagem.base_conhecimento['regioes']:
+                continue
+            grupo = por_regiao.get(regiao)
+            if grupo is None:
+                grupo = por_regiao[regiao] = {
+                    'doencas': list(self.triagem.base_conhecimento['regioes'][regiao]['doencas']),
+                    'mapa_rotulos': self._rotulos_regiao(regiao),
+                    'fatores': [], 'rotulos': [], 'descartados': 0
+                }
+            chave = grupo['mapa_rotulos'].get(diagnostico)
+            if chave is None:
+                # Diagnóstico confirmado fora do perfil da região: não calibrável
+                grupo['descartados'] += 1
+                continue
+            _, fatores = self.triagem.calcular_fatores(dados_paciente, regiao)
+            grupo['fatores'].append(fatores)
+            grupo['rotulos'].append(grupo['doencas'].index(chave))
+
+        tensores = {}
+        for regiao, grupo in por_regiao.items():
+            if not grupo['fatores']:
+                continue
+            tensores[regiao] = {
+                'doencas': grupo['doencas'],
+                'fatores': np.stack(grupo['fatores']),
+                'rotulos': np.array(grupo['rotulos']),
+                'descartados': grupo['descartados']
+            }
+        return tensores
+
+    @staticmethod
+    def gerar_candidatos(passo=0.05, minimo=0.0):
+        """
+        Gera todos os vetores de pesos do simplex com a resolução dada
+
+        Returns:
+            np.ndarray: Candidatos K × 4 (cada linha soma 1)
+        """
+        divisoes = int(round(1 / passo))
+        candidatos = [
+            (a, b, c, divisoes - a - b - c)
+            for a, b, c in product(range(divisoes + 1), repeat=3)
+            if a + b + c <= divisoes
+        ]
+        candidatos = np.array(candidatos, dtype=float) / divisoes
+        return candidatos[(candidatos >= minimo).all(axis=1)]
+
+    @staticmethod
+    def avaliar(fatores, rotulos, candidatos, tamanho_bloco=None):
+        """
+        Avalia acurácia top-1 e top-3 de cada vetor de pesos
+
+        Args:
+            fatores: Tensor N × D × 4
+            rotulos: Índice da doença confirmada de cada caso (N,)
+            candidatos: Vetores de pesos K × 4
+
+        Returns:
+            tuple: (top1, top3) arrays de tamanho K
+        """
+        n, d, _ = fatores.shape
+        k_top = min(3, d)
+        if tamanho_bloco is None:
+            # Limita o bloco a ~4 milhões de scores por vez
+            tamanho_bloco = max(1, 4_000_000 // (n * d))
+        top1 = np.empty(len(candidatos))
+        top3 = np.empty(len(candidatos))
+
+        for inicio in range(0, len(candidatos), tamanho_bloco):
+            bloco = candidatos[inicio:inicio + tamanho_bloco]
+            # Scores de todos os candidatos do bloco: K × N × D, na mesma ordem de soma
+            # da triagem (pesos K × 1 × 1 por fator), para que empates e posições coincidam
+            scores = TriagemMedica.combinar_fatores(fatores[None], bloco.T[:, :, None, None])
+            score_correto = np.take_along_axis(scores, rotulos[None, :, None], axis=2)
+
+            # Posição da doença correta: quantas doenças pontuam estritamente mais,
+            # mais as empatadas que vêm antes dela (mesma ordem estável do sorted da triagem)
+            maiores = (scores > score_correto).sum(axis=2)
+            empatadas_antes = ((scores == score_correto) & (np.arange(d)[None, None, :] < rotulos[None, :, None])).sum(axis=2)
+            posicao = maiores + empatadas_antes
+
+            top1[inicio:inicio + len(bloco)] = (posicao == 0).mean(axis=1)
+            top3[inicio:inicio + len(bloco)] = (posicao < k_top).mean(axis=1)
+
+        return top1, top3
+
+    def calibrar(self, casos, passo=0.05, minimo_casos=30, peso_minimo=0.0):
+        """
+        Calibra um perfil de pesos por região
+
+        Args:
+            casos: Iterável de pares (dados_paciente, diagnóstico confirmado)
+            passo: Resolução da grade de pesos
+            minimo_casos: Casos mínimos para calibrar uma região
+            peso_minimo: Peso mínimo de cada fator
+
+        Returns:
+            dict: regiao -> perfil com pesos, acurácias (calibrada e padrão) e número de casos
+        """
+        candidatos = self.gerar_candidatos(passo, peso_minimo)
+        padrao = np.array([[PESOS_PADRAO[f] for f in FATORES_SCORE]])
+        perfis = {}
+
+        for regiao, tensor in self.montar_tensores(casos).items():
+            n = len(tensor['rotulos'])
+            top1_padrao, top3_padrao = self.avaliar(tensor['fatores'], tensor['rotulos'], padrao)
+            perfil = {
+                'casos': n,
+                'descartados': tensor['descartados'],
+                'top1_padrao': round(float(top1_padrao[0]), 4),
+                'top3_padrao': round(float(top3_padrao[0]), 4),
+                'candidatos_avaliados': len(candidatos),
+                'calibrado_em': agora_ms()
+            }
+            if n < minimo_casos:
+                perfil['pesos'] = dict(PESOS_PADRAO)
+                perfil['observacao'] = f'Casos insuficientes (< {minimo_casos}): mantidos pesos padrão'
+                perfis[regiao] = perfil
+                continue
+
+            top1, top3 = self.avaliar(tensor['fatores'], tensor['rotulos'], candidatos)
+            # Melhor top-1; empates decididos pelo top-3 e depois pela proximidade do padrão
+            distancia = np.abs(candidatos - padrao).sum(axis=1)
+            melhor = np.lexsort((distancia, -top3, -top1))[0]
+
+            perfil['pesos'] = {f: round(float(p), 4) for f, p in zip(FATORES_SCORE, candidatos[melhor])}
+            perfil['top1'] = round(float(top1[melhor]), 4)
+            perfil['top3'] = round(float(top3[melhor]), 4)
+            perfis[regiao] = perfil
+
+        return perfis
+
+    @staticmethod
+    def salvar_perfis(perfis, pesos_file='pesos_regionais.json'):
+        """Grava os perfis de pesos (mesclando com regiões já calibradas)"""
+        existentes = {}
+        if os.path.exists(pesos_file):
+            with open(pesos_file, 'r', encoding='utf-8') as f:
+                existentes = json.load(f)
+        existentes.update(perfis)
+        temporario = pesos_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(existentes, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, pesos_file)
+        return existentes
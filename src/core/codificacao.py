@@ -0,0 +1,282 @@
+"""
+Codificação de Resultados do Histórico
+======================================
+
+O resultado de uma triagem é quase todo derivado da base de conhecimento:
+observações, recomendações, nome da região, medicamento e dosagem se repetem
+em todos os atendimentos da mesma doença. No histórico o resultado é gravado
+como um modelo com parâmetros (doença, região, urgência, probabilidade,
+scores e versão da base); os textos de exibição são reconstruídos sob
+demanda, campo a campo, na leitura.
+
+Qualquer campo que o modelo não reproduza exatamente (ou chave extra, como
+'processed_by') é gravado literalmente em 'literal', de modo que a
+decodificação sempre devolve o resultado original.
+
+Cada versão da base usada na codificação é guardada em `arquivo_bases`
+(JSON Lines, uma linha por versão): atendimentos gravados com uma base
+anterior são reconstruídos com aquela base, e não com a atual, para que uma
+edição da base não altere prescrições e orientações já registradas.
+"""
+
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+from .registros import DadosPaciente, RegistroAtendimento
+from ..utils.registros import compactar_valor
+
+
+# Campos do resultado de triagem e do resultado saudável, na ordem de processar_triagem
+CAMPOS_TRIAGEM = (
+    'diagnostico_principal', 'probabilidade', 'nivel_urgencia', 'medicamentos', 'dosagem',
+    'frequencia', 'observacoes', 'recomendacoes', 'diagnosticos_diferenciais', 'detalhes_score',
+    'tempo_incubacao', 'gravidade_doenca', 'regiao_diagnostico'
+)
+CAMPOS_SAUDAVEL = (
+    'diagnostico_principal', 'probabilidade', 'medicamentos', 'dosagem', 'frequencia',
+    'nivel_urgencia', 'observacoes', 'recomendacoes'
+)
+FATORES_DETALHES = ('sintomas', 'climatico', 'populacao', 'gravidade')
+
+
+def versao_base(base_conhecimento):
+    """Identificador curto do conteúdo da base de conhecimento"""
+    conteudo = json.dumps(base_conhecimento, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:8]
+
+
+def codificado(resultado):
+    """Indica se o resultado está no formato de modelo com parâmetros"""
+    return isinstance(resultado, Mapping) and 'modelo' in resultado
+
+
+class ResultadoCodificado(Mapping):
+    """Resultado de triagem reconstruído campo a campo no primeiro acesso"""
+    __slots__ = ('_codificador', '_dados_paciente', '_codificado', '_cache')
+
+    def __init__(self, codificador, dados_paciente, codificado):
+        self._codificador = codificador
+        self._dados_paciente = dados_paciente
+        self._codificado = codificado
+        self._cache = None
+
+    def __getitem__(self, chave):
+        if self._cache is None:
+            self._cache = {}
+        elif chave in self._cache:
+            return self._cache[chave]
+        valor = self._codificador.campo(chave, self._dados_paciente, self._codificado)
+        self._cache[chave] = valor
+        return valor
+
+    def __iter__(self):
+        return iter(self._codificador.chaves(self._codificado))
+
+    def __len__(self):
+        return len(self._codificador.chaves(self._codificado))
+
+    def __repr__(self):
+        return f"ResultadoCodificado({self._codificado!r})"
+
+
+class CodificadorResultados:
+    def __init__(self, triagem, arquivo_bases='bases_conhecimento.jsonl'):
+        """
+        Inicializa o codificador com o modelo de triagem (base de conhecimento e geradores de texto)
+
+        Args:
+            triagem: TriagemMedica com a base de conhecimento atual
+            arquivo_bases: Versões da base usadas na codificação (None: só a atual, em memória)
+        """
+        self.triagem = triagem
+        self.base_conhecimento = triagem.base_conhecimento
+        self.versao_base = versao_base(self.base_conhecimento)
+        self.arquivo_bases = arquivo_bases
+        # Versão -> base de conhecimento, para decodificar com a base da época
+        self._bases = {}
+        self._carregar_bases()
+        self._base_gravada = self.versao_base in self._bases
+        self._bases[self.versao_base] = self.base_conhecimento
+        self._resultado_saudavel = triagem._resultado_saudavel()
+        # Nome de exibição -> chave da doença, por região
+        self._chaves_por_nome = {
+            regiao: {triagem._formatar_nome_doenca(chave): chave for chave in dados_regiao['doencas']}
+            for regiao, dados_regiao in self.base_conhecimento['regioes'].items()
+        }
+
+    def _carregar_bases(self):
+        if not self.arquivo_bases or not os.path.exists(self.arquivo_bases):
+            return
+        with open(self.arquivo_bases, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        continue
+                    self._bases.setdefault(registro['versao'], registro['base'])
+
+    def _gravar_base(self):
+        """Guarda a base atual na primeira codificação com ela"""
+        self._base_gravada = True
+        if not self.arquivo_bases:
+            return
+        with open(self.arquivo_bases, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'versao': self.versao_base, 'base': self.base_conhecimento},
+                               ensure_ascii=False, sort_keys=True) + '\n')
+
+    def _base(self, modelo):
+        """Base de conhecimento da versão do modelo (a atual, se a versão não foi guardada)"""
+        return self._bases.get(modelo.get('base'), self.base_conhecimento)
+
+    def codificar(self, atendimento):
+        """
+        Converte o resultado de um atendimento para o formato de modelo
+
+        Returns:
+            dict: Atendimento com o resultado codificado (ou inalterado, se não for codificável)
+        """
+        resultado = atendimento.get('resultado')
+        if not isinstance(resultado, Mapping) or codificado(resultado):
+            return atendimento
+        if not self._base_gravada:
+            self._gravar_base()
+        dados_paciente = atendimento['dados_paciente']
+
+        if resultado.get('diagnostico_principal') == self._resultado_saudavel['diagnostico_principal']:
+            modelo = {'modelo': 'saudavel', 'base': self.versao_base}
+        else:
+            regiao = dados_paciente.get('regiao_geografica', 'brasil_norte')
+            nomes = self._chaves_por_nome.get(regiao)
+            doenca = nomes.get(resultado.get('diagnostico_principal')) if nomes else None
+            if doenca is None:
+                # Resultado de erro ou de doença fora da base: gravado como está
+                return atendimento
+            detalhes = resultado.get('detalhes_score') or {}
+            modelo = {
+                'modelo': 'triagem',
+                'base': self.versao_base,
+                'regiao': regiao,
+                'doenca': doenca,
+                'probabilidade': resultado.get('probabilidade'),
+                'urgencia': resultado.get('nivel_urgencia'),
+                'diferenciais': [
+                    [nomes.get(d.get('nome'), d.get('nome')), d.get('probabilidade')]
+                    for d in resultado.get('diagnosticos_diferenciais', [])
+                ],
+                'scores': [detalhes.get(fator, 0) for fator in FATORES_DETALHES]
+            }
+
+        # Campos que o modelo não reproduz exatamente vão literalmente
+        campos = self.chaves(modelo)
+        ausentes = [campo for campo in campos if campo not in resultado]
+        if ausentes:
+            modelo['ausentes'] = ausentes
+        literal = {}
+        for chave, valor in resultado.items():
+            if chave not in campos or self.campo(chave, dados_paciente, modelo) != valor:
+                literal[chave] = valor
+        if literal:
+            modelo['literal'] = literal
+
+        return dict(atendimento, resultado=modelo)
+
+    def decodificar(self, atendimento, compacto=False):
+        """
+        Prepara um atendimento lido do histórico para uso
+
+        Args:
+            atendimento: Atendimento decodificado do JSON
+            compacto: Se True, retorna RegistroAtendimento (janela em memória)
+
+        Returns:
+            Atendimento com o resultado reconstruído sob demanda
+        """
+        resultado = atendimento.get('resultado')
+        if not codificado(resultado):
+            return RegistroAtendimento.de_dict(atendimento) if compacto else atendimento
+
+        dados_paciente = atendimento['dados_paciente']
+        if compacto:
+            dados_paciente = DadosPaciente.de_dict(dados_paciente)
+            resultado = compactar_valor(resultado)
+        atendimento = dict(
+            atendimento,
+            dados_paciente=dados_paciente,
+            resultado=ResultadoCodificado(self, dados_paciente, resultado)
+        )
+        return RegistroAtendimento.de_dict(atendimento) if compacto else atendimento
+
+    def expandir(self, atendimento):
+        """Atendimento com o resultado completo (formato antigo, sem modelo)"""
+        resultado = atendimento.get('resultado')
+        if not codificado(resultado):
+            return atendimento
+        dados_paciente = atendimento['dados_paciente']
+        return dict(atendimento, resultado={
+            chave: self.campo(chave, dados_paciente, resultado) for chave in self.chaves(resultado)
+        })
+
+    def chaves(self, modelo):
+        """Chaves do resultado representado pelo modelo"""
+        campos = CAMPOS_SAUDAVEL if modelo['modelo'] == 'saudavel' else CAMPOS_TRIAGEM
+        ausentes = modelo.get('ausentes')
+        if ausentes:
+            campos = tuple(c for c in campos if c not in ausentes)
+        literal = modelo.get('literal')
+        if literal:
+            campos = campos + tuple(c for c in literal if c not in campos)
+        return campos
+
+    def campo(self, chave, dados_paciente, modelo):
+        """Reconstrói um campo do resultado a partir do modelo"""
+        literal = modelo.get('literal')
+        if literal and chave in literal:
+            return literal[chave]
+        ausentes = modelo.get('ausentes')
+        if ausentes and chave in ausentes:
+            raise KeyError(chave)
+
+        if modelo['modelo'] == 'saudavel':
+            valor = self._resultado_saudavel[chave]
+            return list(valor) if isinstance(valor, list) else valor
+        if chave not in CAMPOS_TRIAGEM:
+            raise KeyError(chave)
+
+        triagem = self.triagem
+        regiao = modelo['regiao']
+        doenca = modelo['doenca']
+        dados_regiao = self._base(modelo)['regioes'].get(regiao, {})
+        dados_doenca = dados_regiao.get('doencas', {}).get(doenca)
+
+        if chave == 'diagnostico_principal':
+            return triagem._formatar_nome_doenca(doenca)
+        if chave == 'probabilidade':
+            return modelo['probabilidade']
+        if chave == 'nivel_urgencia':
+            return modelo['urgencia']
+        if chave == 'diagnosticos_diferenciais':
+            return [
+                {'nome': triagem._formatar_nome_doenca(nome), 'probabilidade': probabilidade}
+                for nome, probabilidade in modelo['diferenciais']
+            ]
+        if chave == 'detalhes_score':
+            return dict(zip(FATORES_DETALHES, modelo['scores']))
+        if chave == 'regiao_diagnostico':
+            return dados_regiao.get('nome', regiao)
+
+        # Demais campos dependem da doença na base da versão gravada
+        if dados_doenca is None:
+            return [] if chave in ('observacoes', 'recomendacoes') else 'N/A'
+        if chave in ('medicamentos', 'dosagem', 'frequencia'):
+            medicamento = triagem._selecionar_medicamento(dados_paciente, dados_doenca)
+            return medicamento['nome' if chave == 'medicamentos' else chave]
+        if chave == 'observacoes':
+            return triagem._gerar_observacoes_regionalizadas(dados_paciente, doenca, dados_doenca)
+        if chave == 'recomendacoes':
+            return triagem._gerar_recomendacoes_regionalizadas(dados_paciente, doenca, modelo['urgencia'], regiao)
+        if chave == 'tempo_incubacao':
+            return dados_doenca['tempo_incubacao']
+        return dados_doenca['gravidade']
@@ -0,0 +1,304 @@
+"""
+Matrizes de Coocorrência de Sintomas
+====================================
+
+Mantém, por região, as matrizes sintoma × sintoma e sintoma × diagnóstico
+como arrays NumPy atualizados em O(k²) por atendimento (k = número de
+sintomas do paciente). Cada matriz tem uma variante com decaimento temporal
+exponencial, atualizada com pesos crescentes (2^(t/meia-vida)) para que o
+decaimento de todas as células seja aplicado apenas na leitura.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from ..utils.tempo import agora_ms, para_epoch_ms, MS_POR_DIA
+
+
+class CoocorrenciaSintomas:
+    # Expoente máximo dos pesos antes de renormalizar as variantes decaídas
+    EXPOENTE_MAXIMO = 500
+
+    def __init__(self, historico, base_conhecimento, coocorrencia_file='coocorrencia_sintomas.npz',
+                 meia_vida_dias=14, intervalo_snapshot=1000):
+        """Inicializa as matrizes e agrega os atendimentos ainda não cobertos pelo snapshot"""
+        self.historico = historico
+        self.base_conhecimento = base_conhecimento
+        self.coocorrencia_file = coocorrencia_file
+        self.meia_vida_ms = meia_vida_dias * MS_POR_DIA
+        self.intervalo_snapshot = intervalo_snapshot
+        self.sintomas = []
+        self._posicao_sintoma = {}
+        self.diagnosticos = []
+        self._posicao_diagnostico = {}
+        self.regioes = {}
+        self.referencia_ms = None
+        self.total_agregado = 0
+        self._pendentes_snapshot = 0
+
+        # Vocabulário inicial: sintomas conhecidos de todas as doenças
+        for regiao in base_conhecimento['regioes'].values():
+            for doenca in regiao['doencas'].values():
+                for sintoma in doenca['sintomas']:
+                    self._id_sintoma(sintoma)
+
+        self._carregar()
+        self.atualizar()
+
+    def _nova_regiao(self):
+        s, d = len(self.sintomas), len(self.diagnosticos)
+        return {
+            'total': 0.0,
+            'total_decaido': 0.0,
+            'sintoma_sintoma': np.zeros((s, s)),
+            'sintoma_sintoma_decaido': np.zeros((s, s)),
+            'sintoma_diagnostico': np.zeros((s, d)),
+            'sintoma_diagnostico_decaido': np.zeros((s, d))
+        }
+
+    def _id_sintoma(self, sintoma):
+        posicao = self._posicao_sintoma.get(sintoma)
+        if posicao is None:
+            posicao = self._posicao_sintoma[sintoma] = len(self.sintomas)
+            self.sintomas.append(sintoma)
+            for matrizes in self.regioes.values():
+                for nome in ('sintoma_sintoma', 'sintoma_sintoma_decaido'):
+                    matrizes[nome] = np.pad(matrizes[nome], ((0, 1), (0, 1)))
+                for nome in ('sintoma_diagnostico', 'sintoma_diagnostico_decaido'):
+                    matrizes[nome] = np.pad(matrizes[nome], ((0, 1), (0, 0)))
+        return posicao
+
+    def _id_diagnostico(self, diagnostico):
+        posicao = self._posicao_diagnostico.get(diagnostico)
+        if posicao is None:
+            posicao = self._posicao_diagnostico[diagnostico] = len(self.diagnosticos)
+            self.diagnosticos.append(diagnostico)
+            for matrizes in self.regioes.values():
+                for nome in ('sintoma_diagnostico', 'sintoma_diagnostico_decaido'):
+                    matrizes[nome] = np.pad(matrizes[nome], ((0, 0), (0, 1)))
+        return posicao
+
+    def _carregar(self):
+        """Carrega o snapshot das matrizes, se compatível com o histórico atual"""
+        if not os.path.exists(self.coocorrencia_file):
+            return
+        try:
+            with np.load(self.coocorrencia_file) as dados:
+                meta = json.loads(str(dados['meta']))
+                if meta['total'] > len(self.historico):
+                    return
+                regioes = {}
+                for regiao, totais in meta['regioes'].items():
+                    matrizes = {'total': totais[0], 'total_decaido': totais[1]}
+                    for nome in ('sintoma_sintoma', 'sintoma_sintoma_decaido',
+                                 'sintoma_diagnostico', 'sintoma_diagnostico_decaido'):
+                        matrizes[nome] = dados[f'{regiao}__{nome}']
+                    regioes[regiao] = matrizes
+        except Exception:
+            return
+
+        self.sintomas = meta['sintomas']
+        self._posicao_sintoma = {s: i for i, s in enumerate(self.sintomas)}
+        self.diagnosticos = meta['diagnosticos']
+        self._posicao_diagnostico = {d: i for i, d in enumerate(self.diagnosticos)}
+        self.referencia_ms = meta['referencia_ms']
+        self.total_agregado = meta['total']
+        self.regioes = regioes
+
+    def salvar(self):
+        """Grava snapshot das matrizes em disco"""
+        meta = {
+            'total': self.total_agregado,
+            'sintomas': self.sintomas,
+            'diagnosticos': self.diagnosticos,
+            'referencia_ms': self.referencia_ms,
+            'regioes': {r: [m['total'], m['total_decaido']] for r, m in self.regioes.items()}
+        }
+        arrays = {'meta': np.array(json.dumps(meta, ensure_ascii=False))}
+        for regiao, matrizes in self.regioes.items():
+            for nome, valor in matrizes.items():
+                if isinstance(valor, np.ndarray):
+                    arrays[f'{regiao}__{nome}'] = valor
+        temporario = self.coocorrencia_file + '.tmp.npz'
+        np.savez(temporario, **arrays)
+        os.replace(temporario, self.coocorrencia_file)
+        self._pendentes_snapshot = 0
+
+    def atualizar(self):
+        """Agrega atendimentos gravados após o último snapshot"""
+        novos = 0
+        for indice, atendimento in self.historico.iterar_com_indice(inicio=self.total_agregado):
+            self._agregar(indice, atendimento)
+            novos += 1
+        if novos:
+            self.salvar()
+        return novos
+
+    def reconstruir(self):
+        """Reconstrói todas as matrizes a partir do histórico"""
+        self.regioes = {}
+        self.referencia_ms = None
+        self.total_agregado = 0
+        self.atualizar()
+
+    def _peso(self, timestamp):
+        """Peso crescente do atendimento; renormaliza as variantes decaídas quando necessário"""
+        if self.referencia_ms is None:
+            self.referencia_ms = timestamp
+        expoente = (timestamp - self.referencia_ms) / self.meia_vida_ms
+        if expoente > self.EXPOENTE_MAXIMO:
+            fator = 2.0 ** -expoente
+            for matrizes in self.regioes.values():
+                matrizes['total_decaido'] *= fator
+                matrizes['sintoma_sintoma_decaido'] *= fator
+                matrizes['sintoma_diagnostico_decaido'] *= fator
+            self.referencia_ms = timestamp
+            expoente = 0.0
+        return 2.0 ** expoente
+
+    def _agregar(self, indice, atendimento):
+        dados = atendimento['dados_paciente']
+        regiao = dados.get('regiao_geografica', 'brasil_norte')
+        posicoes = np.array(sorted({self._id_sintoma(s) for s in dados.get('sintomas', [])}), dtype=np.intp)
+        diagnostico = self._id_diagnostico(atendimento['resultado']['diagnostico_principal'])
+        peso = self._peso(para_epoch_ms(atendimento['timestamp']))
+
+        matrizes = self.regioes.get(regiao)
+        if matrizes is None:
+            matrizes = self.regioes[regiao] = self._nova_regiao()
+
+        matrizes['total'] += 1
+        matrizes['total_decaido'] += peso
+        if len(posicoes):
+            bloco = np.ix_(posicoes, posicoes)
+            matrizes['sintoma_sintoma'][bloco] += 1
+            matrizes['sintoma_sintoma_decaido'][bloco] += peso
+            matrizes['sintoma_diagnostico'][posicoes, diagnostico] += 1
+            matrizes['sintoma_diagnostico_decaido'][posicoes, diagnostico] += peso
+        self.total_agregado = indice + 1
+
+    def adicionar(self, indice, atendimento):
+        """Agrega um atendimento recém-gravado no histórico"""
+        if indice < self.total_agregado:
+            return
+        if indice > self.total_agregado:
+            self.atualizar()
+            return
+        self._agregar(indice, atendimento)
+        self._pendentes_snapshot += 1
+        if self._pendentes_snapshot >= self.intervalo_snapshot:
+            self.salvar()
+
+    def _fator_leitura(self, instante_ms=None):
+        if self.referencia_ms is None:
+            return 1.0
+        instante_ms = instante_ms or agora_ms()
+        return 2.0 ** (-(instante_ms - self.referencia_ms) / self.meia_vida_ms)
+
+    def matrizes(self, regiao, decaido=False):
+        """
+        Retorna as matrizes de uma região
+
+        Args:
+            regiao: Código da região
+            decaido: Se True, contagens ponderadas pelo decaimento temporal (em atendimentos equivalentes hoje)
+
+        Returns:
+            dict: 'total', 'sintomas', 'diagnosticos', 'sintoma_sintoma' (S×S), 'sintoma_diagnostico' (S×D)
+        """
+        matrizes = self.regioes.get(regiao) or self._nova_regiao()
+        if decaido:
+            fator = self._fator_leitura()
+            total = matrizes['total_decaido'] * fator
+            sintoma_sintoma = matrizes['sintoma_sintoma_decaido'] * fator
+            sintoma_diagnostico = matrizes['sintoma_diagnostico_decaido'] * fator
+        else:
+            total = matrizes['total']
+            sintoma_sintoma = matrizes['sintoma_sintoma'].copy()
+            sintoma_diagnostico = matrizes['sintoma_diagnostico'].copy()
+        return {
+            'total': total,
+            'sintomas': list(self.sintomas),
+            'diagnosticos': list(self.diagnosticos),
+            'sintoma_sintoma': sintoma_sintoma,
+            'sintoma_diagnostico': sintoma_diagnostico
+        }
+
+    @staticmethod
+    def lift(sintoma_sintoma, total):
+        """Razão entre coocorrência observada e esperada sob independência"""
+        if total <= 0:
+            return np.zeros_like(sintoma_sintoma)
+        frequencias = np.diag(sintoma_sintoma) / total
+        esperado = np.outer(frequencias, frequencias) * total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lift = np.where(esperado > 0, sintoma_sintoma / esperado, 0.0)
+        np.fill_diagonal(lift, 0.0)
+        return lift
+
+    def clusters_emergentes(self, regiao, suporte_minimo=3.0, lift_minimo=1.5,
+                            cobertura_maxima=0.67, limite=10):
+        """
+        Agrupamentos recentes de sintomas que nenhuma doença conhecida da região explica bem
+
+        Pares de sintomas com coocorrência recente (decaída) acima do suporte e
+        do lift mínimos são estendidos gulosamente com um terceiro sintoma
+        quando todos os pares do trio também passam nos limiares. O suporte do
+        trio é o menor suporte entre seus pares (aproximação a partir das
+        matrizes de pares).
+
+        Returns:
+            list: Dicts com sintomas, suporte, lift, tendência (recente vs histórico),
+                  doença mais próxima e sua cobertura
+        """
+        recente = self.matrizes(regiao, decaido=True)
+        historico = self.matrizes(regiao)
+        sintoma_sintoma = recente['sintoma_sintoma']
+        lift = self.lift(sintoma_sintoma, recente['total'])
+        lift_historico = self.lift(historico['sintoma_sintoma'], historico['total'])
+
+        fortes = (sintoma_sintoma >= suporte_minimo) & (lift >= lift_minimo)
+        fortes = np.triu(fortes, 1)
+
+        doencas = self.base_conhecimento['regioes'].get(regiao, {}).get('doencas', {})
+        perfis = {nome: set(dados['sintomas']) for nome, dados in doencas.items()}
+
+        clusters = []
+        vistos = set()
+        for a, b in zip(*np.nonzero(fortes)):
+            grupo = [a, b]
+            # Extensão gulosa para um trio totalmente conectado
+            candidatos = np.nonzero((fortes | fortes.T)[a] & (fortes | fortes.T)[b])[0]
+            if len(candidatos):
+                grupo.append(candidatos[np.argmax(np.minimum(sintoma_sintoma[a, candidatos],
+                                                             sintoma_sintoma[b, candidatos]))])
+            chave = frozenset(int(i) for i in grupo)
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+
+            nomes = {self.sintomas[i] for i in chave}
+            melhor_doenca, melhor_cobertura = None, 0.0
+            for nome, perfil in perfis.items():
+                cobertura = len(nomes & perfil) / len(nomes)
+                if cobertura > melhor_cobertura:
+                    melhor_doenca, melhor_cobertura = nome, cobertura
+            if melhor_cobertura > cobertura_maxima:
+                continue
+
+            pares = [(i, j) for i in chave for j in chave if i < j]
+            lift_recente = min(lift[i, j] for i, j in pares)
+            lift_base = min(lift_historico[i, j] for i, j in pares)
+            clusters.append({
+                'sintomas': sorted(nomes),
+                'suporte': round(float(min(sintoma_sintoma[i, j] for i, j in pares)), 1),
+                'lift': round(float(lift_recente), 2),
+                'tendencia': round(float(lift_recente / lift_base), 2) if lift_base > 0 else None,
+                'doenca_mais_proxima': melhor_doenca,
+                'cobertura': round(melhor_cobertura, 2)
+            })
+
+        clusters.sort(key=lambda c: (c['cobertura'], -c['suporte'] * c['lift']))
+        return clusters[:limite]
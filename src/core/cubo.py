@@ -0,0 +1,193 @@
+"""
+Cubo OLAP de Atendimentos
+=========================
+
+Agregados pré-calculados do histórico por região × diagnóstico × urgência ×
+evento climático × faixa etária × dia, atualizados a cada atendimento salvo.
+Consultas de roll-up, slice e dice percorrem apenas as células do cubo,
+nunca o histórico bruto. Dias antigos podem ser compactados em meses.
+"""
+
+import json
+import os
+
+from .indice import faixa_etaria
+from ..utils.tempo import formatar_ms, agora_ms, MS_POR_DIA
+
+
+DIMENSOES = ('regiao', 'diagnostico', 'urgencia', 'evento', 'faixa_etaria', 'dia')
+
+# Granularidades de tempo: quantos caracteres de 'AAAA-MM-DD' manter
+GRANULARIDADES = {'dia': 10, 'mes': 7, 'ano': 4}
+
+
+class CuboAtendimentos:
+    def __init__(self, historico, cubo_file='cubo_atendimentos.json', intervalo_snapshot=1000):
+        """Inicializa o cubo e agrega os atendimentos ainda não cobertos pelo snapshot"""
+        self.historico = historico
+        self.cubo_file = cubo_file
+        self.intervalo_snapshot = intervalo_snapshot
+        self.celulas = {}
+        self.total_agregado = 0
+        self._pendentes_snapshot = 0
+        self._carregar()
+        self.atualizar()
+
+    def _carregar(self):
+        """Carrega o snapshot do cubo, se compatível com o histórico atual"""
+        if not os.path.exists(self.cubo_file):
+            return
+        try:
+            with open(self.cubo_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception:
+            return
+        if snapshot.get('total', 0) > len(self.historico):
+            return
+        self.celulas = {tuple(linha[:-2]): linha[-2:] for linha in snapshot.get('celulas', [])}
+        self.total_agregado = snapshot['total']
+
+    def salvar(self):
+        """Grava snapshot do cubo em disco"""
+        snapshot = {
+            'dimensoes': list(DIMENSOES),
+            'total': self.total_agregado,
+            'celulas': [list(chave) + medidas for chave, medidas in self.celulas.items()]
+        }
+        temporario = self.cubo_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temporario, self.cubo_file)
+        self._pendentes_snapshot = 0
+
+    def atualizar(self):
+        """Agrega atendimentos gravados após o último snapshot"""
+        novos = 0
+        for indice, atendimento in self.historico.iterar_com_indice(inicio=self.total_agregado):
+            self._agregar(indice, atendimento)
+            novos += 1
+        if novos:
+            self.salvar()
+        return novos
+
+    def reconstruir(self):
+        """Reconstrói o cubo inteiro a partir do histórico"""
+        self.celulas = {}
+        self.total_agregado = 0
+        self.atualizar()
+
+    @staticmethod
+    def _chave(atendimento):
+        dados = atendimento['dados_paciente']
+        resultado = atendimento['resultado']
+        return (
+            dados.get('regiao_geografica', 'brasil_norte'),
+            resultado['diagnostico_principal'],
+            resultado['nivel_urgencia'],
+            dados.get('evento_climatico') or 'Não informado',
+            faixa_etaria(dados.get('idade', 0)),
+            formatar_ms(atendimento['timestamp'], '%Y-%m-%d')
+        )
+
+    def _agregar(self, indice, atendimento):
+        chave = self._chave(atendimento)
+        medidas = self.celulas.get(chave)
+        if medidas is None:
+            medidas = self.celulas[chave] = [0, 0]
+        medidas[0] += 1
+        medidas[1] += atendimento['dados_paciente'].get('idade', 0)
+        self.total_agregado = indice + 1
+
+    def adicionar(self, indice, atendimento):
+        """Agrega um atendimento recém-gravado no histórico"""
+        if indice < self.total_agregado:
+            return
+        if indice > self.total_agregado:
+            self.atualizar()
+            return
+        self._agregar(indice, atendimento)
+        self._pendentes_snapshot += 1
+        if self._pendentes_snapshot >= self.intervalo_snapshot:
+            self.salvar()
+
+    def compactar(self, dias_detalhe=365):
+        """
+        Funde as células diárias mais antigas que dias_detalhe em células mensais
+
+        Returns:
+            int: Número de células removidas
+        """
+        limite = formatar_ms(agora_ms() - dias_detalhe * MS_POR_DIA, '%Y-%m-%d')
+        antes = len(self.celulas)
+        compactadas = {}
+        for chave, medidas in self.celulas.items():
+            dia = chave[-1]
+            if len(dia) == 10 and dia < limite:
+                chave = chave[:-1] + (dia[:7],)
+            destino = compactadas.get(chave)
+            if destino is None:
+                compactadas[chave] = list(medidas)
+            else:
+                destino[0] += medidas[0]
+                destino[1] += medidas[1]
+        self.celulas = compactadas
+        self.salvar()
+        return antes - len(self.celulas)
+
+    def valores(self, dimensao, granularidade='dia'):
+        """Retorna os valores distintos de uma dimensão"""
+        posicao = DIMENSOES.index(dimensao)
+        if dimensao == 'dia':
+            tamanho = GRANULARIDADES[granularidade]
+            return sorted({chave[posicao][:tamanho] for chave in self.celulas})
+        return sorted({chave[posicao] for chave in self.celulas})
+
+    def consultar(self, agrupar=(), filtros=None, inicio=None, fim=None, granularidade='dia'):
+        """
+        Consulta o cubo com roll-up, slice e dice
+
+        Args:
+            agrupar: Dimensões mantidas no resultado (as demais são somadas)
+            filtros: Dict dimensão -> valor (slice) ou lista de valores (dice)
+            inicio, fim: Período 'AAAA-MM-DD' (inclusivo) sobre a dimensão dia
+            granularidade: 'dia', 'mes' ou 'ano' para a dimensão dia
+
+        Returns:
+            dict: Tupla de valores agrupados -> {'contagem', 'idade_media'}
+        """
+        posicoes = [DIMENSOES.index(d) for d in agrupar]
+        posicao_dia = DIMENSOES.index('dia')
+        tamanho = GRANULARIDADES[granularidade]
+
+        restricoes = []
+        for dimensao, valor in (filtros or {}).items():
+            if valor is None:
+                continue
+            aceitos = {valor} if isinstance(valor, str) else set(valor)
+            restricoes.append((DIMENSOES.index(dimensao), aceitos))
+
+        agregados = {}
+        for chave, (contagem, soma_idade) in self.celulas.items():
+            if any(chave[p] not in aceitos for p, aceitos in restricoes):
+                continue
+            dia = chave[posicao_dia]
+            if inicio and dia < inicio[:len(dia)]:
+                continue
+            if fim and dia > fim[:len(dia)]:
+                continue
+            grupo = tuple(chave[p][:tamanho] if p == posicao_dia else chave[p] for p in posicoes)
+            medidas = agregados.get(grupo)
+            if medidas is None:
+                medidas = agregados[grupo] = [0, 0]
+            medidas[0] += contagem
+            medidas[1] += soma_idade
+
+        return {
+            grupo: {'contagem': contagem, 'idade_media': soma_idade / contagem}
+            for grupo, (contagem, soma_idade) in sorted(agregados.items())
+        }
+
+    def totais(self, dimensao, filtros=None, inicio=None, fim=None, granularidade='dia'):
+        """Roll-up para uma única dimensão: valor -> contagem"""
+        resultado = self.consultar((dimensao,), filtros, inicio, fim, granularidade)
+        return {grupo[0]: medidas['contagem'] for grupo, medidas in resultado.items()}
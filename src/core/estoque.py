@@ -0,0 +1,275 @@
+"""
+Livro-Razão de Estoque de Medicamentos
+======================================
+
+Mantém o saldo de cada medicamento atualizado evento a evento (estoque
+inicial, entradas e dispensações da triagem), sem recalcular nada a partir
+do histórico completo de atendimentos.
+
+Os movimentos são anexados ao livro-razão em disco; o snapshot dos saldos
+guarda a posição do livro-razão que já contém e só é regravado a cada
+`intervalo_snapshot` movimentos (na carga, os movimentos depois dessa
+posição são reaplicados). Dispensações de medicamentos sem estoque
+controlado não criam saldo negativo: ficam registradas à parte.
+"""
+
+import json
+import os
+
+from ..utils.tempo import agora_ms, dia_local, para_epoch_ms
+
+
+# Condutas que não consomem estoque
+MEDICAMENTOS_NAO_DISPENSAVEIS = {
+    'Não necessário', 'Consultar médico', 'Observação clínica', 'Não especificado'
+}
+
+
+class EstoqueMedicamentos:
+    def __init__(self, estoque_file='estoque_medicamentos.json',
+                 movimentos_file='estoque_movimentos.jsonl',
+                 prazo_reposicao_dias=7, estoque_seguranca_dias=7, suavizacao=0.2,
+                 intervalo_snapshot=200):
+        """Inicializa o livro-razão de estoque"""
+        self.estoque_file = estoque_file
+        self.movimentos_file = movimentos_file
+        self.prazo_reposicao_dias = prazo_reposicao_dias
+        self.estoque_seguranca_dias = estoque_seguranca_dias
+        self.suavizacao = suavizacao
+        self.intervalo_snapshot = intervalo_snapshot
+        self.itens = {}
+        self.alertas = {}
+        # Dispensações de medicamentos sem estoque controlado
+        self.nao_controlados = {}
+        self._posicao = 0
+        self._desde_snapshot = 0
+        self._carregar()
+
+    def _carregar(self):
+        """Carrega saldos do snapshot e reaplica os movimentos posteriores (sem snapshot, reconstrói)"""
+        if os.path.exists(self.estoque_file):
+            try:
+                with open(self.estoque_file, 'r', encoding='utf-8') as f:
+                    estado = json.load(f)
+                tamanho = os.path.getsize(self.movimentos_file) if os.path.exists(self.movimentos_file) else 0
+                self.itens = estado['itens']
+                self.nao_controlados = estado.get('nao_controlados', {})
+                self._posicao = estado.get('posicao', 0)
+                if self._posicao <= tamanho:
+                    for medicamento in self.itens:
+                        self._avaliar_alerta(medicamento)
+                    self._reaplicar()
+                    return
+            except Exception:
+                pass
+            self.itens = {}
+            self.nao_controlados = {}
+        self.reconstruir()
+
+    def _reaplicar(self):
+        """Aplica os movimentos do livro-razão a partir da posição já incluída nos saldos"""
+        if not os.path.exists(self.movimentos_file):
+            return
+        with open(self.movimentos_file, 'rb+') as f:
+            f.seek(self._posicao)
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    # Linha incompleta (gravação interrompida): descartada, senão o próximo
+                    # movimento seria anexado a ela e se perderia na releitura
+                    f.truncate(self._posicao)
+                    break
+                self._posicao += len(linha)
+                try:
+                    self._aplicar(json.loads(linha))
+                except (ValueError, KeyError):
+                    continue
+                self._desde_snapshot += 1
+
+    def _salvar(self):
+        """Salva snapshot dos saldos com a posição do livro-razão que eles já incluem"""
+        estado = {'posicao': self._posicao, 'itens': self.itens, 'nao_controlados': self.nao_controlados}
+        temporario = self.estoque_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(temporario, self.estoque_file)
+        self._desde_snapshot = 0
+
+    def _registrar_movimento(self, movimento):
+        """Acrescenta movimento ao livro-razão em disco"""
+        linha = (json.dumps(movimento, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(self.movimentos_file, 'ab') as f:
+            f.write(linha)
+        self._posicao += len(linha)
+        self._desde_snapshot += 1
+
+    def _novo_item(self, prazo_reposicao_dias=None):
+        return {
+            'saldo': 0.0,
+            'consumo_medio_diario': 0.0,
+            'consumo_dia': 0.0,
+            'dia_referencia': None,
+            'prazo_reposicao_dias': prazo_reposicao_dias or self.prazo_reposicao_dias,
+            'atualizado_em': None
+        }
+
+    def _aplicar(self, movimento):
+        """Aplica um movimento aos saldos em O(1)"""
+        medicamento = movimento['medicamento']
+        tipo = movimento['tipo']
+        quantidade = float(movimento['quantidade'])
+        item = self.itens.get(medicamento)
+        if item is None and tipo == 'saida':
+            # Sem estoque controlado: não vira saldo negativo nem alerta de ruptura
+            registro = self.nao_controlados.setdefault(medicamento, {'quantidade': 0.0, 'ultima_saida': None})
+            registro['quantidade'] += quantidade
+            registro['ultima_saida'] = movimento['timestamp']
+            return
+        if item is None:
+            item = self._novo_item(movimento.get('prazo_reposicao_dias'))
+            self.itens[medicamento] = item
+
+        if tipo == 'abertura':
+            item['saldo'] = quantidade
+            if movimento.get('prazo_reposicao_dias'):
+                item['prazo_reposicao_dias'] = movimento['prazo_reposicao_dias']
+        elif tipo == 'entrada':
+            item['saldo'] += quantidade
+        elif tipo == 'saida':
+            self._atualizar_consumo(item, movimento['timestamp'], quantidade)
+            item['saldo'] -= quantidade
+
+        item['atualizado_em'] = movimento['timestamp']
+        self._avaliar_alerta(medicamento)
+
+    def _atualizar_consumo(self, item, timestamp, quantidade):
+        """Atualiza a média móvel exponencial do consumo diário"""
+        dia = dia_local(para_epoch_ms(timestamp))
+        dia_referencia = item['dia_referencia']
+
+        if dia_referencia is None:
+            item['dia_referencia'] = dia
+        elif dia > dia_referencia:
+            item['consumo_medio_diario'] = self._consumo_diario(item, dia)
+            item['consumo_dia'] = 0.0
+            item['dia_referencia'] = dia
+
+        item['consumo_dia'] += quantidade
+
+    def _consumo_diario(self, item, dia=None):
+        """
+        Consumo diário estimado no dia (padrão: hoje)
+
+        No dia da última saída usa o consumo do dia enquanto não há média; depois,
+        fecha esse dia e decai de uma vez os dias sem consumo, para que um
+        medicamento que deixou de sair não mantenha o consumo antigo.
+        """
+        dia_referencia = item['dia_referencia']
+        if dia_referencia is None:
+            return 0.0
+        dia = dia_local(agora_ms()) if dia is None else dia
+        if dia <= dia_referencia:
+            return item['consumo_medio_diario'] or item['consumo_dia']
+        media = item['consumo_medio_diario'] * (1 - self.suavizacao) + self.suavizacao * item['consumo_dia']
+        return media * (1 - self.suavizacao) ** (dia - dia_referencia - 1)
+
+    def _indicadores(self, item):
+        """Calcula dias de cobertura e ponto de reposição de um item"""
+        consumo = self._consumo_diario(item)
+        dias_cobertura = round(item['saldo'] / consumo, 1) if consumo > 0 else None
+        ponto_reposicao = consumo * (item['prazo_reposicao_dias'] + self.estoque_seguranca_dias)
+        return dias_cobertura, ponto_reposicao
+
+    def _avaliar_alerta(self, medicamento):
+        """Atualiza o alerta de um único medicamento"""
+        item = self.itens[medicamento]
+        dias_cobertura, ponto_reposicao = self._indicadores(item)
+
+        if item['saldo'] <= 0:
+            nivel = 'RUPTURA'
+            mensagem = f"🚨 {medicamento} sem estoque"
+        elif ponto_reposicao > 0 and item['saldo'] <= ponto_reposicao:
+            nivel = 'REPOR'
+            mensagem = f"⚠️ {medicamento} abaixo do ponto de reposição ({dias_cobertura} dias de cobertura)"
+        else:
+            self.alertas.pop(medicamento, None)
+            return
+
+        self.alertas[medicamento] = {
+            'medicamento': medicamento,
+            'nivel': nivel,
+            'mensagem': mensagem,
+            'saldo': item['saldo'],
+            'dias_cobertura': dias_cobertura,
+            'ponto_reposicao': round(ponto_reposicao, 1)
+        }
+
+    def _movimentar(self, tipo, medicamento, quantidade, **extras):
+        movimento = {
+            'timestamp': agora_ms(),
+            'tipo': tipo,
+            'medicamento': medicamento,
+            'quantidade': quantidade
+        }
+        movimento.update({k: v for k, v in extras.items() if v is not None})
+        self._aplicar(movimento)
+        self._registrar_movimento(movimento)
+        if self._desde_snapshot >= self.intervalo_snapshot:
+            self._salvar()
+        return self.itens.get(medicamento)
+
+    def definir_estoque_inicial(self, medicamento, quantidade, prazo_reposicao_dias=None):
+        """Define o estoque de abertura de um medicamento"""
+        return self._movimentar('abertura', medicamento, quantidade,
+                                prazo_reposicao_dias=prazo_reposicao_dias)
+
+    def registrar_entrada(self, medicamento, quantidade, observacao=None):
+        """Registra recebimento de medicamentos"""
+        return self._movimentar('entrada', medicamento, quantidade, observacao=observacao)
+
+    def registrar_saida(self, medicamento, quantidade=1, origem='triagem'):
+        """Registra dispensação de medicamento (ignora condutas sem medicamento)"""
+        if not medicamento or medicamento in MEDICAMENTOS_NAO_DISPENSAVEIS:
+            return None
+        return self._movimentar('saida', medicamento, quantidade, origem=origem)
+
+    def obter_saldo(self, medicamento):
+        """Retorna saldo atual de um medicamento (None se não controlado)"""
+        item = self.itens.get(medicamento)
+        return item['saldo'] if item else None
+
+    def obter_saldos(self):
+        """Retorna saldos com consumo, dias de cobertura e ponto de reposição"""
+        saldos = {}
+        for medicamento, item in self.itens.items():
+            # Consumo decai com os dias sem saída: status avaliado na leitura
+            self._avaliar_alerta(medicamento)
+            dias_cobertura, ponto_reposicao = self._indicadores(item)
+            saldos[medicamento] = {
+                'saldo': item['saldo'],
+                'consumo_medio_diario': round(self._consumo_diario(item), 2),
+                'dias_cobertura': dias_cobertura,
+                'ponto_reposicao': round(ponto_reposicao, 1),
+                'prazo_reposicao_dias': item['prazo_reposicao_dias'],
+                'status': self.alertas[medicamento]['nivel'] if medicamento in self.alertas else 'OK',
+                'atualizado_em': item['atualizado_em']
+            }
+        return saldos
+
+    def obter_nao_controlados(self):
+        """Medicamentos dispensados sem estoque controlado (quantidade acumulada e última saída)"""
+        return dict(self.nao_controlados)
+
+    def obter_alertas(self):
+        """Retorna alertas de ruptura e reposição ativos (reavaliados com o consumo de hoje)"""
+        for medicamento in self.itens:
+            self._avaliar_alerta(medicamento)
+        return sorted(self.alertas.values(), key=lambda a: (a['nivel'] != 'RUPTURA', a['saldo']))
+
+    def reconstruir(self):
+        """Reconstrói saldos reaplicando todo o livro-razão de movimentos"""
+        self.itens = {}
+        self.alertas = {}
+        self.nao_controlados = {}
+        self._posicao = 0
+        self._reaplicar()
+        self._salvar()
@@ -0,0 +1,237 @@
+"""
+Camada de Acesso ao Histórico de Atendimentos
+=============================================
+
+Guarda os atendimentos em JSON Lines e mantém em memória apenas um índice
+de posições no arquivo e uma janela com os registros mais recentes (como
+RegistroAtendimento compactos). Páginas, iteração reversa e filtros leem do
+disco sob demanda. Com um codificador, os resultados são gravados como modelo
+com parâmetros e os textos de exibição são reconstruídos na leitura.
+"""
+
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from .registros import RegistroAtendimento
+from ..utils.tempo import para_epoch_ms
+
+
+class HistoricoAtendimentos:
+    TAMANHO_BLOCO = 256
+
+    def __init__(self, historico_file='historico_atendimentos.jsonl',
+                 arquivo_legado='historico_atendimentos.json', janela_memoria=200, codificador=None):
+        """Inicializa a camada de histórico (codificador: CodificadorResultados opcional)"""
+        self.historico_file = historico_file
+        self.codificador = codificador
+        self.arquivo_legado = arquivo_legado
+        self.janela_memoria = janela_memoria
+        self._offsets = array('q')
+        self._timestamps = array('q')
+        self._fim_arquivo = 0
+        self._janela = deque(maxlen=janela_memoria)
+        self._lock = threading.Lock()
+        self._migrar_legado()
+        self._indexar()
+
+    def _migrar_legado(self):
+        """Converte o histórico antigo (lista JSON) para JSON Lines, com timestamps em epoch ms"""
+        if os.path.exists(self.historico_file) or not self.arquivo_legado:
+            return
+        if not os.path.exists(self.arquivo_legado):
+            return
+        try:
+            with open(self.arquivo_legado, 'r', encoding='utf-8') as f:
+                atendimentos = json.load(f)
+        except Exception:
+            return
+        with open(self.historico_file, 'w', encoding='utf-8') as f:
+            for atendimento in atendimentos:
+                if isinstance(atendimento.get('timestamp'), str):
+                    atendimento['timestamp'] = para_epoch_ms(atendimento['timestamp'])
+                f.write(json.dumps(atendimento, ensure_ascii=False) + '\n')
+        print(f"📦 Histórico migrado para {self.historico_file} ({len(atendimentos)} atendimentos)")
+
+    @staticmethod
+    def _extrair_timestamp(linha):
+        """Lê o timestamp de uma linha sem decodificar o JSON inteiro"""
+        inicio = linha.find(b'"timestamp":')
+        if inicio < 0:
+            return 0
+        valor = linha[inicio + 12:].lstrip()
+        if valor[:1] == b'"':
+            # Compatibilidade com registros antigos em ISO
+            return para_epoch_ms(valor[1:valor.index(b'"', 1)].decode())
+        fim = 0
+        while fim < len(valor) and valor[fim:fim + 1].isdigit():
+            fim += 1
+        return int(valor[:fim] or 0)
+
+    def _indexar(self):
+        """Varre o arquivo uma vez guardando apenas posição e timestamp de cada linha"""
+        if not os.path.exists(self.historico_file):
+            return
+        posicao = 0
+        with open(self.historico_file, 'rb') as f:
+            for linha in f:
+                if linha.strip():
+                    self._offsets.append(posicao)
+                    self._timestamps.append(self._extrair_timestamp(linha))
+                posicao += len(linha)
+        self._fim_arquivo = posicao
+
+        inicio_janela = max(0, len(self._offsets) - self.janela_memoria)
+        for indice, atendimento in zip(range(inicio_janela, len(self._offsets)),
+                                       self._ler_intervalo(inicio_janela, len(self._offsets), compacto=True)):
+            self._janela.append((indice, atendimento))
+
+    def _preparar(self, atendimento, compacto=False):
+        """Decodifica o resultado gravado (e compacta os registros da janela em memória)"""
+        if isinstance(atendimento.get('timestamp'), str):
+            # Linhas antigas em ISO: nenhum timestamp sai da camada de histórico como texto
+            atendimento['timestamp'] = para_epoch_ms(atendimento['timestamp'])
+        if self.codificador is not None:
+            return self.codificador.decodificar(atendimento, compacto=compacto)
+        return RegistroAtendimento.de_dict(atendimento) if compacto else atendimento
+
+    def _ler_intervalo(self, inicio, fim, compacto=False):
+        """Lê do disco os atendimentos com índices em [inicio, fim)"""
+        if inicio >= fim:
+            return []
+        byte_inicio = self._offsets[inicio]
+        byte_fim = self._offsets[fim] if fim < len(self._offsets) else self._fim_arquivo
+        with open(self.historico_file, 'rb') as f:
+            f.seek(byte_inicio)
+            bloco = f.read(byte_fim - byte_inicio)
+        return [self._preparar(json.loads(linha), compacto) for linha in bloco.splitlines() if linha.strip()]
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        return self.iterar()
+
+    def adicionar(self, atendimento):
+        """Acrescenta um atendimento ao final do histórico e retorna seu índice"""
+        if self.codificador is not None:
+            atendimento = self.codificador.codificar(atendimento)
+        linha = (json.dumps(atendimento, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            with open(self.historico_file, 'ab') as f:
+                f.write(linha)
+            indice = len(self._offsets)
+            self._offsets.append(self._fim_arquivo)
+            self._timestamps.append(para_epoch_ms(atendimento['timestamp']))
+            self._fim_arquivo += len(linha)
+            self._janela.append((indice, self._preparar(atendimento, compacto=True)))
+        return indice
+
+    def append(self, atendimento):
+        """Compatibilidade com o uso anterior do histórico como lista"""
+        self.adicionar(atendimento)
+
+    def indice_desde(self, inicio_ms):
+        """Busca binária do primeiro atendimento com timestamp >= inicio_ms"""
+        return bisect_left(self._timestamps, inicio_ms)
+
+    def intervalo(self, inicio_ms=None, fim_ms=None):
+        """Retorna o intervalo de índices [inicio, fim) de uma janela de tempo"""
+        inicio = 0 if inicio_ms is None else bisect_left(self._timestamps, inicio_ms)
+        fim = len(self._timestamps) if fim_ms is None else bisect_left(self._timestamps, fim_ms)
+        return inicio, fim
+
+    def obter(self, indice):
+        """Retorna um atendimento pelo índice (janela em memória ou disco)"""
+        if indice < 0:
+            indice += len(self._offsets)
+        if not 0 <= indice < len(self._offsets):
+            raise IndexError(indice)
+        if self._janela and indice >= self._janela[0][0]:
+            return self._janela[indice - self._janela[0][0]][1]
+        return self._ler_intervalo(indice, indice + 1)[0]
+
+    def recentes(self, quantidade=20):
+        """Retorna os atendimentos mais recentes, do mais novo ao mais antigo"""
+        return [atendimento for _, atendimento in self.iterar_com_indice(reverso=True, limite=quantidade)]
+
+    def iterar_com_indice(self, reverso=False, filtro=None, inicio=0, fim=None, limite=None):
+        """Itera pares (índice, atendimento) lendo blocos do disco sob demanda"""
+        total = len(self._offsets)
+        fim = total if fim is None else min(fim, total)
+        inicio = max(0, inicio)
+        entregues = 0
+
+        if reverso:
+            blocos = range(fim, inicio, -self.TAMANHO_BLOCO)
+        else:
+            blocos = range(inicio, fim, self.TAMANHO_BLOCO)
+
+        for marco in blocos:
+            if reverso:
+                a, b = max(inicio, marco - self.TAMANHO_BLOCO), marco
+            else:
+                a, b = marco, min(fim, marco + self.TAMANHO_BLOCO)
+
+            # Cópia da janela sob o lock: um adicionar concorrente pode deslizá-la
+            with self._lock:
+                janela = list(self._janela)
+            deslocamento = janela[0][0] if janela else total
+            if a >= deslocamento:
+                registros = [atendimento for _, atendimento in janela[a - deslocamento:b - deslocamento]]
+            else:
+                registros = self._ler_intervalo(a, b)
+
+            pares = zip(range(a, a + len(registros)), registros)
+            if reverso:
+                pares = reversed(list(pares))
+
+            for indice, atendimento in pares:
+                if filtro is not None and not filtro(atendimento):
+                    continue
+                yield indice, atendimento
+                entregues += 1
+                if limite is not None and entregues >= limite:
+                    return
+
+    def iterar(self, reverso=False, filtro=None, inicio=0, fim=None):
+        """Itera atendimentos (opcionalmente em ordem cronológica reversa e filtrados)"""
+        for _, atendimento in self.iterar_com_indice(reverso, filtro, inicio, fim):
+            yield atendimento
+
+    def pagina(self, offset=0, limite=20, cursor=None, reverso=True, filtro=None):
+        """
+        Retorna uma página de atendimentos
+
+        Args:
+            offset: Quantidade de registros (após filtro) a pular
+            limite: Tamanho da página
+            cursor: Índice do último registro da página anterior (tem precedência sobre offset)
+            reverso: Se True, do mais recente para o mais antigo
+            filtro: Função opcional que recebe o atendimento e retorna bool
+
+        Returns:
+            dict: Itens da página como pares (índice, atendimento) e cursor da próxima página
+        """
+        if cursor is not None:
+            offset = 0
+            inicio, fim = (0, cursor) if reverso else (cursor + 1, None)
+        else:
+            inicio, fim = 0, None
+
+        itens = []
+        for par in self.iterar_com_indice(reverso, filtro, inicio, fim, limite=offset + limite + 1):
+            itens.append(par)
+        tem_mais = len(itens) > offset + limite
+        itens = itens[offset:offset + limite]
+
+        return {
+            'itens': itens,
+            'total': len(self._offsets),
+            'offset': offset,
+            'limite': limite,
+            'proximo_cursor': itens[-1][0] if itens and tem_mais else None
+        }
@@ -0,0 +1,166 @@
+"""
+Incerteza Diagnóstica por Monte Carlo
+=====================================
+
+Propaga o erro de medição dos sinais vitais (termômetros IoT, aferições
+manuais) até o diagnóstico: sorteia N versões perturbadas dos sinais vitais
+e pontua todas as amostras numa única passada vetorizada. Só os termos que
+dependem dos sinais vitais são recalculados por amostra: febre detectada
+automaticamente, modificador clínico da gravidade, urgência e a checagem de
+paciente saudável.
+"""
+
+import time
+
+import numpy as np
+
+
+# Modelos de ruído padrão por sinal vital (desvios em unidades do próprio sinal)
+RUIDO_PADRAO = {
+    'temperatura': {'tipo': 'normal', 'desvio': 0.2},
+    'pressao_sistolica': {'tipo': 'normal', 'desvio': 6.0},
+    'pressao_diastolica': {'tipo': 'normal', 'desvio': 4.0},
+    'frequencia_cardiaca': {'tipo': 'normal', 'desvio': 3.0}
+}
+
+VALORES_PADRAO = {
+    'temperatura': 36.5,
+    'pressao_sistolica': 120,
+    'pressao_diastolica': 80,
+    'frequencia_cardiaca': 70
+}
+
+NIVEIS_URGENCIA = ['CRÍTICA', 'ALTA', 'MÉDIA', 'BAIXA']
+
+
+class AnaliseIncerteza:
+    def __init__(self, triagem):
+        """Inicializa a análise com o modelo de triagem (fórmulas, pesos e base de conhecimento)"""
+        self.triagem = triagem
+
+    @staticmethod
+    def amostrar(dados_paciente, amostras, ruido=None, gerador=None):
+        """
+        Sorteia versões perturbadas dos sinais vitais
+
+        Args:
+            dados_paciente: Dados com os valores medidos
+            amostras: Número de amostras
+            ruido: Modelos por sinal ({'tipo': 'normal', 'desvio': x},
+                   {'tipo': 'uniforme', 'amplitude': x}; 'vies' opcional)
+            gerador: np.random.Generator
+
+        Returns:
+            dict: sinal -> np.ndarray (amostras,)
+        """
+        gerador = gerador or np.random.default_rng()
+        modelos = dict(RUIDO_PADRAO)
+        modelos.update(ruido or {})
+
+        vitais = {}
+        for sinal, padrao in VALORES_PADRAO.items():
+            medido = float(dados_paciente.get(sinal, padrao))
+            modelo = modelos.get(sinal) or {'tipo': 'nenhum'}
+            centro = medido + modelo.get('vies', 0.0)
+            if modelo['tipo'] == 'normal':
+                valores = gerador.normal(centro, modelo['desvio'], amostras)
+            elif modelo['tipo'] == 'uniforme':
+                valores = gerador.uniform(centro - modelo['amplitude'], centro + modelo['amplitude'], amostras)
+            else:
+                valores = np.full(amostras, centro)
+            vitais[sinal] = valores
+        return vitais
+
+    def modificador_clinico(self, vitais):
+        """Versão vetorizada do modificador clínico da gravidade (máscaras das regras compiladas)"""
+        return self.triagem.regras.modificador_clinico_vetorizado(vitais)
+
+    def urgencia(self, gravidade_doenca, vitais):
+        """Versão vetorizada da urgência regionalizada (retorna índices de NIVEIS_URGENCIA)"""
+        return self.triagem.regras.urgencia_regional_vetorizada(vitais, gravidade_doenca, NIVEIS_URGENCIA)
+
+    def analisar(self, dados_paciente, amostras=1000, ruido=None, semente=None, febre_automatica=True):
+        """
+        Distribuição do diagnóstico e da urgência sob ruído de medição
+
+        Args:
+            dados_paciente: Dados do paciente (como em processar_triagem)
+            amostras: Número de amostras Monte Carlo
+            ruido: Modelos de ruído por sinal vital (sobrescrevem RUIDO_PADRAO)
+            semente: Semente do gerador (reprodutibilidade)
+            febre_automatica: Se True, 'febre'/'febre_alta' são somados aos sintomas informados
+                              conforme a temperatura de cada amostra (os informados nunca são retirados)
+
+        Returns:
+            dict: Probabilidade de cada diagnóstico ficar em primeiro, de cada nível
+                  de urgência e de o paciente ser classificado como saudável
+        """
+        inicio = time.perf_counter()
+        gerador = np.random.default_rng(semente)
+        vitais = self.amostrar(dados_paciente, amostras, ruido, gerador)
+        temperatura = vitais['temperatura']
+
+        regiao = dados_paciente.get('regiao_geografica', 'brasil_norte')
+        doencas = self.triagem.base_conhecimento['regioes'][regiao]['doencas']
+        pesos = self.triagem.obter_pesos(regiao)
+
+        # Faixa de febre de cada amostra: 0 sem febre, 1 febre, 2 febre alta
+        sintomas = list(dados_paciente.get('sintomas', []))
+        if febre_automatica:
+            faixa_febre = (temperatura >= 37.8).astype(int) + (temperatura >= 39.0)
+            variantes = [
+                sintomas + [s for s in febres if s not in sintomas]
+                for febres in ((), ('febre',), ('febre_alta', 'febre'))
+            ]
+        else:
+            faixa_febre = np.zeros(amostras, dtype=int)
+            variantes = [sintomas]
+
+        # Parte dos scores que não depende dos sinais vitais, por variante de sintomas
+        # (a gravidade é calculada com sinais neutros: modificador clínico = 1)
+        neutros = dict(dados_paciente, **VALORES_PADRAO)
+        parciais = []
+        for variante in variantes:
+            nomes, fatores = self.triagem.calcular_fatores(dict(neutros, sintomas=variante), regiao)
+            # Mesma ordem de soma da triagem: amostras sem ruído reproduzem o diagnóstico exibido
+            parciais.append(self.triagem.combinar_fatores(fatores[:, :3], pesos[:3]))
+        parciais = np.array(parciais)
+        gravidade_base = fatores[:, 3]
+
+        # Scores de todas as amostras: amostras × doenças
+        gravidade = np.minimum(np.outer(self.modificador_clinico(vitais), gravidade_base), 1.0)
+        scores = parciais[faixa_febre] + pesos[3] * gravidade
+        primeiro = np.argmax(scores, axis=1)
+
+        gravidades = np.array([doencas[nome]['gravidade'] for nome in nomes])
+        urgencias = self.urgencia(gravidades[primeiro], vitais)
+
+        # Checagem vetorizada de paciente saudável
+        vitais_normais = self.triagem.regras.vitais_normais_vetorizado(vitais)
+        significativos = np.array([self.triagem.regras.tem_sintomas_significativos(v) for v in variantes])
+        saudavel = vitais_normais & ~significativos[faixa_febre]
+
+        # Amostras saudáveis saem do ranking de doenças com urgência BAIXA
+        urgencias = np.where(saudavel, 3, urgencias)
+        contagem_diagnosticos = np.bincount(primeiro[~saudavel], minlength=len(nomes))
+
+        diagnosticos = {
+            self.triagem._formatar_nome_doenca(nome): float(contagem) / amostras
+            for nome, contagem in zip(nomes, contagem_diagnosticos) if contagem
+        }
+        if saudavel.any():
+            diagnosticos['Paciente Saudável'] = float(saudavel.mean())
+        diagnosticos = dict(sorted(diagnosticos.items(), key=lambda item: item[1], reverse=True))
+
+        contagem_urgencias = np.bincount(urgencias, minlength=len(NIVEIS_URGENCIA))
+        return {
+            'amostras': amostras,
+            'diagnosticos': diagnosticos,
+            'urgencias': {nivel: float(c) / amostras for nivel, c in zip(NIVEIS_URGENCIA, contagem_urgencias)},
+            'probabilidade_saudavel': float(saudavel.mean()),
+            'intervalos_vitais': {
+                sinal: [round(float(v), 1) for v in np.percentile(valores, [2.5, 97.5])]
+                for sinal, valores in vitais.items()
+            },
+            'tempo_ms': round((time.perf_counter() - inicio) * 1000, 1)
+        }
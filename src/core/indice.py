@@ -0,0 +1,247 @@
+"""
+Índice de Busca de Atendimentos
+===============================
+
+Índice invertido mantido incrementalmente sobre o histórico: para cada
+sintoma, diagnóstico, urgência, região, faixa etária e termo de texto guarda
+a lista ordenada dos índices de atendimento (posting list). Consultas
+combinadas são respondidas por interseção das listas, sem reler o histórico;
+o recorte de tempo usa a busca binária nos timestamps do próprio histórico.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from array import array
+
+import numpy as np
+
+from ..utils.tempo import agora_ms, MS_POR_DIA
+
+
+CAMPOS_INDICE = ('sintoma', 'diagnostico', 'urgencia', 'regiao', 'faixa_etaria', 'termo')
+
+# Palavras ignoradas na busca textual
+STOPWORDS = {'a', 'o', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'por', 'para', 'com', 'na', 'no'}
+
+
+def faixa_etaria(idade):
+    """Classifica a idade nas faixas usadas pelos scores de população"""
+    if idade < 2:
+        return 'lactente'
+    if idade < 12:
+        return 'crianca'
+    if idade < 18:
+        return 'adolescente'
+    if idade <= 65:
+        return 'adulto'
+    return 'idoso'
+
+
+def normalizar_termos(texto):
+    """Quebra um texto em termos minúsculos, sem acentos e sem stopwords"""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode().lower()
+    return [t for t in re.split(r'[^a-z0-9]+', texto) if t and t not in STOPWORDS]
+
+
+class IndiceAtendimentos:
+    def __init__(self, historico, indice_file='indice_atendimentos.json', intervalo_snapshot=1000):
+        """Inicializa o índice e indexa os atendimentos ainda não cobertos pelo snapshot"""
+        self.historico = historico
+        self.indice_file = indice_file
+        self.intervalo_snapshot = intervalo_snapshot
+        self.postings = {campo: {} for campo in CAMPOS_INDICE}
+        self.total_indexado = 0
+        self._pendentes_snapshot = 0
+        self._carregar()
+        self.atualizar()
+
+    def _carregar(self):
+        """Carrega o snapshot do índice, se compatível com o histórico atual"""
+        if not os.path.exists(self.indice_file):
+            return
+        try:
+            with open(self.indice_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception:
+            return
+        if snapshot.get('total', 0) > len(self.historico):
+            # Histórico foi substituído: o snapshot não vale mais
+            return
+        for campo in CAMPOS_INDICE:
+            self.postings[campo] = {
+                valor: array('q', indices)
+                for valor, indices in snapshot.get('postings', {}).get(campo, {}).items()
+            }
+        self.total_indexado = snapshot['total']
+
+    def salvar(self):
+        """Grava snapshot do índice em disco"""
+        snapshot = {
+            'total': self.total_indexado,
+            'postings': {
+                campo: {valor: indices.tolist() for valor, indices in valores.items()}
+                for campo, valores in self.postings.items()
+            }
+        }
+        temporario = self.indice_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temporario, self.indice_file)
+        self._pendentes_snapshot = 0
+
+    def atualizar(self):
+        """Indexa atendimentos gravados após o último snapshot"""
+        novos = 0
+        for indice, atendimento in self.historico.iterar_com_indice(inicio=self.total_indexado):
+            self._indexar(indice, atendimento)
+            novos += 1
+        if novos:
+            self.salvar()
+        return novos
+
+    def _chaves(self, atendimento):
+        """Extrai os pares (campo, valor) indexados de um atendimento"""
+        dados = atendimento['dados_paciente']
+        resultado = atendimento['resultado']
+
+        chaves = {('diagnostico', resultado['diagnostico_principal']),
+                  ('urgencia', resultado['nivel_urgencia']),
+                  ('regiao', dados.get('regiao_geografica', 'brasil_norte')),
+                  ('faixa_etaria', faixa_etaria(dados.get('idade', 0)))}
+        chaves.update(('sintoma', sintoma) for sintoma in dados.get('sintomas', []))
+
+        textos = [resultado['diagnostico_principal'], resultado.get('medicamentos', ''),
+                  dados.get('evento_climatico', '')]
+        textos.extend(dados.get('sintomas', []))
+        textos.extend(dados.get('historico_medico', []))
+        for texto in textos:
+            chaves.update(('termo', termo) for termo in normalizar_termos(texto))
+        return chaves
+
+    def _indexar(self, indice, atendimento):
+        for campo, valor in self._chaves(atendimento):
+            lista = self.postings[campo].get(valor)
+            if lista is None:
+                lista = self.postings[campo][valor] = array('q')
+            lista.append(indice)
+        self.total_indexado = indice + 1
+
+    def adicionar(self, indice, atendimento):
+        """Indexa um atendimento recém-gravado no histórico"""
+        if indice < self.total_indexado:
+            return
+        if indice > self.total_indexado:
+            # Atendimentos gravados por fora do índice: alcança o histórico
+            self.atualizar()
+            return
+        self._indexar(indice, atendimento)
+        self._pendentes_snapshot += 1
+        if self._pendentes_snapshot >= self.intervalo_snapshot:
+            self.salvar()
+
+    def valores(self, campo):
+        """Retorna os valores indexados de um campo com suas contagens"""
+        return {valor: len(indices) for valor, indices in sorted(self.postings[campo].items())}
+
+    def _posting(self, campo, valor):
+        lista = self.postings[campo].get(valor)
+        if lista is None or not len(lista):
+            return np.empty(0, dtype=np.int64)
+        # Cópia: uma view manteria o array travado para novos appends
+        return np.frombuffer(lista, dtype=np.int64).copy()
+
+    @staticmethod
+    def _intersectar(a, b):
+        """Interseção de listas ordenadas: busca binária da menor na maior"""
+        if len(a) > len(b):
+            a, b = b, a
+        if not len(a):
+            return a
+        posicoes = np.searchsorted(b, a)
+        posicoes[posicoes == len(b)] = 0
+        return a[b[posicoes] == a]
+
+    def _uniao(self, campo, valores):
+        listas = [self._posting(campo, valor) for valor in valores]
+        if len(listas) == 1:
+            return listas[0]
+        return np.unique(np.concatenate(listas))
+
+    def consultar(self, sintomas=None, diagnostico=None, urgencia=None, regiao=None,
+                  faixa_etaria=None, texto=None, ultimos_dias=None, inicio_ms=None, fim_ms=None):
+        """
+        Retorna os índices dos atendimentos que satisfazem todos os critérios
+
+        Args:
+            sintomas: Lista de sintomas exigidos (todos devem estar presentes)
+            diagnostico, urgencia, regiao, faixa_etaria: Valor ou lista de valores aceitos
+            texto: Busca textual (todos os termos devem ocorrer)
+            ultimos_dias: Restringe aos últimos N dias
+            inicio_ms, fim_ms: Janela de tempo explícita em epoch ms
+
+        Returns:
+            np.ndarray: Índices em ordem cronológica
+        """
+        listas = []
+        for sintoma in sintomas or []:
+            listas.append(self._posting('sintoma', sintoma))
+        for campo, valor in (('diagnostico', diagnostico), ('urgencia', urgencia),
+                             ('regiao', regiao), ('faixa_etaria', faixa_etaria)):
+            if valor:
+                listas.append(self._uniao(campo, [valor] if isinstance(valor, str) else list(valor)))
+        if texto:
+            for termo in normalizar_termos(texto):
+                listas.append(self._posting('termo', termo))
+
+        if ultimos_dias:
+            inicio_ms = max(inicio_ms or 0, agora_ms() - ultimos_dias * MS_POR_DIA)
+        inicio, fim = self.historico.intervalo(inicio_ms, fim_ms)
+        fim = min(fim, self.total_indexado)
+
+        if not listas:
+            return np.arange(inicio, fim, dtype=np.int64)
+
+        # Interseção começando pelas listas mais seletivas
+        listas.sort(key=len)
+        resultado = listas[0]
+        for lista in listas[1:]:
+            if not len(resultado):
+                break
+            resultado = self._intersectar(resultado, lista)
+
+        a, b = np.searchsorted(resultado, [inicio, fim])
+        return resultado[a:b]
+
+    def contar(self, **criterios):
+        """Conta atendimentos que satisfazem os critérios"""
+        return len(self.consultar(**criterios))
+
+    def contagens(self, campo, **criterios):
+        """Distribuição de um campo entre os atendimentos que satisfazem os critérios"""
+        resultado = self.consultar(**criterios)
+        contagens = {}
+        for valor in self.postings[campo]:
+            quantidade = len(self._intersectar(resultado, self._posting(campo, valor)))
+            if quantidade:
+                contagens[valor] = quantidade
+        return dict(sorted(contagens.items(), key=lambda item: item[1], reverse=True))
+
+    def pagina(self, offset=0, limite=20, reverso=True, **criterios):
+        """
+        Retorna uma página de atendimentos que satisfazem os critérios
+
+        Returns:
+            dict: Itens como pares (índice, atendimento), total encontrado, offset e limite
+        """
+        resultado = self.consultar(**criterios)
+        if reverso:
+            resultado = resultado[::-1]
+        selecionados = resultado[offset:offset + limite]
+        return {
+            'itens': [(int(indice), self.historico.obter(int(indice))) for indice in selecionados],
+            'total': len(resultado),
+            'offset': offset,
+            'limite': limite
+        }
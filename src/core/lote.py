@@ -0,0 +1,193 @@
+"""
+Triagem em Lote
+===============
+
+Pontua muitos pacientes de uma vez, sem efeitos colaterais (não grava no
+histórico, não baixa estoque, não alimenta a prevalência). Usada pela
+simulação de fluxo da clínica e por análises em massa.
+
+Os fatores de score são os mesmos de calcular_fatores, em forma matricial:
+sintomas do lote viram uma matriz pacientes × vocabulário que é multiplicada
+pelas matrizes doenças × sintomas da região; população, gravidade, urgência e
+checagem de paciente saudável usam as regras compiladas (máscaras NumPy).
+"""
+
+import numpy as np
+
+from .incerteza import NIVEIS_URGENCIA, VALORES_PADRAO
+
+
+class TriagemLote:
+    def __init__(self, triagem):
+        """Inicializa com o modelo de triagem (regras, pesos, prevalência e base de conhecimento)"""
+        self.triagem = triagem
+        self._regioes = {}
+
+    def _dados_regiao(self, regiao):
+        """Matrizes da região (montadas uma vez): sintomas, específicos, gravidades e medicamentos"""
+        if regiao in self._regioes:
+            return self._regioes[regiao]
+
+        doencas = self.triagem.base_conhecimento['regioes'][regiao]['doencas']
+        vocabulario = {}
+        for dados_doenca in doencas.values():
+            for sintoma in dados_doenca['sintomas'] + dados_doenca.get('sintomas_especificos', []):
+                vocabulario.setdefault(sintoma, len(vocabulario))
+
+        sintomas = np.zeros((len(doencas), len(vocabulario)))
+        especificos = np.zeros((len(doencas), len(vocabulario)))
+        for i, dados_doenca in enumerate(doencas.values()):
+            for sintoma in dados_doenca['sintomas']:
+                sintomas[i, vocabulario[sintoma]] = 1
+            for sintoma in dados_doenca.get('sintomas_especificos', []):
+                especificos[i, vocabulario[sintoma]] = 1
+
+        dados = {
+            'nomes': list(doencas),
+            'vocabulario': vocabulario,
+            'sintomas': sintomas,
+            'especificos': especificos,
+            # Denominador do score base: tamanho da lista de sintomas da doença (como em calcular_score_sintomas)
+            'total_sintomas': np.array([len(d['sintomas']) for d in doencas.values()], dtype=float),
+            'gravidades': np.array([d['gravidade'] for d in doencas.values()]),
+            'medicamento_adulto': np.array([d['medicamentos']['adulto']['nome'] for d in doencas.values()], dtype=object),
+            'medicamento_crianca': np.array([d['medicamentos']['crianca']['nome'] for d in doencas.values()], dtype=object),
+            # Regimes estruturados da posologia (consumo em unidades de compra)
+            'regime_adulto': np.array([self._regime(d['medicamentos']['adulto'], 'adulto') for d in doencas.values()]),
+            'regime_crianca': np.array([self._regime(d['medicamentos']['crianca'], 'crianca') for d in doencas.values()]),
+            'climatico': {}
+        }
+        self._regioes[regiao] = dados
+        return dados
+
+    def _regime(self, esquema, faixa):
+        return self.triagem.posologia.indice_regime(esquema['nome'], esquema['dosagem'], esquema['frequencia'], faixa)
+
+    def _score_climatico(self, dados, regiao, evento):
+        """Score climático de todas as doenças da região para um evento (memorizado)"""
+        if evento not in dados['climatico']:
+            doencas = self.triagem.base_conhecimento['regioes'][regiao]['doencas']
+            dados['climatico'][evento] = np.array([
+                self.triagem.calcular_score_climatico(evento, d['eventos_climaticos']) for d in doencas.values()
+            ])
+        return dados['climatico'][evento]
+
+    def calcular_fatores(self, pacientes, regiao, fatos=None):
+        """
+        Fatores de score de um lote de pacientes da mesma região
+
+        Args:
+            pacientes: Lista de dicionários de dados do paciente
+            regiao: Chave da região
+            fatos: Fatos dos pacientes já montados pelas regras (opcional)
+
+        Returns:
+            tuple: (nomes das doenças, np.ndarray pacientes × doenças × 4 na ordem de FATORES_SCORE)
+        """
+        dados = self._dados_regiao(regiao)
+        regras = self.triagem.regras
+        vocabulario = dados['vocabulario']
+        quantidade = len(pacientes)
+
+        # Sintomas do lote: pacientes × vocabulário da região (sintomas fora do vocabulário só contam na penalidade)
+        presentes = np.zeros((quantidade, len(vocabulario)))
+        distintos = np.zeros(quantidade)
+        for p, paciente in enumerate(pacientes):
+            sintomas = set(paciente.get('sintomas', []))
+            distintos[p] = len(sintomas)
+            for sintoma in sintomas:
+                posicao = vocabulario.get(sintoma)
+                if posicao is not None:
+                    presentes[p, posicao] = 1
+
+        comuns = presentes @ dados['sintomas'].T
+        especificos = presentes @ dados['especificos'].T
+        total = dados['total_sintomas']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score_base = comuns / total
+        score_sintomas = np.maximum(0.0, np.minimum(1.0, score_base + especificos * 0.3 - (distintos[:, None] - comuns) * 0.1))
+        score_sintomas[(distintos == 0)[:, None] | (total == 0)[None, :]] = 0.0
+
+        fatores = np.empty((quantidade, len(dados['nomes']), 4))
+        fatores[:, :, 0] = score_sintomas
+        for p, paciente in enumerate(pacientes):
+            fatores[p, :, 1] = self._score_climatico(dados, regiao, paciente.get('evento_climatico', ''))
+
+        # População: grupos de risco de cada paciente × matriz doenças × grupos da região
+        if fatos is None:
+            fatos = [regras.fatos(paciente) for paciente in pacientes]
+        grupos = np.array([regras.grupos_paciente(f) for f in fatos]).reshape(quantidade, len(regras.grupos))
+        fatores[:, :, 2] = np.minimum(grupos @ regras.matrizes_populacao[regiao].T, 1.0)
+
+        # Gravidade: base × prevalência × modificador clínico vetorizado
+        vitais = self.vitais(fatos)
+        gravidade_prevalencia = regras.gravidade_base[regiao] * self.triagem.prevalencia.vetor(regiao)
+        fatores[:, :, 3] = np.minimum(gravidade_prevalencia[None, :] * regras.modificador_clinico_vetorizado(vitais)[:, None], 1.0)
+
+        return dados['nomes'], fatores
+
+    @staticmethod
+    def vitais(fatos):
+        """Arrays de sinais vitais do lote (sinal -> np.ndarray)"""
+        return {
+            sinal: np.array([float(f.get(sinal, padrao)) for f in fatos])
+            for sinal, padrao in VALORES_PADRAO.items()
+        }
+
+    def processar(self, pacientes, regiao=None):
+        """
+        Triagem de um lote de pacientes (mesmo resultado de processar_triagem, sem gravar nada)
+
+        Args:
+            pacientes: Lista de dicionários de dados do paciente
+            regiao: Região de todos os pacientes (padrão: 'regiao_geografica' de cada um)
+
+        Returns:
+            dict: Arrays alinhados com o lote — 'diagnostico' (chave da doença ou None
+                  se saudável), 'probabilidade', 'urgencia' (índice de NIVEIS_URGENCIA),
+                  'medicamento' (nome ou None), 'regime' (índice na posologia ou -1) e 'saudavel'
+        """
+        quantidade = len(pacientes)
+        resultado = {
+            'diagnostico': np.empty(quantidade, dtype=object),
+            'probabilidade': np.zeros(quantidade, dtype=int),
+            'urgencia': np.full(quantidade, NIVEIS_URGENCIA.index('BAIXA')),
+            'medicamento': np.empty(quantidade, dtype=object),
+            'regime': np.full(quantidade, -1),
+            'saudavel': np.zeros(quantidade, dtype=bool)
+        }
+
+        # Agrupa por região: cada grupo é pontuado numa única passada
+        por_regiao = {}
+        for p, paciente in enumerate(pacientes):
+            chave = regiao or paciente.get('regiao_geografica', 'brasil_norte')
+            por_regiao.setdefault(chave, []).append(p)
+
+        regras = self.triagem.regras
+        for chave, posicoes in por_regiao.items():
+            posicoes = np.array(posicoes)
+            lote = [pacientes[p] for p in posicoes]
+            dados = self._dados_regiao(chave)
+            fatos = [regras.fatos(paciente) for paciente in lote]
+            nomes, fatores = self.calcular_fatores(lote, chave, fatos)
+            scores = self.triagem.combinar_fatores(fatores, self.triagem.obter_pesos(chave))
+            primeiro = np.argmax(scores, axis=1)
+
+            vitais = self.vitais(fatos)
+            significativos = np.array([regras.tem_sintomas_significativos(f['sintomas']) for f in fatos], dtype=bool)
+            saudavel = regras.vitais_normais_vetorizado(vitais) & ~significativos
+
+            urgencias = regras.urgencia_regional_vetorizada(vitais, dados['gravidades'][primeiro], NIVEIS_URGENCIA)
+            idades = np.array([f['idade'] for f in fatos])
+            medicamentos = np.where(idades < 12, dados['medicamento_crianca'][primeiro], dados['medicamento_adulto'][primeiro])
+            regimes = np.where(idades < 12, dados['regime_crianca'][primeiro], dados['regime_adulto'][primeiro])
+            probabilidades = np.minimum((scores[np.arange(len(lote)), primeiro] * 100).astype(int), 95)
+
+            resultado['diagnostico'][posicoes] = np.where(saudavel, None, np.array(nomes, dtype=object)[primeiro])
+            resultado['probabilidade'][posicoes] = np.where(saudavel, 95, probabilidades)
+            resultado['urgencia'][posicoes] = np.where(saudavel, NIVEIS_URGENCIA.index('BAIXA'), urgencias)
+            resultado['medicamento'][posicoes] = np.where(saudavel, None, medicamentos)
+            resultado['regime'][posicoes] = np.where(saudavel, -1, regimes)
+            resultado['saudavel'][posicoes] = saudavel
+
+        return resultado
@@ -0,0 +1,446 @@
+"""
+Posologia e Consumo de Medicamentos em Unidades
+===============================================
+
+Os esquemas da base de conhecimento trazem dosagem e frequência como texto
+("50mg/kg/dia", "2x/dia por 7 dias", "1 sachê + 20mg"). Na carga, cada
+esquema é convertido uma única vez em um regime estruturado: componentes
+(princípio ativo, quantidade, mg/kg, por dia), doses por dia e duração.
+
+O consumo é calculado de forma vetorizada a partir do peso e da idade de
+cada atendimento e convertido em unidades de compra (comprimidos,
+frascos-ampola, sachês, frascos) pelas apresentações cadastradas. A compra é
+feita em unidades, não em prescrições.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+
+# Apresentações de compra por princípio ativo. 'conteudo' é a quantidade por
+# unidade em cada medida; 'fracionamento' define o arredondamento:
+#   'dose'       – unidades inteiras por administração (ampolas, cápsulas, sachês)
+#   'meia'       – meias unidades por administração (comprimidos sulcados)
+#   'tratamento' – unidades inteiras por tratamento (frascos multidose)
+# 'crianca' sobrescreve a apresentação nos esquemas pediátricos; 'combinado'
+# marca associações em dose fixa (a dose do primeiro componente define as unidades).
+APRESENTACOES = {
+    'Doxiciclina': {'descricao': 'Doxiciclina 100mg comprimido', 'conteudo': {'mg': 100}, 'fracionamento': 'meia'},
+    'Amoxicilina': {
+        'descricao': 'Amoxicilina 500mg cápsula', 'conteudo': {'mg': 500}, 'fracionamento': 'dose',
+        'crianca': {'descricao': 'Amoxicilina 250mg/5ml suspensão 150ml', 'conteudo': {'mg': 7500}, 'fracionamento': 'tratamento'}
+    },
+    'Sais de reidratação': {'descricao': 'Sais de reidratação oral sachê (1 L)', 'conteudo': {'sachê': 1, 'ml': 1000}, 'fracionamento': 'dose'},
+    'Zinco': {'descricao': 'Sulfato de zinco 20mg comprimido', 'conteudo': {'mg': 20}, 'fracionamento': 'meia'},
+    'Ciprofloxacino': {'descricao': 'Ciprofloxacino 500mg comprimido', 'conteudo': {'mg': 500}, 'fracionamento': 'meia'},
+    'Ceftriaxona': {'descricao': 'Ceftriaxona 1g frasco-ampola', 'conteudo': {'mg': 1000}, 'fracionamento': 'dose', 'dose_maxima': {'mg': 4000}},
+    'Artemeter + Lumefantrina': {
+        'descricao': 'Artemeter 20mg + Lumefantrina 120mg comprimido', 'conteudo': {'mg': 20}, 'fracionamento': 'dose', 'combinado': True
+    },
+    'Artesunato + Amodiaquina': {
+        'descricao': 'Artesunato 100mg + Amodiaquina 270mg comprimido', 'conteudo': {'mg': 100}, 'fracionamento': 'dose', 'combinado': True
+    },
+    'Artesunato + Mefloquina': {
+        'descricao': 'Artesunato 100mg + Mefloquina 220mg comprimido', 'conteudo': {'mg': 100}, 'fracionamento': 'dose', 'combinado': True
+    },
+    'Paracetamol': {
+        'descricao': 'Paracetamol 750mg comprimido', 'conteudo': {'mg': 750}, 'fracionamento': 'meia',
+        'crianca': {'descricao': 'Paracetamol 200mg/ml gotas 15ml', 'conteudo': {'mg': 3000}, 'fracionamento': 'tratamento'}
+    },
+    'Dipirona': {
+        'descricao': 'Dipirona 500mg comprimido', 'conteudo': {'mg': 500}, 'fracionamento': 'meia',
+        'crianca': {'descricao': 'Dipirona 500mg/ml gotas 20ml', 'conteudo': {'mg': 10000}, 'fracionamento': 'tratamento'}
+    },
+    'Anti-inflamatório': {'descricao': 'Ibuprofeno 400mg comprimido', 'conteudo': {'mg': 400}, 'fracionamento': 'meia'},
+    'Antimoniato pentavalente': {'descricao': 'Antimoniato de meglumina 405mg/5ml ampola', 'conteudo': {'mg': 405}, 'fracionamento': 'dose'},
+    'Anfotericina B lipossomal': {'descricao': 'Anfotericina B lipossomal 50mg frasco-ampola', 'conteudo': {'mg': 50}, 'fracionamento': 'dose'},
+    'Benznidazol': {
+        'descricao': 'Benznidazol 100mg comprimido', 'conteudo': {'mg': 100}, 'fracionamento': 'meia',
+        'crianca': {'descricao': 'Benznidazol 12,5mg comprimido', 'conteudo': {'mg': 12.5}, 'fracionamento': 'dose'}
+    },
+    'Azitromicina': {
+        'descricao': 'Azitromicina 500mg comprimido', 'conteudo': {'mg': 500}, 'fracionamento': 'meia',
+        'crianca': {'descricao': 'Azitromicina 200mg/5ml suspensão 15ml', 'conteudo': {'mg': 600}, 'fracionamento': 'tratamento'}
+    },
+    'Ribavirina': {'descricao': 'Ribavirina 200mg cápsula', 'conteudo': {'mg': 200}, 'fracionamento': 'dose'},
+    'Fexinidazol': {'descricao': 'Fexinidazol 600mg comprimido', 'conteudo': {'mg': 600}, 'fracionamento': 'dose'},
+    'Melarsoprol': {'descricao': 'Melarsoprol 180mg/5ml ampola', 'conteudo': {'mg': 180}, 'fracionamento': 'dose'},
+    'Dexametasona': {'descricao': 'Dexametasona 4mg/ml ampola 2,5ml', 'conteudo': {'mg': 10}, 'fracionamento': 'dose'},
+    'Praziquantel': {'descricao': 'Praziquantel 600mg comprimido', 'conteudo': {'mg': 600}, 'fracionamento': 'meia'},
+    'Oseltamivir': {
+        'descricao': 'Oseltamivir 75mg cápsula', 'conteudo': {'mg': 75}, 'fracionamento': 'dose',
+        'crianca': {'descricao': 'Oseltamivir 30mg cápsula', 'conteudo': {'mg': 30}, 'fracionamento': 'dose'}
+    },
+    'Cloranfenicol': {'descricao': 'Cloranfenicol 1g frasco-ampola', 'conteudo': {'mg': 1000}, 'fracionamento': 'dose'}
+}
+
+# Peso de referência do esquema adulto (doses "Conforme peso" são proporcionais a ele)
+PESO_REFERENCIA_ADULTO = 70.0
+
+# Duração assumida quando a frequência não informa "por N dias"
+DURACAO_PADRAO_DIAS = 3
+
+UNIDADES_DURACAO = {'dia': 1, 'dias': 1, 'semana': 7, 'semanas': 7, 'mes': 30, 'mês': 30, 'meses': 30}
+
+PADRAO_DOSE = re.compile(
+    r'^(?P<valor>\d+(?:[.,]\d+)?)(?:-(?P<maximo>\d+(?:[.,]\d+)?))?\s*'
+    r'(?P<medida>mg|g|ml|sachês?)(?P<por_kg>/kg)?(?P<por_dia>/dia)?$'
+)
+PADRAO_VEZES_DIA = re.compile(r'(\d+)\s*x\s*/\s*dia')
+PADRAO_INTERVALO = re.compile(r'(\d+)\s*/\s*(\d+)\s*h')
+PADRAO_DURACAO = re.compile(r'por\s+(\d+)\s+(dias?|semanas?|m[eê]s(?:es)?)')
+PADRAO_PRIMEIRAS_HORAS = re.compile(r'nas primeiras\s+\d+\s*h')
+
+
+def _numero(texto):
+    return float(texto.replace(',', '.'))
+
+
+def interpretar_dose(texto):
+    """
+    Converte um componente de dosagem em quantidade estruturada
+
+    Exemplos: '100mg', '2g', '50mg/kg/dia', '5-7mg/kg/dia' (ponto médio),
+    '75ml/kg', '1 sachê', 'SRO' (um sachê por administração).
+
+    Returns:
+        dict ou None: {'quantidade', 'medida', 'por_kg', 'por_dia'} (None se não for dose)
+    """
+    texto = texto.strip()
+    if texto.upper() == 'SRO':
+        return {'quantidade': 1.0, 'medida': 'sachê', 'por_kg': False, 'por_dia': False}
+    if texto.lower() == 'conforme peso':
+        return {'quantidade': None, 'medida': None, 'por_kg': True, 'por_dia': False}
+    correspondencia = PADRAO_DOSE.match(texto.replace(' ', ''))
+    if not correspondencia:
+        return None
+    quantidade = _numero(correspondencia['valor'])
+    if correspondencia['maximo']:
+        quantidade = (quantidade + _numero(correspondencia['maximo'])) / 2
+    medida = correspondencia['medida']
+    if medida == 'g':
+        quantidade, medida = quantidade * 1000, 'mg'
+    elif medida.startswith('sach'):
+        medida = 'sachê'
+    return {
+        'quantidade': quantidade,
+        'medida': medida,
+        'por_kg': bool(correspondencia['por_kg']),
+        'por_dia': bool(correspondencia['por_dia'])
+    }
+
+
+def interpretar_frequencia(texto):
+    """
+    Converte o texto de frequência em doses por dia e duração
+
+    Exemplos: '2x/dia por 7 dias', '6/6h', 'Dose única', 'Por 20 dias',
+    'Nas primeiras 4h', '2x/dia por 3 meses'.
+
+    Returns:
+        dict: {'doses_dia', 'dias', 'estimado'} (None nos campos não informados)
+    """
+    texto = texto.lower()
+    if 'dose única' in texto or PADRAO_PRIMEIRAS_HORAS.search(texto):
+        return {'doses_dia': 1, 'dias': 1, 'estimado': False}
+
+    doses_dia = None
+    vezes = PADRAO_VEZES_DIA.search(texto)
+    intervalo = PADRAO_INTERVALO.search(texto)
+    if vezes:
+        doses_dia = int(vezes.group(1))
+    elif intervalo and intervalo.group(1) == intervalo.group(2):
+        doses_dia = max(1, 24 // int(intervalo.group(2)))
+
+    dias = None
+    duracao = PADRAO_DURACAO.search(texto)
+    if duracao:
+        dias = int(duracao.group(1)) * UNIDADES_DURACAO.get(duracao.group(2), 1)
+    return {'doses_dia': doses_dia, 'dias': dias, 'estimado': False}
+
+
+def principio_ativo(nome):
+    """Nome do princípio ativo sem observações entre parênteses"""
+    return re.sub(r'\s*\(.*?\)', '', nome).strip()
+
+
+class Posologia:
+    def __init__(self, base_conhecimento, apresentacoes_file='apresentacoes_medicamentos.json'):
+        """
+        Interpreta os esquemas de medicamento da base de conhecimento
+
+        Args:
+            base_conhecimento: Base com a seção 'regioes'
+            apresentacoes_file: JSON opcional com apresentações que substituem/estendem APRESENTACOES
+        """
+        self.apresentacoes_file = apresentacoes_file
+        self.apresentacoes = dict(APRESENTACOES)
+        self.apresentacoes.update(self._carregar_personalizadas())
+
+        # Regimes: (nome, dosagem, frequência) -> índice em self.regimes
+        self.regimes = []
+        self._indices = {}
+        self.produtos = []
+        self._indices_produtos = {}
+        esquemas_adultos = {}
+        for dados_regiao in base_conhecimento['regioes'].values():
+            for dados_doenca in dados_regiao['doencas'].values():
+                adulto = dados_doenca['medicamentos']['adulto']
+                esquemas_adultos.setdefault(adulto['nome'], adulto)
+        self._esquemas_adultos = esquemas_adultos
+        for dados_regiao in base_conhecimento['regioes'].values():
+            for dados_doenca in dados_regiao['doencas'].values():
+                for faixa, esquema in dados_doenca['medicamentos'].items():
+                    self.indice_regime(esquema['nome'], esquema['dosagem'], esquema['frequencia'], faixa)
+
+    def _carregar_personalizadas(self):
+        """Carrega apresentações cadastradas em disco (se existirem)"""
+        if self.apresentacoes_file and os.path.exists(self.apresentacoes_file):
+            try:
+                with open(self.apresentacoes_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Apresentações personalizadas ignoradas: {str(e)}")
+        return {}
+
+    def _indice_produto(self, apresentacao):
+        descricao = apresentacao['descricao']
+        if descricao not in self._indices_produtos:
+            self._indices_produtos[descricao] = len(self.produtos)
+            self.produtos.append(apresentacao)
+        return self._indices_produtos[descricao]
+
+    def _apresentacao(self, principio, faixa):
+        apresentacao = self.apresentacoes.get(principio)
+        if apresentacao is None:
+            return None
+        if faixa == 'crianca' and 'crianca' in apresentacao:
+            return apresentacao['crianca']
+        return apresentacao
+
+    def indice_regime(self, nome, dosagem, frequencia, faixa='adulto'):
+        """Índice do regime de um esquema (interpretado na primeira vez que aparece)"""
+        chave = (nome, dosagem, frequencia)
+        indice = self._indices.get(chave)
+        if indice is None:
+            indice = len(self.regimes)
+            self.regimes.append(self.interpretar(nome, dosagem, frequencia, faixa))
+            self._indices[chave] = indice
+        return indice
+
+    def interpretar(self, nome, dosagem, frequencia, faixa='adulto'):
+        """
+        Converte um esquema textual em regime estruturado
+
+        Returns:
+            dict: {'nome', 'doses_dia', 'dias', 'estimado', 'componentes': [{'produto',
+                  'quantidade', 'medida', 'por_kg', 'por_dia', 'fracionamento', 'conteudo', 'dose_maxima'}]}
+        """
+        nome = nome or ''
+        dosagem = dosagem or ''
+        regime = interpretar_frequencia(frequencia or '')
+
+        # Associação em dose fixa: um único produto, dose do primeiro componente
+        if nome in self.apresentacoes and self.apresentacoes[nome].get('combinado'):
+            pares = [(nome, dosagem.split('+')[0])]
+        else:
+            pares = list(zip(nome.split(' + '), dosagem.split(' + ')))
+
+        componentes = []
+        for principio, texto_dose in pares:
+            principio = principio_ativo(principio)
+            dose = interpretar_dose(texto_dose)
+            apresentacao = self._apresentacao(principio, faixa)
+            if dose is None or apresentacao is None:
+                continue
+            if dose['quantidade'] is None:
+                # "Conforme peso": proporcional ao esquema adulto do mesmo medicamento
+                dose = self._dose_por_peso(nome, principio)
+                if dose is None:
+                    continue
+            if dose['medida'] not in apresentacao['conteudo']:
+                continue
+            componentes.append(dict(
+                dose,
+                produto=self._indice_produto(apresentacao),
+                fracionamento=apresentacao.get('fracionamento', 'dose'),
+                conteudo=apresentacao['conteudo'][dose['medida']],
+                dose_maxima=apresentacao.get('dose_maxima', {}).get(dose['medida'])
+            ))
+
+        if componentes and regime['doses_dia'] is None and all(c['por_dia'] for c in componentes):
+            # Dose diária sem "x/dia" (ex.: '20mg/kg/dia', 'Por 20 dias'): uma administração por dia
+            regime['doses_dia'] = 1
+        if componentes and (regime['doses_dia'] is None or regime['dias'] is None):
+            # Texto sem frequência ou duração (ex.: 'Conforme perda', '2x/dia EV'): valores assumidos
+            if regime['doses_dia'] is None:
+                regime['doses_dia'] = 1
+            if regime['dias'] is None:
+                regime['dias'] = DURACAO_PADRAO_DIAS
+            regime['estimado'] = True
+
+        regime['nome'] = nome
+        regime['componentes'] = componentes
+        return regime
+
+    def _dose_por_peso(self, nome, principio):
+        """Dose em mg/kg derivada do esquema adulto (peso de referência de 70 kg)"""
+        adulto = self._esquemas_adultos.get(nome)
+        if adulto is None:
+            return None
+        primeira = adulto['dosagem'].split('+')[0] if self.apresentacoes.get(nome, {}).get('combinado') else None
+        if primeira is None:
+            for parte_nome, parte_dose in zip(nome.split(' + '), adulto['dosagem'].split(' + ')):
+                if principio_ativo(parte_nome) == principio:
+                    primeira = parte_dose
+        dose = interpretar_dose(primeira) if primeira else None
+        if dose is None or dose['quantidade'] is None or dose['por_kg']:
+            return None
+        return dict(dose, quantidade=dose['quantidade'] / PESO_REFERENCIA_ADULTO, por_kg=True)
+
+    def calcular(self, regimes, pesos):
+        """
+        Unidades de compra consumidas por atendimento (vetorizado por regime)
+
+        Args:
+            regimes: np.ndarray de índices de regime (-1 = sem medicamento)
+            pesos: np.ndarray de pesos em kg
+
+        Returns:
+            tuple: (linhas, produtos, unidades) — uma entrada por componente consumido
+        """
+        regimes = np.asarray(regimes)
+        pesos = np.asarray(pesos, dtype=float)
+        linhas, produtos, unidades = [], [], []
+        for indice in np.unique(regimes[regimes >= 0]):
+            regime = self.regimes[indice]
+            if not regime['componentes']:
+                continue
+            posicoes = np.flatnonzero(regimes == indice)
+            peso = pesos[posicoes]
+            doses_total = regime['doses_dia'] * regime['dias']
+            for componente in regime['componentes']:
+                dose = np.full(len(posicoes), componente['quantidade'])
+                if componente['por_kg']:
+                    dose = dose * peso
+                if componente['por_dia']:
+                    dose = dose / regime['doses_dia']
+                if componente['dose_maxima'] is not None:
+                    dose = np.minimum(dose, componente['dose_maxima'])
+                por_dose = dose / componente['conteudo']
+                if componente['fracionamento'] == 'tratamento':
+                    total = np.ceil(por_dose * doses_total - 1e-9)
+                elif componente['fracionamento'] == 'meia':
+                    total = np.ceil(por_dose * 2 - 1e-9) / 2 * doses_total
+                else:
+                    total = np.ceil(por_dose - 1e-9) * doses_total
+                linhas.append(posicoes)
+                produtos.append(np.full(len(posicoes), componente['produto']))
+                unidades.append(total)
+        if not linhas:
+            vazio = np.zeros(0, dtype=int)
+            return vazio, vazio, np.zeros(0)
+        return np.concatenate(linhas), np.concatenate(produtos), np.concatenate(unidades)
+
+    @staticmethod
+    def estimar_peso(pesos, idades):
+        """Completa pesos ausentes pela idade (crianças: 2 × idade + 8; adultos: 70 kg)"""
+        pesos = np.asarray(pesos, dtype=float)
+        idades = np.asarray(idades, dtype=float)
+        estimado = np.where(idades < 12, idades * 2 + 8, PESO_REFERENCIA_ADULTO)
+        return np.where(np.isnan(pesos) | (pesos <= 0), estimado, pesos)
+
+    def _vetores(self, atendimentos, agrupar_por=None):
+        """Índices de regime, pesos, idades e chaves de grupo de uma sequência de atendimentos (uma passada)"""
+        regimes, pesos, idades, chaves = [], [], [], []
+        for atendimento in atendimentos:
+            if agrupar_por is not None:
+                chaves.append(agrupar_por(atendimento))
+            resultado = atendimento['resultado']
+            dados = atendimento['dados_paciente']
+            idade = dados.get('idade', 30)
+            nome = resultado.get('medicamentos')
+            if nome is None:
+                regimes.append(-1)
+            else:
+                regimes.append(self.indice_regime(
+                    nome, resultado.get('dosagem'), resultado.get('frequencia'),
+                    'crianca' if idade < 12 else 'adulto'
+                ))
+            peso = dados.get('peso')
+            pesos.append(np.nan if peso is None else float(peso))
+            idades.append(idade)
+        return np.array(regimes, dtype=int), self.estimar_peso(pesos, idades), idades, chaves
+
+    def consumo(self, atendimentos, agrupar_por=None):
+        """
+        Consumo em unidades de compra de uma sequência de atendimentos
+
+        Args:
+            atendimentos: Iterável de atendimentos (dados_paciente + resultado), lido
+                          uma única vez sem ser guardado em memória
+            agrupar_por: Função atendimento -> chave (ex.: dia); None agrega tudo
+
+        Returns:
+            dict: 'por_produto' {descrição: unidades}, 'por_medicamento'
+                  {medicamento prescrito: {descrição: unidades}}, 'por_grupo'
+                  {chave: {descrição: unidades}} (se agrupar_por), 'prescricoes',
+                  'sem_posologia' {medicamento: prescrições de produtos dispensáveis não convertidas}
+        """
+        regimes, pesos, _, chaves_grupo = self._vetores(atendimentos, agrupar_por)
+        linhas, produtos, unidades = self.calcular(regimes, pesos)
+
+        # Agregação vetorizada por produto e por regime × produto
+        por_produto = np.bincount(produtos, weights=unidades, minlength=len(self.produtos))
+        chave_regime = regimes[linhas] * len(self.produtos) + produtos
+        por_regime = np.bincount(chave_regime, weights=unidades, minlength=len(self.regimes) * len(self.produtos))
+
+        por_medicamento = {}
+        for chave in np.flatnonzero(por_regime):
+            regime, produto = divmod(int(chave), len(self.produtos))
+            itens = por_medicamento.setdefault(self.regimes[regime]['nome'], {})
+            descricao = self.produtos[produto]['descricao']
+            itens[descricao] = itens.get(descricao, 0.0) + float(por_regime[chave])
+
+        sem_posologia = {}
+        for regime in regimes[regimes >= 0]:
+            nome = self.regimes[regime]['nome']
+            if not self.regimes[regime]['componentes'] and self.dispensavel(nome):
+                sem_posologia[nome] = sem_posologia.get(nome, 0) + 1
+
+        relatorio = {
+            'por_produto': {
+                self.produtos[i]['descricao']: float(por_produto[i]) for i in np.flatnonzero(por_produto)
+            },
+            'por_medicamento': por_medicamento,
+            'prescricoes': int((regimes >= 0).sum()),
+            'sem_posologia': sem_posologia
+        }
+
+        if agrupar_por is not None:
+            grupos = {chave: i for i, chave in enumerate(dict.fromkeys(chaves_grupo))}
+            grupo_linha = np.array([grupos[chave] for chave in chaves_grupo], dtype=int)
+            chave_grupo = grupo_linha[linhas] * len(self.produtos) + produtos if len(linhas) else linhas
+            por_grupo = np.bincount(chave_grupo, weights=unidades, minlength=len(grupos) * len(self.produtos))
+            relatorio['por_grupo'] = {
+                chave: {
+                    self.produtos[p]['descricao']: float(por_grupo[g * len(self.produtos) + p])
+                    for p in range(len(self.produtos)) if por_grupo[g * len(self.produtos) + p]
+                }
+                for chave, g in grupos.items()
+            }
+        return relatorio
+
+    def dispensavel(self, nome):
+        """Se o esquema prescreve algum produto com apresentação de compra (condutas como 'Suporte clínico' não)"""
+        nome = nome or ''
+        return nome in self.apresentacoes or any(
+            principio_ativo(parte) in self.apresentacoes for parte in nome.split(' + ')
+        )
+
+    def unidades(self, dados_paciente, resultado):
+        """Unidades de compra dispensadas num atendimento ({apresentação: unidades})"""
+        return self.consumo([{'dados_paciente': dados_paciente, 'resultado': resultado}])['por_produto']
@@ -0,0 +1,242 @@
+"""
+Prevalência Regional Dinâmica
+=============================
+
+Estimativas bayesianas da prevalência relativa de cada doença por região.
+O rótulo estático da base de conhecimento ('baixa' ... 'muito_alta') vira
+uma priori de Dirichlet; diagnósticos confirmados somam pseudo-contagens
+com esquecimento exponencial. Diagnósticos da triagem não entram por padrão
+(peso_triagem=0): a predição elevaria a própria priori. Cada atualização
+custa O(1) no volume de atendimentos e recalcula o vetor de modificadores
+lido pelo score de gravidade.
+
+As observações são anexadas a um log JSON Lines; o estado completo só é
+regravado a cada `intervalo_snapshot` observações (e o log, zerado).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from ..utils.tempo import agora_ms, MS_POR_DIA, MS_POR_HORA
+
+
+# Modificadores estáticos usados antes da prevalência dinâmica
+MODIFICADOR_ROTULO = {
+    'baixa': 0.5,
+    'media': 0.7,
+    'alta': 0.9,
+    'muito_alta': 1.2
+}
+
+
+class PrevalenciaRegional:
+    # Expoente máximo dos pesos antes de renormalizar as contagens
+    EXPOENTE_MAXIMO = 500
+
+    def __init__(self, base_conhecimento, prevalencia_file='prevalencia_regional.json',
+                 meia_vida_dias=21, forca_priori=50.0, peso_triagem=0.0, limites=(0.4, 1.5),
+                 intervalo_snapshot=200):
+        """
+        Inicializa as estimativas a partir dos rótulos estáticos e do estado salvo
+
+        Args:
+            meia_vida_dias: Meia-vida do esquecimento exponencial das observações
+            forca_priori: Pseudo-contagens totais da priori (quanto maior, mais lenta a adaptação)
+            peso_triagem: Peso de um diagnóstico de triagem não confirmado (confirmado = 1; 0 ignora)
+            limites: Faixa permitida para o modificador de prevalência
+            intervalo_snapshot: Observações no log antes de regravar o estado completo
+        """
+        self.prevalencia_file = prevalencia_file
+        self.log_file = os.path.splitext(prevalencia_file)[0] + '.jsonl'
+        self.intervalo_snapshot = intervalo_snapshot
+        self.sequencia = 0
+        self._no_log = 0
+        self.meia_vida_ms = meia_vida_dias * MS_POR_DIA
+        self.forca_priori = forca_priori
+        self.peso_triagem = peso_triagem
+        self.limites = limites
+        self.regioes = {}
+        self.referencia_ms = None
+
+        # Rótulos da regra de gravidade quando a base as declara
+        rotulos = base_conhecimento.get('regras', {}).get('gravidade', {}).get('prevalencia', MODIFICADOR_ROTULO)
+        for regiao, dados_regiao in base_conhecimento['regioes'].items():
+            doencas = list(dados_regiao['doencas'])
+            estaticos = np.array([
+                rotulos.get(d['prevalencia_regional'], 0.7) for d in dados_regiao['doencas'].values()
+            ])
+            self.regioes[regiao] = {
+                'doencas': doencas,
+                'posicao': {nome: i for i, nome in enumerate(doencas)},
+                'estaticos': estaticos,
+                'priori': forca_priori * estaticos / estaticos.sum(),
+                'contagens': np.zeros(len(doencas)),
+                'total': 0.0,
+                'modificadores': estaticos.copy(),
+                'recalculado_em': 0
+            }
+
+        self._carregar()
+        for regiao in self.regioes:
+            self._recalcular(regiao)
+
+    def _carregar(self):
+        """Carrega o último estado salvo e reaplica as observações do log (doenças novas começam zeradas)"""
+        if os.path.exists(self.prevalencia_file):
+            try:
+                with open(self.prevalencia_file, 'r', encoding='utf-8') as f:
+                    estado = json.load(f)
+            except Exception:
+                estado = {}
+            self.referencia_ms = estado.get('referencia_ms')
+            self.sequencia = estado.get('sequencia', 0)
+            for regiao, salvo in estado.get('regioes', {}).items():
+                dados = self.regioes.get(regiao)
+                if dados is None:
+                    continue
+                for nome, contagem in salvo['contagens'].items():
+                    if nome in dados['posicao']:
+                        dados['contagens'][dados['posicao'][nome]] = contagem
+                dados['total'] = float(dados['contagens'].sum())
+
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    observacao = json.loads(linha)
+                except ValueError:
+                    continue
+                self._no_log += 1
+                # Observações já incluídas no estado (falha entre gravar o estado e zerar o log)
+                if observacao['seq'] <= self.sequencia:
+                    continue
+                self.sequencia = observacao['seq']
+                self._aplicar(observacao['regiao'], observacao['doenca'], observacao['peso'], observacao['timestamp'])
+
+    def _salvar(self):
+        """Grava o estado completo e zera o log de observações"""
+        estado = {
+            'referencia_ms': self.referencia_ms,
+            'sequencia': self.sequencia,
+            'regioes': {
+                regiao: {'contagens': dict(zip(dados['doencas'], dados['contagens'].tolist()))}
+                for regiao, dados in self.regioes.items()
+            }
+        }
+        temporario = self.prevalencia_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(temporario, self.prevalencia_file)
+        open(self.log_file, 'w').close()
+        self._no_log = 0
+
+    def _peso(self, timestamp):
+        """Peso crescente 2^(t/meia-vida) da observação; renormaliza quando necessário"""
+        if self.referencia_ms is None:
+            self.referencia_ms = timestamp
+        expoente = (timestamp - self.referencia_ms) / self.meia_vida_ms
+        if expoente > self.EXPOENTE_MAXIMO:
+            fator = 2.0 ** -expoente
+            for dados in self.regioes.values():
+                dados['contagens'] *= fator
+                dados['total'] *= fator
+            self.referencia_ms = timestamp
+            expoente = 0.0
+        return 2.0 ** expoente
+
+    def _fator_leitura(self):
+        if self.referencia_ms is None:
+            return 1.0
+        return 2.0 ** (-(agora_ms() - self.referencia_ms) / self.meia_vida_ms)
+
+    def _recalcular(self, regiao):
+        """Atualiza o vetor de modificadores de uma região (O(doenças da região))"""
+        dados = self.regioes[regiao]
+        contagens = dados['contagens'] * self._fator_leitura()
+        posteriori = (dados['priori'] + contagens) / (self.forca_priori + contagens.sum())
+        razao = posteriori / (dados['priori'] / self.forca_priori)
+        dados['modificadores'] = np.clip(dados['estaticos'] * razao, *self.limites)
+        dados['recalculado_em'] = agora_ms()
+
+    def observar(self, regiao, doenca, confirmado=False, timestamp=None):
+        """
+        Registra um diagnóstico observado
+
+        Args:
+            regiao: Código da região
+            doenca: Chave da doença na base de conhecimento
+            confirmado: Se True, diagnóstico confirmado pelo clínico (peso cheio)
+            timestamp: Instante da observação em epoch ms (padrão: agora)
+        """
+        dados = self.regioes.get(regiao)
+        if dados is None or doenca not in dados['posicao']:
+            return
+        peso = 1.0 if confirmado else self.peso_triagem
+        if peso <= 0:
+            return
+        self._registrar(regiao, doenca, peso, timestamp or agora_ms())
+
+    def retirar(self, regiao, doenca, timestamp):
+        """
+        Desfaz um diagnóstico confirmado que foi corrigido (observação de peso -1)
+
+        Args:
+            timestamp: Instante da observação original, para retirar a mesma pseudo-contagem
+        """
+        dados = self.regioes.get(regiao)
+        if dados is None or doenca not in dados['posicao']:
+            return
+        self._registrar(regiao, doenca, -1.0, timestamp)
+
+    def _registrar(self, regiao, doenca, peso, timestamp):
+        """Aplica a observação, recalcula a região e anexa ao log"""
+        self._aplicar(regiao, doenca, peso, timestamp)
+        self._recalcular(regiao)
+
+        # Anexa ao log (O(1)); o estado completo só a cada intervalo_snapshot observações
+        self.sequencia += 1
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'seq': self.sequencia, 'regiao': regiao, 'doenca': doenca,
+                                'peso': peso, 'timestamp': timestamp}, ensure_ascii=False) + '\n')
+        self._no_log += 1
+        if self._no_log >= self.intervalo_snapshot:
+            self._salvar()
+
+    def _aplicar(self, regiao, doenca, peso, timestamp):
+        """Soma a pseudo-contagem de uma observação (sem recalcular os modificadores)"""
+        dados = self.regioes.get(regiao)
+        if dados is None or doenca not in dados['posicao']:
+            return
+        posicao = dados['posicao'][doenca]
+        anterior = dados['contagens'][posicao]
+        # Retiradas nunca deixam contagem negativa (arredondamento da renormalização)
+        dados['contagens'][posicao] = max(0.0, anterior + peso * self._peso(timestamp))
+        dados['total'] += dados['contagens'][posicao] - anterior
+
+    def vetor(self, regiao):
+        """Vetor de modificadores de prevalência da região, na ordem da base de conhecimento"""
+        dados = self.regioes[regiao]
+        # Sem observações novas o decaimento só é reaplicado de hora em hora
+        if agora_ms() - dados['recalculado_em'] > MS_POR_HORA:
+            self._recalcular(regiao)
+        return dados['modificadores']
+
+    def resumo(self, regiao):
+        """Prevalência relativa a priori e a posteriori de cada doença da região"""
+        dados = self.regioes[regiao]
+        contagens = dados['contagens'] * self._fator_leitura()
+        posteriori = (dados['priori'] + contagens) / (self.forca_priori + contagens.sum())
+        return [
+            {
+                'doenca': nome,
+                'priori': float(dados['priori'][i] / self.forca_priori),
+                'posteriori': float(posteriori[i]),
+                'observacoes_recentes': float(contagens[i]),
+                'modificador_estatico': float(dados['estaticos'][i]),
+                'modificador': float(dados['modificadores'][i])
+            }
+            for i, nome in enumerate(dados['doencas'])
+        ]
@@ -0,0 +1,52 @@
+"""
+Registros de Atendimentos
+=========================
+
+Tipos compactos para os atendimentos mantidos em memória (janela recente do
+histórico). Dados do paciente e resultado viram registros com __slots__;
+sintomas, histórico médico, observações e recomendações viram tuplas de
+strings internadas, compartilhadas entre todos os atendimentos.
+"""
+
+from ..utils.registros import RegistroCompacto
+
+
+class DadosPaciente(RegistroCompacto):
+    CAMPOS = (
+        'idade', 'sexo', 'peso', 'temperatura', 'pressao_sistolica', 'pressao_diastolica',
+        'frequencia_cardiaca', 'sintomas', 'evento_climatico', 'tempo_sintomas',
+        'historico_medico', 'populacao_vulneravel', 'regiao_geografica'
+    )
+    __slots__ = CAMPOS + ('_extras',)
+
+
+class DiagnosticoDiferencial(RegistroCompacto):
+    CAMPOS = ('nome', 'probabilidade')
+    __slots__ = CAMPOS + ('_extras',)
+
+
+class DetalhesScore(RegistroCompacto):
+    CAMPOS = ('sintomas', 'climatico', 'populacao', 'gravidade')
+    __slots__ = CAMPOS + ('_extras',)
+
+
+class ResultadoTriagem(RegistroCompacto):
+    CAMPOS = (
+        'diagnostico_principal', 'probabilidade', 'nivel_urgencia', 'medicamentos', 'dosagem',
+        'frequencia', 'observacoes', 'recomendacoes', 'diagnosticos_diferenciais', 'detalhes_score',
+        'tempo_incubacao', 'gravidade_doenca', 'regiao_diagnostico'
+    )
+    __slots__ = CAMPOS + ('_extras',)
+    ANINHADOS = {
+        'diagnosticos_diferenciais': DiagnosticoDiferencial,
+        'detalhes_score': DetalhesScore
+    }
+
+
+class RegistroAtendimento(RegistroCompacto):
+    CAMPOS = ('timestamp', 'dados_paciente', 'resultado')
+    __slots__ = CAMPOS + ('_extras',)
+    ANINHADOS = {
+        'dados_paciente': DadosPaciente,
+        'resultado': ResultadoTriagem
+    }
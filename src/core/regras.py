@@ -0,0 +1,294 @@
+"""
+Compilador de Regras de Triagem
+===============================
+
+As regras de população de risco, gravidade, urgência e paciente saudável
+ficam declaradas como dados na base de conhecimento (seção 'regras') e são
+compiladas uma única vez, na carga, em closures de predicado (versão escalar)
+e em máscaras NumPy (versão vetorizada, usada pela análise de incerteza).
+
+Formato de uma condição:
+    {'campo': 'idade', 'op': '<', 'valor': 12}
+    {'todos': [condição, ...]}   {'algum': [condição, ...]}   {'nao': condição}
+
+Operadores: <, <=, >, >=, ==, !=, entre (inclusivo), em, contem,
+contem_algum, verdadeiro.
+"""
+
+import json
+import operator
+import os
+
+import numpy as np
+
+
+COMPARADORES = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+
+def compilar_condicao(condicao, vetorizado=False):
+    """
+    Compila uma condição declarativa em uma função fatos -> bool
+
+    Args:
+        condicao: Condição no formato descrito no módulo
+        vetorizado: Se True, campos podem ser arrays NumPy e o resultado é uma máscara
+
+    Returns:
+        callable: Predicado sobre o dicionário de fatos do paciente
+    """
+    if 'todos' in condicao:
+        partes = [compilar_condicao(c, vetorizado) for c in condicao['todos']]
+        if vetorizado:
+            return lambda fatos: np.logical_and.reduce([p(fatos) for p in partes])
+
+        def todos(fatos):
+            for parte in partes:
+                if not parte(fatos):
+                    return False
+            return True
+        return todos
+    if 'algum' in condicao:
+        partes = [compilar_condicao(c, vetorizado) for c in condicao['algum']]
+        if vetorizado:
+            return lambda fatos: np.logical_or.reduce([p(fatos) for p in partes])
+
+        def algum(fatos):
+            for parte in partes:
+                if parte(fatos):
+                    return True
+            return False
+        return algum
+    if 'nao' in condicao:
+        parte = compilar_condicao(condicao['nao'], vetorizado)
+        if vetorizado:
+            return lambda fatos: np.logical_not(parte(fatos))
+        return lambda fatos: not parte(fatos)
+
+    campo = condicao['campo']
+    op = condicao['op']
+    valor = condicao.get('valor')
+
+    if op in COMPARADORES:
+        comparar = COMPARADORES[op]
+        return lambda fatos: comparar(fatos[campo], valor)
+    if op == 'entre':
+        minimo, maximo = valor
+        if vetorizado:
+            return lambda fatos: (fatos[campo] >= minimo) & (fatos[campo] <= maximo)
+        return lambda fatos: minimo <= fatos[campo] <= maximo
+    if op == 'verdadeiro':
+        if vetorizado:
+            return lambda fatos: np.asarray(fatos[campo], dtype=bool)
+        return lambda fatos: bool(fatos[campo])
+    if op == 'contem':
+        return lambda fatos: valor in fatos[campo]
+    if op == 'contem_algum':
+        conjunto = frozenset(valor)
+        return lambda fatos: not conjunto.isdisjoint(fatos[campo])
+    if op == 'em':
+        conjunto = frozenset(valor)
+        if vetorizado:
+            lista = list(valor)
+            return lambda fatos: np.isin(fatos[campo], lista)
+        return lambda fatos: fatos[campo] in conjunto
+    raise ValueError(f"Operador de regra desconhecido: {op}")
+
+
+def compilar_faixas(faixas, chave, vetorizado=False):
+    """Compila uma lista ordenada de faixas (a primeira condição satisfeita define o valor)"""
+    return [(compilar_condicao(f['condicao'], vetorizado), f[chave]) for f in faixas]
+
+
+class RegrasTriagem:
+    def __init__(self, base_conhecimento, regras_file='regras_triagem.json'):
+        """
+        Compila as regras da base de conhecimento
+
+        Args:
+            base_conhecimento: Base com as seções 'regioes' e 'regras'
+            regras_file: JSON opcional cujas seções substituem as da base (ajuste sem editar código)
+        """
+        self.regras_file = regras_file
+        regras = dict(base_conhecimento['regras'])
+        regras.update(self._carregar_personalizadas())
+        self.definicao = regras
+
+        self.valores_padrao = regras['valores_padrao']
+
+        # População de risco: um predicado por grupo, avaliado uma vez por paciente
+        grupos = regras['grupos_risco']
+        self.grupos = list(grupos)
+        self._posicao_grupo = {nome: i for i, nome in enumerate(self.grupos)}
+        self._predicados_grupos = [compilar_condicao(g['condicao']) for g in grupos.values()]
+        self.pesos_grupos = np.array([g['peso'] for g in grupos.values()])
+
+        # Matriz doenças × grupos por região: score de população = pesos dos grupos satisfeitos
+        gravidade = regras['gravidade']
+        self.matrizes_populacao = {}
+        self.gravidade_base = {}
+        for regiao, dados_regiao in base_conhecimento['regioes'].items():
+            doencas = list(dados_regiao['doencas'].values())
+            matriz = np.zeros((len(doencas), len(self.grupos)))
+            for i, dados_doenca in enumerate(doencas):
+                for grupo in dados_doenca['populacao_risco']:
+                    # Grupos sem regra não pontuam
+                    if grupo in self._posicao_grupo:
+                        matriz[i, self._posicao_grupo[grupo]] += 1
+            self.matrizes_populacao[regiao] = matriz * self.pesos_grupos
+            self.gravidade_base[regiao] = np.array([
+                gravidade['base'].get(d['gravidade'], gravidade['base_padrao']) for d in doencas
+            ])
+
+        # Gravidade: cada grupo de faixas soma o incremento da primeira faixa satisfeita
+        self.base_gravidade = gravidade['base']
+        self.base_gravidade_padrao = gravidade['base_padrao']
+        self.modificadores_prevalencia = gravidade['prevalencia']
+        self.prevalencia_padrao = gravidade['prevalencia_padrao']
+        self._modificadores_clinicos = [compilar_faixas(g, 'incremento') for g in gravidade['modificadores_clinicos']]
+        self._modificadores_clinicos_vetorizados = [
+            compilar_faixas(g, 'incremento', vetorizado=True) for g in gravidade['modificadores_clinicos']
+        ]
+
+        # Urgência por pontos
+        urgencia = regras['urgencia']
+        self._pontos_urgencia = [compilar_faixas(g, 'pontos') for g in urgencia['pontos']]
+        self.niveis_urgencia = [(n['minimo'], n['nivel']) for n in urgencia['niveis']]
+        self.nivel_urgencia_padrao = urgencia['nivel_padrao']
+
+        # Urgência regionalizada (gravidade da doença + sinais vitais)
+        urgencia_regional = regras['urgencia_regional']
+        self._faixas_urgencia_regional = compilar_faixas(urgencia_regional['faixas'], 'nivel')
+        self._faixas_urgencia_regional_vetorizadas = compilar_faixas(urgencia_regional['faixas'], 'nivel', vetorizado=True)
+        self.nivel_urgencia_regional_padrao = urgencia_regional['nivel_padrao']
+
+        # Paciente saudável
+        saudavel = regras['saudavel']
+        self._vitais_normais = compilar_condicao(saudavel['vitais_normais'])
+        self._vitais_normais_vetorizado = compilar_condicao(saudavel['vitais_normais'], vetorizado=True)
+        self.sintomas_significativos = frozenset(saudavel['sintomas_significativos'])
+
+    def _carregar_personalizadas(self):
+        """Carrega seções de regras sobrescritas em disco (se existirem)"""
+        if self.regras_file and os.path.exists(self.regras_file):
+            try:
+                with open(self.regras_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Regras personalizadas ignoradas: {str(e)}")
+        return {}
+
+    def fatos(self, dados_paciente):
+        """Fatos do paciente usados pelas regras (campos ausentes recebem os valores padrão)"""
+        fatos = dict(self.valores_padrao)
+        fatos.update(dados_paciente)
+        return fatos
+
+    def grupos_paciente(self, fatos):
+        """Vetor booleano dos grupos de risco a que o paciente pertence"""
+        return np.array([predicado(fatos) for predicado in self._predicados_grupos], dtype=float)
+
+    def score_populacao(self, regiao, fatos, grupos=None):
+        """Score de população de risco de todas as doenças da região (vetor na ordem da base)"""
+        if grupos is None:
+            grupos = self.grupos_paciente(fatos)
+        return np.minimum(self.matrizes_populacao[regiao] @ grupos, 1.0)
+
+    def score_populacao_grupos(self, populacao_risco, fatos):
+        """Score de população de risco para uma lista avulsa de grupos"""
+        score = 0.0
+        for grupo in populacao_risco:
+            posicao = self._posicao_grupo.get(grupo)
+            if posicao is not None and self._predicados_grupos[posicao](fatos):
+                score += self.pesos_grupos[posicao]
+        return min(score, 1.0)
+
+    @staticmethod
+    def _somar_faixas(grupos_faixas, fatos):
+        total = 0
+        for faixas in grupos_faixas:
+            for predicado, valor in faixas:
+                if predicado(fatos):
+                    total += valor
+                    break
+        return total
+
+    @staticmethod
+    def _somar_faixas_vetorizado(grupos_faixas, fatos, tamanho):
+        total = np.zeros(tamanho)
+        for faixas in grupos_faixas:
+            total += np.select(
+                [np.broadcast_to(predicado(fatos), (tamanho,)) for predicado, _ in faixas],
+                [valor for _, valor in faixas],
+                default=0.0
+            )
+        return total
+
+    def modificador_clinico(self, fatos):
+        """Modificador clínico da gravidade a partir dos sinais vitais"""
+        return 1.0 + self._somar_faixas(self._modificadores_clinicos, fatos)
+
+    def modificador_clinico_vetorizado(self, vitais):
+        """Modificador clínico para arrays de sinais vitais (uma posição por amostra)"""
+        tamanho = len(next(iter(vitais.values())))
+        return 1.0 + self._somar_faixas_vetorizado(self._modificadores_clinicos_vetorizados, vitais, tamanho)
+
+    def score_gravidade(self, regiao, fatos, modificadores_prevalencia):
+        """Score de gravidade de todas as doenças da região (vetor na ordem da base)"""
+        return np.minimum(
+            self.gravidade_base[regiao] * modificadores_prevalencia * self.modificador_clinico(fatos), 1.0
+        )
+
+    def urgencia(self, fatos):
+        """Nível de urgência por pontos (sinais vitais e sintomas graves)"""
+        pontos = self._somar_faixas(self._pontos_urgencia, fatos)
+        for minimo, nivel in self.niveis_urgencia:
+            if pontos >= minimo:
+                return nivel
+        return self.nivel_urgencia_padrao
+
+    def urgencia_regional(self, fatos, gravidade_doenca):
+        """Nível de urgência a partir da gravidade da doença e dos sinais vitais"""
+        # A gravidade da doença entra como mais um fato do paciente
+        fatos['gravidade_doenca'] = gravidade_doenca
+        for predicado, nivel in self._faixas_urgencia_regional:
+            if predicado(fatos):
+                return nivel
+        return self.nivel_urgencia_regional_padrao
+
+    def urgencia_regional_vetorizada(self, vitais, gravidades_doenca, niveis):
+        """
+        Urgência regionalizada para arrays de sinais vitais
+
+        Args:
+            vitais: sinal -> np.ndarray (amostras,)
+            gravidades_doenca: Gravidade da doença de cada amostra (np.ndarray de str)
+            niveis: Lista de níveis; o retorno são índices nessa lista
+
+        Returns:
+            np.ndarray: Índice do nível de urgência de cada amostra
+        """
+        fatos = dict(vitais, gravidade_doenca=gravidades_doenca)
+        tamanho = len(gravidades_doenca)
+        return np.select(
+            [np.broadcast_to(predicado(fatos), (tamanho,)) for predicado, _ in self._faixas_urgencia_regional_vetorizadas],
+            [niveis.index(nivel) for _, nivel in self._faixas_urgencia_regional_vetorizadas],
+            default=niveis.index(self.nivel_urgencia_regional_padrao)
+        )
+
+    def tem_sintomas_significativos(self, sintomas):
+        return not self.sintomas_significativos.isdisjoint(sintomas)
+
+    def paciente_saudavel(self, fatos):
+        """Sinais vitais normais e nenhum sintoma significativo"""
+        return bool(self._vitais_normais(fatos)) and not self.tem_sintomas_significativos(fatos['sintomas'])
+
+    def vitais_normais_vetorizado(self, vitais):
+        """Máscara das amostras com todos os sinais vitais dentro da faixa normal"""
+        return self._vitais_normais_vetorizado(vitais)
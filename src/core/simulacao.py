@@ -0,0 +1,353 @@
+"""
+Simulação de Fluxo da Clínica
+=============================
+
+Simulador de eventos discretos para planejamento de capacidade (ex.: equipe
+para a temporada de enchentes). Gera chegadas de pacientes por um processo
+de Poisson com perfil horário, com surtos ligados a eventos climáticos que
+multiplicam as chegadas e desviam o perfil de casos para as doenças
+associadas ao evento. Os pacientes são triados em lote pelo motor de triagem
+(sem gravar histórico, estoque ou prevalência) e atendidos por ordem de
+nível de urgência, com equipe configurável por hora do dia.
+
+Unidade de tempo: minutos desde o início da simulação.
+"""
+
+import heapq
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from .incerteza import NIVEIS_URGENCIA
+from .lote import TriagemLote
+from ..utils.detection import detectar_febre_automatica
+
+
+# Tempo médio de atendimento (minutos) por nível de urgência
+TEMPOS_ATENDIMENTO_PADRAO = {'CRÍTICA': 45.0, 'ALTA': 25.0, 'MÉDIA': 15.0, 'BAIXA': 8.0}
+
+# Espera máxima recomendada (minutos) por nível de urgência (Protocolo de Manchester)
+METAS_ESPERA = {'CRÍTICA': 0.0, 'ALTA': 10.0, 'MÉDIA': 60.0, 'BAIXA': 120.0}
+
+# Peso relativo das chegadas por hora do dia (0h a 23h)
+PERFIL_HORARIO_PADRAO = (
+    0.3, 0.2, 0.2, 0.2, 0.3, 0.5, 0.9, 1.4, 1.8, 1.9, 1.8, 1.6,
+    1.4, 1.5, 1.6, 1.6, 1.5, 1.4, 1.3, 1.2, 1.0, 0.8, 0.6, 0.4
+)
+
+# Faixas etárias da demanda: (idade mínima, idade máxima, proporção)
+FAIXAS_ETARIAS = ((0, 2, 0.08), (2, 12, 0.20), (12, 65, 0.57), (65, 90, 0.15))
+
+HISTORICO_MEDICO_COMUM = ('hipertensao', 'diabetes', 'gestante', 'hiv', 'cancer')
+
+SINTOMAS_FEBRE = ('febre', 'febre_alta')
+
+# Forma da distribuição gama dos tempos de atendimento (coeficiente de variação ≈ 0,7)
+FORMA_ATENDIMENTO = 2.0
+
+# Ordem dos eventos no mesmo instante: troca de turno, fim de atendimento, chegada
+EVENTO_TURNO, EVENTO_SAIDA, EVENTO_CHEGADA = 0, 1, 2
+
+
+class SimuladorClinica:
+    def __init__(self, triagem, regiao='brasil_norte', chegadas_por_dia=300, equipe=8,
+                 tempos_atendimento=None, perfil_horario=None, surtos=None, evento_base='',
+                 proporcao_saudaveis=0.08, tamanho_lote=2000, semente=None):
+        """
+        Configura a simulação
+
+        Args:
+            triagem: Instância de TriagemMedica (base de conhecimento, regras e pesos)
+            regiao: Região da clínica
+            chegadas_por_dia: Média de chegadas por dia fora de surtos
+            equipe: Profissionais atendendo (int) ou lista com 24 valores, um por hora do dia
+            tempos_atendimento: Tempo médio (min) por nível de urgência (sobrescreve o padrão)
+            perfil_horario: 24 pesos relativos de chegada por hora do dia
+            surtos: Lista de {'evento', 'inicio_dia', 'duracao_dias', 'multiplicador'}
+            evento_base: Evento climático informado fora dos surtos
+            proporcao_saudaveis: Fração de chegadas sem doença (sinais normais, sem sintomas)
+            tamanho_lote: Pacientes por lote de triagem
+            semente: Semente do gerador (reprodutibilidade)
+        """
+        self.triagem = triagem
+        self.lote = TriagemLote(triagem)
+        self.regiao = regiao
+        self.chegadas_por_dia = chegadas_por_dia
+        self.equipe = [equipe] * 24 if isinstance(equipe, int) else list(equipe)
+        if len(self.equipe) != 24:
+            raise ValueError("A equipe deve ser um inteiro ou uma lista com 24 valores (um por hora)")
+        self.tempos_atendimento = dict(TEMPOS_ATENDIMENTO_PADRAO)
+        self.tempos_atendimento.update(tempos_atendimento or {})
+        perfil = np.array(perfil_horario or PERFIL_HORARIO_PADRAO, dtype=float)
+        self.perfil_horario = perfil / perfil.sum()
+        self.surtos = list(surtos or [])
+        self.evento_base = evento_base
+        self.proporcao_saudaveis = proporcao_saudaveis
+        self.tamanho_lote = tamanho_lote
+        self.gerador = np.random.default_rng(semente)
+
+        doencas = triagem.base_conhecimento['regioes'][regiao]['doencas']
+        self.doencas = doencas
+        self.nomes_doencas = list(doencas)
+        # Perfil de casos: prevalência regional a posteriori (dinâmica)
+        self.perfil_casos = np.array([linha['posteriori'] for linha in triagem.prevalencia.resumo(regiao)])
+        self.perfil_casos = self.perfil_casos / self.perfil_casos.sum()
+
+    def _surto_por_hora(self, horas):
+        """Índice do surto ativo em cada hora (-1 fora de surto) e multiplicador de chegadas"""
+        surto = np.full(horas, -1)
+        multiplicador = np.ones(horas)
+        for i, s in enumerate(self.surtos):
+            inicio = int(s['inicio_dia'] * 24)
+            fim = min(int((s['inicio_dia'] + s['duracao_dias']) * 24), horas)
+            surto[inicio:fim] = i
+            multiplicador[inicio:fim] = s.get('multiplicador', 2.0)
+        return surto, multiplicador
+
+    def gerar_chegadas(self, dias):
+        """
+        Instantes de chegada (Poisson não homogêneo, taxa constante dentro de cada hora)
+
+        Returns:
+            tuple: (np.ndarray de minutos ordenados, np.ndarray do surto ativo de cada chegada)
+        """
+        horas = int(dias * 24)
+        surto, multiplicador = self._surto_por_hora(horas)
+        taxas = self.chegadas_por_dia * self.perfil_horario[np.arange(horas) % 24] * multiplicador
+        contagens = self.gerador.poisson(taxas)
+        hora_chegada = np.repeat(np.arange(horas), contagens)
+        minutos = hora_chegada * 60.0 + self.gerador.uniform(0.0, 60.0, len(hora_chegada))
+        ordem = np.argsort(minutos, kind='stable')
+        return minutos[ordem], surto[hora_chegada][ordem]
+
+    def _perfil_surto(self, indice):
+        """Perfil de casos durante um surto: doenças ligadas ao evento ganham o peso do excesso"""
+        if indice < 0:
+            return self.perfil_casos
+        surto = self.surtos[indice]
+        ligadas = np.array([
+            self.triagem.calcular_score_climatico(surto['evento'], d['eventos_climaticos']) for d in self.doencas.values()
+        ])
+        if not ligadas.any():
+            return self.perfil_casos
+        # Chegadas normais mantêm o perfil base; o excesso do surto segue as doenças ligadas ao evento
+        excesso = surto.get('multiplicador', 2.0) - 1.0
+        perfil = self.perfil_casos + max(excesso, 0.0) * ligadas * self.perfil_casos / (ligadas * self.perfil_casos).sum()
+        return perfil / perfil.sum()
+
+    def gerar_pacientes(self, surtos_chegada):
+        """
+        Pacientes sintéticos para as chegadas (doença simulada, sintomas, sinais vitais e perfil)
+
+        Args:
+            surtos_chegada: Surto ativo de cada chegada (-1 fora de surto)
+
+        Returns:
+            tuple: (lista de dados do paciente, np.ndarray da doença simulada — índice ou -1 se saudável)
+        """
+        gerador = self.gerador
+        quantidade = len(surtos_chegada)
+        doenca = np.full(quantidade, -1)
+        for indice in np.unique(surtos_chegada):
+            posicoes = np.flatnonzero(surtos_chegada == indice)
+            doenca[posicoes] = gerador.choice(len(self.nomes_doencas), len(posicoes), p=self._perfil_surto(indice))
+        doenca[gerador.random(quantidade) < self.proporcao_saudaveis] = -1
+
+        faixas = gerador.choice(len(FAIXAS_ETARIAS), quantidade, p=[f[2] for f in FAIXAS_ETARIAS])
+        minimos = np.array([f[0] for f in FAIXAS_ETARIAS])[faixas]
+        maximos = np.array([f[1] for f in FAIXAS_ETARIAS])[faixas]
+        idades = gerador.integers(minimos, maximos)
+        pesos = np.where(idades < 12, idades * 2.5 + 4, 70) + gerador.normal(0, np.where(idades < 12, 2, 12))
+        sexos = gerador.choice(['Masculino', 'Feminino'], quantidade)
+        vulneravel = gerador.random(quantidade) < 0.3
+        tem_historico = gerador.random(quantidade) < 0.15
+        historico = gerador.choice(HISTORICO_MEDICO_COMUM, quantidade)
+
+        pressao_sistolica = gerador.normal(120, 12, quantidade)
+        pressao_diastolica = gerador.normal(78, 7, quantidade)
+        frequencia_cardiaca = gerador.normal(80, 10, quantidade)
+        temperatura_normal = gerador.normal(36.7, 0.3, quantidade)
+        temperatura_febre = gerador.normal(38.6, 0.6, quantidade)
+        quantidade_sintomas = gerador.integers(2, 6, quantidade)
+        especifico = gerador.random(quantidade) < 0.5
+        extra = gerador.random(quantidade) < 0.15
+        vocabulario = sorted({s for d in self.doencas.values() for s in d['sintomas']})
+
+        pacientes = []
+        for p in range(quantidade):
+            if doenca[p] < 0:
+                sintomas = []
+                temperatura = min(temperatura_normal[p], 37.4)
+            else:
+                dados_doenca = self.doencas[self.nomes_doencas[doenca[p]]]
+                lista = dados_doenca['sintomas']
+                sintomas = list(gerador.choice(lista, min(quantidade_sintomas[p], len(lista)), replace=False))
+                especificos = dados_doenca.get('sintomas_especificos', [])
+                if especifico[p] and especificos:
+                    sintomas.append(especificos[gerador.integers(len(especificos))])
+                if extra[p]:
+                    sintomas.append(vocabulario[gerador.integers(len(vocabulario))])
+                febril = any(s in SINTOMAS_FEBRE for s in sintomas)
+                temperatura = temperatura_febre[p] if febril else temperatura_normal[p]
+                # Febre informada pelos sinais vitais, como no formulário de triagem
+                sintomas = [s for s in dict.fromkeys(sintomas) if s not in SINTOMAS_FEBRE]
+                sintomas += detectar_febre_automatica(round(float(temperatura), 1))
+
+            surto = surtos_chegada[p]
+            pacientes.append({
+                'idade': int(idades[p]),
+                'sexo': str(sexos[p]),
+                'peso': round(max(float(pesos[p]), 3.0), 1),
+                'temperatura': round(float(temperatura), 1),
+                'pressao_sistolica': int(pressao_sistolica[p]),
+                'pressao_diastolica': int(pressao_diastolica[p]),
+                'frequencia_cardiaca': int(frequencia_cardiaca[p] + (12 if doenca[p] >= 0 and temperatura >= 37.8 else 0)),
+                'sintomas': [str(s) for s in sintomas],
+                'evento_climatico': self.surtos[surto]['evento'] if surto >= 0 else self.evento_base,
+                'historico_medico': [str(historico[p])] if tem_historico[p] else [],
+                'populacao_vulneravel': bool(vulneravel[p]),
+                'regiao_geografica': self.regiao
+            })
+        return pacientes, doenca
+
+    def triar(self, pacientes):
+        """Triagem em lotes de tamanho_lote (concatena os arrays de resultado)"""
+        partes = [
+            self.lote.processar(pacientes[inicio:inicio + self.tamanho_lote], regiao=self.regiao)
+            for inicio in range(0, len(pacientes), self.tamanho_lote)
+        ]
+        if not partes:
+            return self.lote.processar([], regiao=self.regiao)
+        return {chave: np.concatenate([parte[chave] for parte in partes]) for chave in partes[0]}
+
+    def _simular_filas(self, chegadas, urgencias, servicos, dias):
+        """
+        Filas por nível de urgência com a equipe da hora (sem preempção)
+
+        Returns:
+            tuple: (espera de cada paciente em minutos, fila máxima por nível, minutos de equipe disponíveis no período)
+        """
+        quantidade = len(chegadas)
+        esperas = np.zeros(quantidade)
+        filas = [deque() for _ in NIVEIS_URGENCIA]
+        fila_maxima = [0] * len(NIVEIS_URGENCIA)
+        eventos = [(float(chegadas[p]), EVENTO_CHEGADA, p) for p in range(quantidade)]
+        eventos.append((0.0, EVENTO_TURNO, 0))
+        heapq.heapify(eventos)
+        horizonte = dias * 24 * 60
+        capacidade = 0
+        ocupados = 0
+        aguardando = 0
+        pendentes_chegada = quantidade
+
+        while eventos:
+            agora, tipo, valor = heapq.heappop(eventos)
+            if tipo == EVENTO_TURNO:
+                capacidade = self.equipe[valor % 24]
+                # Próxima troca de turno só é agendada enquanto houver pacientes a atender
+                if pendentes_chegada or aguardando or ocupados:
+                    heapq.heappush(eventos, (agora + 60.0, EVENTO_TURNO, valor + 1))
+            elif tipo == EVENTO_SAIDA:
+                ocupados -= 1
+            else:
+                nivel = urgencias[valor]
+                filas[nivel].append(valor)
+                aguardando += 1
+                pendentes_chegada -= 1
+                if len(filas[nivel]) > fila_maxima[nivel]:
+                    fila_maxima[nivel] = len(filas[nivel])
+
+            # Profissionais livres chamam o próximo da fila mais urgente
+            while ocupados < capacidade and aguardando:
+                for fila in filas:
+                    if fila:
+                        paciente = fila.popleft()
+                        break
+                aguardando -= 1
+                ocupados += 1
+                esperas[paciente] = agora - chegadas[paciente]
+                heapq.heappush(eventos, (agora + servicos[paciente], EVENTO_SAIDA, paciente))
+
+        minutos_equipe = sum(self.equipe[h % 24] for h in range(int(horizonte // 60))) * 60.0
+        return esperas, fila_maxima, minutos_equipe
+
+    def executar(self, dias=30):
+        """
+        Executa a simulação
+
+        Args:
+            dias: Duração do período de chegadas (a fila é esvaziada ao final)
+
+        Returns:
+            dict: Esperas por nível de urgência, utilização da equipe, série diária,
+                  diagnósticos, prescrições e consumo em unidades de compra
+        """
+        inicio = time.perf_counter()
+        chegadas, surtos_chegada = self.gerar_chegadas(dias)
+        pacientes, doenca_simulada = self.gerar_pacientes(surtos_chegada)
+        resultado = self.triar(pacientes)
+        urgencias = resultado['urgencia']
+
+        medias = np.array([self.tempos_atendimento[nivel] for nivel in NIVEIS_URGENCIA])[urgencias]
+        servicos = self.gerador.gamma(FORMA_ATENDIMENTO, medias / FORMA_ATENDIMENTO) if len(chegadas) else np.zeros(0)
+        esperas, fila_maxima, minutos_equipe = self._simular_filas(chegadas, urgencias, servicos, dias)
+
+        por_urgencia = {}
+        for i, nivel in enumerate(NIVEIS_URGENCIA):
+            esperas_nivel = esperas[urgencias == i]
+            if not len(esperas_nivel):
+                por_urgencia[nivel] = {'pacientes': 0, 'fila_maxima': 0}
+                continue
+            p50, p90, p95 = np.percentile(esperas_nivel, [50, 90, 95])
+            por_urgencia[nivel] = {
+                'pacientes': int(len(esperas_nivel)),
+                'espera_media_min': round(float(esperas_nivel.mean()), 1),
+                'espera_p50_min': round(float(p50), 1),
+                'espera_p90_min': round(float(p90), 1),
+                'espera_p95_min': round(float(p95), 1),
+                'espera_maxima_min': round(float(esperas_nivel.max()), 1),
+                'meta_min': METAS_ESPERA[nivel],
+                'dentro_meta': round(float((esperas_nivel <= METAS_ESPERA[nivel]).mean()), 3),
+                'fila_maxima': fila_maxima[i]
+            }
+
+        dia_chegada = (chegadas // (24 * 60)).astype(int)
+        por_dia = []
+        for dia in range(int(np.ceil(dias))):
+            mascara = dia_chegada == dia
+            por_dia.append({
+                'dia': dia,
+                'chegadas': int(mascara.sum()),
+                'espera_media_min': round(float(esperas[mascara].mean()), 1) if mascara.any() else 0.0,
+                'criticos': int((urgencias[mascara] == NIVEIS_URGENCIA.index('CRÍTICA')).sum())
+            })
+
+        doentes = doenca_simulada >= 0
+        diagnosticos = Counter(d for d in resultado['diagnostico'] if d is not None)
+        medicamentos = Counter(m for m in resultado['medicamento'] if m is not None)
+        posologia = self.triagem.posologia
+        pesos = np.array([paciente['peso'] for paciente in pacientes], dtype=float)
+        _, produtos, unidades = posologia.calcular(resultado['regime'], pesos)
+        unidades_produto = np.bincount(produtos, weights=unidades, minlength=len(posologia.produtos))
+        concordancia = np.array(self.nomes_doencas, dtype=object)[doenca_simulada[doentes]] == resultado['diagnostico'][doentes]
+
+        return {
+            'regiao': self.regiao,
+            'dias': dias,
+            'pacientes': int(len(chegadas)),
+            'saudaveis': int(resultado['saudavel'].sum()),
+            'urgencias': por_urgencia,
+            'utilizacao_equipe': round(float(servicos.sum() / minutos_equipe), 3) if minutos_equipe else None,
+            'por_dia': por_dia,
+            'diagnosticos': {
+                self.triagem._formatar_nome_doenca(nome): contagem for nome, contagem in diagnosticos.most_common()
+            },
+            'medicamentos': dict(medicamentos.most_common()),
+            'unidades': {
+                posologia.produtos[i]['descricao']: float(unidades_produto[i])
+                for i in np.argsort(-unidades_produto) if unidades_produto[i]
+            },
+            'concordancia_diagnostico': round(float(concordancia.mean()), 3) if doentes.any() else None,
+            'tempo_execucao_s': round(time.perf_counter() - inicio, 2)
+        }
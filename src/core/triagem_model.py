@@ -1,15 +1,63 @@
-import pandas as pd
 import numpy as np
-from datetime import datetime
+from collections import Counter
 import json
 import os
+from .estoque import EstoqueMedicamentos
+from .historico import HistoricoAtendimentos
+from .indice import IndiceAtendimentos
+from .cubo import CuboAtendimentos
+from .coocorrencia import CoocorrenciaSintomas
+from .incerteza import AnaliseIncerteza
+from .lote import TriagemLote
+from .posologia import Posologia
+from .prevalencia import PrevalenciaRegional
+from .regras import RegrasTriagem
+from .codificacao import CodificadorResultados
+from ..utils.tempo import agora_ms, para_epoch_ms, formatar_ms, MS_POR_DIA
+
+# Fatores do score final e pesos padrão (sobrescritos por perfis calibrados por região)
+FATORES_SCORE = ('sintomas', 'climatico', 'populacao', 'gravidade')
+PESOS_PADRAO = {'sintomas': 0.45, 'climatico': 0.25, 'populacao': 0.15, 'gravidade': 0.15}
 
 class TriagemMedica:
-    def __init__(self):
+    def __init__(self, janela_historico=200):
         """Inicializa o modelo de triagem médica"""
         self.base_conhecimento = self._carregar_base_conhecimento()
-        self.historico_file = 'historico_atendimentos.json'
+        self.regras = RegrasTriagem(self.base_conhecimento)
+        self.historico_file = 'historico_atendimentos.jsonl'
+        self.janela_historico = janela_historico
         self.historico = self._carregar_historico()
+        self.pesos_file = 'pesos_regionais.json'
+        self.desfechos_file = 'desfechos_confirmados.jsonl'
+        self.pesos_regionais = self._carregar_pesos_regionais()
+        self.estoque = EstoqueMedicamentos()
+        self.prevalencia = PrevalenciaRegional(self.base_conhecimento)
+        self.posologia = Posologia(self.base_conhecimento)
+        # Estruturas analíticas carregadas sob demanda (runtime de campo não as usa)
+        self._indice = None
+        self._cubo = None
+        self._coocorrencia = None
+    
+    @property
+    def indice(self):
+        """Índice de busca do histórico (carregado no primeiro uso)"""
+        if self._indice is None:
+            self._indice = IndiceAtendimentos(self.historico)
+        return self._indice
+    
+    @property
+    def cubo(self):
+        """Cubo OLAP do histórico (carregado no primeiro uso)"""
+        if self._cubo is None:
+            self._cubo = CuboAtendimentos(self.historico)
+        return self._cubo
+    
+    @property
+    def coocorrencia(self):
+        """Matrizes de coocorrência de sintomas (carregadas no primeiro uso)"""
+        if self._coocorrencia is None:
+            self._coocorrencia = CoocorrenciaSintomas(self.historico, self.base_conhecimento)
+        return self._coocorrencia
     
     def _carregar_base_conhecimento(self):
         """Carrega a base de conhecimento médico regionalizada"""
@@ -509,23 +557,137 @@ class TriagemMedica:
                         }
                     }
                 }
+            },
+            # Regras de pontuação declarativas, compiladas por RegrasTriagem na carga
+            'regras': {
+                'valores_padrao': {
+                    'idade': 0,
+                    'sexo': '',
+                    'historico_medico': [],
+                    'populacao_vulneravel': False,
+                    'sintomas': [],
+                    'temperatura': 36.5,
+                    'pressao_sistolica': 120,
+                    'pressao_diastolica': 80,
+                    'frequencia_cardiaca': 70
+                },
+                'grupos_risco': {
+                    'criancas': {'peso': 0.3, 'condicao': {'campo': 'idade', 'op': '<', 'valor': 12}},
+                    'menores_5_anos': {'peso': 0.4, 'condicao': {'campo': 'idade', 'op': '<', 'valor': 5}},
+                    'idosos': {'peso': 0.3, 'condicao': {'campo': 'idade', 'op': '>', 'valor': 65}},
+                    'gestantes': {'peso': 0.4, 'condicao': {'campo': 'historico_medico', 'op': 'contem', 'valor': 'gestante'}},
+                    'desnutridos': {'peso': 0.3, 'condicao': {'campo': 'historico_medico', 'op': 'contem', 'valor': 'desnutricao'}},
+                    'imunodeprimidos': {'peso': 0.4, 'condicao': {'campo': 'historico_medico', 'op': 'contem_algum', 'valor': ['hiv', 'cancer', 'imunossupressao']}},
+                    'trabalhadores_rurais': {'peso': 0.3, 'condicao': {'campo': 'populacao_vulneravel', 'op': 'verdadeiro'}},
+                    'ribeirinhos': {'peso': 0.3, 'condicao': {'campo': 'populacao_vulneravel', 'op': 'verdadeiro'}},
+                    'nao_vacinados': {'peso': 0.3, 'condicao': {'campo': 'historico_medico', 'op': 'contem', 'valor': 'vacinacao_incompleta'}},
+                    'homens_adultos': {'peso': 0.2, 'condicao': {'todos': [
+                        {'campo': 'sexo', 'op': '==', 'valor': 'Masculino'},
+                        {'campo': 'idade', 'op': 'entre', 'valor': [18, 60]}
+                    ]}},
+                    'mulheres_idade_fertil': {'peso': 0.2, 'condicao': {'todos': [
+                        {'campo': 'sexo', 'op': '==', 'valor': 'Feminino'},
+                        {'campo': 'idade', 'op': 'entre', 'valor': [15, 45]}
+                    ]}}
+                },
+                'gravidade': {
+                    'base': {'baixa': 0.2, 'media': 0.4, 'alta': 0.7, 'critica': 1.0},
+                    'base_padrao': 0.4,
+                    'prevalencia': {'baixa': 0.5, 'media': 0.7, 'alta': 0.9, 'muito_alta': 1.2},
+                    'prevalencia_padrao': 0.7,
+                    # Cada grupo soma o incremento da primeira faixa satisfeita
+                    'modificadores_clinicos': [
+                        [
+                            {'condicao': {'campo': 'temperatura', 'op': '>=', 'valor': 39.0}, 'incremento': 0.3},
+                            {'condicao': {'campo': 'temperatura', 'op': '>=', 'valor': 37.8}, 'incremento': 0.2}
+                        ],
+                        [
+                            {'condicao': {'campo': 'pressao_sistolica', 'op': '<', 'valor': 90}, 'incremento': 0.3},
+                            {'condicao': {'campo': 'pressao_sistolica', 'op': '>', 'valor': 160}, 'incremento': 0.2}
+                        ]
+                    ]
+                },
+                'urgencia': {
+                    'pontos': [
+                        [
+                            {'condicao': {'campo': 'temperatura', 'op': '>=', 'valor': 39.0}, 'pontos': 3},
+                            {'condicao': {'campo': 'temperatura', 'op': '>=', 'valor': 38.0}, 'pontos': 2},
+                            {'condicao': {'campo': 'temperatura', 'op': '<=', 'valor': 35.0}, 'pontos': 2}
+                        ],
+                        [
+                            {'condicao': {'algum': [
+                                {'campo': 'pressao_sistolica', 'op': '>=', 'valor': 180},
+                                {'campo': 'pressao_sistolica', 'op': '<=', 'valor': 90}
+                            ]}, 'pontos': 3},
+                            {'condicao': {'algum': [
+                                {'campo': 'pressao_sistolica', 'op': '>=', 'valor': 160},
+                                {'campo': 'pressao_sistolica', 'op': '<=', 'valor': 100}
+                            ]}, 'pontos': 2}
+                        ],
+                        [
+                            {'condicao': {'algum': [
+                                {'campo': 'frequencia_cardiaca', 'op': '>=', 'valor': 120},
+                                {'campo': 'frequencia_cardiaca', 'op': '<=', 'valor': 50}
+                            ]}, 'pontos': 2},
+                            {'condicao': {'algum': [
+                                {'campo': 'frequencia_cardiaca', 'op': '>=', 'valor': 100},
+                                {'campo': 'frequencia_cardiaca', 'op': '<=', 'valor': 60}
+                            ]}, 'pontos': 1}
+                        ],
+                        [{'condicao': {'campo': 'sintomas', 'op': 'contem', 'valor': 'dificuldade_respirar'}, 'pontos': 2}],
+                        [{'condicao': {'campo': 'sintomas', 'op': 'contem', 'valor': 'dor_peito'}, 'pontos': 2}],
+                        [{'condicao': {'campo': 'sintomas', 'op': 'contem', 'valor': 'desidratacao'}, 'pontos': 2}],
+                        [{'condicao': {'campo': 'sintomas', 'op': 'contem', 'valor': 'convulsoes'}, 'pontos': 2}]
+                    ],
+                    'niveis': [
+                        {'minimo': 7, 'nivel': 'CRÍTICA'},
+                        {'minimo': 4, 'nivel': 'ALTA'},
+                        {'minimo': 2, 'nivel': 'MÉDIA'}
+                    ],
+                    'nivel_padrao': 'BAIXA'
+                },
+                'urgencia_regional': {
+                    'faixas': [
+                        {'condicao': {'campo': 'gravidade_doenca', 'op': '==', 'valor': 'critica'}, 'nivel': 'CRÍTICA'},
+                        {'condicao': {'algum': [
+                            {'campo': 'temperatura', 'op': '>=', 'valor': 40.0},
+                            {'campo': 'pressao_sistolica', 'op': '<', 'valor': 80}
+                        ]}, 'nivel': 'CRÍTICA'},
+                        {'condicao': {'algum': [
+                            {'campo': 'gravidade_doenca', 'op': '==', 'valor': 'alta'},
+                            {'campo': 'temperatura', 'op': '>=', 'valor': 39.0}
+                        ]}, 'nivel': 'ALTA'},
+                        {'condicao': {'algum': [
+                            {'campo': 'gravidade_doenca', 'op': '==', 'valor': 'media'},
+                            {'campo': 'temperatura', 'op': '>=', 'valor': 38.0}
+                        ]}, 'nivel': 'MÉDIA'}
+                    ],
+                    'nivel_padrao': 'BAIXA'
+                },
+                'saudavel': {
+                    'vitais_normais': {'todos': [
+                        {'campo': 'temperatura', 'op': 'entre', 'valor': [36.0, 37.5]},
+                        {'campo': 'pressao_sistolica', 'op': 'entre', 'valor': [90, 140]},
+                        {'campo': 'pressao_diastolica', 'op': 'entre', 'valor': [60, 90]},
+                        {'campo': 'frequencia_cardiaca', 'op': 'entre', 'valor': [60, 100]}
+                    ]},
+                    'sintomas_significativos': [
+                        'febre', 'febre_alta', 'dor_cabeca', 'dor_muscular', 'dor_articular',
+                        'nausea', 'vomito', 'diarreia', 'tosse', 'dificuldade_respirar',
+                        'calafrios', 'manchas_pele', 'conjuntivite', 'dor_abdominal',
+                        'ictericia', 'sangue_fezes', 'rigidez_nuca', 'confusao_mental'
+                    ]
+                }
             }
         }
     
     def _carregar_historico(self):
-        """Carrega histórico de atendimentos"""
-        if os.path.exists(self.historico_file):
-            try:
-                with open(self.historico_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-    
-    def _salvar_historico(self):
-        """Salva histórico de atendimentos"""
-        with open(self.historico_file, 'w', encoding='utf-8') as f:
-            json.dump(self.historico, f, ensure_ascii=False, indent=2)
+        """Abre a camada de acesso ao histórico de atendimentos (paginada em disco)"""
+        return HistoricoAtendimentos(
+            self.historico_file,
+            janela_memoria=self.janela_historico,
+            codificador=CodificadorResultados(self)
+        )
     
     def calcular_score_sintomas(self, sintomas_paciente, sintomas_doenca, sintomas_especificos=None):
         """Calcula score de compatibilidade entre sintomas do paciente e da doença"""
@@ -642,86 +804,83 @@ class TriagemMedica:
         return min(score_gravidade, 1.0)
     
     def calcular_urgencia(self, dados_paciente, diagnostico):
-        """Calcula nível de urgência baseado nos sinais vitais e sintomas"""
-        temperatura = dados_paciente.get('temperatura', 36.5)
-        pressao_sistolica = dados_paciente.get('pressao_sistolica', 120)
-        frequencia_cardiaca = dados_paciente.get('frequencia_cardiaca', 70)
-        sintomas = dados_paciente.get('sintomas', [])
-        
-        score_urgencia = 0
-        
-        # Temperatura
-        if temperatura >= 39.0:
-            score_urgencia += 3
-        elif temperatura >= 38.0:
-            score_urgencia += 2
-        elif temperatura <= 35.0:
-            score_urgencia += 2
-        
-        # Pressão arterial
-        if pressao_sistolica >= 180 or pressao_sistolica <= 90:
-            score_urgencia += 3
-        elif pressao_sistolica >= 160 or pressao_sistolica <= 100:
-            score_urgencia += 2
-        
-        # Frequência cardíaca
-        if frequencia_cardiaca >= 120 or frequencia_cardiaca <= 50:
-            score_urgencia += 2
-        elif frequencia_cardiaca >= 100 or frequencia_cardiaca <= 60:
-            score_urgencia += 1
-        
-        # Sintomas graves
-        sintomas_graves = ['dificuldade_respirar', 'dor_peito', 'desidratacao', 'convulsoes']
-        for sintoma in sintomas_graves:
-            if sintoma in sintomas:
-                score_urgencia += 2
-        
-        # Classificação
-        if score_urgencia >= 7:
-            return "CRÍTICA"
-        elif score_urgencia >= 4:
-            return "ALTA"
-        elif score_urgencia >= 2:
-            return "MÉDIA"
-        else:
-            return "BAIXA"
+        """Calcula nível de urgência baseado nos sinais vitais e sintomas (regras de pontos)"""
+        return self.regras.urgencia(self.regras.fatos(dados_paciente))
     
     def verificar_paciente_saudavel(self, dados_paciente):
         """Verifica se o paciente apresenta sinais de estar saudável"""
-        temperatura = dados_paciente.get('temperatura', 36.5)
-        pressao_sistolica = dados_paciente.get('pressao_sistolica', 120)
-        pressao_diastolica = dados_paciente.get('pressao_diastolica', 80)
-        frequencia_cardiaca = dados_paciente.get('frequencia_cardiaca', 70)
-        sintomas = dados_paciente.get('sintomas', [])
-        
-        # Verifica se sinais vitais estão normais
-        temperatura_normal = 36.0 <= temperatura <= 37.5
-        pressao_normal = 90 <= pressao_sistolica <= 140 and 60 <= pressao_diastolica <= 90
-        frequencia_normal = 60 <= frequencia_cardiaca <= 100
-        
-        # Lista simplificada de sintomas significativos
-        sintomas_significativos = [
-            'febre', 'febre_alta', 'dor_cabeca', 'dor_muscular', 'dor_articular', 
-            'nausea', 'vomito', 'diarreia', 'tosse', 'dificuldade_respirar', 
-            'calafrios', 'manchas_pele', 'conjuntivite', 'dor_abdominal', 
-            'ictericia', 'sangue_fezes', 'rigidez_nuca', 'confusao_mental'
-        ]
+        # Sinais vitais normais E nenhum sintoma significativo (regra 'saudavel')
+        return self.regras.paciente_saudavel(self.regras.fatos(dados_paciente))
+
+    def calcular_fatores(self, dados_paciente, regiao):
+        """
+        Calcula os fatores de score de cada doença da região
         
-        tem_sintomas_significativos = any(sintoma in sintomas_significativos for sintoma in sintomas)
+        Returns:
+            tuple: (nomes das doenças, np.ndarray doenças × 4 na ordem de FATORES_SCORE)
+        """
+        doencas_regiao = self.base_conhecimento['regioes'][regiao]['doencas']
+        fatores = np.empty((len(doencas_regiao), len(FATORES_SCORE)))
+        
+        # Fatos do paciente avaliados uma única vez; população e gravidade saem
+        # vetorizadas para todas as doenças da região
+        fatos = self.regras.fatos(dados_paciente)
+        fatores[:, 2] = self.regras.score_populacao(regiao, fatos)
+        fatores[:, 3] = self.regras.score_gravidade(regiao, fatos, self.prevalencia.vetor(regiao))
+        
+        for i, dados_doenca in enumerate(doencas_regiao.values()):
+            # Score base dos sintomas
+            fatores[i, 0] = self.calcular_score_sintomas(
+                dados_paciente['sintomas'], 
+                dados_doenca['sintomas'],
+                dados_doenca.get('sintomas_especificos', [])
+            )
+            
+            # Score do evento climático
+            fatores[i, 1] = self.calcular_score_climatico(
+                dados_paciente.get('evento_climatico', ''),
+                dados_doenca['eventos_climaticos']
+            )
         
-        # Paciente é considerado saudável se:
-        # - Sinais vitais normais E
-        # - Sem sintomas significativos
-        if (temperatura_normal and pressao_normal and frequencia_normal):
-            # Se não tem sintomas nenhum, é saudável
-            if not sintomas or len(sintomas) == 0:
-                return True
-            # Se não tem sintomas significativos, é saudável
-            if not tem_sintomas_significativos:
-                return True
+        return list(doencas_regiao), fatores
+    
+    def _carregar_pesos_regionais(self):
+        """Carrega perfis de pesos calibrados por região (se existirem)"""
+        if os.path.exists(self.pesos_file):
+            try:
+                with open(self.pesos_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {}
+    
+    def obter_pesos(self, regiao):
+        """Retorna o vetor de pesos dos fatores para a região (padrão: 45/25/15/15)"""
+        perfil = self.pesos_regionais.get(regiao, {}).get('pesos', PESOS_PADRAO)
+        return np.array([perfil[fator] for fator in FATORES_SCORE])
+    
+    @staticmethod
+    def combinar_fatores(fatores, pesos):
+        """
+        Score final: soma ponderada dos fatores (último eixo), da esquerda para a direita
         
-        return False
-
+        Mesma ordem de sintomas*0.45 + climatico*0.25 + populacao*0.15 + gravidade*0.15:
+        o produto matricial soma em outra ordem, e o truncamento de score*100 na
+        probabilidade transforma essa diferença de arredondamento em 1 ponto percentual.
+        """
+        score = fatores[..., 0] * pesos[0]
+        for i in range(1, len(pesos)):
+            score = score + fatores[..., i] * pesos[i]
+        return score
+    
+    def analisar_incerteza(self, dados_paciente, amostras=1000, ruido=None, semente=None):
+        """Probabilidades de diagnóstico e urgência sob ruído de medição dos sinais vitais (Monte Carlo)"""
+        return AnaliseIncerteza(self).analisar(dados_paciente, amostras=amostras, ruido=ruido, semente=semente)
+    
+    def triar_lote(self, pacientes, regiao=None):
+        """Triagem vetorizada de um lote de pacientes, sem gravar histórico, estoque ou prevalência"""
+        return TriagemLote(self).processar(pacientes, regiao=regiao)
+    
     def processar_triagem(self, dados_paciente):
         """Processa triagem médica com sistema regionalizado"""
         try:
@@ -733,51 +892,19 @@ class TriagemMedica:
             regiao = dados_paciente.get('regiao_geografica', 'brasil_norte')
             doencas_regiao = self.base_conhecimento['regioes'][regiao]['doencas']
             
-            scores_doencas = {}
+            # Fatores de cada doença (matriz doenças × 4) ponderados pelo perfil da região
+            nomes_doencas, fatores = self.calcular_fatores(dados_paciente, regiao)
+            scores_finais = self.combinar_fatores(fatores, self.obter_pesos(regiao))
             
-            # Calcular scores para cada doença da região
-            for nome_doenca, dados_doenca in doencas_regiao.items():
-                # Score base dos sintomas (45%)
-                score_sintomas = self.calcular_score_sintomas(
-                    dados_paciente['sintomas'], 
-                    dados_doenca['sintomas'],
-                    dados_doenca.get('sintomas_especificos', [])
-                )
-                
-                # Score do evento climático (25%)
-                score_climatico = self.calcular_score_climatico(
-                    dados_paciente.get('evento_climatico', ''),
-                    dados_doenca['eventos_climaticos']
-                )
-                
-                # Score da população vulnerável (15%)
-                score_populacao = self.calcular_score_populacao_regionalizado(
-                    dados_paciente,
-                    dados_doenca['populacao_risco']
-                )
-                
-                # Score de gravidade e prevalência regional (15%)
-                score_gravidade = self.calcular_score_gravidade_regionalizado(
-                    dados_paciente,
-                    dados_doenca['gravidade'],
-                    dados_doenca['prevalencia_regional']
-                )
-                
-                # Score final ponderado
-                score_final = (
-                    score_sintomas * 0.45 +
-                    score_climatico * 0.25 + 
-                    score_populacao * 0.15 +
-                    score_gravidade * 0.15
-                )
-                
+            scores_doencas = {}
+            for i, nome_doenca in enumerate(nomes_doencas):
                 scores_doencas[nome_doenca] = {
-                    'score_total': score_final,
-                    'score_sintomas': score_sintomas,
-                    'score_climatico': score_climatico,
-                    'score_populacao': score_populacao,
-                    'score_gravidade': score_gravidade,
-                    'dados_doenca': dados_doenca
+                    'score_total': float(scores_finais[i]),
+                    'score_sintomas': float(fatores[i, 0]),
+                    'score_climatico': float(fatores[i, 1]),
+                    'score_populacao': float(fatores[i, 2]),
+                    'score_gravidade': float(fatores[i, 3]),
+                    'dados_doenca': doencas_regiao[nome_doenca]
                 }
             
             # Ordenar por score
@@ -800,11 +927,7 @@ class TriagemMedica:
             urgencia = self.calcular_urgencia_regionalizada(dados_paciente, dados_doenca)
             
             # Selecionar medicamento baseado na idade
-            idade = dados_paciente['idade']
-            if idade < 12:
-                medicamento_info = dados_doenca['medicamentos']['crianca']
-            else:
-                medicamento_info = dados_doenca['medicamentos']['adulto']
+            medicamento_info = self._selecionar_medicamento(dados_paciente, dados_doenca)
             
             # Diagnósticos diferenciais (top 3)
             diagnosticos_diferenciais = []
@@ -842,6 +965,9 @@ class TriagemMedica:
             # Salvar atendimento
             self._salvar_atendimento(dados_paciente, resultado)
             
+            # Baixar do estoque as unidades dispensadas
+            self._baixar_estoque(dados_paciente, resultado)
+            
             return resultado
             
         except Exception as e:
@@ -859,6 +985,12 @@ class TriagemMedica:
                 'detalhes_score': {'sintomas': 0, 'climatico': 0, 'populacao': 0, 'gravidade': 0}
             }
     
+    def _selecionar_medicamento(self, dados_paciente, dados_doenca):
+        """Seleciona o esquema de medicamento (criança ou adulto) pela idade"""
+        if dados_paciente['idade'] < 12:
+            return dados_doenca['medicamentos']['crianca']
+        return dados_doenca['medicamentos']['adulto']
+    
     def _gerar_observacoes_regionalizadas(self, dados_paciente, diagnostico, dados_doenca):
         """Gera observações específicas baseadas no diagnóstico regionalizado"""
         observacoes = []
@@ -878,7 +1010,8 @@ class TriagemMedica:
         sintomas_paciente = dados_paciente.get('sintomas', [])
         sintomas_especificos = dados_doenca.get('sintomas_especificos', [])
         
-        sintomas_graves_presentes = set(sintomas_paciente).intersection(set(sintomas_especificos))
+        # Ordem dos sintomas do paciente: o texto é reconstruído a partir do histórico e precisa ser estável
+        sintomas_graves_presentes = [s for s in dict.fromkeys(sintomas_paciente) if s in sintomas_especificos]
         if sintomas_graves_presentes:
             observacoes.append(f"⚠️ Sintomas específicos presentes: {', '.join(sintomas_graves_presentes)}")
         
@@ -937,7 +1070,16 @@ class TriagemMedica:
     
     def _gerar_resultado_saudavel(self, dados_paciente):
         """Gera resultado para paciente saudável"""
-        resultado = {
+        resultado = self._resultado_saudavel()
+        
+        # Salva no histórico
+        self._salvar_atendimento(dados_paciente, resultado)
+        
+        return resultado
+    
+    def _resultado_saudavel(self):
+        """Resultado padrão de paciente saudável"""
+        return {
             'diagnostico_principal': 'Paciente Saudável',
             'probabilidade': 95.0,
             'medicamentos': 'Não necessário',
@@ -947,137 +1089,122 @@ class TriagemMedica:
             'observacoes': ['Sinais vitais dentro dos parâmetros normais', 'Ausência de sintomas significativos', 'Paciente em bom estado geral'],
             'recomendacoes': ['Manter hábitos saudáveis de vida', 'Hidratação adequada', 'Alimentação balanceada', 'Retornar se desenvolver sintomas']
         }
-        
-        # Salva no histórico
-        self._salvar_atendimento(dados_paciente, resultado)
-        
-        return resultado
     
     def _salvar_atendimento(self, dados_paciente, resultado):
         """Salva atendimento no histórico"""
         atendimento = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': agora_ms(),
             'dados_paciente': dados_paciente,
             'resultado': resultado
         }
         
-        self.historico.append(atendimento)
-        self._salvar_historico()
+        indice = self.historico.adicionar(atendimento)
+        
+        # Estruturas ainda não carregadas alcançam o histórico quando forem abertas
+        for estrutura in (self._indice, self._cubo, self._coocorrencia):
+            if estrutura is not None:
+                estrutura.adicionar(indice, atendimento)
     
-    def obter_historico(self):
-        """Retorna histórico de atendimentos"""
-        return self.historico
+    def obter_historico(self, offset=0, limite=20, cursor=None, filtro=None):
+        """Retorna uma página do histórico, do atendimento mais recente ao mais antigo"""
+        return self.historico.pagina(offset=offset, limite=limite, cursor=cursor, filtro=filtro)
+    
+    def registrar_desfecho(self, indice, diagnostico_confirmado, confirmado_por=None):
+        """
+        Registra o diagnóstico confirmado pelo clínico para um atendimento do histórico
+
+        A prevalência recebe a observação na data do atendimento; uma correção
+        retira a observação do diagnóstico confirmado antes, e uma reconfirmação
+        do mesmo diagnóstico não conta de novo.
+        """
+        anterior = self.obter_desfechos().get(indice)
+        desfecho = {
+            'timestamp': agora_ms(),
+            'indice': indice,
+            'diagnostico': diagnostico_confirmado,
+            'confirmado_por': confirmado_por
+        }
+        with open(self.desfechos_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(desfecho, ensure_ascii=False) + '\n')
+        
+        # Diagnóstico confirmado atualiza a prevalência da região com peso cheio
+        atendimento = self.historico.obter(indice)
+        regiao = atendimento['dados_paciente'].get('regiao_geografica', 'brasil_norte')
+        timestamp = para_epoch_ms(atendimento['timestamp'])
+        chave_anterior = self._chave_doenca(regiao, anterior) if anterior is not None else None
+        chave = self._chave_doenca(regiao, diagnostico_confirmado)
+        if chave != chave_anterior:
+            if chave_anterior is not None:
+                self.prevalencia.retirar(regiao, chave_anterior, timestamp)
+            if chave is not None:
+                self.prevalencia.observar(regiao, chave, confirmado=True, timestamp=timestamp)
+        return desfecho
+
+    def _chave_doenca(self, regiao, diagnostico):
+        """Chave da doença da região pelo nome (chave ou nome formatado); None se não pertencer à região"""
+        for chave in self.base_conhecimento['regioes'].get(regiao, {}).get('doencas', {}):
+            if diagnostico in (chave, self._formatar_nome_doenca(chave)):
+                return chave
+        return None
+
+    def obter_desfechos(self):
+        """Retorna os diagnósticos confirmados por índice de atendimento (o mais recente prevalece)"""
+        desfechos = {}
+        if os.path.exists(self.desfechos_file):
+            with open(self.desfechos_file, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    if linha.strip():
+                        desfecho = json.loads(linha)
+                        desfechos[desfecho['indice']] = desfecho['diagnostico']
+        return desfechos
+
+    def casos_confirmados(self):
+        """Itera pares (dados_paciente, diagnóstico confirmado) dos atendimentos com desfecho"""
+        for indice, diagnostico in sorted(self.obter_desfechos().items()):
+            if 0 <= indice < len(self.historico):
+                yield self.historico.obter(indice)['dados_paciente'], diagnostico
+
+    def buscar_atendimentos(self, offset=0, limite=20, **criterios):
+        """Busca atendimentos pelo índice (sintomas, diagnóstico, urgência, região, faixa etária, texto, período)"""
+        return self.indice.pagina(offset=offset, limite=limite, **criterios)
     
     def obter_estatisticas(self):
         """Calcula estatísticas dos atendimentos"""
         if not self.historico:
             return {}
         
-        df = pd.DataFrame([
-            {
-                'diagnostico': item['resultado']['diagnostico_principal'],
-                'urgencia': item['resultado']['nivel_urgencia'],
-                'idade': item['dados_paciente']['idade'],
-                'evento_climatico': item['dados_paciente'].get('evento_climatico', 'Não informado')
-            }
-            for item in self.historico
-        ])
-        
+        # Roll-ups do cubo pré-agregado (sem varrer o histórico)
+        geral = self.cubo.consultar()[()]
         return {
-            'total_atendimentos': len(self.historico),
-            'diagnosticos_frequentes': df['diagnostico'].value_counts().to_dict(),
-            'urgencia_distribuicao': df['urgencia'].value_counts().to_dict(),
-            'eventos_climaticos': df['evento_climatico'].value_counts().to_dict(),
-            'idade_media': df['idade'].mean()
+            'total_atendimentos': geral['contagem'],
+            'diagnosticos_frequentes': dict(Counter(self.cubo.totais('diagnostico')).most_common()),
+            'urgencia_distribuicao': dict(Counter(self.cubo.totais('urgencia')).most_common()),
+            'eventos_climaticos': dict(Counter(self.cubo.totais('evento')).most_common()),
+            'idade_media': geral['idade_media']
         }
     
     def calcular_score_populacao_regionalizado(self, dados_paciente, populacao_risco):
-        """Calcula score baseado na população de risco regionalizada"""
-        score = 0.0
-        
-        idade = dados_paciente.get('idade', 0)
-        historico = dados_paciente.get('historico_medico', [])
-        sexo = dados_paciente.get('sexo', '')
-        populacao_vulneravel = dados_paciente.get('populacao_vulneravel', False)
-        
-        for grupo_risco in populacao_risco:
-            if grupo_risco == 'criancas' and idade < 12:
-                score += 0.3
-            elif grupo_risco == 'menores_5_anos' and idade < 5:
-                score += 0.4
-            elif grupo_risco == 'idosos' and idade > 65:
-                score += 0.3
-            elif grupo_risco == 'gestantes' and 'gestante' in historico:
-                score += 0.4
-            elif grupo_risco == 'desnutridos' and 'desnutricao' in historico:
-                score += 0.3
-            elif grupo_risco == 'imunodeprimidos' and any(x in historico for x in ['hiv', 'cancer', 'imunossupressao']):
-                score += 0.4
-            elif grupo_risco == 'trabalhadores_rurais' and populacao_vulneravel:
-                score += 0.3
-            elif grupo_risco == 'ribeirinhos' and populacao_vulneravel:
-                score += 0.3
-            elif grupo_risco == 'nao_vacinados' and 'vacinacao_incompleta' in historico:
-                score += 0.3
-            elif grupo_risco == 'homens_adultos' and sexo == 'Masculino' and 18 <= idade <= 60:
-                score += 0.2
-            elif grupo_risco == 'mulheres_idade_fertil' and sexo == 'Feminino' and 15 <= idade <= 45:
-                score += 0.2
-        
-        return min(score, 1.0)
+        """Calcula score baseado na população de risco regionalizada (regras 'grupos_risco')"""
+        return self.regras.score_populacao_grupos(populacao_risco, self.regras.fatos(dados_paciente))
     
-    def calcular_score_gravidade_regionalizado(self, dados_paciente, gravidade, prevalencia_regional):
-        """Calcula score de gravidade considerando prevalência regional"""
-        score_base = {
-            'baixa': 0.2,
-            'media': 0.4,
-            'alta': 0.7,
-            'critica': 1.0
-        }.get(gravidade, 0.4)
+    def calcular_score_gravidade_regionalizado(self, dados_paciente, gravidade, prevalencia_regional,
+                                               modificador_prevalencia=None):
+        """Calcula score de gravidade considerando prevalência regional (estática ou dinâmica)"""
+        regras = self.regras
+        score_base = regras.base_gravidade.get(gravidade, regras.base_gravidade_padrao)
         
-        # Modificador de prevalência regional
-        modificador_prevalencia = {
-            'baixa': 0.5,
-            'media': 0.7,
-            'alta': 0.9,
-            'muito_alta': 1.2
-        }.get(prevalencia_regional, 0.7)
+        # Modificador de prevalência regional (rótulo estático se não houver estimativa dinâmica)
+        if modificador_prevalencia is None:
+            modificador_prevalencia = regras.modificadores_prevalencia.get(prevalencia_regional, regras.prevalencia_padrao)
         
         # Considera sinais vitais alterados
-        temperatura = dados_paciente.get('temperatura', 36.5)
-        pressao_sistolica = dados_paciente.get('pressao_sistolica', 120)
-        
-        modificador_clinico = 1.0
-        if temperatura >= 39.0:
-            modificador_clinico += 0.3
-        elif temperatura >= 37.8:
-            modificador_clinico += 0.2
-        
-        if pressao_sistolica < 90:
-            modificador_clinico += 0.3
-        elif pressao_sistolica > 160:
-            modificador_clinico += 0.2
+        modificador_clinico = regras.modificador_clinico(regras.fatos(dados_paciente))
         
         return min(score_base * modificador_prevalencia * modificador_clinico, 1.0)
     
     def calcular_urgencia_regionalizada(self, dados_paciente, dados_doenca):
         """Calcula urgência baseada em dados regionalizados"""
-        urgencia_base = dados_doenca['gravidade']
-        
-        # Modificadores baseados em sinais vitais
-        temperatura = dados_paciente.get('temperatura', 36.5)
-        pressao_sistolica = dados_paciente.get('pressao_sistolica', 120)
-        
-        if urgencia_base == 'critica':
-            return 'CRÍTICA'
-        elif temperatura >= 40.0 or pressao_sistolica < 80:
-            return 'CRÍTICA'
-        elif urgencia_base == 'alta' or temperatura >= 39.0:
-            return 'ALTA'
-        elif urgencia_base == 'media' or temperatura >= 38.0:
-            return 'MÉDIA'
-        else:
-            return 'BAIXA'
+        return self.regras.urgencia_regional(self.regras.fatos(dados_paciente), dados_doenca['gravidade'])
     
     def _formatar_nome_doenca(self, nome_doenca):
         """Formata nome da doença para exibição"""
@@ -1107,6 +1234,19 @@ class TriagemMedica:
         
         return formatacao.get(nome_doenca, nome_doenca.replace('_', ' ').title())
 
+    def _baixar_estoque(self, dados_paciente, resultado):
+        """
+        Saída das unidades dispensadas por apresentação (posologia pelo peso)
+
+        Produto dispensável sem posologia conhecida sai como uma prescrição;
+        condutas sem produto (suporte clínico, UTI) não movimentam o estoque.
+        """
+        unidades = self.posologia.unidades(dados_paciente, resultado)
+        if not unidades and self.posologia.dispensavel(resultado['medicamentos']):
+            self.estoque.registrar_saida(resultado['medicamentos'])
+        for apresentacao, quantidade in unidades.items():
+            self.estoque.registrar_saida(apresentacao, quantidade)
+    
     def calcular_necessidades_medicamentos(self, periodo_dias=30, projecao_dias=30):
         """
         Calcula necessidades de medicamentos baseado no histórico de triagens
@@ -1119,57 +1259,60 @@ class TriagemMedica:
             dict: Relatório completo de necessidades de medicamentos
         """
         try:
-            historico = self.obter_historico()
-            
-            if not historico:
+            if not self.historico:
                 return {
                     'erro': 'Nenhum histórico de triagens disponível',
                     'medicamentos_necessarios': {},
                     'estatisticas': {}
                 }
             
-            # Filtrar triagens do período especificado
-            from datetime import datetime, timedelta
-            cutoff_date = datetime.now() - timedelta(days=periodo_dias)
+            # Filtrar triagens do período especificado (busca binária nos timestamps)
+            agora = agora_ms()
+            cutoff_ms = agora - periodo_dias * MS_POR_DIA
+            inicio_periodo, fim_periodo = self.historico.intervalo(cutoff_ms)
+            
+            # Contar medicamentos prescritos
+            medicamentos_count = {}
+            diagnosticos_count = {}
+            urgencia_count = {}
+            urgentes_por_medicamento = {}
             
-            triagens_periodo = []
-            for triagem in historico:
-                triagem_date = datetime.fromisoformat(triagem['timestamp'])
-                if triagem_date >= cutoff_date:
-                    triagens_periodo.append(triagem)
+            def contar(atendimentos):
+                """Contagens do período na mesma passada que alimenta o consumo (sem guardar os atendimentos)"""
+                for triagem in atendimentos:
+                    resultado = triagem['resultado']
+                    medicamento = resultado.get('medicamentos', 'Não especificado')
+                    diagnostico = resultado.get('diagnostico_principal', 'Não especificado')
+                    urgencia = resultado.get('nivel_urgencia', 'BAIXA')
+                    
+                    # Contar medicamentos
+                    if medicamento != 'Observação clínica' and medicamento != 'Não especificado':
+                        medicamentos_count[medicamento] = medicamentos_count.get(medicamento, 0) + 1
+                        if urgencia in ['CRÍTICA', 'ALTA']:
+                            urgentes_por_medicamento[medicamento] = urgentes_por_medicamento.get(medicamento, 0) + 1
+                    
+                    # Contar diagnósticos
+                    diagnosticos_count[diagnostico] = diagnosticos_count.get(diagnostico, 0) + 1
+                    
+                    # Contar urgências
+                    urgencia_count[urgencia] = urgencia_count.get(urgencia, 0) + 1
+                    yield triagem
             
-            if not triagens_periodo:
+            # Consumo em unidades de compra (dose × frequência × duração, pelo peso do paciente)
+            consumo = self.posologia.consumo(contar(self.historico.iterar(inicio=inicio_periodo, fim=fim_periodo)))
+            total_triagens = fim_periodo - inicio_periodo
+            
+            if not total_triagens:
                 return {
                     'erro': f'Nenhuma triagem encontrada nos últimos {periodo_dias} dias',
                     'medicamentos_necessarios': {},
                     'estatisticas': {}
                 }
             
-            # Contar medicamentos prescritos
-            medicamentos_count = {}
-            diagnosticos_count = {}
-            urgencia_count = {}
-            
-            for triagem in triagens_periodo:
-                resultado = triagem['resultado']
-                medicamento = resultado.get('medicamentos', 'Não especificado')
-                diagnostico = resultado.get('diagnostico_principal', 'Não especificado')
-                urgencia = resultado.get('nivel_urgencia', 'BAIXA')
-                
-                # Contar medicamentos
-                if medicamento != 'Observação clínica' and medicamento != 'Não especificado':
-                    medicamentos_count[medicamento] = medicamentos_count.get(medicamento, 0) + 1
-                
-                # Contar diagnósticos
-                diagnosticos_count[diagnostico] = diagnosticos_count.get(diagnostico, 0) + 1
-                
-                # Contar urgências
-                urgencia_count[urgencia] = urgencia_count.get(urgencia, 0) + 1
-            
             # Calcular projeção baseada na média diária
-            total_triagens = len(triagens_periodo)
             media_diaria = total_triagens / periodo_dias
             projecao_total = int(media_diaria * projecao_dias)
+            fator_projecao = projecao_dias / periodo_dias
             
             # Calcular necessidades projetadas de medicamentos
             medicamentos_necessarios = {}
@@ -1191,7 +1334,14 @@ class TriagemMedica:
                     'projecao_base': necessidade_projetada,
                     'margem_seguranca': margem_seguranca,
                     'total_necessario': total_necessario,
-                    'prioridade': self._calcular_prioridade_medicamento(medicamento, frequencia, urgencia_count, triagens_periodo)
+                    'unidades_periodo': consumo['por_medicamento'].get(medicamento, {}),
+                    'unidades_necessarias': {
+                        apresentacao: int(np.ceil(unidades * fator_projecao * 1.2))
+                        for apresentacao, unidades in consumo['por_medicamento'].get(medicamento, {}).items()
+                    },
+                    'prioridade': self._calcular_prioridade_medicamento(
+                        medicamento, frequencia, urgencia_count, urgentes_por_medicamento.get(medicamento, 0)
+                    )
                 }
             
             # Estatísticas gerais
@@ -1203,14 +1353,16 @@ class TriagemMedica:
                 'projecao_triagens': projecao_total,
                 'diagnosticos_mais_comuns': dict(sorted(diagnosticos_count.items(), key=lambda x: x[1], reverse=True)[:5]),
                 'distribuicao_urgencia': urgencia_count,
-                'medicamentos_mais_usados': dict(sorted(medicamentos_count.items(), key=lambda x: x[1], reverse=True)[:5])
+                'medicamentos_mais_usados': dict(sorted(medicamentos_count.items(), key=lambda x: x[1], reverse=True)[:5]),
+                'unidades_por_apresentacao': consumo['por_produto'],
+                'prescricoes_sem_posologia': consumo['sem_posologia']
             }
             
             return {
                 'medicamentos_necessarios': medicamentos_necessarios,
                 'estatisticas': estatisticas,
-                'periodo_analise': f"{cutoff_date.strftime('%d/%m/%Y')} a {datetime.now().strftime('%d/%m/%Y')}",
-                'projecao_para': f"{datetime.now().strftime('%d/%m/%Y')} a {(datetime.now() + timedelta(days=projecao_dias)).strftime('%d/%m/%Y')}"
+                'periodo_analise': f"{formatar_ms(cutoff_ms, '%d/%m/%Y')} a {formatar_ms(agora, '%d/%m/%Y')}",
+                'projecao_para': f"{formatar_ms(agora, '%d/%m/%Y')} a {formatar_ms(agora + projecao_dias * MS_POR_DIA, '%d/%m/%Y')}"
             }
             
         except Exception as e:
@@ -1220,7 +1372,7 @@ class TriagemMedica:
                 'estatisticas': {}
             }
     
-    def _calcular_prioridade_medicamento(self, medicamento, frequencia, urgencia_count, triagens_periodo):
+    def _calcular_prioridade_medicamento(self, medicamento, frequencia, urgencia_count, casos_urgentes_medicamento):
         """Calcula prioridade do medicamento baseado em critérios clínicos"""
         
         # Medicamentos críticos (sempre alta prioridade)
@@ -1234,19 +1386,6 @@ class TriagemMedica:
             if critico.lower() in medicamento.lower():
                 return 'CRÍTICA'
         
-        # Calcular prioridade baseada na frequência e urgência
-        urgencia_critica = urgencia_count.get('CRÍTICA', 0)
-        urgencia_alta = urgencia_count.get('ALTA', 0)
-        total_urgente = urgencia_critica + urgencia_alta
-        
-        # Verificar se o medicamento está associado a casos urgentes
-        casos_urgentes_medicamento = 0
-        for triagem in triagens_periodo:
-            resultado = triagem['resultado']
-            if (resultado.get('medicamentos') == medicamento and 
-                resultado.get('nivel_urgencia') in ['CRÍTICA', 'ALTA']):
-                casos_urgentes_medicamento += 1
-        
         # Critérios de prioridade
         if frequencia >= 0.15 or casos_urgentes_medicamento >= 3:  # 15% ou mais, ou 3+ casos urgentes
             return 'ALTA'
@@ -1280,14 +1419,28 @@ class TriagemMedica:
             'BAIXA': []
         }
         
+        # Compra em unidades por apresentação (somando todos os esquemas que a usam)
+        apresentacoes = {}
         for medicamento, dados in necessidades['medicamentos_necessarios'].items():
             prioridade = dados['prioridade']
             medicamentos_por_prioridade[prioridade].append({
                 'medicamento': medicamento,
                 'quantidade': dados['total_necessario'],
                 'frequencia': dados['frequencia_percent'],
-                'usado_periodo': dados['usado_periodo']
+                'usado_periodo': dados['usado_periodo'],
+                'apresentacoes': dados['unidades_necessarias']
             })
+            for apresentacao, unidades in dados['unidades_necessarias'].items():
+                item = apresentacoes.setdefault(apresentacao, {'apresentacao': apresentacao, 'unidades': 0, 'prioridade': prioridade})
+                item['unidades'] += unidades
+                if list(medicamentos_por_prioridade).index(prioridade) < list(medicamentos_por_prioridade).index(item['prioridade']):
+                    item['prioridade'] = prioridade
+        
+        # Saldo do livro-razão (em unidades da apresentação) descontado da compra
+        for apresentacao, item in apresentacoes.items():
+            saldo = self.estoque.obter_saldo(apresentacao)
+            item['saldo_estoque'] = saldo
+            item['comprar'] = max(0, int(np.ceil(item['unidades'] - max(saldo, 0)))) if saldo is not None else item['unidades']
         
         # Ordenar por quantidade dentro de cada prioridade
         for prioridade in medicamentos_por_prioridade:
@@ -1297,12 +1450,16 @@ class TriagemMedica:
         
         lista_compras = {
             'medicamentos_por_prioridade': medicamentos_por_prioridade,
+            'apresentacoes': sorted(apresentacoes.values(), key=lambda x: x['unidades'], reverse=True),
             'resumo': {
                 'total_medicamentos_diferentes': len(necessidades['medicamentos_necessarios']),
-                'total_unidades_estimadas': sum(dados['total_necessario'] for dados in necessidades['medicamentos_necessarios'].values()),
+                'total_prescricoes_estimadas': sum(dados['total_necessario'] for dados in necessidades['medicamentos_necessarios'].values()),
+                'total_unidades_estimadas': sum(item['unidades'] for item in apresentacoes.values()),
+                'total_unidades_comprar': sum(item['comprar'] for item in apresentacoes.values()),
                 'periodo_cobertura': f"{projecao_dias} dias",
                 'baseado_em': f"{necessidades['estatisticas']['total_triagens_periodo']} triagens"
             },
+            'alertas_estoque': self.estoque.obter_alertas(),
             'estatisticas': necessidades['estatisticas'] if incluir_detalhes else None,
             'periodo_analise': necessidades['periodo_analise'],
             'projecao_para': necessidades['projecao_para']
@@ -9,10 +9,28 @@ Classes principais:
 - MQTTManager: Gerenciamento de comunicação MQTT
 - IoTDashboard: Dashboard para visualização de dados IoT
 - IoTManager: Gerenciamento geral de dispositivos IoT
+- LeituraSensor: Registro compacto (__slots__) de leitura de sensor
+- NucleoIngestao: Buffer circular de leituras com persistência em segundo plano
+- SerieTemporal: Histórico de leituras em segmentos diários colunares
+- AgregadosIoT: Rollups por minuto, hora e dia das leituras
+- ServidorIoTAsync: Servidor HTTP asyncio da API IoT
+- FilaIngestao: Fila limitada de leituras com processamento em micro-lotes
+- MotorAlertas: Regras de alerta com estado por dispositivo (histerese, supressão, escalonamento)
+- CentralAlertas: Alertas compartilhados entre sessões, com cursor e reconhecimento
+- MonitorPresenca: Presença online/offline por last-will MQTT e roda de temporização
 """
 
 from .mqtt_manager import MQTTManager
 from .iot_dashboard import IoTDashboard
 from .iot_manager import IoTManager
+from .registros import LeituraSensor
+from .ingestao import NucleoIngestao
+from .serie_temporal import SerieTemporal
+from .agregados import AgregadosIoT
+from .servidor_async import ServidorIoTAsync
+from .fila_ingestao import FilaIngestao
+from .alertas import MotorAlertas
+from .central_alertas import CentralAlertas
+from .presenca import MonitorPresenca
 
-__all__ = ['MQTTManager', 'IoTDashboard', 'IoTManager'] 
\ No newline at end of file
+__all__ = ['MQTTManager', 'IoTDashboard', 'IoTManager', 'LeituraSensor', 'NucleoIngestao', 'SerieTemporal', 'AgregadosIoT', 'ServidorIoTAsync', 'FilaIngestao', 'MotorAlertas', 'CentralAlertas', 'MonitorPresenca'] 
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""
+Agregados de Leituras IoT
+=========================
+
+Rollups por dispositivo e tipo de sensor nas resoluções minuto, hora e dia:
+contagem, mínimo, máximo, soma, soma dos quadrados e contagens de febre e de
+temperatura crítica. Gráficos e estatísticas de períodos longos são montados
+a partir de poucos milhares de linhas agregadas, sem percorrer as leituras.
+
+Os minutos são mantidos continuamente: cada lote gravado na série temporal é
+somado aos baldes abertos em memória, e um balde é anexado ao segmento do seu
+dia (minuto.agg) quando o minuto fecha. Hora e dia de dias fechados são
+materializados a partir dos minutos (hora.agg, dia.agg); o dia corrente é
+reagregado dos seus minutos na consulta. Registros parciais do mesmo balde
+(leitura atrasada, reinício do processo, outro processo gravando) são
+mesclados na leitura.
+"""
+
+import os
+
+import numpy as np
+
+from ..utils.tempo import agora_ms, MS_POR_MINUTO, MS_POR_HORA, MS_POR_DIA
+
+
+RESOLUCOES = {
+    'minuto': MS_POR_MINUTO,
+    'hora': MS_POR_HORA,
+    'dia': MS_POR_DIA,
+}
+
+REGISTRO_AGREGADO = np.dtype([
+    ('inicio', '<i8'),
+    ('device', '<u2'),
+    ('sensor', '<u1'),
+    ('contagem', '<u4'),
+    ('minimo', '<f4'),
+    ('maximo', '<f4'),
+    ('soma', '<f8'),
+    ('soma_quadrados', '<f8'),
+    ('febre', '<u4'),
+    ('critico', '<u4'),
+])
+
+
+def reduzir(registros):
+    """Mescla registros do mesmo (inicio, dispositivo, sensor) num único registro"""
+    if len(registros) < 2:
+        return registros
+    ordem = np.lexsort((registros['sensor'], registros['device'], registros['inicio']))
+    registros = registros[ordem]
+    novo_grupo = np.ones(len(registros), dtype=bool)
+    novo_grupo[1:] = (
+        (registros['inicio'][1:] != registros['inicio'][:-1])
+        | (registros['device'][1:] != registros['device'][:-1])
+        | (registros['sensor'][1:] != registros['sensor'][:-1])
+    )
+    inicios = np.flatnonzero(novo_grupo)
+    if len(inicios) == len(registros):
+        return registros
+    resultado = registros[inicios].copy()
+    for campo in ('contagem', 'soma', 'soma_quadrados', 'febre', 'critico'):
+        resultado[campo] = np.add.reduceat(registros[campo], inicios)
+    resultado['minimo'] = np.minimum.reduceat(registros['minimo'], inicios)
+    resultado['maximo'] = np.maximum.reduceat(registros['maximo'], inicios)
+    return resultado
+
+
+def resolucao_para_periodo(periodo_ms, dispositivos=1, max_baldes=1500):
+    """Resolução mais fina cujo número de baldes no período (somando os dispositivos) cabe em max_baldes"""
+    max_baldes = max_baldes / max(1, dispositivos)
+    for nome, passo in RESOLUCOES.items():
+        if periodo_ms / passo <= max_baldes:
+            return nome
+    return 'dia'
+
+
+class AgregadosIoT:
+    ARQUIVOS = {nome: f'{nome}.agg' for nome in RESOLUCOES}
+
+    def __init__(self, serie, limite_febre=37.8, limite_critico=39.0, tolerancia_ms=5000):
+        """
+        Inicializa os rollups de uma SerieTemporal
+
+        Args:
+            serie: SerieTemporal dona dos segmentos diários e do dicionário
+            limite_febre: Valor a partir do qual a leitura conta como febre (abaixo do crítico)
+            limite_critico: Valor a partir do qual a leitura conta como crítica
+            tolerancia_ms: Espera após o fim do minuto antes de gravá-lo (leituras em trânsito)
+        """
+        self.serie = serie
+        self.limite_febre = limite_febre
+        self.limite_critico = limite_critico
+        self.tolerancia_ms = tolerancia_ms
+        self._abertos = np.empty(0, dtype=REGISTRO_AGREGADO)
+        self._reconstruir_ausentes()
+
+    def _arquivo(self, dia, resolucao):
+        return os.path.join(self.serie._caminho(dia), self.ARQUIVOS[resolucao])
+
+    @staticmethod
+    def _ler(arquivo):
+        try:
+            # Registro incompleto no final (gravação interrompida) é ignorado
+            quantidade = os.path.getsize(arquivo) // REGISTRO_AGREGADO.itemsize
+            return np.fromfile(arquivo, dtype=REGISTRO_AGREGADO, count=quantidade)
+        except OSError:
+            return np.empty(0, dtype=REGISTRO_AGREGADO)
+
+    def registros(self, timestamps, valores, dispositivos, sensores, passo=MS_POR_MINUTO):
+        """Agregados (já reduzidos) de colunas de leituras"""
+        registros = np.empty(len(timestamps), dtype=REGISTRO_AGREGADO)
+        registros['inicio'] = timestamps - timestamps % passo
+        registros['device'] = dispositivos
+        registros['sensor'] = sensores
+        registros['contagem'] = 1
+        registros['minimo'] = valores
+        registros['maximo'] = valores
+        registros['soma'] = valores
+        registros['soma_quadrados'] = valores.astype('<f8') ** 2
+        registros['critico'] = valores >= self.limite_critico
+        registros['febre'] = (valores >= self.limite_febre) & (valores < self.limite_critico)
+        return reduzir(registros)
+
+    def _reconstruir_ausentes(self):
+        """Minutos de dias fechados gravados antes dos rollups (uma vez, na inicialização)"""
+        hoje = self.serie.dia(agora_ms())
+        with self.serie._trava():
+            for dia in self.serie.dias():
+                if dia >= hoje or os.path.exists(self._arquivo(dia, 'minuto')):
+                    continue
+                colunas = self.serie._mapear(dia)
+                if colunas is None:
+                    continue
+                minutos = self.registros(
+                    np.asarray(colunas['timestamp']), np.asarray(colunas['value']),
+                    np.asarray(colunas['device']), np.asarray(colunas['sensor'])
+                )
+                minutos.tofile(self._arquivo(dia, 'minuto'))
+
+    # ------------------------------------------------------------------
+    # Manutenção contínua
+    # ------------------------------------------------------------------
+
+    def acumular(self, timestamps, valores, dispositivos, sensores):
+        """Soma um lote (colunas codificadas da série) aos minutos abertos"""
+        novos = self.registros(timestamps, valores, dispositivos, sensores)
+        self._abertos = reduzir(np.concatenate([self._abertos, novos]))
+
+    def fechar(self, agora=None, todos=False):
+        """
+        Grava os minutos encerrados (ou todos, no encerramento do processo)
+
+        Returns:
+            int: Registros gravados
+        """
+        if not len(self._abertos):
+            return 0
+        agora = agora_ms() if agora is None else agora
+        with self.serie._trava():
+            if todos:
+                fechados = np.ones(len(self._abertos), dtype=bool)
+            else:
+                fechados = self._abertos['inicio'] + MS_POR_MINUTO <= agora - self.tolerancia_ms
+            if not fechados.any():
+                return 0
+            gravar, self._abertos = self._abertos[fechados], self._abertos[~fechados]
+
+            dias = gravar['inicio'] // MS_POR_DIA
+            for dia in np.unique(dias):
+                dia = int(dia)
+                os.makedirs(self.serie._caminho(dia), exist_ok=True)
+                with open(self._arquivo(dia, 'minuto'), 'ab') as f:
+                    # Descarta registro incompleto de uma gravação interrompida
+                    f.truncate(f.tell() - f.tell() % REGISTRO_AGREGADO.itemsize)
+                    f.write(gravar[dias == dia].tobytes())
+                # Minuto atrasado num dia já materializado: hora/dia serão recalculados
+                for resolucao in ('hora', 'dia'):
+                    try:
+                        os.remove(self._arquivo(dia, resolucao))
+                    except FileNotFoundError:
+                        pass
+        return int(fechados.sum())
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _do_dia(self, dia, resolucao, hoje):
+        """Registros de um dia na resolução (hora/dia de dias fechados ficam materializados)"""
+        arquivo = self._arquivo(dia, resolucao)
+        if resolucao != 'minuto' and dia < hoje and os.path.exists(arquivo):
+            return self._ler(arquivo)
+        minutos = reduzir(self._ler(self._arquivo(dia, 'minuto')))
+        if resolucao == 'minuto':
+            return minutos
+        registros = minutos
+        registros['inicio'] -= registros['inicio'] % RESOLUCOES[resolucao]
+        registros = reduzir(registros)
+        if dia < hoje and len(registros):
+            with self.serie._trava():
+                temporario = arquivo + '.tmp'
+                registros.tofile(temporario)
+                os.replace(temporario, arquivo)
+        return registros
+
+    def consultar(self, resolucao, inicio_ms=None, fim_ms=None, device_id=None, sensor_type='temperature'):
+        """
+        Rollups do intervalo na resolução pedida
+
+        Args:
+            resolucao: 'minuto', 'hora' ou 'dia'
+            inicio_ms: Início do intervalo (alinhado ao início do balde)
+            fim_ms: Fim do intervalo (exclusivo)
+            device_id: Apenas este dispositivo (padrão: todos)
+            sensor_type: Apenas este tipo de sensor (None: todos)
+
+        Returns:
+            dict: Arrays alinhados por balde — 'inicio', 'device_id', 'sensor_type',
+                  'contagem', 'minimo', 'maximo', 'soma', 'soma_quadrados', 'febre',
+                  'critico', 'media' e 'desvio' — e os limites com que 'febre' e
+                  'critico' foram contados ('limite_febre', 'limite_critico')
+        """
+        passo = RESOLUCOES[resolucao]
+        hoje = self.serie.dia(agora_ms())
+        inicio_balde = None if inicio_ms is None else inicio_ms - inicio_ms % passo
+
+        with self.serie._lock:
+            self.serie._carregar_dicionario()
+            codigo_dispositivo = self.serie._codigo_dispositivo.get(device_id) if device_id is not None else None
+            codigo_tipo = self.serie._codigo_tipo.get(sensor_type) if sensor_type is not None else None
+            nomes_dispositivos = np.array(self.serie.dispositivos, dtype=object)
+            nomes_tipos = np.array(self.serie.tipos, dtype=object)
+            vazio = (device_id is not None and codigo_dispositivo is None) or \
+                    (sensor_type is not None and codigo_tipo is None)
+
+            partes = []
+            for dia in ([] if vazio else self.serie.dias()):
+                if inicio_balde is not None and (dia + 1) * MS_POR_DIA <= inicio_balde:
+                    continue
+                if fim_ms is not None and dia * MS_POR_DIA >= fim_ms:
+                    continue
+                partes.append(self._do_dia(dia, resolucao, hoje))
+            if not vazio and len(self._abertos):
+                # Minutos ainda abertos neste processo
+                abertos = self._abertos.copy()
+                abertos['inicio'] -= abertos['inicio'] % passo
+                partes.append(abertos)
+
+        registros = reduzir(np.concatenate(partes)) if partes else np.empty(0, dtype=REGISTRO_AGREGADO)
+        mascara = np.ones(len(registros), dtype=bool)
+        if inicio_balde is not None:
+            mascara &= registros['inicio'] >= inicio_balde
+        if fim_ms is not None:
+            mascara &= registros['inicio'] < fim_ms
+        if codigo_dispositivo is not None:
+            mascara &= registros['device'] == codigo_dispositivo
+        if codigo_tipo is not None:
+            mascara &= registros['sensor'] == codigo_tipo
+        registros = registros[mascara]
+
+        contagem = registros['contagem'].astype(float)
+        media = registros['soma'] / np.maximum(contagem, 1)
+        variancia = np.maximum(registros['soma_quadrados'] / np.maximum(contagem, 1) - media ** 2, 0.0)
+        return {
+            'inicio': registros['inicio'],
+            'device_id': nomes_dispositivos[registros['device']] if len(registros) else np.empty(0, dtype=object),
+            'sensor_type': nomes_tipos[registros['sensor']] if len(registros) else np.empty(0, dtype=object),
+            'contagem': registros['contagem'],
+            'minimo': registros['minimo'],
+            'maximo': registros['maximo'],
+            'soma': registros['soma'],
+            'soma_quadrados': registros['soma_quadrados'],
+            'febre': registros['febre'],
+            'critico': registros['critico'],
+            'media': media,
+            'desvio': np.sqrt(variancia),
+            'limite_febre': self.limite_febre,
+            'limite_critico': self.limite_critico,
+        }
+
+    @staticmethod
+    def totais(agregados):
+        """Estatísticas do período somando os baldes (contagem, mínimo, máximo, média, febre, crítico e limites)"""
+        contagem = int(agregados['contagem'].sum())
+        limites = {'limite_febre': agregados['limite_febre'], 'limite_critico': agregados['limite_critico']}
+        if not contagem:
+            return {'contagem': 0, 'minimo': None, 'maximo': None, 'media': None, 'febre': 0, 'critico': 0, **limites}
+        return {
+            **limites,
+            'contagem': contagem,
+            'minimo': float(agregados['minimo'].min()),
+            'maximo': float(agregados['maximo'].max()),
+            'media': float(agregados['soma'].sum() / contagem),
+            'febre': int(agregados['febre'].sum()),
+            'critico': int(agregados['critico'].sum()),
+        }
@@ -0,0 +1,382 @@
+"""
+Motor de Alertas IoT
+====================
+
+Avaliação incremental das leituras de temperatura com estado por
+dispositivo, em O(1) por leitura: um alerta é um episódio (entra, persiste,
+normaliza), não uma mensagem por leitura acima do limite.
+
+Cada regra tem:
+- febre / critico / baixa: limites de entrada (°C)
+- histerese: faixa (°C) que a temperatura precisa recuar além do limite
+  para o episódio terminar, evitando oscilação em torno do limite
+- duracao_minima_s: tempo que a condição precisa se manter antes de alertar
+- supressao_s: intervalo mínimo entre lembretes do mesmo episódio (0 = sem lembretes)
+- escalonamento_s: episódio ativo por mais tempo que isto é escalonado uma vez
+- limite_por_hora: notificações por dispositivo por hora (agravamentos passam sempre)
+
+A regra padrão vem de Config.TEMPERATURE_THRESHOLDS e pode ser sobrescrita,
+por local e por dispositivo (nessa ordem de precedência), no arquivo de
+regras JSON editado pelo painel:
+
+    {"padrao": {...}, "locais": {"UTI": {...}}, "dispositivos": {"ESP32_X": {...}}}
+
+Além disso, um dispositivo pode ser silenciado até um instante (ex.:
+limpeza do sensor): o estado continua sendo acompanhado, só as notificações
+são suprimidas.
+"""
+
+import json
+import os
+import threading
+import time
+
+from ..config.config import Config
+from ..utils.tempo import MS_POR_SEGUNDO, MS_POR_MINUTO, MS_POR_HORA
+
+
+# Gravidade dos níveis (maior = mais grave)
+GRAVIDADE = {None: 0, 'LOW': 1, 'HIGH': 2, 'CRITICAL': 3}
+
+MENSAGENS = {
+    'CRITICAL': "🚨 Temperatura crítica detectada: {valor}°C no dispositivo {device_id}",
+    'HIGH': "⚠️ Febre detectada: {valor}°C no dispositivo {device_id}",
+    'LOW': "🔵 Temperatura baixa detectada: {valor}°C no dispositivo {device_id}",
+}
+
+CAMPOS_REGRA = ('febre', 'critico', 'baixa', 'histerese', 'duracao_minima_s',
+                'supressao_s', 'escalonamento_s', 'limite_por_hora')
+
+
+def regra_padrao():
+    """Regra global a partir de Config.TEMPERATURE_THRESHOLDS"""
+    limites = Config.TEMPERATURE_THRESHOLDS
+    return {
+        'febre': limites['FEVER_MIN'],
+        'critico': limites['CRITICAL_MIN'],
+        # NORMAL_MIN é o primeiro valor normal; abaixo dele a temperatura é baixa
+        'baixa': round(limites['NORMAL_MIN'] - 0.1, 1),
+        'histerese': 0.3,
+        'duracao_minima_s': 0,
+        'supressao_s': 600,
+        'escalonamento_s': 900,
+        'limite_por_hora': 6,
+    }
+
+
+class EstadoAlerta:
+    """Estado do episódio de alerta de um dispositivo"""
+    __slots__ = ('nivel', 'ativo_desde', 'candidato', 'candidato_desde', 'ultimo_envio',
+                 'ultimo_ts', 'leituras', 'escalonado', 'notificado', 'fichas', 'fichas_em', 'silenciado_ate')
+
+    def __init__(self):
+        self.nivel = None
+        self.ativo_desde = None
+        self.candidato = None
+        self.candidato_desde = None
+        self.ultimo_envio = None
+        self.ultimo_ts = None
+        self.leituras = 0
+        self.escalonado = False
+        self.notificado = False
+        self.fichas = None
+        self.fichas_em = None
+        self.silenciado_ate = None
+
+
+class MotorAlertas:
+    _compartilhados = {}
+    _lock_compartilhados = threading.Lock()
+
+    # Intervalo mínimo entre verificações de alteração do arquivo de regras
+    INTERVALO_RECARGA = 5.0
+
+    def __init__(self, arquivo='iot_alert_rules.json'):
+        self.arquivo = arquivo
+        self.padrao = regra_padrao()
+        self.locais = {}
+        self.dispositivos = {}
+        self.estados = {}
+        self._regras = {}
+        self._lock = threading.Lock()
+        self._versao = None
+        self._proxima_recarga = 0.0
+
+        self.avaliadas = 0
+        self.notificadas = 0
+        self.suprimidas = 0
+        self.limitadas = 0
+
+        self._carregar()
+
+    @classmethod
+    def compartilhado(cls, arquivo='iot_alert_rules.json'):
+        """Motor único por arquivo de regras dentro do processo"""
+        chave = os.path.abspath(arquivo)
+        with cls._lock_compartilhados:
+            motor = cls._compartilhados.get(chave)
+            if motor is None:
+                motor = cls(arquivo)
+                cls._compartilhados[chave] = motor
+            return motor
+
+    # ------------------------------------------------------------------
+    # Regras
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _filtrar(regra):
+        return {campo: float(valor) for campo, valor in (regra or {}).items()
+                if campo in CAMPOS_REGRA and valor is not None}
+
+    def _carregar(self):
+        """Lê o arquivo de regras (mantém as atuais se ausente ou inválido)"""
+        try:
+            versao = os.stat(self.arquivo).st_mtime_ns
+        except OSError:
+            return
+        if versao == self._versao:
+            return
+        try:
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Regras de alerta inválidas em {self.arquivo}: {str(e)}")
+            return
+        self.padrao = {**regra_padrao(), **self._filtrar(dados.get('padrao'))}
+        self.locais = {local: self._filtrar(regra) for local, regra in dados.get('locais', {}).items()}
+        self.dispositivos = {device_id: self._filtrar(regra) for device_id, regra in dados.get('dispositivos', {}).items()}
+        self._regras = {}
+        self._versao = versao
+
+    def _recarregar_se_alterado(self):
+        agora = time.monotonic()
+        if agora >= self._proxima_recarga:
+            self._proxima_recarga = agora + self.INTERVALO_RECARGA
+            self._carregar()
+
+    def _gravar(self):
+        """Substituição atômica do arquivo de regras (chamar com _lock)"""
+        dados = {
+            'padrao': self.padrao,
+            'locais': self.locais,
+            'dispositivos': self.dispositivos,
+        }
+        temporario = self.arquivo + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.arquivo)
+        self._versao = os.stat(self.arquivo).st_mtime_ns
+        self._regras = {}
+
+    def atualizar_padrao(self, **valores):
+        """Altera a regra global (ex.: limites editados no painel) e grava o arquivo"""
+        with self._lock:
+            self._carregar()
+            self.padrao = {**self.padrao, **self._filtrar(valores)}
+            self._gravar()
+
+    def definir_regra(self, escopo, alvo, regra):
+        """
+        Define ou remove (regra None) a regra de um local ou dispositivo
+
+        Args:
+            escopo: 'locais' ou 'dispositivos'
+            alvo: Nome do local ou device_id
+            regra: Campos a sobrescrever (parcial) ou None para remover
+        """
+        if escopo not in ('locais', 'dispositivos'):
+            raise ValueError(f"Escopo inválido: {escopo!r}")
+        with self._lock:
+            self._carregar()
+            regras = getattr(self, escopo)
+            if regra is None:
+                regras.pop(alvo, None)
+            else:
+                regras[alvo] = self._filtrar(regra)
+            self._gravar()
+
+    def regra_para(self, device_id, location=None):
+        """Regra efetiva: padrão, sobrescrita pelo local e depois pelo dispositivo"""
+        chave = (device_id, location)
+        regra = self._regras.get(chave)
+        if regra is None:
+            regra = {**self.padrao, **self.locais.get(location, {}), **self.dispositivos.get(device_id, {})}
+            self._regras[chave] = regra
+        return regra
+
+    def silenciar(self, device_id, ate_ms):
+        """Suprime notificações do dispositivo até ate_ms (None encerra o silêncio)"""
+        with self._lock:
+            self.estados.setdefault(device_id, EstadoAlerta()).silenciado_ate = ate_ms
+
+    # ------------------------------------------------------------------
+    # Avaliação
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def classificar(valor, regra):
+        """Nível pelos limites de entrada (None se normal)"""
+        if valor >= regra['critico']:
+            return 'CRITICAL'
+        if valor >= regra['febre']:
+            return 'HIGH'
+        if valor <= regra['baixa']:
+            return 'LOW'
+        return None
+
+    @staticmethod
+    def _mantem(nivel, valor, regra):
+        """O episódio atual continua dentro da faixa de histerese?"""
+        if nivel == 'CRITICAL':
+            return valor >= regra['critico'] - regra['histerese']
+        if nivel == 'HIGH':
+            return valor >= regra['febre'] - regra['histerese']
+        if nivel == 'LOW':
+            return valor <= regra['baixa'] + regra['histerese']
+        return False
+
+    def _consumir_ficha(self, estado, regra, agora):
+        """Balde de fichas por dispositivo: limite_por_hora notificações por hora"""
+        limite = regra['limite_por_hora']
+        if limite <= 0:
+            return True
+        if estado.fichas is None:
+            estado.fichas = limite
+        else:
+            estado.fichas = min(limite, estado.fichas + (agora - estado.fichas_em) * limite / MS_POR_HORA)
+        estado.fichas_em = agora
+        if estado.fichas < 1:
+            return False
+        estado.fichas -= 1
+        return True
+
+    def _evento(self, tipo, nivel, leitura, mensagem):
+        return {'tipo': tipo, 'level': nivel, 'message': mensagem, 'reading': leitura}
+
+    def avaliar(self, leitura, location=None):
+        """
+        Avalia uma leitura e atualiza o estado do dispositivo (O(1))
+
+        Leituras que não são temperatura em °C, ou mais antigas que a última
+        avaliada do dispositivo (ex.: lote reenviado), não alteram o estado.
+
+        Args:
+            leitura: LeituraSensor (ou dicionário equivalente)
+            location: Local usado na escolha da regra (padrão: o da leitura)
+
+        Returns:
+            list: Eventos a notificar, cada um com 'tipo' ('disparo',
+                  'lembrete', 'escalonamento' ou 'normalizado'), 'level'
+                  ('NORMAL' no fim do episódio), 'message' e 'reading'
+        """
+        if leitura['sensor_type'] != 'temperature' or leitura['unit'] != '°C':
+            return []
+        with self._lock:
+            self._recarregar_se_alterado()
+            self.avaliadas += 1
+            device_id = leitura['device_id']
+            agora = leitura['timestamp']
+            valor = leitura['value']
+            estado = self.estados.get(device_id)
+            if estado is None:
+                estado = self.estados[device_id] = EstadoAlerta()
+            if estado.ultimo_ts is not None and agora < estado.ultimo_ts:
+                return []
+            estado.ultimo_ts = agora
+            regra = self.regra_para(device_id, location or leitura['location'])
+
+            # Nível alvo: agrava pelos limites de entrada, alivia só fora da histerese
+            alvo = self.classificar(valor, regra)
+            if GRAVIDADE[alvo] <= GRAVIDADE[estado.nivel] and self._mantem(estado.nivel, valor, regra):
+                alvo = estado.nivel
+
+            eventos = []
+            if alvo == estado.nivel:
+                estado.candidato = None
+                if alvo is not None:
+                    estado.leituras += 1
+                    eventos.extend(self._acompanhar(estado, regra, leitura, agora))
+            elif alvo is None or (estado.nivel == 'CRITICAL' and alvo == 'HIGH'):
+                # Normalizou ou aliviou (ex.: crítico -> febre): sem espera pela duração mínima
+                notificado = estado.notificado
+                self._iniciar(estado, alvo, agora)
+                estado.ultimo_envio = agora if alvo is not None else None
+                estado.notificado = notificado
+                # Só avisa o fim de episódios que chegaram a ser notificados
+                if alvo is None and notificado:
+                    eventos.append(self._evento(
+                        'normalizado', 'NORMAL', leitura,
+                        f"✅ Temperatura normalizada: {valor}°C no dispositivo {device_id}"
+                    ))
+            else:
+                # Nova condição: precisa se manter por duracao_minima_s
+                if estado.candidato != alvo:
+                    estado.candidato = alvo
+                    estado.candidato_desde = agora
+                if agora - estado.candidato_desde >= regra['duracao_minima_s'] * MS_POR_SEGUNDO:
+                    agravamento = estado.nivel is not None and GRAVIDADE[alvo] > GRAVIDADE[estado.nivel]
+                    self._iniciar(estado, alvo, estado.candidato_desde)
+                    estado.leituras = 1
+                    eventos.extend(self._notificar(
+                        estado, regra, agora, 'disparo', alvo, leitura,
+                        MENSAGENS[alvo].format(valor=valor, device_id=device_id), sempre=agravamento
+                    ))
+            return eventos
+
+    @staticmethod
+    def _iniciar(estado, nivel, desde):
+        estado.nivel = nivel
+        estado.ativo_desde = desde if nivel is not None else None
+        estado.candidato = None
+        estado.escalonado = False
+        estado.notificado = False
+        estado.leituras = 0
+
+    def _acompanhar(self, estado, regra, leitura, agora):
+        """Episódio em andamento: escalonamento único e lembretes fora da janela de supressão"""
+        duracao = agora - estado.ativo_desde
+        mensagem = MENSAGENS[estado.nivel].format(valor=leitura['value'], device_id=leitura['device_id'])
+        minutos = int(duracao // MS_POR_MINUTO)
+        if not estado.escalonado and regra['escalonamento_s'] > 0 and duracao >= regra['escalonamento_s'] * MS_POR_SEGUNDO:
+            estado.escalonado = True
+            return self._notificar(
+                estado, regra, agora, 'escalonamento', estado.nivel, leitura,
+                f"⏫ Escalonado: {mensagem} (persiste há {minutos} min)", sempre=True
+            )
+        if regra['supressao_s'] > 0 and estado.ultimo_envio is not None and \
+                agora - estado.ultimo_envio >= regra['supressao_s'] * MS_POR_SEGUNDO:
+            return self._notificar(
+                estado, regra, agora, 'lembrete', estado.nivel, leitura,
+                f"{mensagem} (persiste há {minutos} min, {estado.leituras} leituras)"
+            )
+        self.suprimidas += 1
+        return []
+
+    def _notificar(self, estado, regra, agora, tipo, nivel, leitura, mensagem, sempre=False):
+        """Aplica silêncio e limite por hora; agravamentos e escalonamentos ignoram o limite"""
+        estado.ultimo_envio = agora
+        if estado.silenciado_ate is not None and agora < estado.silenciado_ate:
+            self.suprimidas += 1
+            return []
+        if not self._consumir_ficha(estado, regra, agora) and not sempre:
+            self.limitadas += 1
+            return []
+        self.notificadas += 1
+        estado.notificado = True
+        return [self._evento(tipo, nivel, leitura, mensagem)]
+
+    def estatisticas(self):
+        """Contadores do motor e episódios ativos por nível"""
+        ativos = {'CRITICAL': 0, 'HIGH': 0, 'LOW': 0}
+        with self._lock:
+            for estado in self.estados.values():
+                if estado.nivel is not None:
+                    ativos[estado.nivel] += 1
+        return {
+            'avaliadas': self.avaliadas,
+            'notificadas': self.notificadas,
+            'suprimidas': self.suprimidas,
+            'limitadas': self.limitadas,
+            'ativos': ativos,
+        }
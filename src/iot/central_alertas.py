@@ -0,0 +1,249 @@
+"""
+Central de Alertas IoT
+======================
+
+Armazenamento único dos alertas do processo (motor de regras, alertas
+enviados pelos dispositivos via MQTT), visível de qualquer thread e de
+qualquer sessão do painel:
+
+- buffer circular em memória com os alertas mais recentes
+- log JSON Lines só de acréscimo em disco (alertas e reconhecimentos), que
+  também sincroniza processos diferentes (ex.: API IoT separada do painel)
+
+Cada registro do log tem um número de sequência crescente, atribuído sob
+trava de arquivo; o id do alerta é o seu número de sequência. Sessões do
+painel guardam um cursor (última sequência vista) e pedem só as novidades:
+alertas novos e alertas reconhecidos desde o cursor, em O(novidades).
+O reconhecimento é compartilhado por todos os usuários.
+
+O log é compactado (apenas os alertas do buffer, com o reconhecimento já
+aplicado) quando passa de `fator_compactacao` vezes a capacidade.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .ingestao import BufferCircular
+from ..utils.tempo import agora_ms, indice_desde
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas a trava entre threads
+    fcntl = None
+
+
+class CentralAlertas:
+    _compartilhadas = {}
+    _lock_compartilhadas = threading.Lock()
+
+    def __init__(self, arquivo='iot_alerts.jsonl', capacidade=1000, fator_compactacao=10):
+        """
+        Inicializa a central e carrega o log
+
+        Args:
+            arquivo: Log JSON Lines de alertas e reconhecimentos
+            capacidade: Alertas mantidos em memória
+            fator_compactacao: Compacta o log acima de capacidade * fator registros
+        """
+        self.arquivo = arquivo
+        self.capacidade = capacidade
+        self.fator_compactacao = fator_compactacao
+        self.alertas = BufferCircular(capacidade)
+        self._por_id = {}
+        # (sequência, id do alerta) de cada alerta ou reconhecimento, para os cursores
+        self._eventos = BufferCircular(capacidade * 4)
+        self.ultima_sequencia = 0
+        self._lock = threading.RLock()
+        self._posicao = 0
+        self._inode = None
+        self._registros_arquivo = 0
+        self.sincronizar()
+
+    @classmethod
+    def compartilhada(cls, arquivo='iot_alerts.jsonl', **kwargs):
+        """Central única por arquivo dentro do processo"""
+        chave = os.path.abspath(arquivo)
+        with cls._lock_compartilhadas:
+            central = cls._compartilhadas.get(chave)
+            if central is None:
+                central = cls(arquivo, **kwargs)
+                cls._compartilhadas[chave] = central
+            return central
+
+    # ------------------------------------------------------------------
+    # Log em disco
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _trava(self):
+        """Trava exclusiva entre processos, quando suportado (arquivo separado: o log é substituído na compactação)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.arquivo + '.trava', 'a') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _reiniciar(self):
+        self.alertas.limpar()
+        self._por_id = {}
+        self._eventos.limpar()
+        self.ultima_sequencia = 0
+        self._posicao = 0
+        self._registros_arquivo = 0
+
+    def sincronizar(self):
+        """Aplica registros anexados ao log (por este ou outro processo) desde a última leitura"""
+        with self._lock:
+            try:
+                info = os.stat(self.arquivo)
+            except OSError:
+                if self._posicao:
+                    self._reiniciar()
+                return
+            if info.st_ino != self._inode or info.st_size < self._posicao:
+                # Log compactado ou recriado: recarrega do início
+                self._reiniciar()
+                self._inode = info.st_ino
+            if info.st_size == self._posicao:
+                return
+            with open(self.arquivo, 'rb') as f:
+                f.seek(self._posicao)
+                dados = f.read()
+            fim = dados.rfind(b'\n') + 1
+            for linha in dados[:fim].splitlines():
+                if linha.strip():
+                    try:
+                        self._aplicar(json.loads(linha))
+                    except ValueError:
+                        continue
+            self._posicao += fim
+
+    def _aplicar(self, registro):
+        """Aplica um registro do log em memória (chamar com _lock)"""
+        sequencia = registro.get('seq', 0)
+        if sequencia <= self.ultima_sequencia:
+            return
+        self.ultima_sequencia = sequencia
+        self._registros_arquivo += 1
+        if registro.get('marca'):
+            return
+        if 'ack' in registro:
+            alerta = self._por_id.get(registro['ack'])
+            if alerta is None or alerta.get('acknowledged_at'):
+                return
+            alerta['acknowledged_by'] = registro.get('by')
+            alerta['acknowledged_at'] = registro.get('at')
+            self._eventos.adicionar((sequencia, alerta['id']))
+            return
+        if len(self.alertas) == self.capacidade:
+            self._por_id.pop(self.alertas[0]['id'], None)
+        registro['id'] = sequencia
+        self.alertas.adicionar(registro)
+        self._por_id[sequencia] = registro
+        self._eventos.adicionar((sequencia, sequencia))
+
+    def _anexar(self, registro):
+        """Grava um registro com a próxima sequência e o aplica (retorna a sequência)"""
+        with self._lock, self._trava():
+            # Sequências atribuídas por outros processos antes desta
+            self.sincronizar()
+            registro = {'seq': self.ultima_sequencia + 1, **registro}
+            with open(self.arquivo, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+            self.sincronizar()
+            if self._registros_arquivo > self.capacidade * self.fator_compactacao:
+                self._compactar()
+            return registro['seq']
+
+    def _compactar(self):
+        """Reescreve o log só com os alertas do buffer (chamar com _lock e a trava de arquivo)"""
+        temporario = self.arquivo + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for alerta in self.alertas:
+                f.write(json.dumps(alerta, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+            # Preserva a última sequência (reconhecimentos compactados) para não reutilizá-la
+            f.write(json.dumps({'seq': self.ultima_sequencia, 'marca': True}) + '\n')
+        os.replace(temporario, self.arquivo)
+        info = os.stat(self.arquivo)
+        self._inode = info.st_ino
+        self._posicao = info.st_size
+        self._registros_arquivo = len(self.alertas) + 1
+
+    # ------------------------------------------------------------------
+    # Publicação e consulta
+    # ------------------------------------------------------------------
+
+    def publicar(self, alerta):
+        """
+        Registra um alerta para todas as sessões
+
+        Args:
+            alerta: Dicionário com 'level', 'message' e dados opcionais
+                    (kind, source, device_id, location, reading, timestamp)
+
+        Returns:
+            int: Id do alerta
+        """
+        return self._anexar({
+            'timestamp': agora_ms(),
+            **alerta,
+            'acknowledged_by': None,
+            'acknowledged_at': None,
+        })
+
+    def reconhecer(self, alerta_id, usuario=None):
+        """Marca o alerta como reconhecido para todos os usuários (False se já estava ou não existe)"""
+        self.sincronizar()
+        with self._lock:
+            alerta = self._por_id.get(alerta_id)
+            if alerta is None or alerta.get('acknowledged_at'):
+                return False
+            self._anexar({'ack': alerta_id, 'by': usuario, 'at': agora_ms()})
+            return True
+
+    def novidades(self, cursor=0):
+        """
+        Alertas novos ou reconhecidos depois do cursor (O(novidades))
+
+        Args:
+            cursor: Última sequência já vista pela sessão (0 na primeira consulta)
+
+        Returns:
+            dict: 'alertas' (cópias, em ordem de sequência), 'cursor' (novo
+                  cursor) e 'completo' (True se o cursor ficou para trás do
+                  que há em memória e 'alertas' é o conteúdo inteiro do buffer)
+        """
+        self.sincronizar()
+        with self._lock:
+            mais_antigo = self._eventos[0][0] if len(self._eventos) else self.ultima_sequencia + 1
+            if cursor > self.ultima_sequencia or (cursor < mais_antigo - 1 and cursor < self.ultima_sequencia):
+                return {
+                    'alertas': [dict(alerta) for alerta in self.alertas],
+                    'cursor': self.ultima_sequencia,
+                    'completo': True
+                }
+            inicio = indice_desde(self._eventos, cursor + 1, campo=0)
+            ids = dict.fromkeys(alerta_id for _, alerta_id in self._eventos[inicio:])
+            return {
+                'alertas': [dict(self._por_id[alerta_id]) for alerta_id in ids if alerta_id in self._por_id],
+                'cursor': self.ultima_sequencia,
+                'completo': False
+            }
+
+    def recentes(self, quantidade=50):
+        """Cópias dos alertas mais recentes (do mais antigo para o mais recente)"""
+        self.sincronizar()
+        with self._lock:
+            return [dict(alerta) for alerta in self.alertas.recentes(quantidade)]
+
+    def pendentes(self):
+        """Quantidade de alertas em memória ainda não reconhecidos"""
+        self.sincronizar()
+        with self._lock:
+            return sum(1 for alerta in self.alertas if not alerta.get('acknowledged_at'))
@@ -0,0 +1,242 @@
+"""
+Fila de Ingestão IoT
+====================
+
+Estágio entre os transportes (MQTT, API HTTP) e o armazenamento. Os
+transportes só enfileiram leituras já normalizadas numa fila de capacidade
+fixa; uma thread de trabalho retira micro-lotes e faz o restante (remoção de
+duplicadas, gravação no núcleo de ingestão, registro de dispositivos e
+alertas), de modo que disco lento ou um pico de leituras não travam a thread
+de rede do paho nem o loop do servidor HTTP.
+
+Política de excesso quando a fila está cheia:
+- 'bloquear': o produtor espera até `tempo_bloqueio` segundos por espaço
+  (produtores que não podem esperar, como o callback MQTT, são recusados)
+- 'descartar_antigas': a leitura mais antiga da fila é descartada
+- 'rejeitar': a leitura é recusada (HTTP 503, para o dispositivo reenviar)
+
+Profundidade, latência fila→armazenamento e contadores de descarte são
+expostos por `metricas()`.
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+from ..utils.tempo import agora_ms
+
+
+POLITICAS = ('bloquear', 'descartar_antigas', 'rejeitar')
+
+
+class FilaIngestao:
+    _compartilhadas = {}
+    _lock_compartilhadas = threading.Lock()
+
+    def __init__(self, processar, capacidade=20000, politica='rejeitar', tamanho_lote=500,
+                 tempo_bloqueio=2.0, janela_duplicadas=10000, amostras_latencia=2048):
+        """
+        Inicializa a fila e a thread de trabalho
+
+        Args:
+            processar: Função que grava um micro-lote (lista de leituras normalizadas)
+            capacidade: Leituras aguardando processamento
+            politica: 'bloquear', 'descartar_antigas' ou 'rejeitar'
+            tamanho_lote: Máximo de leituras por micro-lote
+            tempo_bloqueio: Espera máxima do produtor na política 'bloquear' (segundos)
+            janela_duplicadas: Chaves recentes lembradas para remover reenvios
+            amostras_latencia: Latências recentes usadas no p95
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de fila inválida: {politica!r} (use {', '.join(POLITICAS)})")
+        self.processar = processar
+        self.capacidade = capacidade
+        self.politica = politica
+        self.tamanho_lote = tamanho_lote
+        self.tempo_bloqueio = tempo_bloqueio
+        self.janela_duplicadas = janela_duplicadas
+
+        self._fila = deque()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._vazia = threading.Condition(self._lock)
+        self._em_processamento = 0
+        # Dicionário como conjunto ordenado: as chaves mais antigas saem primeiro
+        self._chaves_recentes = {}
+        self._latencias = deque(maxlen=amostras_latencia)
+
+        self.enfileiradas = 0
+        self.processadas = 0
+        self.descartadas = 0
+        self.rejeitadas = 0
+        self.duplicadas = 0
+        self.erros = 0
+        self.lotes = 0
+        self.profundidade_maxima = 0
+        self.latencia_maxima_ms = 0.0
+        self.ultimo_processamento = None
+
+        self._thread = threading.Thread(target=self._trabalhar, daemon=True)
+        self._thread.start()
+        atexit.register(self.esvaziar)
+
+    @classmethod
+    def compartilhada(cls, chave, processar, **kwargs):
+        """Fila única por chave (ex.: núcleo de ingestão) dentro do processo"""
+        with cls._lock_compartilhadas:
+            fila = cls._compartilhadas.get(chave)
+            if fila is None:
+                fila = cls(processar, **kwargs)
+                cls._compartilhadas[chave] = fila
+            return fila
+
+    @property
+    def pode_bloquear(self):
+        return self.politica == 'bloquear'
+
+    def __len__(self):
+        return len(self._fila)
+
+    # ------------------------------------------------------------------
+    # Produtores
+    # ------------------------------------------------------------------
+
+    def enfileirar(self, leitura, bloquear=True, chave=None):
+        """Enfileira uma leitura normalizada (False se recusada pela política)"""
+        return self.enfileirar_lote([leitura], bloquear, [chave]) == 1
+
+    def enfileirar_lote(self, leituras, bloquear=True, chaves=None):
+        """
+        Enfileira leituras normalizadas, na ordem
+
+        Args:
+            leituras: Dicionários no formato de IoTManager._validate_reading
+            bloquear: Se False, a política 'bloquear' recusa em vez de esperar
+            chaves: Identidade de cada leitura para remover reenvios
+                    (None: a leitura não é comparada, ex.: sem timestamp do dispositivo)
+
+        Returns:
+            int: Quantas leituras (do início da lista) entraram na fila
+        """
+        if not leituras:
+            return 0
+        instante = time.monotonic()
+        limite = instante + self.tempo_bloqueio
+        chaves = chaves or [None] * len(leituras)
+        aceitas = 0
+        with self._cond:
+            for leitura, chave in zip(leituras, chaves):
+                if len(self._fila) >= self.capacidade:
+                    if self.politica == 'descartar_antigas':
+                        self._fila.popleft()
+                        self.descartadas += 1
+                    elif self.politica == 'bloquear' and bloquear:
+                        # Acorda a thread de trabalho antes de esperar por espaço
+                        self._cond.notify_all()
+                        while len(self._fila) >= self.capacidade:
+                            restante = limite - time.monotonic()
+                            if restante <= 0 or not self._cond.wait(restante):
+                                break
+                    if len(self._fila) >= self.capacidade:
+                        break
+                self._fila.append((instante, leitura, chave))
+                aceitas += 1
+            self.enfileiradas += aceitas
+            self.rejeitadas += len(leituras) - aceitas
+            if len(self._fila) > self.profundidade_maxima:
+                self.profundidade_maxima = len(self._fila)
+            self._cond.notify_all()
+        return aceitas
+
+    # ------------------------------------------------------------------
+    # Estágio de trabalho
+    # ------------------------------------------------------------------
+
+    def _trabalhar(self):
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                quantidade = min(len(self._fila), self.tamanho_lote)
+                lote = [self._fila.popleft() for _ in range(quantidade)]
+                self._em_processamento = quantidade
+                # Libera produtores esperando espaço
+                self._cond.notify_all()
+            try:
+                self._processar_lote(lote)
+            except Exception as e:
+                self.erros += len(lote)
+                print(f"❌ Erro ao processar lote da fila de ingestão: {str(e)}")
+            finally:
+                with self._cond:
+                    self._em_processamento = 0
+                    self._vazia.notify_all()
+
+    def _processar_lote(self, lote):
+        """Remove duplicadas (reenvios do dispositivo ou do broker) e grava o micro-lote"""
+        novas = []
+        recentes = self._chaves_recentes
+        for _, leitura, chave in lote:
+            if chave is not None:
+                if chave in recentes:
+                    self.duplicadas += 1
+                    continue
+                recentes[chave] = None
+            novas.append(leitura)
+        while len(recentes) > self.janela_duplicadas:
+            del recentes[next(iter(recentes))]
+
+        if novas:
+            self.processar(novas)
+
+        fim = time.monotonic()
+        for instante, _, _ in lote:
+            self._latencias.append((fim - instante) * 1000)
+        latencia = (fim - lote[0][0]) * 1000
+        if latencia > self.latencia_maxima_ms:
+            self.latencia_maxima_ms = latencia
+        self.processadas += len(novas)
+        self.lotes += 1
+        self.ultimo_processamento = agora_ms()
+
+    def esvaziar(self, timeout=10.0):
+        """Espera a fila ser processada (True se esvaziou dentro do prazo)"""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._fila or self._em_processamento:
+                restante = limite - time.monotonic()
+                if restante <= 0 or not self._thread.is_alive():
+                    return False
+                self._vazia.wait(restante)
+        return True
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def metricas(self):
+        """Profundidade, latência (ms) e contadores da fila"""
+        latencias = sorted(self._latencias)
+        if latencias:
+            media = sum(latencias) / len(latencias)
+            p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        else:
+            media = p95 = 0.0
+        return {
+            'politica': self.politica,
+            'capacidade': self.capacidade,
+            'profundidade': len(self._fila),
+            'profundidade_maxima': self.profundidade_maxima,
+            'enfileiradas': self.enfileiradas,
+            'processadas': self.processadas,
+            'duplicadas': self.duplicadas,
+            'descartadas': self.descartadas,
+            'rejeitadas': self.rejeitadas,
+            'erros': self.erros,
+            'lotes': self.lotes,
+            'latencia_media_ms': round(media, 2),
+            'latencia_p95_ms': round(p95, 2),
+            'latencia_maxima_ms': round(self.latencia_maxima_ms, 2),
+            'ultimo_processamento': self.ultimo_processamento,
+        }
@@ -0,0 +1,506 @@
+"""
+Núcleo de Ingestão IoT
+======================
+
+Caminho de ingestão em memória das leituras de sensores. Cada leitura entra
+num buffer circular de capacidade fixa e atualiza o registro de dispositivos
+em memória, sem ler nem regravar arquivos; uma thread de persistência anexa
+as leituras pendentes ao arquivo JSON Lines e grava o registro de
+dispositivos (substituição atômica) em segundo plano.
+
+Com um diretório de séries, a mesma thread anexa as leituras à SerieTemporal
+(segmentos diários colunares, retenção em dias) usada pelo histórico.
+
+O núcleo é compartilhado por caminho de arquivo: todas as instâncias de
+IoTManager do processo (painel, cliente MQTT, API) usam o mesmo buffer.
+Leituras anexadas por outros processos são incorporadas a partir da última
+posição conhecida do arquivo.
+
+A cada leitura também são atualizadas a tabela da última leitura por
+(dispositivo, tipo de sensor) e o ponteiro da temperatura mais recente, de
+modo que consultas de "valor atual" não percorrem o buffer.
+"""
+
+import atexit
+import json
+import os
+import threading
+
+from .registros import LeituraSensor
+from .serie_temporal import SerieTemporal
+from ..utils.tempo import agora_ms, para_epoch_ms
+
+
+class BufferCircular:
+    """Buffer de capacidade fixa: inserção O(1), iteração em ordem cronológica"""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._itens = [None] * capacidade
+        self._inicio = 0
+        self._tamanho = 0
+
+    def adicionar(self, item):
+        """Insere no final, sobrescrevendo o item mais antigo quando cheio"""
+        if self._tamanho < self.capacidade:
+            self._itens[(self._inicio + self._tamanho) % self.capacidade] = item
+            self._tamanho += 1
+        else:
+            self._itens[self._inicio] = item
+            self._inicio = (self._inicio + 1) % self.capacidade
+
+    def limpar(self):
+        self._itens = [None] * self.capacidade
+        self._inicio = 0
+        self._tamanho = 0
+
+    def __len__(self):
+        return self._tamanho
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(self._tamanho))]
+        if indice < 0:
+            indice += self._tamanho
+        if not 0 <= indice < self._tamanho:
+            raise IndexError('índice fora do buffer')
+        return self._itens[(self._inicio + indice) % self.capacidade]
+
+    def __iter__(self):
+        for i in range(self._tamanho):
+            yield self._itens[(self._inicio + i) % self.capacidade]
+
+    def recentes(self, quantidade):
+        """Últimos itens, do mais antigo para o mais recente"""
+        return self[max(0, self._tamanho - quantidade):]
+
+
+class NucleoIngestao:
+    """Buffer de leituras, registro de dispositivos e persistência em segundo plano"""
+
+    _compartilhados = {}
+    _lock_compartilhados = threading.Lock()
+
+    def __init__(self, readings_file='iot_readings.jsonl', devices_file='iot_devices.json',
+                 arquivo_legado='iot_readings.json', capacidade=1000, intervalo_persistencia=1.0,
+                 fator_compactacao=10, series_dir=None, retencao_dias=90,
+                 limite_febre=37.8, limite_critico=39.0):
+        """
+        Inicializa o núcleo carregando as leituras recentes e os dispositivos
+
+        Args:
+            readings_file: Leituras em JSON Lines (somente anexação)
+            devices_file: Registro de dispositivos (JSON)
+            arquivo_legado: Leituras no formato antigo (lista JSON), migradas uma vez
+            capacidade: Leituras mantidas em memória
+            intervalo_persistencia: Segundos entre gravações em disco
+            fator_compactacao: Reescreve o arquivo de leituras ao passar de capacidade × fator linhas
+            series_dir: Diretório da série temporal durável (None desativa)
+            retencao_dias: Dias mantidos na série temporal
+            limite_febre: Limite de febre das contagens dos rollups
+            limite_critico: Limite crítico das contagens dos rollups
+        """
+        self.readings_file = readings_file
+        self.devices_file = devices_file
+        self.arquivo_legado = arquivo_legado
+        self.intervalo_persistencia = intervalo_persistencia
+        self.limite_arquivo = capacidade * fator_compactacao
+        self.leituras = BufferCircular(capacidade)
+        self.dispositivos = {}
+        self.ultimas = {}
+        self.ultima_temperatura = None
+        self.total_leituras = 0
+        self._pendentes = []
+        self._dispositivos_alterados = False
+        self._lock = threading.RLock()
+        self._lock_disco = threading.Lock()
+        self._fim_arquivo = 0
+        self._linhas_arquivo = 0
+        self._versao_dispositivos = None
+        # Chamados com (device_id, last_seen) quando um dispositivo dá sinal de vida
+        self._observadores = []
+        # Sinais de vida registrados sob _lock, entregues aos observadores depois de liberá-lo
+        self._vistos = []
+
+        self._migrar_legado()
+        self._carregar_leituras()
+        self._carregar_dispositivos()
+
+        self.serie = None
+        if series_dir:
+            self.serie = SerieTemporal(series_dir, retencao_dias, limite_febre, limite_critico)
+            if not self.serie.dias() and len(self.leituras):
+                # Primeira execução com série: aproveita as leituras já gravadas
+                self.serie.adicionar_lote(list(self.leituras))
+
+        self._sinal = threading.Event()
+        self._thread = threading.Thread(target=self._persistir_continuamente, daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    @classmethod
+    def compartilhado(cls, readings_file='iot_readings.jsonl', devices_file='iot_devices.json', **kwargs):
+        """Núcleo único por par de arquivos dentro do processo"""
+        chave = (os.path.abspath(readings_file), os.path.abspath(devices_file))
+        with cls._lock_compartilhados:
+            nucleo = cls._compartilhados.get(chave)
+            if nucleo is None:
+                nucleo = cls(readings_file, devices_file, **kwargs)
+                cls._compartilhados[chave] = nucleo
+            return nucleo
+
+    # ------------------------------------------------------------------
+    # Carga e sincronização com o disco
+    # ------------------------------------------------------------------
+
+    def _migrar_legado(self):
+        """Converte as leituras antigas (lista JSON) para JSON Lines"""
+        if os.path.exists(self.readings_file) or not self.arquivo_legado:
+            return
+        if not os.path.exists(self.arquivo_legado):
+            return
+        try:
+            with open(self.arquivo_legado, 'r', encoding='utf-8') as f:
+                leituras = json.load(f)
+        except Exception:
+            return
+        with open(self.readings_file, 'w', encoding='utf-8') as f:
+            for leitura in leituras:
+                if isinstance(leitura.get('timestamp'), str):
+                    leitura['timestamp'] = para_epoch_ms(leitura['timestamp'])
+                f.write(json.dumps(leitura, ensure_ascii=False, separators=(',', ':')) + '\n')
+        print(f"📦 Leituras IoT migradas para {self.readings_file} ({len(leituras)} leituras)")
+
+    def _decodificar(self, linha):
+        leitura = json.loads(linha)
+        if isinstance(leitura.get('timestamp'), str):
+            leitura['timestamp'] = para_epoch_ms(leitura['timestamp'])
+        return LeituraSensor.de_dict(leitura)
+
+    def _registrar(self, leitura):
+        """Buffer e tabela de últimas leituras (chamar com _lock)"""
+        self.leituras.adicionar(leitura)
+        chave = (leitura['device_id'], leitura['sensor_type'])
+        anterior = self.ultimas.get(chave)
+        if anterior is None or leitura['timestamp'] >= anterior['timestamp']:
+            self.ultimas[chave] = leitura
+        if leitura['sensor_type'] == 'temperature' and (
+                self.ultima_temperatura is None or leitura['timestamp'] >= self.ultima_temperatura['timestamp']):
+            self.ultima_temperatura = leitura
+
+    def _carregar_leituras(self):
+        """Lê o arquivo (limitado pela compactação) e mantém as leituras mais recentes"""
+        self.leituras.limpar()
+        self._fim_arquivo = 0
+        self._linhas_arquivo = 0
+        if not os.path.exists(self.readings_file):
+            open(self.readings_file, 'a').close()
+            return
+        with open(self.readings_file, 'rb') as f:
+            conteudo = f.read()
+        linhas = [linha for linha in conteudo.splitlines() if linha.strip()]
+        for linha in linhas[-self.leituras.capacidade:]:
+            try:
+                self._registrar(self._decodificar(linha))
+            except (ValueError, KeyError):
+                continue
+        self._fim_arquivo = len(conteudo)
+        self._linhas_arquivo = len(linhas)
+        self.total_leituras = max(self.total_leituras, len(linhas))
+
+    def _carregar_dispositivos(self):
+        try:
+            with open(self.devices_file, 'r', encoding='utf-8') as f:
+                self.dispositivos = json.load(f)
+            self._versao_dispositivos = os.stat(self.devices_file).st_mtime_ns
+        except FileNotFoundError:
+            self.dispositivos = {}
+            self._dispositivos_alterados = True
+        except Exception:
+            self.dispositivos = {}
+
+    def _ler_novas_linhas(self, f, fim):
+        """Incorpora leituras anexadas por outro processo entre _fim_arquivo e fim (chamar com os locks)"""
+        f.seek(self._fim_arquivo)
+        bloco = f.read(fim - self._fim_arquivo)
+        # Linha incompleta (ainda sendo escrita) fica para a próxima sincronização
+        completo = bloco[:bloco.rfind(b'\n') + 1]
+        novas = 0
+        for linha in completo.splitlines():
+            if linha.strip():
+                try:
+                    leitura = self._decodificar(linha)
+                except (ValueError, KeyError):
+                    continue
+                with self._lock:
+                    self._registrar(leitura)
+                    self.total_leituras += 1
+                novas += 1
+        self._fim_arquivo += len(completo)
+        self._linhas_arquivo += novas
+
+    def sincronizar(self):
+        """Incorpora gravações de outros processos (custo: um stat por arquivo quando nada mudou)"""
+        with self._lock_disco:
+            try:
+                tamanho = os.path.getsize(self.readings_file)
+            except OSError:
+                tamanho = 0
+            if tamanho < self._fim_arquivo:
+                # Arquivo compactado ou recriado por outro processo
+                with self._lock:
+                    self._carregar_leituras()
+                    for leitura in self._pendentes:
+                        self._registrar(leitura)
+            elif tamanho > self._fim_arquivo:
+                with open(self.readings_file, 'rb') as f:
+                    self._ler_novas_linhas(f, tamanho)
+
+            try:
+                versao = os.stat(self.devices_file).st_mtime_ns
+            except OSError:
+                versao = None
+            if versao is not None and versao != self._versao_dispositivos:
+                self._mesclar_dispositivos_externos()
+        self._entregar_vistos()
+
+    def _mesclar_dispositivos_externos(self):
+        """Mescla o registro gravado por outro processo (vence o last_seen mais recente)"""
+        try:
+            with open(self.devices_file, 'r', encoding='utf-8') as f:
+                externos = json.load(f)
+            self._versao_dispositivos = os.stat(self.devices_file).st_mtime_ns
+        except Exception:
+            return
+        with self._lock:
+            for device_id, externo in externos.items():
+                atual = self.dispositivos.get(device_id)
+                if atual is None or (externo.get('last_seen') or 0) > (atual.get('last_seen') or 0):
+                    self.dispositivos[device_id] = externo
+                    if externo.get('last_seen'):
+                        self._vistos.append((device_id, para_epoch_ms(externo['last_seen'])))
+
+    # ------------------------------------------------------------------
+    # Caminho de ingestão (O(1), somente memória)
+    # ------------------------------------------------------------------
+
+    def registrar_dispositivo(self, device_id, dados):
+        with self._lock:
+            self.dispositivos[device_id] = dados
+            self._dispositivos_alterados = True
+
+    def possui_dispositivo(self, device_id):
+        return device_id in self.dispositivos
+
+    def observar_dispositivos(self, callback):
+        """Registra callback(device_id, last_seen) chamado a cada sinal de vida (local ou de outro processo)"""
+        self._observadores.append(callback)
+
+    def _entregar_vistos(self):
+        """Entrega os sinais de vida pendentes (chamar sem _lock: observadores podem publicar alertas)"""
+        with self._lock:
+            if not self._vistos:
+                return
+            vistos, self._vistos = self._vistos, []
+        for device_id, visto_em in vistos:
+            for callback in self._observadores:
+                try:
+                    callback(device_id, visto_em)
+                except Exception as e:
+                    print(f"❌ Erro no observador de dispositivos: {str(e)}")
+
+    def definir_status(self, device_id, status):
+        """Status de presença ('online'/'offline') decidido pelo monitor de presença"""
+        with self._lock:
+            dispositivo = self.dispositivos.get(device_id)
+            if dispositivo is None or dispositivo.get('status') == status:
+                return
+            dispositivo['status'] = status
+            self._dispositivos_alterados = True
+        self.solicitar_persistencia()
+
+    def _atualizar_dispositivo(self, leitura, location, battery_level, firmware_version, visto_em):
+        """Status do dispositivo após uma leitura (chamar com _lock)"""
+        dispositivo = self.dispositivos.get(leitura['device_id'])
+        if dispositivo is None:
+            return
+        dispositivo['last_seen'] = max(visto_em, para_epoch_ms(dispositivo.get('last_seen')) or 0)
+        dispositivo['status'] = 'online'
+        if battery_level is not None:
+            dispositivo['battery_level'] = battery_level
+        if firmware_version is not None:
+            dispositivo['firmware_version'] = firmware_version
+        if location is not None:
+            dispositivo['location'] = location
+        self._dispositivos_alterados = True
+        self._vistos.append((leitura['device_id'], visto_em))
+
+    def adicionar(self, leitura, location=None, battery_level=None, firmware_version=None):
+        """
+        Registra uma leitura: buffer, dispositivo e fila de persistência
+
+        Returns:
+            int: Número sequencial da leitura
+        """
+        with self._lock:
+            self._atualizar_dispositivo(leitura, location, battery_level, firmware_version, leitura['timestamp'])
+            self._registrar(leitura)
+            self._pendentes.append(leitura)
+            self.total_leituras += 1
+            sequencia = self.total_leituras
+        self._entregar_vistos()
+        return sequencia
+
+    def adicionar_lote(self, itens, visto_em=None):
+        """
+        Registra um lote numa única transação (um lock, uma gravação em disco)
+
+        Args:
+            itens: Tuplas (leitura, location, battery_level, firmware_version)
+            visto_em: Momento da recepção, usado como last_seen (padrão: agora)
+
+        Returns:
+            int: Número sequencial da primeira leitura do lote
+        """
+        visto_em = agora_ms() if visto_em is None else visto_em
+        with self._lock:
+            primeiro = self.total_leituras + 1
+            for leitura, location, battery_level, firmware_version in itens:
+                self._atualizar_dispositivo(leitura, location, battery_level, firmware_version, visto_em)
+                self._registrar(leitura)
+                self._pendentes.append(leitura)
+            self.total_leituras += len(itens)
+        self._entregar_vistos()
+        self.solicitar_persistencia()
+        return primeiro
+
+    def obter_leituras(self):
+        """Cópia das leituras em memória, em ordem cronológica"""
+        self.sincronizar()
+        with self._lock:
+            return list(self.leituras)
+
+    def obter_ultima(self, device_id, sensor_type):
+        """Última leitura de um sensor do dispositivo (O(1))"""
+        self.sincronizar()
+        return self.ultimas.get((device_id, sensor_type))
+
+    def obter_ultima_temperatura(self, desde_ms=None):
+        """Temperatura mais recente de qualquer dispositivo, se não for anterior a desde_ms (O(1))"""
+        self.sincronizar()
+        leitura = self.ultima_temperatura
+        if leitura is None or (desde_ms is not None and leitura['timestamp'] < desde_ms):
+            return None
+        return leitura
+
+    def obter_dispositivos(self):
+        """Cópia do registro de dispositivos"""
+        self.sincronizar()
+        with self._lock:
+            return {device_id: dict(dados) for device_id, dados in self.dispositivos.items()}
+
+    def obter_dispositivo(self, device_id):
+        self.sincronizar()
+        with self._lock:
+            dados = self.dispositivos.get(device_id)
+            return dict(dados) if dados is not None else None
+
+    # ------------------------------------------------------------------
+    # Persistência em segundo plano
+    # ------------------------------------------------------------------
+
+    def _persistir_continuamente(self):
+        while True:
+            self._sinal.wait(self.intervalo_persistencia)
+            self._sinal.clear()
+            try:
+                self.persistir()
+            except Exception as e:
+                print(f"❌ Erro ao persistir leituras IoT: {str(e)}")
+
+    def persistir(self):
+        """Anexa as leituras pendentes e grava o registro de dispositivos se alterado"""
+        with self._lock_disco:
+            with self._lock:
+                pendentes, self._pendentes = self._pendentes, []
+                dispositivos = None
+                if self._dispositivos_alterados:
+                    dispositivos = {device_id: dict(dados) for device_id, dados in self.dispositivos.items()}
+                    self._dispositivos_alterados = False
+
+            if pendentes:
+                bloco = ''.join(
+                    json.dumps(leitura.para_dict(), ensure_ascii=False, separators=(',', ':')) + '\n'
+                    for leitura in pendentes
+                ).encode('utf-8')
+                with open(self.readings_file, 'ab+') as f:
+                    fim = f.seek(0, os.SEEK_END)
+                    if fim > self._fim_arquivo:
+                        self._ler_novas_linhas(f, fim)
+                        f.seek(0, os.SEEK_END)
+                    f.write(bloco)
+                    self._fim_arquivo = f.tell()
+                self._linhas_arquivo += len(pendentes)
+                if self._linhas_arquivo > self.limite_arquivo:
+                    self._compactar()
+                if self.serie is not None:
+                    self.serie.adicionar_lote(pendentes)
+            if self.serie is not None:
+                # Minutos que fecharam sem novas leituras
+                self.serie.agregados.fechar()
+
+            if dispositivos is not None:
+                self._gravar_dispositivos(dispositivos)
+
+    def encerrar(self):
+        """Grava pendências e os minutos ainda abertos (encerramento do processo)"""
+        self.persistir()
+        if self.serie is not None:
+            with self._lock_disco:
+                self.serie.agregados.fechar(todos=True)
+
+    def _compactar(self):
+        """Reescreve o arquivo de leituras apenas com o conteúdo do buffer (chamar com _lock_disco)"""
+        with self._lock:
+            leituras = list(self.leituras)
+        temporario = self.readings_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for leitura in leituras:
+                f.write(json.dumps(leitura.para_dict(), ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(temporario, self.readings_file)
+        self._fim_arquivo = os.path.getsize(self.readings_file)
+        self._linhas_arquivo = len(leituras)
+
+    def _gravar_dispositivos(self, dispositivos):
+        """Substituição atômica do registro, preservando dispositivos gravados por outro processo"""
+        try:
+            versao = os.stat(self.devices_file).st_mtime_ns
+        except OSError:
+            versao = None
+        if versao is not None and versao != self._versao_dispositivos:
+            self._mesclar_dispositivos_externos()
+            with self._lock:
+                dispositivos = {device_id: dict(dados) for device_id, dados in self.dispositivos.items()}
+        temporario = self.devices_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dispositivos, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, self.devices_file)
+        self._versao_dispositivos = os.stat(self.devices_file).st_mtime_ns
+
+    def solicitar_persistencia(self):
+        """Acorda a thread de persistência sem esperar o intervalo"""
+        self._sinal.set()
+
+
+def novo_dispositivo(device_name, device_type, location):
+    """Registro inicial de um dispositivo (offline até a primeira leitura)"""
+    return {
+        'name': device_name,
+        'type': device_type,
+        'location': location,
+        'registered_at': agora_ms(),
+        'last_seen': None,
+        'status': 'offline',
+        'battery_level': None,
+        'firmware_version': None
+    }
@@ -2,11 +2,20 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime
 from .iot_manager import IoTManager
+from .agregados import AgregadosIoT, resolucao_para_periodo
+from ..utils.tempo import (
+    agora_ms, para_epoch_ms, formatar_ms, fuso_local,
+    MS_POR_MINUTO, MS_POR_HORA, MS_POR_DIA
+)
 import json
 
 class IoTDashboard:
+    # Alertas mantidos por sessão (a central guarda o histórico)
+    MAX_SESSION_ALERTS = 200
+    
     def __init__(self, mqtt_manager=None):
         self.iot_manager = IoTManager()
         self.mqtt_manager = mqtt_manager
@@ -79,7 +88,7 @@ class IoTDashboard:
                 self._show_history()
             
             with tab5:
-                self._show_alerts()
+                self._show_alerts(full=True)
             
             with tab6:
                 self._show_settings()
@@ -137,45 +146,23 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
         with st.expander("🌡️ Simular Dados"):
             if st.button("🧪 Criar Dados de Teste"):
                 try:
-                    # Tentar criar dados de teste
-                    import json
-                    import os
-                    from datetime import datetime
-                    
-                    # Criar dispositivo de teste
-                    test_device = {
-                        "TEST_DEVICE_001": {
-                            "name": "Sensor de Teste",
-                            "type": "temperature_sensor",
-                            "location": "Dashboard Teste",
-                            "registered_at": datetime.now().isoformat(),
-                            "last_seen": datetime.now().isoformat(),
-                            "status": "online",
-                            "battery_level": 85,
-                            "firmware_version": "1.0.0"
-                        }
-                    }
-                    
-                    # Criar leituras de teste
-                    test_readings = [
-                        {
-                            "device_id": "TEST_DEVICE_001",
-                            "sensor_type": "temperature",
-                            "value": 36.5,
-                            "unit": "°C",
-                            "location": "Dashboard Teste",
-                            "battery_level": 85,
-                            "timestamp": datetime.now().isoformat(),
-                            "processed": False
-                        }
-                    ]
-                    
-                    # Salvar arquivos
-                    with open('iot_devices.json', 'w') as f:
-                        json.dump(test_device, f, indent=2)
-                    
-                    with open('iot_readings.json', 'w') as f:
-                        json.dump(test_readings, f, indent=2)
+                    # Registrar dispositivo e leitura de teste pelo núcleo de ingestão
+                    # (gravar os arquivos diretamente seria sobrescrito pelo buffer em memória)
+                    self.iot_manager.register_device(
+                        device_id="TEST_DEVICE_001",
+                        device_name="Sensor de Teste",
+                        device_type="temperature_sensor",
+                        location="Dashboard Teste"
+                    )
+                    self.iot_manager.receive_sensor_data(
+                        device_id="TEST_DEVICE_001",
+                        sensor_type="temperature",
+                        value=36.5,
+                        unit="°C",
+                        location="Dashboard Teste",
+                        battery_level=85,
+                        firmware_version="1.0.0"
+                    )
                     
                     st.success("✅ Dados de teste criados!")
                     st.info("🔄 Recarregue a página para ver os dados")
@@ -186,34 +173,82 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
         if st.button("🔄 Tentar Recarregar Dashboard"):
             st.rerun()
     
-    def _show_alerts(self):
-        """Mostra alertas IoT"""
-        if 'iot_alerts' in st.session_state and st.session_state['iot_alerts']:
-            # Mostrar apenas alertas dos últimos 30 minutos
-            recent_alerts = []
-            cutoff_time = datetime.now() - timedelta(minutes=30)
-            
-            for alert in st.session_state['iot_alerts']:
-                alert_time = datetime.fromisoformat(alert['timestamp'])
-                if alert_time > cutoff_time:
-                    recent_alerts.append(alert)
+    def _sync_alerts(self):
+        """Alertas da sessão atualizados pelo cursor: só o que mudou desde a última atualização"""
+        news = self.iot_manager.alert_store.novidades(st.session_state.get('iot_alerts_cursor', 0))
+        alerts = st.session_state.get('iot_alerts')
+        if news['completo'] or not isinstance(alerts, dict):
+            alerts = {}
+        for alert in news['alertas']:
+            alerts[alert['id']] = alert
+        # Manter apenas os alertas mais recentes na sessão
+        while len(alerts) > self.MAX_SESSION_ALERTS:
+            del alerts[next(iter(alerts))]
+        st.session_state['iot_alerts'] = alerts
+        st.session_state['iot_alerts_cursor'] = news['cursor']
+        return alerts
+    
+    def _render_alert(self, alert):
+        level = alert['level']
+        message = alert['message']
+        timestamp = formatar_ms(alert['timestamp'], "%H:%M:%S")
+        
+        if level == 'CRITICAL':
+            st.error(f"🚨 **{timestamp}** - {message}")
+        elif level == 'HIGH':
+            st.warning(f"⚠️ **{timestamp}** - {message}")
+        else:
+            st.info(f"ℹ️ **{timestamp}** - {message}")
+    
+    def _show_alerts(self, full=False):
+        """Mostra alertas IoT (resumo dos pendentes ou, com full, a central com reconhecimento)"""
+        alerts = list(self._sync_alerts().values())
+        
+        if not full:
+            # Mostrar apenas alertas pendentes dos últimos 30 minutos
+            cutoff_time = agora_ms() - 30 * MS_POR_MINUTO
+            recent_alerts = [
+                alert for alert in alerts
+                if alert['timestamp'] > cutoff_time and not alert.get('acknowledged_at') and alert.get('kind') != 'normalizado'
+            ]
             
             if recent_alerts:
                 st.subheader("🚨 Alertas Recentes")
                 
                 for alert in recent_alerts[-5:]:  # Últimos 5 alertas
-                    level = alert['level']
-                    message = alert['message']
-                    timestamp = datetime.fromisoformat(alert['timestamp']).strftime("%H:%M:%S")
-                    
-                    if level == 'CRITICAL':
-                        st.error(f"🚨 **{timestamp}** - {message}")
-                    elif level == 'HIGH':
-                        st.warning(f"⚠️ **{timestamp}** - {message}")
-                    else:
-                        st.info(f"ℹ️ **{timestamp}** - {message}")
+                    self._render_alert(alert)
                 
                 st.divider()
+            return
+        
+        st.subheader("🚨 Central de Alertas")
+        pending = [alert for alert in alerts if not alert.get('acknowledged_at') and alert.get('kind') != 'normalizado']
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Pendentes", len(pending))
+        col2.metric("Críticos Pendentes", sum(1 for alert in pending if alert['level'] == 'CRITICAL'))
+        col3.metric("Alertas na Sessão", len(alerts))
+        
+        show_acknowledged = st.checkbox("Mostrar reconhecidos", value=False)
+        shown = alerts if show_acknowledged else [alert for alert in alerts if not alert.get('acknowledged_at')]
+        
+        if not shown:
+            st.info("✅ Nenhum alerta pendente")
+            return
+        
+        user = st.session_state.get('username') or 'anônimo'
+        for alert in reversed(shown[-50:]):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                self._render_alert(alert)
+                if alert.get('acknowledged_at'):
+                    st.caption(f"✅ Reconhecido por {alert.get('acknowledged_by') or 'anônimo'} "
+                               f"às {formatar_ms(alert['acknowledged_at'], '%H:%M:%S')}")
+            with col2:
+                if not alert.get('acknowledged_at') and alert.get('kind') != 'normalizado':
+                    if st.button("✅ Reconhecer", key=f"ack_{alert['id']}"):
+                        self.iot_manager.alert_store.reconhecer(alert['id'], user)
+                        st.rerun()
     
     def _show_monitoring(self):
         """Mostra monitoramento em tempo real"""
@@ -229,67 +264,70 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
         col1, col2, col3, col4 = st.columns(4)
         
         devices = self.iot_manager.get_all_devices()
-        readings = self.iot_manager._load_readings()
         
-        # Filtrar leituras das últimas 24h
-        recent_readings = [
-            r for r in readings 
-            if datetime.fromisoformat(r['timestamp']) > datetime.now() - timedelta(hours=24)
-        ]
+        # Últimas 24h a partir dos rollups por minuto (sem percorrer leituras)
+        rollups = self.iot_manager.get_rollups('minuto', inicio_ms=agora_ms() - 24 * MS_POR_HORA)
+        totais = AgregadosIoT.totais(rollups)
+        # Limites atuais da regra padrão (os mesmos dos alertas e do status das leituras)
+        regra = self.iot_manager.alert_engine.padrao
         
         with col1:
-            online_devices = len([d for d in devices.values() if d.get('status') == 'online'])
+            # Contagem mantida pelo monitor de presença (last-will MQTT e timeout)
+            online_devices = self.iot_manager.presence.contar_online()
             st.metric("Dispositivos Online", f"{online_devices}/{len(devices)}")
         
         with col2:
-            st.metric("Leituras (24h)", len(recent_readings))
+            st.metric("Leituras (24h)", totais['contagem'])
         
         with col3:
-            fever_count = len([r for r in recent_readings if r.get('value', 0) >= 37.8])
-            st.metric("Casos de Febre", fever_count, delta=None if fever_count == 0 else f"+{fever_count}")
+            # As contagens dos rollups usam os limites com que foram gravadas
+            fever_count = totais['febre'] + totais['critico']
+            st.metric(f"Casos de Febre (≥ {totais['limite_febre']:.1f}°C)", fever_count,
+                      delta=None if fever_count == 0 else f"+{fever_count}")
         
         with col4:
-            if recent_readings:
-                avg_temp = sum(r.get('value', 0) for r in recent_readings) / len(recent_readings)
-                st.metric("Temp. Média", f"{avg_temp:.1f}°C")
+            if totais['contagem']:
+                st.metric("Temp. Média", f"{totais['media']:.1f}°C")
             else:
                 st.metric("Temp. Média", "N/A")
         
         # Gráfico em tempo real
-        if recent_readings:
+        if totais['contagem']:
             st.subheader("📈 Temperaturas em Tempo Real")
             
-            df = pd.DataFrame(recent_readings)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
+            df = pd.DataFrame({
+                'timestamp': pd.to_datetime(rollups['inicio'], unit='ms', utc=True).tz_convert(fuso_local()),
+                'device_id': rollups['device_id'],
+                'value': rollups['media'].round(2)
+            })
             
             fig = px.line(
                 df, 
                 x='timestamp', 
                 y='value',
                 color='device_id',
-                title="Leituras das Últimas 24 Horas",
+                title="Leituras das Últimas 24 Horas (média por minuto)",
                 labels={'value': 'Temperatura (°C)', 'timestamp': 'Horário'},
                 height=400
             )
             
             # Adicionar linhas de referência
-            fig.add_hline(y=37.8, line_dash="dash", line_color="orange", 
-                         annotation_text="Limite Febre (37.8°C)")
-            fig.add_hline(y=39.0, line_dash="dash", line_color="red", 
-                         annotation_text="Crítico (39.0°C)")
-            fig.add_hline(y=35.0, line_dash="dash", line_color="blue", 
-                         annotation_text="Baixa (35.0°C)")
+            fig.add_hline(y=regra['febre'], line_dash="dash", line_color="orange", 
+                         annotation_text=f"Limite Febre ({regra['febre']:.1f}°C)")
+            fig.add_hline(y=regra['critico'], line_dash="dash", line_color="red", 
+                         annotation_text=f"Crítico ({regra['critico']:.1f}°C)")
+            fig.add_hline(y=regra['baixa'], line_dash="dash", line_color="blue", 
+                         annotation_text=f"Baixa ({regra['baixa']:.1f}°C)")
             
             st.plotly_chart(fig, use_container_width=True)
             
             # Últimas leituras
             st.subheader("🕐 Últimas Leituras")
             
-            latest_readings = sorted(recent_readings, key=lambda x: x['timestamp'], reverse=True)[:10]
+            latest_readings = self.iot_manager.get_recent_readings(10)[::-1]
             
             for reading in latest_readings:
-                timestamp = datetime.fromisoformat(reading['timestamp']).strftime("%H:%M:%S")
+                timestamp = formatar_ms(reading['timestamp'], "%H:%M:%S")
                 temp = reading['value']
                 device_id = reading['device_id']
                 status = self.iot_manager._get_temp_status(temp)
@@ -348,9 +386,7 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
                     with col2:
                         last_seen = device_info.get('last_seen')
                         if last_seen:
-                            last_seen_dt = datetime.fromisoformat(last_seen)
-                            time_diff = datetime.now() - last_seen_dt
-                            minutes_ago = time_diff.total_seconds() // 60
+                            minutes_ago = (agora_ms() - para_epoch_ms(last_seen)) // MS_POR_MINUTO
                             st.write(f"**Última comunicação:** {int(minutes_ago)} min atrás")
                         else:
                             st.write("**Última comunicação:** Nunca")
@@ -441,112 +477,144 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
             st.info("📱 Nenhum dispositivo registrado ainda")
     
     def _show_history(self):
-        """Mostra histórico de leituras"""
+        """Mostra histórico de leituras (rollups para gráficos, série temporal para o detalhe)"""
         st.subheader("📈 Histórico de Leituras")
         
-        readings = self.iot_manager._load_readings()
+        devices = self.iot_manager.get_all_devices()
         
-        if readings:
-            # Filtros
-            col1, col2, col3 = st.columns(3)
+        # Filtros
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            days_back = st.selectbox("Período", [1, 7, 30, 90], index=1)
+        
+        with col2:
+            selected_device = st.selectbox("Dispositivo", ["Todos"] + sorted(devices))
+        
+        with col3:
+            temp_filter = st.selectbox("Filtro Temperatura", ["Todas", "Normal", "Febre", "Crítico", "Baixa"])
+        
+        inicio_ms = agora_ms() - days_back * MS_POR_DIA
+        device_filter = None if selected_device == "Todos" else selected_device
+        
+        # Resolução mais fina cujos baldes de todos os dispositivos exibidos cabem no gráfico
+        resolucao = resolucao_para_periodo(days_back * MS_POR_DIA, 1 if device_filter else len(devices))
+        rollups = self.iot_manager.get_rollups(resolucao, inicio_ms=inicio_ms, device_id=device_filter)
+        totais = AgregadosIoT.totais(rollups)
+        regra = self.iot_manager.alert_engine.padrao
+        
+        if totais['contagem']:
+            # Estatísticas
+            col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                days_back = st.selectbox("Período", [1, 7, 30, 90], index=1)
-            
+                st.metric("Total de Leituras", totais['contagem'])
             with col2:
-                devices = list(set(r['device_id'] for r in readings))
-                selected_device = st.selectbox("Dispositivo", ["Todos"] + devices)
-            
+                st.metric("Temp. Mínima", f"{totais['minimo']:.1f}°C")
             with col3:
-                temp_filter = st.selectbox("Filtro Temperatura", ["Todas", "Normal", "Febre", "Crítico"])
+                st.metric("Temp. Máxima", f"{totais['maximo']:.1f}°C")
+            with col4:
+                st.metric("Temp. Média", f"{totais['media']:.1f}°C")
+            
+            # Gráfico histórico: média, mínimo e máximo por balde
+            df = pd.DataFrame({
+                'timestamp': pd.to_datetime(rollups['inicio'], unit='ms', utc=True).tz_convert(fuso_local()),
+                'device_id': rollups['device_id'],
+                'value': rollups['media'].round(2),
+                'minimo': rollups['minimo'].astype(float).round(2),
+                'maximo': rollups['maximo'].astype(float).round(2),
+                'contagem': rollups['contagem']
+            })
+            
+            fig = px.line(
+                df,
+                x='timestamp',
+                y='value',
+                color='device_id',
+                hover_data=['minimo', 'maximo', 'contagem'],
+                title=f"Histórico de Temperaturas - Últimos {days_back} dias (média por {resolucao})",
+                labels={'value': 'Temperatura (°C)', 'timestamp': 'Data/Hora'},
+                height=500
+            )
             
-            # Filtrar dados
-            filtered_readings = []
-            cutoff_date = datetime.now() - timedelta(days=days_back)
+            fig.add_hline(y=regra['febre'], line_dash="dash", line_color="orange")
+            fig.add_hline(y=regra['critico'], line_dash="dash", line_color="red")
+            fig.add_hline(y=regra['baixa'], line_dash="dash", line_color="blue")
             
-            for reading in readings:
-                reading_date = datetime.fromisoformat(reading['timestamp'])
-                
-                if reading_date < cutoff_date:
-                    continue
-                
-                if selected_device != "Todos" and reading['device_id'] != selected_device:
-                    continue
-                
-                temp = reading.get('value', 0)
-                if temp_filter == "Normal" and temp >= 37.8:
-                    continue
-                elif temp_filter == "Febre" and (temp < 37.8 or temp >= 39.0):
-                    continue
-                elif temp_filter == "Crítico" and temp < 39.0:
-                    continue
-                
-                filtered_readings.append(reading)
+            st.plotly_chart(fig, use_container_width=True)
             
-            if filtered_readings:
-                # Estatísticas
-                temps = [r['value'] for r in filtered_readings]
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Total de Leituras", len(filtered_readings))
-                with col2:
-                    st.metric("Temp. Mínima", f"{min(temps):.1f}°C")
-                with col3:
-                    st.metric("Temp. Máxima", f"{max(temps):.1f}°C")
-                with col4:
-                    st.metric("Temp. Média", f"{sum(temps)/len(temps):.1f}°C")
-                
-                # Gráfico histórico
-                df = pd.DataFrame(filtered_readings)
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                
-                fig = px.scatter(
-                    df,
-                    x='timestamp',
-                    y='value',
-                    color='device_id',
-                    title=f"Histórico de Temperaturas - Últimos {days_back} dias",
-                    labels={'value': 'Temperatura (°C)', 'timestamp': 'Data/Hora'},
-                    height=500
+            # Distribuição de temperaturas
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig_hist = px.histogram(
+                    df, 
+                    x='value', 
+                    y='contagem',
+                    histfunc='sum',
+                    title=f"Distribuição das Médias por {resolucao.title()}",
+                    labels={'value': 'Temperatura (°C)', 'contagem': 'Leituras'},
+                    nbins=20
+                )
+                st.plotly_chart(fig_hist, use_container_width=True)
+            
+            with col2:
+                # Contagem por status a partir das contagens dos rollups (rotuladas com os limites delas)
+                limite_febre, limite_critico = totais['limite_febre'], totais['limite_critico']
+                status_counts = pd.Series({
+                    f"🟢 Abaixo de {limite_febre:.1f}°C": totais['contagem'] - totais['febre'] - totais['critico'],
+                    f"🟡 Febre ({limite_febre:.1f}–{limite_critico:.1f}°C)": totais['febre'],
+                    f"🔴 Crítico (≥ {limite_critico:.1f}°C)": totais['critico']
+                })
+                status_counts = status_counts[status_counts > 0]
+                
+                fig_pie = px.pie(
+                    values=status_counts.values,
+                    names=status_counts.index,
+                    title="Distribuição por Status"
+                )
+                st.plotly_chart(fig_pie, use_container_width=True)
+            
+            # Tabela de dados: leituras individuais (série temporal) com o filtro de temperatura
+            st.subheader("📋 Dados Detalhados")
+            # Faixas do filtro pela regra padrão, como _get_temp_status (baixa inclui o próprio limite)
+            acima_da_baixa = float(np.nextafter(regra['baixa'], np.inf))
+            faixas = {
+                "Normal": (acima_da_baixa, regra['febre']),
+                "Febre": (regra['febre'], regra['critico']),
+                "Crítico": (regra['critico'], None),
+                "Baixa": (None, acima_da_baixa),
+            }
+            faixa = faixas.get(temp_filter, (None, None))
+            # Total de leituras na faixa pelos rollups, sem ler leituras (só se contados com os mesmos limites)
+            mesmos_limites = (totais['limite_febre'], totais['limite_critico']) == (regra['febre'], regra['critico'])
+            total_filtro = {
+                "Todas": totais['contagem'],
+                "Febre": totais['febre'] if mesmos_limites else None,
+                "Crítico": totais['critico'] if mesmos_limites else None,
+            }.get(temp_filter)
+            
+            # Apenas as leituras mais recentes: a série para de ler ao juntar 1000
+            history = self.iot_manager.get_history(inicio_ms=inicio_ms, device_id=device_filter, limite=1000,
+                                                   valor_min=faixa[0], valor_max=faixa[1])
+            values = history['value']
+            selected = np.arange(len(values))[::-1]
+            if len(selected):
+                df_display = pd.DataFrame({
+                    'timestamp': pd.to_datetime(history['timestamp'][selected], unit='ms', utc=True).tz_convert(fuso_local()),
+                    'device_id': history['device_id'][selected],
+                    'value': values[selected].astype(float).round(2),
+                    'unit': '°C'
+                })
+                df_display['location'] = df_display['device_id'].map(
+                    lambda device_id: devices.get(device_id, {}).get('location', 'N/A')
                 )
-                
-                fig.add_hline(y=37.8, line_dash="dash", line_color="orange")
-                fig.add_hline(y=39.0, line_dash="dash", line_color="red")
-                
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Distribuição de temperaturas
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    fig_hist = px.histogram(
-                        df, 
-                        x='value', 
-                        title="Distribuição de Temperaturas",
-                        labels={'value': 'Temperatura (°C)', 'count': 'Frequência'},
-                        nbins=20
-                    )
-                    st.plotly_chart(fig_hist, use_container_width=True)
-                
-                with col2:
-                    # Contagem por status
-                    df['status'] = df['value'].apply(self.iot_manager._get_temp_status)
-                    status_counts = df['status'].value_counts()
-                    
-                    fig_pie = px.pie(
-                        values=status_counts.values,
-                        names=status_counts.index,
-                        title="Distribuição por Status"
-                    )
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                
-                # Tabela de dados
-                st.subheader("📋 Dados Detalhados")
-                df_display = df[['timestamp', 'device_id', 'value', 'unit', 'location']].copy()
                 df_display['status'] = df_display['value'].apply(self.iot_manager._get_temp_status)
-                df_display = df_display.sort_values('timestamp', ascending=False)
                 df_display['timestamp'] = df_display['timestamp'].dt.strftime('%d/%m/%Y %H:%M:%S')
+                if total_filtro is not None and total_filtro > len(df_display):
+                    st.caption(f"Exibindo as {len(df_display)} leituras mais recentes de {total_filtro}")
+                elif total_filtro is None and len(df_display) >= 1000:
+                    st.caption(f"Exibindo as {len(df_display)} leituras mais recentes")
                 
                 st.dataframe(df_display, use_container_width=True)
                 
@@ -561,6 +629,8 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
                     )
             else:
                 st.info("📊 Nenhum dado encontrado para os filtros selecionados")
+        elif devices:
+            st.info("📊 Nenhum dado encontrado para os filtros selecionados")
         else:
             st.info("📊 Nenhuma leitura disponível")
     
@@ -568,18 +638,56 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
         """Mostra configurações do sistema IoT"""
         st.subheader("⚙️ Configurações IoT")
         
-        # Configurações de alertas
+        # Configurações de alertas (regra padrão do motor de alertas)
         st.write("🚨 **Configurações de Alertas**")
         
+        motor = self.iot_manager.alert_engine
+        regra = motor.padrao
+        
         col1, col2 = st.columns(2)
         
         with col1:
-            fever_threshold = st.number_input("Limite para Febre (°C)", value=37.8, step=0.1)
-            critical_threshold = st.number_input("Limite Crítico (°C)", value=39.0, step=0.1)
+            fever_threshold = st.number_input("Limite para Febre (°C)", value=float(regra['febre']), step=0.1)
+            critical_threshold = st.number_input("Limite Crítico (°C)", value=float(regra['critico']), step=0.1)
+            hysteresis = st.number_input("Histerese (°C)", value=float(regra['histerese']), min_value=0.0, step=0.1,
+                                         help="Quanto a temperatura precisa recuar além do limite para o alerta terminar")
+            min_duration = st.number_input("Duração Mínima (segundos)", value=int(regra['duracao_minima_s']), min_value=0, step=5,
+                                           help="Tempo acima do limite antes de alertar")
         
         with col2:
-            low_temp_threshold = st.number_input("Limite Baixo (°C)", value=35.0, step=0.1)
+            low_temp_threshold = st.number_input("Limite Baixo (°C)", value=float(regra['baixa']), step=0.1)
             reading_interval = st.number_input("Intervalo de Leitura (segundos)", value=30, step=5)
+            suppression = st.number_input("Lembrete a cada (minutos, 0 = nunca)", value=int(regra['supressao_s'] // 60), min_value=0, step=5)
+            escalation = st.number_input("Escalonar após (minutos, 0 = nunca)", value=int(regra['escalonamento_s'] // 60), min_value=0, step=5)
+        
+        max_per_hour = st.number_input("Máximo de Alertas por Dispositivo por Hora (0 = sem limite)",
+                                       value=int(regra['limite_por_hora']), min_value=0, step=1)
+        
+        with st.expander("📍 Regras por Local ou Dispositivo"):
+            st.caption("Sobrescrevem os limites padrão; a regra do dispositivo prevalece sobre a do local.")
+            scope_label = st.radio("Aplicar a", ["Dispositivo", "Local"], horizontal=True)
+            scope = 'dispositivos' if scope_label == "Dispositivo" else 'locais'
+            devices = self.iot_manager.get_all_devices()
+            if scope == 'dispositivos':
+                options = sorted(devices)
+            else:
+                options = sorted({d.get('location') for d in devices.values() if d.get('location')})
+            target = st.selectbox(scope_label, options) if options else st.text_input(scope_label)
+            current = getattr(motor, scope).get(target, {}) if target else {}
+            effective = {**regra, **current}
+            col1, col2, col3 = st.columns(3)
+            rule_fever = col1.number_input("Febre (°C)", value=float(effective['febre']), step=0.1, key="rule_fever")
+            rule_critical = col2.number_input("Crítico (°C)", value=float(effective['critico']), step=0.1, key="rule_critical")
+            rule_low = col3.number_input("Baixa (°C)", value=float(effective['baixa']), step=0.1, key="rule_low")
+            col1, col2 = st.columns(2)
+            if col1.button("💾 Salvar Regra", disabled=not target):
+                motor.definir_regra(scope, target, {'febre': rule_fever, 'critico': rule_critical, 'baixa': rule_low})
+                st.success(f"✅ Regra salva para {target}")
+            if col2.button("🗑️ Remover Regra", disabled=not current):
+                motor.definir_regra(scope, target, None)
+                st.success(f"✅ Regra de {target} removida")
+            if motor.locais or motor.dispositivos:
+                st.json({'locais': motor.locais, 'dispositivos': motor.dispositivos})
         
         # Configurações de conectividade
         st.write("🌐 **Configurações de Conectividade**")
@@ -591,9 +699,21 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
             max_readings = st.number_input("Máximo de Leituras Armazenadas", value=1000, step=100)
         
         with col2:
-            device_timeout = st.number_input("Timeout de Dispositivo (minutos)", value=10, step=1)
+            device_timeout = st.number_input("Timeout de Dispositivo (minutos)", value=float(self.iot_manager.presence.timeout_min),
+                                             min_value=1.0, step=1.0, help="Sem leituras por este tempo, o dispositivo fica offline")
         
         if st.button("💾 Salvar Configurações", use_container_width=True):
+            motor.atualizar_padrao(
+                febre=fever_threshold,
+                critico=critical_threshold,
+                baixa=low_temp_threshold,
+                histerese=hysteresis,
+                duracao_minima_s=min_duration,
+                supressao_s=suppression * 60,
+                escalonamento_s=escalation * 60,
+                limite_por_hora=max_per_hour
+            )
+            self.iot_manager.presence.definir_timeout(device_timeout)
             st.success("✅ Configurações salvas com sucesso!")
         
         # Informações do sistema
@@ -610,7 +730,18 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
             st.info(f"**Método:** POST")
             st.info(f"**Formato:** JSON")
             st.info(f"**Content-Type:** application/json")
-        
+
+        # Fila de ingestão (transportes → armazenamento)
+        st.write("📥 **Fila de Ingestão**")
+        metricas_fila = self.iot_manager.get_queue_metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Profundidade", f"{metricas_fila['profundidade']}/{metricas_fila['capacidade']}")
+        col2.metric("Latência p95", f"{metricas_fila['latencia_p95_ms']:.1f} ms")
+        col3.metric("Descartadas", metricas_fila['descartadas'] + metricas_fila['rejeitadas'])
+        col4.metric("Duplicadas", metricas_fila['duplicadas'])
+        st.caption(f"Política com fila cheia: {metricas_fila['politica']} · "
+                   f"{metricas_fila['processadas']} leituras em {metricas_fila['lotes']} micro-lotes")
+
         # Exemplo de payload
         st.write("📝 **Exemplo de Payload JSON:**")
         
@@ -643,7 +774,7 @@ curl -X POST http://127.0.0.1:5001/api/sensor-data \\
             )
             
             st.success(f"✅ Leitura de teste criada: {test_temp}°C")
-            st.json(test_reading)
+            st.json(test_reading.para_dict())
     
     def get_latest_temperature_for_triagem(self):
         """Obtém última temperatura para integração com triagem"""
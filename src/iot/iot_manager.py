@@ -1,104 +1,87 @@
 import json
-import os
+import math
 import requests
-from datetime import datetime, timedelta
-import streamlit as st
+from datetime import datetime
 from flask import Flask, request, jsonify
 import threading
 import time
+from ..utils.tempo import agora_ms, para_epoch_ms, MS_POR_MINUTO
+from .registros import LeituraSensor
+from .ingestao import NucleoIngestao, novo_dispositivo
+from .fila_ingestao import FilaIngestao
+from .alertas import MotorAlertas
+from .central_alertas import CentralAlertas
+from .presenca import MonitorPresenca
+from .servidor_async import ServidorIoTAsync
+from ..config.config import Config
 
 class IoTManager:
+    # Limite de leituras por requisição em /api/sensor-data/batch
+    MAX_BATCH_SIZE = 5000
+    # Timestamps do dispositivo antes disto (ex.: millis() desde o boot) ou no futuro usam a hora de recepção
+    MIN_DEVICE_TIMESTAMP = 1577836800000  # 2020-01-01T00:00:00Z
+    MAX_CLOCK_SKEW_MS = 5 * MS_POR_MINUTO
+    
     def __init__(self):
         self.devices_file = 'iot_devices.json'
-        self.readings_file = 'iot_readings.json'
+        self.readings_file = 'iot_readings.jsonl'
+        self.series_dir = Config.IOT_SERIES_DIR
         self.flask_app = None
         self.flask_thread = None
-        self._init_files()
-    
-    def _init_files(self):
-        """Inicializa arquivos de dados IoT"""
-        if not os.path.exists(self.devices_file):
-            with open(self.devices_file, 'w') as f:
-                json.dump({}, f, indent=2)
-        
-        if not os.path.exists(self.readings_file):
-            with open(self.readings_file, 'w') as f:
-                json.dump([], f, indent=2)
+        self.api_server = None
+        # Buffer em memória e persistência em segundo plano, compartilhados no processo
+        self.nucleo = NucleoIngestao.compartilhado(
+            self.readings_file, self.devices_file,
+            series_dir=self.series_dir, retencao_dias=Config.IOT_RETENTION_DAYS,
+            limite_febre=Config.TEMPERATURE_THRESHOLDS['FEVER_MIN'],
+            limite_critico=Config.TEMPERATURE_THRESHOLDS['CRITICAL_MIN']
+        )
+        # Regras de alerta com estado por dispositivo, compartilhadas no processo
+        self.alert_engine = MotorAlertas.compartilhado(Config.IOT_ALERT_RULES_FILE)
+        # Alertas visíveis a todas as sessões do painel (buffer + log em disco)
+        self.alert_store = CentralAlertas.compartilhada(Config.IOT_ALERTS_FILE, capacidade=Config.IOT_ALERTS_CAPACITY)
+        # Fila limitada entre os transportes (MQTT, API) e o armazenamento, uma por núcleo
+        self.ingestion_queue = FilaIngestao.compartilhada(
+            self.nucleo, self._store_readings,
+            capacidade=Config.IOT_QUEUE_CAPACITY, politica=Config.IOT_QUEUE_POLICY,
+            tamanho_lote=Config.IOT_QUEUE_BATCH_SIZE, tempo_bloqueio=Config.IOT_QUEUE_BLOCK_TIMEOUT
+        )
+        # Presença online/offline por prazo (roda de temporização) e last-will MQTT, um monitor por núcleo
+        self.presence = MonitorPresenca.compartilhado(
+            self.nucleo, timeout_min=Config.IOT_DEVICE_TIMEOUT_MIN, ao_mudar=self._on_presence_change
+        )
     
     def register_device(self, device_id, device_name, device_type, location):
         """Registra um novo dispositivo IoT"""
-        devices = self._load_devices()
-        
-        devices[device_id] = {
-            'name': device_name,
-            'type': device_type,
-            'location': location,
-            'registered_at': datetime.now().isoformat(),
-            'last_seen': None,
-            'status': 'offline',
-            'battery_level': None,
-            'firmware_version': None
-        }
-        
-        self._save_devices(devices)
+        self.nucleo.registrar_dispositivo(device_id, novo_dispositivo(device_name, device_type, location))
         return True
     
     def _load_devices(self):
-        """Carrega dispositivos registrados"""
-        try:
-            with open(self.devices_file, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    
-    def _save_devices(self, devices):
-        """Salva dispositivos"""
-        with open(self.devices_file, 'w') as f:
-            json.dump(devices, f, indent=2)
+        """Carrega dispositivos registrados (cópia do registro em memória)"""
+        return self.nucleo.obter_dispositivos()
     
     def _load_readings(self):
-        """Carrega leituras dos sensores"""
-        try:
-            with open(self.readings_file, 'r') as f:
-                return json.load(f)
-        except:
-            return []
+        """Carrega leituras dos sensores (registros LeituraSensor do buffer em memória)"""
+        return self.nucleo.obter_leituras()
     
-    def _save_readings(self, readings):
-        """Salva leituras dos sensores"""
-        with open(self.readings_file, 'w') as f:
-            json.dump(readings, f, indent=2)
+    def get_recent_readings(self, quantidade=10):
+        """Últimas leituras do buffer em memória (da mais antiga para a mais recente)"""
+        self.nucleo.sincronizar()
+        return self.nucleo.leituras.recentes(quantidade)
     
     def receive_sensor_data(self, device_id, sensor_type, value, unit='°C', location=None, 
                            battery_level=None, firmware_version=None, status=None):
-        """Recebe dados de um sensor IoT"""
-        readings = self._load_readings()
-        devices = self._load_devices()
-        
+        """Recebe dados de um sensor IoT (O(1): buffer em memória, gravação em segundo plano)"""
         # Auto-registrar dispositivo se não existir
-        if device_id not in devices:
+        if not self.nucleo.possui_dispositivo(device_id):
             self.register_device(
                 device_id=device_id,
                 device_name=f"Sensor {device_id}",
                 device_type=sensor_type,
                 location=location or "Local não especificado"
             )
-            devices = self._load_devices()
-        
-        # Atualizar status do dispositivo
-        if device_id in devices:
-            devices[device_id]['last_seen'] = datetime.now().isoformat()
-            devices[device_id]['status'] = 'online'
-            if battery_level is not None:
-                devices[device_id]['battery_level'] = battery_level
-            if firmware_version is not None:
-                devices[device_id]['firmware_version'] = firmware_version
-            if location is not None:
-                devices[device_id]['location'] = location
-            self._save_devices(devices)
-        
-        # Salvar leitura
-        reading = {
+        
+        reading = LeituraSensor.de_dict({
             'device_id': device_id,
             'sensor_type': sensor_type,
             'value': float(value),
@@ -107,78 +90,315 @@ class IoTManager:
             'battery_level': battery_level,
             'firmware_version': firmware_version,
             'status': status,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': agora_ms(),
             'processed': False
-        }
-        
-        readings.append(reading)
+        })
         
-        # Manter apenas últimas 1000 leituras
-        if len(readings) > 1000:
-            readings = readings[-1000:]
-        
-        self._save_readings(readings)
+        # Buffer circular, status do dispositivo e fila de persistência
+        self.nucleo.adicionar(reading, location, battery_level, firmware_version)
         
         # Verificar alertas
         self._check_alerts(reading)
         
         return reading
     
-    def _check_alerts(self, reading):
-        """Verifica se a leitura requer alertas"""
-        if reading['sensor_type'] == 'temperature' and reading['unit'] == '°C':
-            temp = reading['value']
-            device_id = reading['device_id']
-            
-            if temp >= 39.0:
-                self._send_alert('CRITICAL', f"🚨 Temperatura crítica detectada: {temp}°C no dispositivo {device_id}", reading)
-            elif temp >= 37.8:
-                self._send_alert('HIGH', f"⚠️ Febre detectada: {temp}°C no dispositivo {device_id}", reading)
-            elif temp <= 35.0:
-                self._send_alert('LOW', f"🔵 Temperatura baixa detectada: {temp}°C no dispositivo {device_id}", reading)
-    
-    def _send_alert(self, level, message, reading):
-        """Envia alertas"""
-        alert = {
-            'level': level,
-            'message': message,
-            'reading': reading,
-            'timestamp': datetime.now().isoformat()
+    @staticmethod
+    def parse_batch(body, content_type=''):
+        """
+        Itens de um corpo de lote: lista JSON, objeto com 'readings' ou NDJSON
+        
+        No objeto com 'readings', os demais campos (ex.: device_id, location)
+        valem para todas as leituras. Linhas NDJSON inválidas viram itens de
+        erro (ValueError), rejeitados individualmente.
+        """
+        text = body.decode('utf-8') if isinstance(body, bytes) else body
+        text = text.strip()
+        if not text:
+            return []
+        
+        if 'ndjson' not in content_type and text[0] in '[{':
+            try:
+                data = json.loads(text)
+            except ValueError:
+                data = None  # Pode ser NDJSON sem o Content-Type
+            if isinstance(data, list):
+                return data
+            if isinstance(data, dict):
+                if isinstance(data.get('readings'), list):
+                    common = {k: v for k, v in data.items() if k != 'readings'}
+                    return [{**common, **item} if isinstance(item, dict) else item for item in data['readings']]
+                return [data]
+            if text[0] == '[':
+                raise ValueError("JSON inválido no lote")
+        
+        items = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if line.strip():
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    items.append(ValueError(f"JSON inválido na linha {number}"))
+        return items
+    
+    def _validate_reading(self, item, received_at):
+        """Normaliza um item do lote (ValueError com o motivo se inválido)"""
+        if isinstance(item, Exception):
+            raise item
+        if not isinstance(item, dict):
+            raise ValueError("Item deve ser um objeto JSON")
+        device_id = item.get('device_id')
+        if not device_id or not isinstance(device_id, str):
+            raise ValueError("device_id é obrigatório")
+        if item.get('value') is None:
+            raise ValueError("value é obrigatório")
+        try:
+            value = float(item['value'])
+        except (TypeError, ValueError):
+            raise ValueError(f"value inválido: {item['value']!r}")
+        if not math.isfinite(value):
+            raise ValueError(f"value inválido: {item['value']!r}")
+        
+        timestamp = received_at
+        if item.get('timestamp') not in (None, ''):
+            try:
+                timestamp = para_epoch_ms(item['timestamp'])
+            except (TypeError, ValueError):
+                raise ValueError(f"timestamp inválido: {item['timestamp']!r}")
+            if not self.MIN_DEVICE_TIMESTAMP <= timestamp <= received_at + self.MAX_CLOCK_SKEW_MS:
+                timestamp = received_at
+        
+        return {
+            'device_id': device_id,
+            'sensor_type': item.get('sensor_type') or 'temperature',
+            'value': value,
+            'unit': item.get('unit', '°C'),
+            'location': item.get('location'),
+            'battery_level': item.get('battery_level'),
+            'firmware_version': item.get('firmware_version'),
+            'status': item.get('status'),
+            'timestamp': timestamp,
+            'processed': False
         }
+    
+    def _validate_batch(self, items):
+        """Normaliza os itens do lote: (recebido_em, [(índice, leitura)], [rejeitados])"""
+        received_at = agora_ms()
+        results = []
+        accepted = []
+        for index, item in enumerate(items):
+            try:
+                accepted.append((index, self._validate_reading(item, received_at)))
+            except ValueError as e:
+                results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+        return received_at, accepted, results
+    
+    def _store_readings(self, readings_data, received_at=None):
+        """
+        Grava leituras normalizadas numa única transação do núcleo de ingestão
+        
+        Registra dispositivos novos, anexa ao buffer/persistência e avalia
+        alertas sobre o conjunto. Usado pelo lote síncrono e pela fila de ingestão.
+        
+        Returns:
+            int: Número sequencial da primeira leitura (None se vazio)
+        """
+        # Auto-registrar dispositivos novos (uma vez por dispositivo)
+        for data in readings_data:
+            if not self.nucleo.possui_dispositivo(data['device_id']):
+                self.register_device(
+                    device_id=data['device_id'],
+                    device_name=f"Sensor {data['device_id']}",
+                    device_type=data['sensor_type'],
+                    location=data['location'] or "Local não especificado"
+                )
+        
+        readings = [LeituraSensor.de_dict(data) for data in readings_data]
+        if not readings:
+            return None
+        first_id = self.nucleo.adicionar_lote([
+            (reading, data['location'], data['battery_level'], data['firmware_version'])
+            for reading, data in zip(readings, readings_data)
+        ], visto_em=received_at)
+        self._check_alerts_batch(readings)
+        return first_id
+    
+    def receive_sensor_batch(self, items):
+        """
+        Recebe um lote de leituras (ex.: ESP32 reenviando o que guardou offline)
+        
+        Valida todos os itens, grava os válidos numa única transação do núcleo
+        de ingestão e avalia alertas sobre o lote inteiro.
+        
+        Args:
+            items: Lista de dicionários no formato de /api/sensor-data
+                   (timestamp opcional, em epoch ms ou ISO)
+        
+        Returns:
+            dict: 'accepted', 'rejected' e 'results' (status por item, na ordem recebida)
+        """
+        received_at, accepted, results = self._validate_batch(items)
+        
+        if accepted:
+            first_id = self._store_readings([data for _, data in accepted], received_at)
+            for offset, (index, _) in enumerate(accepted):
+                results.append({'index': index, 'status': 'accepted', 'reading_id': first_id + offset})
+            results.sort(key=lambda r: r['index'])
+        
+        return {
+            'accepted': len(accepted),
+            'rejected': len(items) - len(accepted),
+            'results': results
+        }
+    
+    def enqueue_sensor_data(self, data, block=True):
+        """
+        Valida uma leitura e a coloca na fila de ingestão (gravação e alertas na thread da fila)
         
-        # Salvar alerta no session state para exibir no Streamlit (se disponível)
+        Args:
+            data: Dicionário no formato de /api/sensor-data (timestamp opcional)
+            block: Se False, nunca espera por espaço (ex.: thread de rede do MQTT)
+        
+        Returns:
+            dict: Leitura normalizada, ou None se a fila recusou (cheia)
+        
+        Raises:
+            ValueError: Leitura inválida
+        """
+        received_at = agora_ms()
+        reading = self._validate_reading(data, received_at)
+        if not self.ingestion_queue.enfileirar(reading, block, self._dedupe_key(reading, received_at)):
+            return None
+        return reading
+    
+    def enqueue_sensor_batch(self, items, block=True):
+        """
+        Valida um lote e coloca os itens válidos na fila de ingestão
+        
+        Returns:
+            dict: 'accepted', 'rejected' e 'results' como em receive_sensor_batch
+                  (sem reading_id; itens recusados pela fila cheia têm 'error')
+        """
+        received_at, accepted, results = self._validate_batch(items)
+        
+        queued = self.ingestion_queue.enfileirar_lote(
+            [data for _, data in accepted], block,
+            [self._dedupe_key(data, received_at) for _, data in accepted]
+        )
+        for position, (index, _) in enumerate(accepted):
+            if position < queued:
+                results.append({'index': index, 'status': 'accepted'})
+            else:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Fila de ingestão cheia'})
+        results.sort(key=lambda r: r['index'])
+        
+        return {
+            'accepted': queued,
+            'rejected': len(items) - queued,
+            'results': results
+        }
+    
+    @staticmethod
+    def _dedupe_key(reading, received_at):
+        """Identidade para descartar reenvios: só leituras com timestamp do próprio dispositivo"""
+        if reading['timestamp'] == received_at:
+            return None
+        return (reading['device_id'], reading['sensor_type'], reading['timestamp'], reading['value'])
+    
+    def get_queue_metrics(self):
+        """Profundidade, latência e descartes da fila de ingestão"""
+        return self.ingestion_queue.metricas()
+    
+    def _check_alerts(self, reading):
+        """Avalia a leitura no motor de alertas (estado por dispositivo, O(1)) e envia os eventos"""
+        location = reading['location'] or self.nucleo.dispositivos.get(reading['device_id'], {}).get('location')
+        for event in self.alert_engine.avaliar(reading, location):
+            self._send_alert(event['level'], event['message'], reading, event['tipo'])
+    
+    def _check_alerts_batch(self, readings):
+        """Alertas de um lote em ordem cronológica (o motor agrupa as leituras em episódios)"""
+        for reading in sorted(readings, key=lambda r: r['timestamp']):
+            self._check_alerts(reading)
+    
+    def _send_alert(self, level, message, reading, kind='disparo'):
+        """Publica o alerta na central de alertas (kind: 'disparo', 'lembrete', 'escalonamento' ou 'normalizado')"""
         try:
-            if 'iot_alerts' not in st.session_state:
-                st.session_state['iot_alerts'] = []
-            
-            st.session_state['iot_alerts'].append(alert)
-            
-            # Manter apenas últimos 50 alertas
-            if len(st.session_state['iot_alerts']) > 50:
-                st.session_state['iot_alerts'] = st.session_state['iot_alerts'][-50:]
-        except Exception:
-            # Se não estiver no contexto do Streamlit, apenas imprimir
-            pass
+            self.alert_store.publicar({
+                'level': level,
+                'kind': kind,
+                'source': 'regras',
+                'message': message,
+                'device_id': reading['device_id'],
+                'location': reading['location'],
+                'reading': dict(reading)
+            })
+        except OSError as e:
+            print(f"❌ Erro ao gravar alerta: {str(e)}")
         
-        print(f"🚨 ALERTA {level}: {message}")
+        if kind == 'normalizado':
+            print(message)
+        else:
+            print(f"🚨 ALERTA {level}: {message}")
     
     def get_latest_reading(self, device_id, sensor_type):
-        """Obtém a leitura mais recente de um sensor"""
-        readings = self._load_readings()
-        
-        device_readings = [
-            r for r in readings 
-            if r['device_id'] == device_id and r['sensor_type'] == sensor_type
-        ]
+        """Obtém a leitura mais recente de um sensor (tabela de últimas leituras, O(1))"""
+        return self.nucleo.obter_ultima(device_id, sensor_type)
+    
+    def get_history(self, inicio_ms=None, fim_ms=None, device_id=None, sensor_type='temperature',
+                    limite=None, valor_min=None, valor_max=None):
+        """Leituras duráveis do intervalo (série temporal em segmentos diários; com limite, só as mais recentes)"""
+        return self.nucleo.serie.consultar(inicio_ms, fim_ms, device_id, sensor_type,
+                                           limite=limite, valor_min=valor_min, valor_max=valor_max)
+    
+    def get_rollups(self, resolucao, inicio_ms=None, fim_ms=None, device_id=None, sensor_type='temperature'):
+        """Agregados por dispositivo na resolução 'minuto', 'hora' ou 'dia'"""
+        return self.nucleo.serie.agregados.consultar(resolucao, inicio_ms, fim_ms, device_id, sensor_type)
+    
+    def update_presence(self, device_id, status, session=False):
+        """
+        Aplica uma mensagem de status do dispositivo (MQTT termometro/status)
         
-        if device_readings:
-            return sorted(device_readings, key=lambda x: x['timestamp'])[-1]
-        return None
+        'offline' derruba o dispositivo na hora; 'online' no status retido de
+        presença (session) abre uma sessão, online até o last-will; qualquer
+        outra mensagem conta como sinal de vida.
+        """
+        if not self.nucleo.possui_dispositivo(device_id):
+            return False
+        if status == 'online' and session:
+            self.presence.conectado(device_id)
+        elif status == 'offline':
+            self.presence.desconectado(device_id)
+        else:
+            self.presence.visto(device_id, origem='mqtt')
+        return True
+    
+    def _on_presence_change(self, event):
+        """Transição online/offline do monitor de presença: log e central de alertas"""
+        device_id = event['device_id']
+        if event['status'] == 'offline':
+            if event['origem'] == 'timeout':
+                message = f"📴 Dispositivo {device_id} offline (sem sinal há {self.presence.timeout_min:g} min)"
+            else:
+                message = f"📴 Dispositivo {device_id} desconectou do broker MQTT"
+            level, kind = 'HIGH', 'presenca'
+        elif event['reconectado']:
+            message = f"📶 Dispositivo {device_id} voltou a ficar online"
+            level, kind = 'NORMAL', 'normalizado'
+        else:
+            print(f"📶 Dispositivo {device_id} online")
+            return
+        print(message)
+        self.alert_store.publicar({
+            'level': level,
+            'message': message,
+            'kind': kind,
+            'source': 'presenca',
+            'device_id': device_id,
+            'location': self.nucleo.dispositivos.get(device_id, {}).get('location')
+        })
     
     def get_device_status(self, device_id):
         """Obtém status de um dispositivo"""
-        devices = self._load_devices()
-        return devices.get(device_id, None)
+        return self.nucleo.obter_dispositivo(device_id)
     
     def get_all_devices(self):
         """Obtém todos os dispositivos"""
@@ -186,193 +406,275 @@ class IoTManager:
     
     def get_latest_temperature_for_triagem(self):
         """Obtém última temperatura para integração com triagem"""
-        readings = self._load_readings()
+        # Ponteiro da temperatura mais recente: a janela de 5 minutos é uma comparação de inteiros
+        latest = self.nucleo.obter_ultima_temperatura(desde_ms=agora_ms() - 5 * MS_POR_MINUTO)
         
-        if readings:
-            # Filtrar apenas leituras de temperatura dos últimos 5 minutos
-            recent_readings = []
-            cutoff_time = datetime.now() - timedelta(minutes=5)
-            
-            for reading in readings:
-                if reading['sensor_type'] == 'temperature':
-                    reading_time = datetime.fromisoformat(reading['timestamp'])
-                    if reading_time > cutoff_time:
-                        recent_readings.append(reading)
-            
-            if recent_readings:
-                # Pegar a mais recente
-                latest = sorted(recent_readings, key=lambda x: x['timestamp'])[-1]
-                
-                return {
-                    'temperature': latest['value'],
-                    'device_id': latest['device_id'],
-                    'timestamp': latest['timestamp'],
-                    'location': latest.get('location', 'N/A'),
-                    'status': self._get_temp_status(latest['value'])
-                }
+        if latest:
+            return {
+                'temperature': latest['value'],
+                'device_id': latest['device_id'],
+                'timestamp': latest['timestamp'],
+                'location': latest.get('location', 'N/A'),
+                'status': self._get_temp_status(latest['value'])
+            }
         
         return None
     
     def _get_temp_status(self, temp):
-        """Retorna status baseado na temperatura"""
-        if temp >= 39.0:
+        """Retorna status baseado na temperatura (limites da regra de alerta padrão)"""
+        level = MotorAlertas.classificar(temp, self.alert_engine.padrao)
+        if level == 'CRITICAL':
             return "🔴 Crítico"
-        elif temp >= 37.8:
+        elif level == 'HIGH':
             return "🟡 Febre"
-        elif temp <= 35.0:
+        elif level == 'LOW':
             return "🔵 Baixa"
         else:
             return "🟢 Normal"
     
-    def start_api_server(self, port=5002):
-        """Inicia servidor Flask para receber dados IoT"""
+    # ------------------------------------------------------------------
+    # Handlers da API (compartilhados pelo servidor asyncio e pelo Flask)
+    # Cada um retorna (payload, status HTTP)
+    # ------------------------------------------------------------------
+    
+    def api_info(self):
+        """GET / - Informações da API"""
+        return {
+            'message': 'Sistema IoT - API de Sensores',
+            'version': '2.0.0',
+            'status': 'online',
+            'timestamp': datetime.now().isoformat(),
+            'endpoints': {
+                'POST /api/sensor-data': 'Receber dados de sensores',
+                'POST /api/sensor-data/batch': 'Receber lote de leituras (JSON array ou NDJSON)',
+                'POST /webhook': 'Endpoint para webhooks ESP32',
+                'GET /api/device-status/<device_id>': 'Status do dispositivo',
+                'GET /api/health': 'Health check da API'
+            },
+            'devices_count': len(self.get_all_devices()),
+            'readings_count': len(self.nucleo.leituras)
+        }, 200
+    
+    def api_sensor_data(self, data):
+        """POST /api/sensor-data - Uma leitura (enfileirada; 503 se a fila estiver cheia)"""
+        try:
+            if not isinstance(data, dict):
+                return {'error': 'Invalid JSON body'}, 400
+            if not all([data.get('device_id'), data.get('sensor_type'), data.get('value') is not None]):
+                return {'error': 'Missing required fields'}, 400
+            
+            try:
+                reading = self.enqueue_sensor_data(data)
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            if reading is None:
+                return self._queue_full_response()
+            
+            return {
+                'status': 'success',
+                'queued': True,
+                'timestamp': reading['timestamp'],
+                'message': 'Data received successfully'
+            }, 202
+        
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    def _queue_full_response(self):
+        """Resposta 503 de fila de ingestão cheia (o dispositivo deve reenviar)"""
+        return {
+            'error': 'Fila de ingestão cheia',
+            'retry_after': 1,
+            'queue_depth': len(self.ingestion_queue)
+        }, 503
+    
+    def api_sensor_batch(self, body, content_type=''):
+        """POST /api/sensor-data/batch - Lote em JSON array, objeto com 'readings' ou NDJSON"""
+        try:
+            items = self.parse_batch(body, content_type)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        if not items:
+            return {'error': 'Nenhuma leitura no lote'}, 400
+        if len(items) > self.MAX_BATCH_SIZE:
+            return {'error': f'Lote excede {self.MAX_BATCH_SIZE} leituras'}, 413
+        
+        try:
+            result = self.enqueue_sensor_batch(items)
+        except Exception as e:
+            return {'error': str(e)}, 500
+        
+        if not result['accepted'] and any(r.get('error') == 'Fila de ingestão cheia' for r in result['results']):
+            payload, status = self._queue_full_response()
+            return {**payload, **result}, status
+        if not result['rejected']:
+            status = 'success'
+        elif result['accepted']:
+            status = 'partial'
+        else:
+            status = 'error'
+        return {
+            'status': status,
+            'timestamp': agora_ms(),
+            **result
+        }, 202 if result['accepted'] else 400
+    
+    def api_webhook(self, data):
+        """POST /webhook (e POST /) - Payload do ESP32: leitura ou registro"""
+        try:
+            if not isinstance(data, dict):
+                return {'error': 'JSON inválido'}, 400
+            print(f"📨 Dados recebidos do webhook: {data}")
+            
+            # Extrair dados do payload ESP32
+            device_id = data.get('device_id')
+            sensor_type = data.get('sensor_type', 'temperature')
+            value = data.get('value')
+            unit = data.get('unit', '°C')
+            location = data.get('location')
+            
+            # Validar dados obrigatórios
+            if not device_id or value is None:
+                print("❌ Dados obrigatórios faltando")
+                return {'error': 'device_id e value são obrigatórios'}, 400
+            
+            # Verificar se é registro de dispositivo
+            if data.get('action') == 'register':
+                print(f"📝 Registrando dispositivo: {device_id}")
+                self.register_device(
+                    device_id=device_id,
+                    device_name=f"ESP32 {device_id}",
+                    device_type=sensor_type,
+                    location=location or "ESP32 Sensor"
+                )
+                return {
+                    'status': 'success',
+                    'message': 'Device registered successfully',
+                    'device_id': device_id
+                }, 200
+            
+            # Processar leitura do sensor
+            print(f"🌡️ Processando leitura: {value}{unit} de {device_id}")
+            try:
+                reading = self.enqueue_sensor_data({**data, 'sensor_type': sensor_type, 'unit': unit})
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            if reading is None:
+                print("⚠️ Fila de ingestão cheia, leitura recusada")
+                return self._queue_full_response()
+            
+            # Log do status da temperatura
+            if sensor_type == 'temperature':
+                temp_status = self._get_temp_status(reading['value'])
+                print(f"📊 Status: {temp_status}")
+            
+            return {
+                'status': 'success',
+                'message': 'Data received and queued for processing',
+                'device_id': device_id,
+                'queued': True,
+                'timestamp': reading['timestamp'],
+                'temperature_status': self._get_temp_status(reading['value']) if sensor_type == 'temperature' else 'N/A'
+            }, 202
+        
+        except Exception as e:
+            print(f"❌ Erro no webhook: {str(e)}")
+            return {
+                'error': 'Internal server error',
+                'message': str(e)
+            }, 500
+    
+    def api_device_status(self, device_id):
+        """GET /api/device-status/<device_id>"""
+        status = self.get_device_status(device_id)
+        if status:
+            return status, 200
+        return {'error': 'Device not found'}, 404
+    
+    def api_health(self):
+        """GET /api/health"""
+        return {
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'devices_count': len(self.get_all_devices()),
+            'readings_count': len(self.nucleo.leituras),
+            'ingestion_queue': self.get_queue_metrics(),
+            'alerts': {**self.alert_engine.estatisticas(), 'pendentes': self.alert_store.pendentes()},
+            'presence': self.presence.estatisticas()
+        }, 200
+    
+    def api_test(self):
+        """POST /api/test - Teste de conectividade"""
+        return {
+            'status': 'success',
+            'message': 'Test endpoint working',
+            'timestamp': datetime.now().isoformat()
+        }, 200
+    
+    def start_api_server(self, port=5002, backend=None):
+        """
+        Inicia o servidor HTTP que recebe dados IoT (em thread daemon)
+        
+        Args:
+            port: Porta do servidor
+            backend: 'async' (servidor asyncio, padrão de Config.IOT_API_SERVER) ou 'flask'
+        
+        Returns:
+            bool: True se iniciou agora, False se já havia servidor nesta porta ou falhou
+        """
+        backend = backend or Config.IOT_API_SERVER
+        if backend == 'flask':
+            return self._start_flask_server(port)
+        
+        if ServidorIoTAsync.ativo(port):
+            return False
+        self.api_server = ServidorIoTAsync(self, port=port)
+        if not self.api_server.iniciar_em_thread():
+            return False
+        print(f"🚀 Servidor IoT API (asyncio) iniciado na porta {port}")
+        print(f"📡 Webhook ESP32 disponível em: http://localhost:{port}/webhook")
+        return True
+    
+    def _start_flask_server(self, port=5002):
+        """Servidor Flask de desenvolvimento (alternativa ao servidor asyncio)"""
         if self.flask_app is None:
             self.flask_app = Flask(__name__)
             
+            def responder(resultado):
+                payload, status = resultado
+                return jsonify(payload), status
+            
             @self.flask_app.route('/', methods=['GET'])
             def home():
-                return jsonify({
-                    'message': 'Sistema IoT - API de Sensores',
-                    'version': '2.0.0',
-                    'status': 'online',
-                    'timestamp': datetime.now().isoformat(),
-                    'endpoints': {
-                        'POST /api/sensor-data': 'Receber dados de sensores',
-                        'POST /webhook': 'Endpoint para webhooks ESP32',
-                        'GET /api/device-status/<device_id>': 'Status do dispositivo',
-                        'GET /api/health': 'Health check da API'
-                    },
-                    'devices_count': len(self.get_all_devices()),
-                    'readings_count': len(self._load_readings())
-                })
+                return responder(self.api_info())
             
             @self.flask_app.route('/api/sensor-data', methods=['POST'])
             def receive_data():
-                try:
-                    data = request.json
-                    device_id = data.get('device_id')
-                    sensor_type = data.get('sensor_type')
-                    value = data.get('value')
-                    unit = data.get('unit', '°C')
-                    location = data.get('location')
-                    battery_level = data.get('battery_level')
-                    firmware_version = data.get('firmware_version')
-                    status = data.get('status')
-                    
-                    if not all([device_id, sensor_type, value is not None]):
-                        return jsonify({'error': 'Missing required fields'}), 400
-                    
-                    reading = self.receive_sensor_data(
-                        device_id, sensor_type, value, unit, 
-                        location, battery_level, firmware_version, status
-                    )
-                    
-                    return jsonify({
-                        'status': 'success',
-                        'reading_id': len(self._load_readings()),
-                        'timestamp': reading['timestamp'],
-                        'message': 'Data received successfully'
-                    })
-                
-                except Exception as e:
-                    return jsonify({'error': str(e)}), 500
+                return responder(self.api_sensor_data(request.get_json(silent=True)))
+            
+            @self.flask_app.route('/api/sensor-data/batch', methods=['POST'])
+            def receive_batch():
+                return responder(self.api_sensor_batch(request.get_data(cache=False), request.content_type or ''))
             
             # Novo endpoint específico para webhook do ESP32
             @self.flask_app.route('/webhook', methods=['POST'])
             @self.flask_app.route('/', methods=['POST'])  # Para compatibilidade com webhook.site
             def webhook_esp32():
-                try:
-                    data = request.json
-                    print(f"📨 Dados recebidos do webhook: {data}")
-                    
-                    # Extrair dados do payload ESP32
-                    device_id = data.get('device_id')
-                    sensor_type = data.get('sensor_type', 'temperature')
-                    value = data.get('value')
-                    unit = data.get('unit', '°C')
-                    location = data.get('location')
-                    battery_level = data.get('battery_level')
-                    firmware_version = data.get('firmware_version')
-                    status = data.get('status')
-                    
-                    # Validar dados obrigatórios
-                    if not device_id or value is None:
-                        print("❌ Dados obrigatórios faltando")
-                        return jsonify({'error': 'device_id e value são obrigatórios'}), 400
-                    
-                    # Verificar se é registro de dispositivo
-                    if data.get('action') == 'register':
-                        print(f"📝 Registrando dispositivo: {device_id}")
-                        success = self.register_device(
-                            device_id=device_id,
-                            device_name=f"ESP32 {device_id}",
-                            device_type=sensor_type,
-                            location=location or "ESP32 Sensor"
-                        )
-                        return jsonify({
-                            'status': 'success',
-                            'message': 'Device registered successfully',
-                            'device_id': device_id
-                        })
-                    
-                    # Processar leitura do sensor
-                    print(f"🌡️ Processando leitura: {value}{unit} de {device_id}")
-                    reading = self.receive_sensor_data(
-                        device_id=device_id,
-                        sensor_type=sensor_type,
-                        value=value,
-                        unit=unit,
-                        location=location,
-                        battery_level=battery_level,
-                        firmware_version=firmware_version,
-                        status=status
-                    )
-                    
-                    # Log do status da temperatura
-                    if sensor_type == 'temperature':
-                        temp_status = self._get_temp_status(float(value))
-                        print(f"📊 Status: {temp_status}")
-                    
-                    return jsonify({
-                        'status': 'success',
-                        'message': 'Data received and processed successfully',
-                        'device_id': device_id,
-                        'reading_id': len(self._load_readings()),
-                        'timestamp': reading['timestamp'],
-                        'temperature_status': self._get_temp_status(float(value)) if sensor_type == 'temperature' else 'N/A'
-                    })
-                
-                except Exception as e:
-                    print(f"❌ Erro no webhook: {str(e)}")
-                    return jsonify({
-                        'error': 'Internal server error',
-                        'message': str(e)
-                    }), 500
+                return responder(self.api_webhook(request.get_json(silent=True)))
             
             @self.flask_app.route('/api/device-status/<device_id>', methods=['GET'])
             def get_status(device_id):
-                status = self.get_device_status(device_id)
-                if status:
-                    return jsonify(status)
-                return jsonify({'error': 'Device not found'}), 404
+                return responder(self.api_device_status(device_id))
             
             @self.flask_app.route('/api/health', methods=['GET'])
             def health_check():
-                return jsonify({
-                    'status': 'healthy',
-                    'timestamp': datetime.now().isoformat(),
-                    'devices_count': len(self.get_all_devices()),
-                    'readings_count': len(self._load_readings())
-                })
+                return responder(self.api_health())
             
             # Endpoint para testar conectividade
             @self.flask_app.route('/api/test', methods=['POST'])
             def test_endpoint():
-                return jsonify({
-                    'status': 'success',
-                    'message': 'Test endpoint working',
-                    'timestamp': datetime.now().isoformat()
-                })
+                return responder(self.api_test())
         
         # Executar Flask em thread separada
         if self.flask_thread is None or not self.flask_thread.is_alive():
@@ -381,7 +683,7 @@ class IoTManager:
             )
             self.flask_thread.daemon = True
             self.flask_thread.start()
-            print(f"🚀 Servidor IoT API iniciado na porta {port}")
+            print(f"🚀 Servidor IoT API (Flask) iniciado na porta {port}")
             print(f"📡 Webhook ESP32 disponível em: http://localhost:{port}/webhook")
             return True
-        return False 
\ No newline at end of file
+        return False
@@ -27,7 +27,9 @@ class MQTTManager:
             'status': 'termometro/status',
             'alert': 'termometro/alerta',
             'device': 'termometro/device',
-            'command': 'termometro/comando'  # Novo tópico para comandos
+            'command': 'termometro/comando',  # Novo tópico para comandos
+            # Status retido por dispositivo: 'online' ao conectar, 'offline' como last-will
+            'presence': 'termometro/status/+'
         }
         
         # Log de ambiente
@@ -59,7 +61,8 @@ class MQTTManager:
             
             # Subscrever aos tópicos do termômetro
             for topic_name, topic in self.topics.items():
-                client.subscribe(topic)
+                # QoS 1 na presença: o last-will não pode se perder (o broker reenvia os retidos a cada conexão)
+                client.subscribe(topic, qos=1 if topic_name == 'presence' else 0)
                 print(f"📡 Subscrito ao tópico: {topic}")
                 
         else:
@@ -90,6 +93,8 @@ class MQTTManager:
         """Callback quando recebe uma mensagem"""
         try:
             topic = msg.topic
+            if not msg.payload:
+                return  # Mensagem retida apagada
             payload_str = msg.payload.decode()
             payload = json.loads(payload_str)
             
@@ -105,6 +110,9 @@ class MQTTManager:
                 self._process_temperature_data(payload)
             elif topic == self.topics['status']:
                 self._process_status_data(payload)
+            elif mqtt.topic_matches_sub(self.topics['presence'], topic):
+                payload.setdefault('device_id', topic.rsplit('/', 1)[-1])
+                self._process_status_data(payload, session=True)
             elif topic == self.topics['alert']:
                 self._process_alert_data(payload)
             elif topic == self.topics['device']:
@@ -126,22 +134,26 @@ class MQTTManager:
             battery_level = payload.get('battery_level')
             
             if temperature is not None:
-                # Salvar leitura usando o IoTManager
-                reading = self.iot_manager.receive_sensor_data(
-                    device_id=device_id,
-                    sensor_type='temperature',
-                    value=float(temperature),
-                    unit=unit,
-                    location=location,
-                    battery_level=battery_level,
-                    firmware_version="2.0.0"
-                )
+                # Enfileirar para a thread de ingestão: nunca bloqueia a thread de rede do paho
+                reading = self.iot_manager.enqueue_sensor_data({
+                    'device_id': device_id,
+                    'sensor_type': 'temperature',
+                    'value': temperature,
+                    'unit': unit,
+                    'location': location,
+                    'battery_level': battery_level,
+                    'firmware_version': "2.0.0",
+                    'timestamp': payload.get('timestamp')
+                }, block=False)
+                if reading is None:
+                    print(f"⚠️ Fila de ingestão cheia, leitura de {device_id} descartada")
+                    return
                 
                 print(f"🌡️ Temperatura processada: {temperature}{unit} de {device_id}")
                 print(f"📍 Local: {location}")
                 
                 if self.is_docker:
-                    print(f"🐳 Dados salvos no container: /app/{self.iot_manager.readings_file}")
+                    print(f"🐳 Leitura enfileirada; gravação em /app/{self.iot_manager.readings_file}")
                 
                 # Determinar status da temperatura
                 temp_status = self._get_temperature_status(float(temperature))
@@ -150,8 +162,8 @@ class MQTTManager:
         except Exception as e:
             print(f"❌ Erro ao processar temperatura: {str(e)}")
     
-    def _process_status_data(self, payload):
-        """Processa dados de status do termômetro"""
+    def _process_status_data(self, payload, session=False):
+        """Processa dados de status do termômetro (session: status retido de presença)"""
         try:
             device_id = payload.get('device_id')
             status = payload.get('status')
@@ -163,6 +175,10 @@ class MQTTManager:
             print(f"   Temperatura: {temperature}°C")
             print(f"   Local: {location}")
             
+            # Sessão online / last-will offline / sinal de vida
+            if device_id:
+                self.iot_manager.update_presence(device_id, status, session=session)
+            
         except Exception as e:
             print(f"❌ Erro ao processar status: {str(e)}")
     
@@ -236,30 +252,20 @@ class MQTTManager:
             return "🟢 NORMAL"
     
     def _save_alert(self, device_id, alert_type, temperature, location, priority):
-        """Salva alerta no sistema"""
+        """Salva alerta enviado pelo dispositivo na central de alertas (visível a todas as sessões)"""
         try:
-            # Salvar no session state do Streamlit se disponível
-            alert = {
+            self.iot_manager.alert_store.publicar({
+                'level': priority,
+                'kind': 'dispositivo',
+                'source': 'mqtt',
+                'message': f"📟 Alerta do dispositivo {device_id}: {alert_type} ({temperature}°C)",
                 'device_id': device_id,
-                'alert_type': alert_type,
-                'temperature': temperature,
                 'location': location,
-                'priority': priority,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            if 'iot_alerts' not in st.session_state:
-                st.session_state['iot_alerts'] = []
-            
-            st.session_state['iot_alerts'].append(alert)
-            
-            # Manter apenas últimos 50 alertas
-            if len(st.session_state['iot_alerts']) > 50:
-                st.session_state['iot_alerts'] = st.session_state['iot_alerts'][-50:]
-                
-        except Exception:
-            # Se não estiver no contexto do Streamlit, apenas log
-            pass
+                'alert_type': alert_type,
+                'temperature': temperature
+            })
+        except Exception as e:
+            print(f"❌ Erro ao salvar alerta: {str(e)}")
     
     def start(self):
         """Inicia o cliente MQTT"""
@@ -0,0 +1,294 @@
+"""
+Presença de Dispositivos IoT
+============================
+
+Decide quais dispositivos estão online sem varrer o registro:
+
+- cada sinal de vida (leitura local, leitura gravada por outro processo,
+  mensagem em `termometro/status`) adia o prazo do dispositivo em O(1)
+- os prazos ficam numa roda de temporização (hashed timing wheel): a cada
+  tique só a posição vencida é examinada; um prazo adiado é reinserido
+  uma única vez, quando a posição antiga vence, então o custo por
+  dispositivo é O(1) amortizado por janela de timeout, não por leitura
+- dispositivos com sessão MQTT ativa (mensagem retida `online` no tópico
+  `termometro/status/<device_id>`) ficam online até o broker publicar o
+  last-will `offline`, sem depender do timeout
+
+As transições online/offline atualizam o status do registro e são
+entregues ao callback `ao_mudar` (ex.: para a central de alertas).
+"""
+
+import threading
+
+from .ingestao import BufferCircular
+from ..utils.tempo import agora_ms, para_epoch_ms, MS_POR_MINUTO
+
+
+class RodaTempo:
+    """Roda de temporização: agendar e adiar em O(1), expiração O(1) amortizada"""
+
+    def __init__(self, resolucao_ms=1000, posicoes=4096):
+        """
+        Args:
+            resolucao_ms: Duração de um tique (granularidade dos prazos)
+            posicoes: Posições da roda; prazos além de uma volta são revistos a cada volta
+        """
+        self.resolucao_ms = resolucao_ms
+        self.posicoes = posicoes
+        self._casas = [[] for _ in range(posicoes)]
+        # Prazo atual de cada chave; as entradas na roda podem estar atrasadas em relação a ele
+        self._prazos = {}
+        # Tique da entrada válida de cada chave (entradas com outro tique são descartadas)
+        self._entradas = {}
+        self._tique = agora_ms() // resolucao_ms
+
+    def __len__(self):
+        return len(self._prazos)
+
+    def __contains__(self, chave):
+        return chave in self._prazos
+
+    def _inserir(self, chave, tique):
+        # Prazo já vencido vai para o próximo tique processado
+        tique = max(tique, self._tique)
+        self._entradas[chave] = tique
+        self._casas[tique % self.posicoes].append((chave, tique))
+
+    def agendar(self, chave, prazo_ms):
+        """Define ou adia o prazo da chave (só antecipar cria entrada nova)"""
+        tique = prazo_ms // self.resolucao_ms
+        entrada = self._entradas.get(chave)
+        self._prazos[chave] = prazo_ms
+        if entrada is None or tique < entrada:
+            self._inserir(chave, tique)
+
+    def cancelar(self, chave):
+        """Remove a chave (a entrada na roda é descartada quando a posição vencer)"""
+        self._prazos.pop(chave, None)
+        self._entradas.pop(chave, None)
+
+    def avancar(self, instante_ms):
+        """
+        Processa os tiques até o instante
+
+        Returns:
+            list: Chaves cujo prazo venceu (removidas da roda)
+        """
+        alvo = instante_ms // self.resolucao_ms
+        if alvo < self._tique:
+            return []
+        vencidas = []
+        # Depois de uma pausa maior que uma volta, cada posição é visitada uma vez
+        for tique in range(max(self._tique, alvo - self.posicoes + 1), alvo + 1):
+            indice = tique % self.posicoes
+            casa = self._casas[indice]
+            if not casa:
+                continue
+            self._casas[indice] = []
+            for chave, entrada in casa:
+                if self._entradas.get(chave) != entrada:
+                    continue
+                if entrada > alvo:
+                    # Prazo numa volta futura
+                    self._casas[indice].append((chave, entrada))
+                    continue
+                tique_prazo = self._prazos[chave] // self.resolucao_ms
+                if tique_prazo <= alvo:
+                    del self._prazos[chave]
+                    del self._entradas[chave]
+                    vencidas.append(chave)
+                else:
+                    self._inserir(chave, tique_prazo)
+        self._tique = alvo + 1
+        return vencidas
+
+
+class MonitorPresenca:
+    _compartilhados = {}
+    _lock_compartilhados = threading.Lock()
+
+    def __init__(self, nucleo, timeout_min=10, ao_mudar=None, resolucao_ms=1000, capacidade_eventos=500):
+        """
+        Inicializa o monitor a partir do registro e passa a observar o núcleo
+
+        Args:
+            nucleo: NucleoIngestao cujo registro de dispositivos é acompanhado
+            timeout_min: Minutos sem sinal de vida até o dispositivo ficar offline
+            ao_mudar: Callback(evento) chamado a cada transição online/offline
+            resolucao_ms: Granularidade da expiração
+            capacidade_eventos: Transições recentes mantidas em memória
+        """
+        self.nucleo = nucleo
+        self.timeout_ms = int(timeout_min * MS_POR_MINUTO)
+        self.ao_mudar = ao_mudar
+        self.resolucao_ms = resolucao_ms
+        self.roda = RodaTempo(resolucao_ms)
+        # device_id -> último sinal de vida (ms) dos dispositivos online
+        self.online = {}
+        self._sessoes = set()
+        self._caidos = set()
+        self.eventos = BufferCircular(capacidade_eventos)
+        self.transicoes = 0
+        self._lock = threading.Lock()
+
+        self._carregar()
+        nucleo.observar_dispositivos(self.visto)
+
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._acompanhar, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def compartilhado(cls, nucleo, **kwargs):
+        """Monitor único por núcleo de ingestão dentro do processo"""
+        with cls._lock_compartilhados:
+            monitor = cls._compartilhados.get(id(nucleo))
+            if monitor is None:
+                monitor = cls(nucleo, **kwargs)
+                cls._compartilhados[id(nucleo)] = monitor
+            return monitor
+
+    def _carregar(self):
+        """Estado inicial pelo last_seen do registro (única passada completa, na inicialização)"""
+        agora = agora_ms()
+        for device_id, dispositivo in self.nucleo.obter_dispositivos().items():
+            visto_em = para_epoch_ms(dispositivo.get('last_seen'))
+            if visto_em and visto_em + self.timeout_ms > agora:
+                self.online[device_id] = visto_em
+                self.roda.agendar(device_id, visto_em + self.timeout_ms)
+            elif dispositivo.get('status') == 'online':
+                # Status 'online' deixado por uma execução anterior
+                self.nucleo.definir_status(device_id, 'offline')
+
+    # ------------------------------------------------------------------
+    # Sinais de vida
+    # ------------------------------------------------------------------
+
+    def _transicao(self, device_id, status, origem, agora):
+        """Evento de transição (chamar com _lock)"""
+        if status == 'offline':
+            self._caidos.add(device_id)
+            reconectado = False
+        else:
+            reconectado = device_id in self._caidos
+            self._caidos.discard(device_id)
+        self.transicoes += 1
+        return {
+            'device_id': device_id,
+            'status': status,
+            'origem': origem,
+            'timestamp': agora,
+            'last_seen': self.online.get(device_id),
+            'reconectado': reconectado,
+        }
+
+    def _entregar(self, eventos):
+        """Atualiza o registro e avisa o callback (fora do _lock: ambos usam outras travas)"""
+        for evento in eventos:
+            self.nucleo.definir_status(evento['device_id'], evento['status'])
+            self.eventos.adicionar(evento)
+            if self.ao_mudar:
+                try:
+                    self.ao_mudar(evento)
+                except Exception as e:
+                    print(f"❌ Erro ao notificar mudança de presença: {str(e)}")
+
+    def visto(self, device_id, instante=None, origem='leitura'):
+        """Sinal de vida do dispositivo: adia o prazo em O(1) (ignora sinais mais antigos que o timeout)"""
+        agora = agora_ms()
+        instante = agora if instante is None else min(instante, agora)
+        if instante + self.timeout_ms <= agora:
+            return
+        with self._lock:
+            anterior = self.online.get(device_id)
+            if anterior is not None and instante <= anterior:
+                return
+            self.online[device_id] = instante
+            if device_id not in self._sessoes:
+                self.roda.agendar(device_id, instante + self.timeout_ms)
+            evento = self._transicao(device_id, 'online', origem, agora) if anterior is None else None
+        if evento:
+            self._entregar([evento])
+
+    def conectado(self, device_id):
+        """Sessão MQTT ativa (status retido 'online'): online até o last-will, sem timeout"""
+        with self._lock:
+            self._sessoes.add(device_id)
+            self.roda.cancelar(device_id)
+        self.visto(device_id, origem='mqtt')
+
+    def desconectado(self, device_id, origem='last_will'):
+        """Dispositivo anunciou (ou o broker anunciou por ele) que saiu: offline imediato"""
+        agora = agora_ms()
+        with self._lock:
+            self._sessoes.discard(device_id)
+            self.roda.cancelar(device_id)
+            if device_id not in self.online:
+                return
+            evento = self._transicao(device_id, 'offline', origem, agora)
+            del self.online[device_id]
+        self._entregar([evento])
+
+    # ------------------------------------------------------------------
+    # Expiração
+    # ------------------------------------------------------------------
+
+    def avancar(self, instante=None):
+        """Expira os dispositivos cujo prazo venceu até o instante"""
+        agora = agora_ms() if instante is None else instante
+        eventos = []
+        with self._lock:
+            for device_id in self.roda.avancar(agora):
+                eventos.append(self._transicao(device_id, 'offline', 'timeout', agora))
+                self.online.pop(device_id, None)
+        if eventos:
+            self._entregar(eventos)
+        return eventos
+
+    def _acompanhar(self):
+        while not self._parar.wait(self.resolucao_ms / 1000):
+            try:
+                # Leituras gravadas por outro processo (um stat por arquivo quando nada mudou)
+                self.nucleo.sincronizar()
+                self.avancar()
+            except Exception as e:
+                print(f"❌ Erro no monitor de presença: {str(e)}")
+
+    def encerrar(self):
+        self._parar.set()
+
+    def definir_timeout(self, timeout_min):
+        """Altera o timeout e reagenda os dispositivos online (passada única, só na alteração)"""
+        with self._lock:
+            self.timeout_ms = int(timeout_min * MS_POR_MINUTO)
+            for device_id, visto_em in self.online.items():
+                if device_id not in self._sessoes:
+                    self.roda.agendar(device_id, visto_em + self.timeout_ms)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    @property
+    def timeout_min(self):
+        return self.timeout_ms / MS_POR_MINUTO
+
+    def esta_online(self, device_id):
+        return device_id in self.online
+
+    def contar_online(self):
+        """Dispositivos online (O(1))"""
+        return len(self.online)
+
+    def recentes(self, quantidade=50):
+        """Transições mais recentes (da mais antiga para a mais recente)"""
+        return self.eventos.recentes(quantidade)
+
+    def estatisticas(self):
+        return {
+            'online': len(self.online),
+            'sessoes_mqtt': len(self._sessoes),
+            'aguardando_timeout': len(self.roda),
+            'timeout_min': self.timeout_min,
+            'transicoes': self.transicoes,
+        }
@@ -0,0 +1,19 @@
+"""
+Registros de Leituras IoT
+=========================
+
+Tipo compacto para as leituras de sensores mantidas em memória. Identificador
+do dispositivo, tipo de sensor, unidade, local, firmware e status são strings
+internadas: milhares de leituras do mesmo termômetro compartilham os mesmos
+objetos.
+"""
+
+from ..utils.registros import RegistroCompacto
+
+
+class LeituraSensor(RegistroCompacto):
+    CAMPOS = (
+        'device_id', 'sensor_type', 'value', 'unit', 'location', 'battery_level',
+        'firmware_version', 'status', 'timestamp', 'processed'
+    )
+    __slots__ = CAMPOS + ('_extras',)
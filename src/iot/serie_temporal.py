@@ -0,0 +1,373 @@
+"""
+Série Temporal de Leituras IoT
+==============================
+
+Armazenamento durável das leituras de sensores em segmentos diários (UTC) com
+layout colunar binário. Cada segmento é um diretório AAAA-MM-DD com uma
+coluna por arquivo:
+
+    ts.i8           timestamp em epoch ms (int64)
+    valor.f4        valor medido (float32)
+    dispositivo.u2  índice do dispositivo no dicionário (uint16)
+    tipo.u1         código do tipo de sensor no dicionário (uint8)
+
+Os nomes de dispositivos e tipos de sensor ficam em dicionario.json. Segmentos
+de dias anteriores (fechados) são lidos por memory mapping e ficam em cache;
+o segmento do dia corrente é mapeado a cada consulta. A retenção é em dias:
+segmentos mais antigos que o limite são apagados inteiros (com os rollups de
+AgregadosIoT gravados no mesmo diretório).
+
+Gravações de processos diferentes (painel, cliente MQTT, API) são
+serializadas por uma trava de arquivo quando o sistema a suporta.
+"""
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .agregados import AgregadosIoT
+from ..utils.tempo import agora_ms, MS_POR_DIA
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas a trava entre threads
+    fcntl = None
+
+
+# (campo, arquivo, dtype) na ordem das colunas
+COLUNAS = (
+    ('timestamp', 'ts.i8', np.dtype('<i8')),
+    ('value', 'valor.f4', np.dtype('<f4')),
+    ('device', 'dispositivo.u2', np.dtype('<u2')),
+    ('sensor', 'tipo.u1', np.dtype('<u1')),
+)
+
+
+class SerieTemporal:
+    def __init__(self, diretorio='iot_series', retencao_dias=90, limite_febre=37.8, limite_critico=39.0):
+        """
+        Inicializa o armazenamento de séries temporais
+
+        Args:
+            diretorio: Diretório dos segmentos diários
+            retencao_dias: Dias mantidos em disco (None mantém tudo)
+            limite_febre: Limite de febre das contagens dos rollups
+            limite_critico: Limite crítico das contagens dos rollups
+        """
+        self.diretorio = diretorio
+        self.retencao_dias = retencao_dias
+        self.dispositivos = []
+        self.tipos = []
+        self._codigo_dispositivo = {}
+        self._codigo_tipo = {}
+        self._arquivo_dicionario = os.path.join(diretorio, 'dicionario.json')
+        self._versao_dicionario = None
+        self._fechados = {}
+        self._dia_retencao = None
+        self._lock = threading.RLock()
+        self._profundidade_trava = 0
+        os.makedirs(diretorio, exist_ok=True)
+        self._carregar_dicionario()
+        self.aplicar_retencao()
+        self.agregados = AgregadosIoT(self, limite_febre, limite_critico)
+
+    # ------------------------------------------------------------------
+    # Dicionário de dispositivos e tipos de sensor
+    # ------------------------------------------------------------------
+
+    def _carregar_dicionario(self):
+        """Recarrega o dicionário se outro processo o alterou"""
+        try:
+            versao = os.stat(self._arquivo_dicionario).st_mtime_ns
+        except OSError:
+            return
+        if versao == self._versao_dicionario:
+            return
+        with open(self._arquivo_dicionario, 'r', encoding='utf-8') as f:
+            dicionario = json.load(f)
+        self.dispositivos = dicionario.get('dispositivos', [])
+        self.tipos = dicionario.get('tipos', [])
+        self._codigo_dispositivo = {nome: i for i, nome in enumerate(self.dispositivos)}
+        self._codigo_tipo = {nome: i for i, nome in enumerate(self.tipos)}
+        self._versao_dicionario = versao
+
+    def _gravar_dicionario(self):
+        temporario = self._arquivo_dicionario + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'dispositivos': self.dispositivos, 'tipos': self.tipos}, f, ensure_ascii=False)
+        os.replace(temporario, self._arquivo_dicionario)
+        self._versao_dicionario = os.stat(self._arquivo_dicionario).st_mtime_ns
+
+    def _codificar(self, valores, nomes, codigos, limite):
+        """Códigos dos valores, acrescentando novos nomes ao dicionário"""
+        resultado = []
+        novos = False
+        for valor in valores:
+            codigo = codigos.get(valor)
+            if codigo is None:
+                if len(nomes) >= limite:
+                    raise ValueError(f"Dicionário da série temporal cheio ({limite} entradas)")
+                codigo = len(nomes)
+                nomes.append(valor)
+                codigos[valor] = codigo
+                novos = True
+            resultado.append(codigo)
+        return resultado, novos
+
+    # ------------------------------------------------------------------
+    # Segmentos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def dia(timestamp_ms):
+        """Número do dia UTC (partição) de um timestamp em ms"""
+        return int(timestamp_ms) // MS_POR_DIA
+
+    def _caminho(self, dia):
+        nome = datetime.fromtimestamp(dia * 86400, tz=timezone.utc).strftime('%Y-%m-%d')
+        return os.path.join(self.diretorio, nome)
+
+    def dias(self):
+        """Dias (números UTC) com segmento em disco, em ordem"""
+        dias = []
+        for nome in os.listdir(self.diretorio):
+            try:
+                data = datetime.strptime(nome, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            dias.append(int(data.timestamp()) // 86400)
+        return sorted(dias)
+
+    @contextmanager
+    def _trava(self):
+        """Exclusão mútua entre threads e, quando suportado, entre processos (reentrante)"""
+        with self._lock:
+            if fcntl is None or self._profundidade_trava:
+                self._profundidade_trava += 1
+                try:
+                    yield
+                finally:
+                    self._profundidade_trava -= 1
+                return
+            with open(os.path.join(self.diretorio, '.trava'), 'a') as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                self._profundidade_trava = 1
+                try:
+                    yield
+                finally:
+                    self._profundidade_trava = 0
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _linhas_completas(caminho):
+        """Linhas presentes em todas as colunas (gravação interrompida deixa colunas desiguais)"""
+        linhas = None
+        for _, arquivo, dtype in COLUNAS:
+            try:
+                tamanho = os.path.getsize(os.path.join(caminho, arquivo))
+            except OSError:
+                return 0
+            quantidade = tamanho // dtype.itemsize
+            linhas = quantidade if linhas is None else min(linhas, quantidade)
+        return linhas or 0
+
+    def _alinhar_colunas(self, caminho):
+        """Trunca colunas com linhas incompletas antes de anexar"""
+        linhas = self._linhas_completas(caminho)
+        for _, arquivo, dtype in COLUNAS:
+            arquivo = os.path.join(caminho, arquivo)
+            if os.path.exists(arquivo) and os.path.getsize(arquivo) != linhas * dtype.itemsize:
+                with open(arquivo, 'r+b') as f:
+                    f.truncate(linhas * dtype.itemsize)
+
+    def _mapear(self, dia):
+        """Colunas de um segmento como memmaps somente leitura (em cache se o dia já fechou)"""
+        if dia in self._fechados:
+            return self._fechados[dia]
+        caminho = self._caminho(dia)
+        linhas = self._linhas_completas(caminho)
+        colunas = None
+        if linhas:
+            colunas = {
+                campo: np.memmap(os.path.join(caminho, arquivo), dtype=dtype, mode='r', shape=(linhas,))
+                for campo, arquivo, dtype in COLUNAS
+            }
+            timestamps = colunas['timestamp']
+            colunas['ordenado'] = bool(np.all(timestamps[1:] >= timestamps[:-1]))
+        if dia < self.dia(agora_ms()):
+            self._fechados[dia] = colunas
+        return colunas
+
+    # ------------------------------------------------------------------
+    # Gravação e retenção
+    # ------------------------------------------------------------------
+
+    def adicionar_lote(self, leituras):
+        """
+        Anexa leituras aos segmentos dos seus dias
+
+        Args:
+            leituras: Registros com device_id, sensor_type, value e timestamp (ms)
+
+        Returns:
+            int: Quantidade de leituras gravadas
+        """
+        if not leituras:
+            return 0
+        with self._trava():
+            self._carregar_dicionario()
+            dispositivos, novos_dispositivos = self._codificar(
+                (l['device_id'] for l in leituras), self.dispositivos, self._codigo_dispositivo, 2 ** 16)
+            tipos, novos_tipos = self._codificar(
+                (l['sensor_type'] for l in leituras), self.tipos, self._codigo_tipo, 2 ** 8)
+            if novos_dispositivos or novos_tipos:
+                self._gravar_dicionario()
+
+            colunas = {
+                'timestamp': np.array([l['timestamp'] for l in leituras], dtype='<i8'),
+                'value': np.array([l['value'] for l in leituras], dtype='<f4'),
+                'device': np.array(dispositivos, dtype='<u2'),
+                'sensor': np.array(tipos, dtype='<u1'),
+            }
+            dias = colunas['timestamp'] // MS_POR_DIA
+            for dia in np.unique(dias):
+                dia = int(dia)
+                selecao = dias == dia
+                caminho = self._caminho(dia)
+                os.makedirs(caminho, exist_ok=True)
+                self._alinhar_colunas(caminho)
+                for campo, arquivo, _ in COLUNAS:
+                    with open(os.path.join(caminho, arquivo), 'ab') as f:
+                        f.write(colunas[campo][selecao].tobytes())
+                # Leitura atrasada num dia fechado: o memmap em cache ficou curto
+                self._fechados.pop(dia, None)
+
+            self.agregados.acumular(colunas['timestamp'], colunas['value'], colunas['device'], colunas['sensor'])
+            self.agregados.fechar()
+
+            if self._dia_retencao != self.dia(agora_ms()):
+                self.aplicar_retencao()
+        return len(leituras)
+
+    def aplicar_retencao(self):
+        """Apaga segmentos mais antigos que retencao_dias"""
+        hoje = self.dia(agora_ms())
+        self._dia_retencao = hoje
+        if not self.retencao_dias:
+            return 0
+        removidos = 0
+        for dia in self.dias():
+            if dia < hoje - self.retencao_dias:
+                shutil.rmtree(self._caminho(dia), ignore_errors=True)
+                self._fechados.pop(dia, None)
+                removidos += 1
+        if removidos:
+            print(f"🧹 {removidos} segmentos de leituras IoT removidos (retenção de {self.retencao_dias} dias)")
+        return removidos
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def consultar(self, inicio_ms=None, fim_ms=None, device_id=None, sensor_type=None,
+                  limite=None, valor_min=None, valor_max=None):
+        """
+        Leituras em [inicio_ms, fim_ms), opcionalmente de um dispositivo e tipo de sensor
+
+        Só os segmentos dos dias do intervalo são mapeados; em segmentos ordenados
+        o intervalo é localizado por busca binária na coluna de timestamps. Com
+        `limite`, os dias são percorridos do mais recente para o mais antigo e a
+        leitura para ao juntar as `limite` leituras mais recentes.
+
+        Args:
+            limite: Máximo de leituras (as mais recentes)
+            valor_min: Apenas valores >= valor_min
+            valor_max: Apenas valores < valor_max
+
+        Returns:
+            dict: Arrays alinhados 'timestamp' (int64), 'value' (float32),
+                  'device_id' e 'sensor_type' (object)
+        """
+        with self._lock:
+            self._carregar_dicionario()
+            codigo_dispositivo = self._codigo_dispositivo.get(device_id) if device_id is not None else None
+            codigo_tipo = self._codigo_tipo.get(sensor_type) if sensor_type is not None else None
+            nomes_dispositivos = np.array(self.dispositivos, dtype=object)
+            nomes_tipos = np.array(self.tipos, dtype=object)
+            vazio = (device_id is not None and codigo_dispositivo is None) or \
+                    (sensor_type is not None and codigo_tipo is None)
+
+            partes = []
+            restante = limite
+            dias = [] if vazio else self.dias()
+            for dia in (dias if limite is None else reversed(dias)):
+                if restante is not None and restante <= 0:
+                    break
+                if inicio_ms is not None and (dia + 1) * MS_POR_DIA <= inicio_ms:
+                    continue
+                if fim_ms is not None and dia * MS_POR_DIA >= fim_ms:
+                    continue
+                colunas = self._mapear(dia)
+                if colunas is None:
+                    continue
+                timestamps = colunas['timestamp']
+                if colunas['ordenado']:
+                    a = 0 if inicio_ms is None else int(np.searchsorted(timestamps, inicio_ms, 'left'))
+                    b = len(timestamps) if fim_ms is None else int(np.searchsorted(timestamps, fim_ms, 'left'))
+                    selecao = slice(a, b)
+                    mascara = np.ones(b - a, dtype=bool)
+                else:
+                    selecao = slice(None)
+                    mascara = np.ones(len(timestamps), dtype=bool)
+                    if inicio_ms is not None:
+                        mascara &= timestamps >= inicio_ms
+                    if fim_ms is not None:
+                        mascara &= timestamps < fim_ms
+                if codigo_dispositivo is not None:
+                    mascara &= colunas['device'][selecao] == codigo_dispositivo
+                if codigo_tipo is not None:
+                    mascara &= colunas['sensor'][selecao] == codigo_tipo
+                if valor_min is not None:
+                    mascara &= colunas['value'][selecao] >= valor_min
+                if valor_max is not None:
+                    mascara &= colunas['value'][selecao] < valor_max
+                parte = {campo: np.asarray(colunas[campo][selecao])[mascara] for campo, _, _ in COLUNAS}
+                if restante is not None:
+                    if not colunas['ordenado']:
+                        ordem = np.argsort(parte['timestamp'], kind='stable')
+                        parte = {campo: valores[ordem] for campo, valores in parte.items()}
+                    parte = {campo: valores[len(valores) - restante:] if len(valores) > restante else valores
+                             for campo, valores in parte.items()}
+                    restante -= len(parte['timestamp'])
+                partes.append(parte)
+            if limite is not None:
+                # Dias percorridos do mais recente: volta à ordem cronológica
+                partes.reverse()
+
+        if partes:
+            resultado = {campo: np.concatenate([p[campo] for p in partes]) for campo, _, _ in COLUNAS}
+        else:
+            resultado = {campo: np.empty(0, dtype=dtype) for campo, _, dtype in COLUNAS}
+        return {
+            'timestamp': resultado['timestamp'],
+            'value': resultado['value'],
+            'device_id': nomes_dispositivos[resultado['device']] if len(resultado['device']) else np.empty(0, dtype=object),
+            'sensor_type': nomes_tipos[resultado['sensor']] if len(resultado['sensor']) else np.empty(0, dtype=object),
+        }
+
+    def resumo(self):
+        """Dias, leituras e bytes em disco"""
+        dias = self.dias()
+        linhas = sum(self._linhas_completas(self._caminho(dia)) for dia in dias)
+        tamanho = sum(
+            os.path.getsize(os.path.join(self._caminho(dia), arquivo))
+            for dia in dias for _, arquivo, _ in COLUNAS
+            if os.path.exists(os.path.join(self._caminho(dia), arquivo))
+        )
+        return {'dias': len(dias), 'leituras': linhas, 'bytes': tamanho,
+                'dispositivos': len(self.dispositivos)}
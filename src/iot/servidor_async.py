@@ -0,0 +1,318 @@
+"""
+Servidor de Ingestão IoT (asyncio)
+==================================
+
+Servidor HTTP/1.1 da API IoT sobre asyncio da biblioteca padrão, com as
+mesmas rotas do servidor Flask:
+
+    GET  /                              Informações da API
+    POST /  e  POST /webhook            Webhook do ESP32
+    POST /api/sensor-data               Uma leitura
+    POST /api/sensor-data/batch         Lote (JSON array ou NDJSON)
+    GET  /api/device-status/<id>        Status do dispositivo
+    GET  /api/health                    Health check
+    POST /api/test                      Teste de conectividade
+
+Uma única thread atende milhares de conexões: conexões persistentes
+(keep-alive) com tempo ocioso limitado, limite de conexões abertas (as
+excedentes recebem 503) e de requisições processadas ao mesmo tempo. As
+rotas de ingestão apenas colocam as leituras na fila de ingestão (gravação e
+alertas acontecem na thread da fila) e rodam no próprio loop, exceto com a
+política 'bloquear', em que a espera por espaço vai para o executor; rotas
+de consulta, que podem tocar o disco, também rodam no executor.
+"""
+
+import asyncio
+import json
+import threading
+from urllib.parse import unquote, urlsplit
+
+from ..config.config import Config
+
+
+MENSAGENS_STATUS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class ServidorIoTAsync:
+    # Servidores ativos no processo, por porta
+    _ativos = {}
+    _lock_ativos = threading.Lock()
+
+    def __init__(self, iot_manager, host='0.0.0.0', port=5002, max_conexoes=None, max_simultaneas=None,
+                 max_corpo=4 * 1024 * 1024, tempo_ocioso=15.0, tempo_leitura=30.0):
+        """
+        Inicializa o servidor
+
+        Args:
+            iot_manager: IoTManager com os handlers api_*
+            host: Endereço de escuta
+            port: Porta
+            max_conexoes: Conexões abertas simultâneas (padrão: Config.IOT_API_MAX_CONNECTIONS)
+            max_simultaneas: Requisições processadas ao mesmo tempo (padrão: Config.IOT_API_MAX_CONCURRENCY)
+            max_corpo: Tamanho máximo do corpo em bytes
+            tempo_ocioso: Segundos de espera pela próxima requisição numa conexão keep-alive
+            tempo_leitura: Segundos para receber o corpo de uma requisição
+        """
+        self.iot_manager = iot_manager
+        self.host = host
+        self.port = port
+        self.max_conexoes = max_conexoes or Config.IOT_API_MAX_CONNECTIONS
+        self.max_simultaneas = max_simultaneas or Config.IOT_API_MAX_CONCURRENCY
+        self.max_corpo = max_corpo
+        self.tempo_ocioso = tempo_ocioso
+        self.tempo_leitura = tempo_leitura
+        self.conexoes = 0
+        self.requisicoes = 0
+        self.recusadas = 0
+        self.loop = None
+        self._servidor = None
+        self._semaforo = None
+        self._pronto = threading.Event()
+        self._erro = None
+        self._thread = None
+
+    @classmethod
+    def ativo(cls, port):
+        """Há servidor ativo nesta porta dentro do processo?"""
+        with cls._lock_ativos:
+            servidor = cls._ativos.get(port)
+            return servidor is not None and servidor._thread is not None and servidor._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def iniciar(self):
+        """Abre o socket de escuta no loop corrente"""
+        self.loop = asyncio.get_running_loop()
+        self._semaforo = asyncio.Semaphore(self.max_simultaneas)
+        self._servidor = await asyncio.start_server(
+            self._atender, self.host, self.port, limit=64 * 1024, backlog=2048, reuse_address=True
+        )
+
+    async def _executar(self):
+        try:
+            await self.iniciar()
+        except OSError as e:
+            self._erro = e
+            self._pronto.set()
+            return
+        self._pronto.set()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    def iniciar_em_thread(self, timeout=5.0):
+        """Executa o servidor num loop próprio em thread daemon (True se a porta abriu)"""
+        with self._lock_ativos:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._executar()), daemon=True)
+            self._thread.start()
+            self._pronto.wait(timeout)
+            if self._erro is not None or not self._pronto.is_set():
+                print(f"❌ Erro ao iniciar servidor IoT na porta {self.port}: {self._erro}")
+                return False
+            self._ativos[self.port] = self
+            return True
+
+    def parar(self):
+        """Fecha o socket de escuta"""
+        if self.loop is not None and self._servidor is not None:
+            self.loop.call_soon_threadsafe(self._servidor.close)
+        with self._lock_ativos:
+            if self._ativos.get(self.port) is self:
+                del self._ativos[self.port]
+
+    def estatisticas(self):
+        return {
+            'conexoes_abertas': self.conexoes,
+            'requisicoes': self.requisicoes,
+            'conexoes_recusadas': self.recusadas,
+            'max_conexoes': self.max_conexoes,
+            'max_simultaneas': self.max_simultaneas,
+        }
+
+    # ------------------------------------------------------------------
+    # Protocolo HTTP/1.1
+    # ------------------------------------------------------------------
+
+    async def _atender(self, reader, writer):
+        """Atende uma conexão: várias requisições enquanto houver keep-alive"""
+        if self.conexoes >= self.max_conexoes:
+            self.recusadas += 1
+            await self._responder(writer, 503, {'error': 'Servidor ocupado'}, manter=False)
+            writer.close()
+            return
+        self.conexoes += 1
+        try:
+            while True:
+                try:
+                    cabecalho = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.tempo_ocioso)
+                except asyncio.LimitOverrunError:
+                    await self._responder(writer, 431, {'error': 'Cabeçalho muito grande'}, manter=False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+
+                try:
+                    metodo, alvo, versao, cabecalhos = self._interpretar_cabecalho(cabecalho)
+                except ValueError:
+                    await self._responder(writer, 400, {'error': 'Requisição inválida'}, manter=False)
+                    break
+
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao != 'close' if versao == 'HTTP/1.1' else conexao == 'keep-alive'
+
+                try:
+                    corpo = await asyncio.wait_for(self._ler_corpo(reader, cabecalhos), self.tempo_leitura)
+                except _ErroHTTP as e:
+                    await self._responder(writer, e.status, {'error': e.mensagem}, manter=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.TimeoutError:
+                    await self._responder(writer, 408, {'error': 'Tempo esgotado lendo o corpo'}, manter=False)
+                    break
+
+                self.requisicoes += 1
+                async with self._semaforo:
+                    status, payload = await self._despachar(metodo, alvo, cabecalhos, corpo)
+                await self._responder(writer, status, payload, manter)
+                if not manter:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.conexoes -= 1
+            writer.close()
+
+    @staticmethod
+    def _interpretar_cabecalho(bloco):
+        linhas = bloco.decode('latin-1').split('\r\n')
+        metodo, alvo, versao = linhas[0].split(' ', 2)
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            if linha:
+                nome, _, valor = linha.partition(':')
+                cabecalhos[nome.strip().lower()] = valor.strip()
+        return metodo.upper(), alvo, versao.strip().upper(), cabecalhos
+
+    async def _ler_corpo(self, reader, cabecalhos):
+        if 'chunked' in cabecalhos.get('transfer-encoding', '').lower():
+            partes = []
+            total = 0
+            while True:
+                linha = await reader.readuntil(b'\r\n')
+                try:
+                    tamanho = int(linha.split(b';', 1)[0].strip(), 16)
+                except ValueError:
+                    raise _ErroHTTP(400, 'Chunk inválido')
+                if tamanho == 0:
+                    # Trailers opcionais até a linha vazia
+                    while (await reader.readuntil(b'\r\n')) != b'\r\n':
+                        pass
+                    return b''.join(partes)
+                total += tamanho
+                if total > self.max_corpo:
+                    raise _ErroHTTP(413, 'Corpo muito grande')
+                partes.append(await reader.readexactly(tamanho))
+                await reader.readexactly(2)
+
+        try:
+            tamanho = int(cabecalhos.get('content-length', '0'))
+        except ValueError:
+            raise _ErroHTTP(400, 'Content-Length inválido')
+        if tamanho > self.max_corpo:
+            raise _ErroHTTP(413, 'Corpo muito grande')
+        return await reader.readexactly(tamanho) if tamanho > 0 else b''
+
+    async def _responder(self, writer, status, payload, manter):
+        corpo = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        cabecalho = (
+            f"HTTP/1.1 {status} {MENSAGENS_STATUS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n"
+            + (f"Keep-Alive: timeout={int(self.tempo_ocioso)}\r\n" if manter else "")
+            + "\r\n"
+        ).encode('latin-1')
+        try:
+            writer.write(cabecalho + corpo)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Rotas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _json(corpo):
+        try:
+            return json.loads(corpo) if corpo else None
+        except ValueError:
+            return None
+
+    async def _em_executor(self, funcao, *args):
+        return await self.loop.run_in_executor(None, funcao, *args)
+
+    async def _ingerir(self, funcao, *args):
+        """Handler de ingestão: no loop, ou no executor se a fila puder bloquear o produtor"""
+        if self.iot_manager.ingestion_queue.pode_bloquear:
+            return await self._em_executor(funcao, *args)
+        return funcao(*args)
+
+    async def _despachar(self, metodo, alvo, cabecalhos, corpo):
+        """Rota -> handler api_* do IoTManager; retorna (status, payload)"""
+        caminho = urlsplit(alvo).path.rstrip('/') or '/'
+        manager = self.iot_manager
+        try:
+            if caminho == '/':
+                if metodo == 'GET':
+                    payload, status = await self._em_executor(manager.api_info)
+                elif metodo == 'POST':
+                    # Compatibilidade com webhook.site
+                    payload, status = await self._ingerir(manager.api_webhook, self._json(corpo))
+                else:
+                    return 405, {'error': 'Method not allowed'}
+            elif caminho == '/webhook':
+                if metodo != 'POST':
+                    return 405, {'error': 'Method not allowed'}
+                payload, status = await self._ingerir(manager.api_webhook, self._json(corpo))
+            elif caminho == '/api/sensor-data':
+                if metodo != 'POST':
+                    return 405, {'error': 'Method not allowed'}
+                payload, status = await self._ingerir(manager.api_sensor_data, self._json(corpo))
+            elif caminho == '/api/sensor-data/batch':
+                if metodo != 'POST':
+                    return 405, {'error': 'Method not allowed'}
+                payload, status = await self._ingerir(manager.api_sensor_batch, corpo, cabecalhos.get('content-type', ''))
+            elif caminho.startswith('/api/device-status/'):
+                if metodo != 'GET':
+                    return 405, {'error': 'Method not allowed'}
+                device_id = unquote(caminho[len('/api/device-status/'):])
+                payload, status = await self._em_executor(manager.api_device_status, device_id)
+            elif caminho == '/api/health':
+                if metodo != 'GET':
+                    return 405, {'error': 'Method not allowed'}
+                payload, status = await self._em_executor(manager.api_health)
+                payload['server'] = self.estatisticas()
+            elif caminho == '/api/test':
+                if metodo != 'POST':
+                    return 405, {'error': 'Method not allowed'}
+                payload, status = manager.api_test()
+            else:
+                return 404, {'error': 'Not found'}
+        except Exception as e:
+            return 500, {'error': str(e)}
+        return status, payload
+
+
+class _ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
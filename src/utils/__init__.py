@@ -8,6 +8,8 @@ utilizadas em todo o sistema.
 Funções:
 - Detecção automática de região geográfica
 - Detecção automática de febre
+- Timestamps normalizados em epoch ms
+- Base de registros compactos com __slots__
 - Formatação de dados
 - Validações auxiliares
 """
@@ -18,10 +20,22 @@ from .detection import (
     get_regiao_nomes,
     get_regiao_nomes_curtos
 )
+from .tempo import (
+    agora_ms,
+    para_epoch_ms,
+    datetime_de_ms,
+    formatar_ms
+)
+from .registros import RegistroCompacto
 
 __all__ = [
     'detectar_regiao_automatica',
     'detectar_febre_automatica', 
     'get_regiao_nomes',
-    'get_regiao_nomes_curtos'
+    'get_regiao_nomes_curtos',
+    'agora_ms',
+    'para_epoch_ms',
+    'datetime_de_ms',
+    'formatar_ms',
+    'RegistroCompacto'
 ] 
\ No newline at end of file
@@ -6,8 +6,6 @@ Funções para detecção automática de região geográfica e sintomas
 baseados em dados clínicos e localização.
 """
 
-import requests
-
 
 def detectar_regiao_automatica():
     """
@@ -17,6 +15,9 @@ def detectar_regiao_automatica():
         str: Código da região ('brasil_norte', 'africa', 'asia')
     """
     try:
+        # Importado sob demanda: o runtime de campo não depende de requests
+        import requests
+        
         # Tentar obter localização via IP
         response = requests.get('http://ip-api.com/json/', timeout=3)
         if response.status_code == 200:
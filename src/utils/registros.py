@@ -0,0 +1,119 @@
+"""
+Registros Compactos
+===================
+
+Base para tipos de registro com __slots__ usados pelos armazenamentos em
+memória (leituras de sensores, atendimentos). Strings são internadas (local,
+unidade, firmware, sintomas e textos repetidos passam a ser um único objeto),
+listas viram tuplas e sub-registros conhecidos viram registros aninhados.
+
+Os registros implementam a interface de leitura de dicionário (Mapping):
+`registro['campo']`, `registro.get(...)`, `'campo' in registro` continuam
+funcionando. Campos ausentes no JSON original continuam ausentes, e chaves
+desconhecidas são preservadas em `_extras`, de modo que
+`de_dict(...).para_dict()` reproduz o formato de transporte.
+"""
+
+import sys
+from collections.abc import Mapping
+
+
+def compactar_valor(valor):
+    """Interna strings e converte listas em tuplas (recursivamente)"""
+    if isinstance(valor, str):
+        return sys.intern(valor)
+    if isinstance(valor, list):
+        return tuple(compactar_valor(v) for v in valor)
+    if isinstance(valor, dict):
+        return {sys.intern(k): compactar_valor(v) for k, v in valor.items()}
+    return valor
+
+
+def expandir_valor(valor):
+    """Inverso de compactar_valor: tuplas voltam a ser listas e registros a ser dicts"""
+    if isinstance(valor, RegistroCompacto):
+        return valor.para_dict()
+    if isinstance(valor, Mapping) and not isinstance(valor, dict):
+        # Outros registros somente leitura (ex.: resultados reconstruídos sob demanda)
+        return {k: expandir_valor(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return [expandir_valor(v) for v in valor]
+    if isinstance(valor, dict):
+        return {k: expandir_valor(v) for k, v in valor.items()}
+    return valor
+
+
+class RegistroCompacto(Mapping):
+    """
+    Registro com __slots__ e interface de leitura de dicionário
+
+    Subclasses declaram CAMPOS (mesma ordem do JSON) e __slots__ = CAMPOS + ('_extras',).
+    ANINHADOS mapeia campo -> classe de registro (aplicada também a cada item de listas).
+    """
+    __slots__ = ()
+    CAMPOS = ()
+    ANINHADOS = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._CONJUNTO_CAMPOS = frozenset(cls.CAMPOS)
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Cria o registro a partir do dicionário no formato JSON de transporte"""
+        if isinstance(dados, cls):
+            return dados
+        registro = cls.__new__(cls)
+        extras = None
+        for chave, valor in dados.items():
+            if chave in cls._CONJUNTO_CAMPOS:
+                classe = cls.ANINHADOS.get(chave)
+                if classe is not None and isinstance(valor, list):
+                    valor = tuple(classe.de_dict(v) if isinstance(v, dict) else compactar_valor(v) for v in valor)
+                elif classe is not None and isinstance(valor, dict):
+                    valor = classe.de_dict(valor)
+                else:
+                    valor = compactar_valor(valor)
+                setattr(registro, chave, valor)
+            else:
+                if extras is None:
+                    extras = {}
+                extras[sys.intern(chave)] = compactar_valor(valor)
+        registro._extras = extras
+        return registro
+
+    def para_dict(self):
+        """Converte de volta para o dicionário do formato JSON de transporte"""
+        dados = {}
+        for campo in self.CAMPOS:
+            try:
+                dados[campo] = expandir_valor(getattr(self, campo))
+            except AttributeError:
+                pass
+        if self._extras:
+            for chave, valor in self._extras.items():
+                dados[chave] = expandir_valor(valor)
+        return dados
+
+    def __getitem__(self, chave):
+        if chave in self._CONJUNTO_CAMPOS:
+            try:
+                return getattr(self, chave)
+            except AttributeError:
+                pass
+        elif self._extras and chave in self._extras:
+            return self._extras[chave]
+        raise KeyError(chave)
+
+    def __iter__(self):
+        for campo in self.CAMPOS:
+            if hasattr(self, campo):
+                yield campo
+        if self._extras:
+            yield from self._extras
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dict()!r})"
@@ -0,0 +1,135 @@
+"""
+Utilitários de Tempo
+====================
+
+Representação normalizada de timestamps: inteiros com milissegundos desde a
+época Unix (UTC). Conversões para datetime sempre retornam objetos com fuso
+horário. O leitor de compatibilidade aceita as strings ISO antigas.
+"""
+
+import time
+from datetime import datetime, timezone
+
+MS_POR_SEGUNDO = 1000
+MS_POR_MINUTO = 60 * MS_POR_SEGUNDO
+MS_POR_HORA = 60 * MS_POR_MINUTO
+MS_POR_DIA = 24 * MS_POR_HORA
+
+
+def agora_ms():
+    """
+    Retorna o instante atual em milissegundos desde a época.
+
+    Returns:
+        int: Timestamp epoch em ms
+    """
+    return time.time_ns() // 1_000_000
+
+
+def fuso_local():
+    """
+    Retorna o fuso horário local da máquina.
+
+    Returns:
+        tzinfo: Fuso horário local
+    """
+    return datetime.now().astimezone().tzinfo
+
+
+def para_epoch_ms(valor):
+    """
+    Converte qualquer representação de timestamp para epoch em ms.
+
+    Aceita inteiros/floats já em ms, objetos datetime e strings ISO
+    (formato antigo). Datas sem fuso horário são interpretadas no fuso local,
+    como eram gravadas por `datetime.now().isoformat()`.
+
+    Args:
+        valor: int, float, datetime, str ISO ou None
+
+    Returns:
+        int: Timestamp epoch em ms (None se valor for None ou vazio)
+    """
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, bool):
+        raise ValueError(f"Timestamp inválido: {valor!r}")
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, float):
+        return int(valor)
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.astimezone()
+        return int(valor.timestamp() * MS_POR_SEGUNDO)
+    raise ValueError(f"Timestamp inválido: {valor!r}")
+
+
+def datetime_de_ms(ms, fuso=None):
+    """
+    Converte epoch em ms para datetime com fuso horário.
+
+    Args:
+        ms (int): Timestamp epoch em ms
+        fuso: Fuso horário de destino (padrão: local)
+
+    Returns:
+        datetime: Data/hora com tzinfo
+    """
+    return datetime.fromtimestamp(ms / MS_POR_SEGUNDO, tz=timezone.utc).astimezone(fuso or fuso_local())
+
+
+def formatar_ms(ms, formato='%d/%m/%Y %H:%M'):
+    """
+    Formata epoch em ms para exibição no fuso local.
+
+    Args:
+        ms (int): Timestamp epoch em ms (aceita também strings ISO antigas)
+        formato (str): Formato strftime
+
+    Returns:
+        str: Data/hora formatada ('N/A' se ausente)
+    """
+    ms = para_epoch_ms(ms)
+    if ms is None:
+        return 'N/A'
+    return datetime_de_ms(ms).strftime(formato)
+
+
+def dia_local(ms):
+    """
+    Retorna o ordinal do dia local correspondente a um timestamp.
+
+    Args:
+        ms (int): Timestamp epoch em ms
+
+    Returns:
+        int: Ordinal do dia (compatível com date.toordinal)
+    """
+    return datetime_de_ms(ms).date().toordinal()
+
+
+def indice_desde(registros, inicio_ms, campo='timestamp'):
+    """
+    Busca binária do primeiro registro com timestamp >= inicio_ms.
+
+    Os registros devem estar em ordem cronológica (como são gravados).
+
+    Args:
+        registros (list): Sequência de dicts ordenada por timestamp
+        inicio_ms (int): Início da janela em epoch ms
+        campo (str): Nome do campo de timestamp
+
+    Returns:
+        int: Índice do primeiro registro dentro da janela
+    """
+    baixo, alto = 0, len(registros)
+    while baixo < alto:
+        meio = (baixo + alto) // 2
+        if registros[meio][campo] < inicio_ms:
+            baixo = meio + 1
+        else:
+            alto = meio
+    return baixo
@@ -0,0 +1,32 @@
+"""
+Rollups IoT: as contagens de febre e crítico carregam os limites com que foram
+feitas, e a resolução do período considera quantos dispositivos serão exibidos
+"""
+
+from src.iot.agregados import AgregadosIoT, resolucao_para_periodo
+from src.iot.serie_temporal import SerieTemporal
+from src.utils.tempo import agora_ms, MS_POR_DIA
+
+
+def test_resolucao_divide_os_baldes_entre_dispositivos():
+    assert resolucao_para_periodo(MS_POR_DIA) == 'minuto'
+    assert resolucao_para_periodo(MS_POR_DIA, dispositivos=2) == 'hora'
+    assert resolucao_para_periodo(7 * MS_POR_DIA) == 'hora'
+    assert resolucao_para_periodo(7 * MS_POR_DIA, dispositivos=10) == 'dia'
+    assert resolucao_para_periodo(7 * MS_POR_DIA, dispositivos=0) == 'hora'
+
+
+def test_totais_rotulados_com_os_limites_da_contagem(tmp_path):
+    serie = SerieTemporal(str(tmp_path / 'series'), limite_febre=38.0, limite_critico=39.5)
+    agora = agora_ms()
+    serie.adicionar_lote([
+        {'device_id': 'ESP32_A', 'sensor_type': 'temperature', 'value': valor, 'timestamp': agora - i * 1000}
+        for i, valor in enumerate([36.5, 37.9, 38.0, 39.4, 39.5])
+    ])
+
+    totais = AgregadosIoT.totais(serie.agregados.consultar('minuto'))
+    assert (totais['contagem'], totais['febre'], totais['critico']) == (5, 2, 1)
+    assert (totais['limite_febre'], totais['limite_critico']) == (38.0, 39.5)
+
+    vazio = AgregadosIoT.totais(serie.agregados.consultar('minuto', device_id='ESP32_X'))
+    assert vazio['contagem'] == 0 and vazio['limite_febre'] == 38.0
@@ -0,0 +1,124 @@
+"""
+Motor de alertas: leituras com timestamp passam pela histerese, duração mínima,
+supressão de lembretes, escalonamento, limite por hora (balde de fichas) e
+descarte de leituras fora de ordem; cada caso confere os eventos emitidos
+"""
+
+from src.iot.alertas import MotorAlertas
+
+
+T0 = 1_700_000_000_000
+
+# Regra base: sem espera, sem lembretes, sem escalonamento e sem limite por hora
+REGRA = {'febre': 37.8, 'critico': 39.0, 'baixa': 35.0, 'histerese': 0.3, 'duracao_minima_s': 0,
+         'supressao_s': 0, 'escalonamento_s': 0, 'limite_por_hora': 0}
+
+
+def _motor(tmp_path, **regra):
+    motor = MotorAlertas(str(tmp_path / 'iot_alert_rules.json'))
+    motor.atualizar_padrao(**{**REGRA, **regra})
+    return motor
+
+
+def _leitura(segundos, valor, device_id='ESP32_A', sensor_type='temperature'):
+    return {'device_id': device_id, 'sensor_type': sensor_type, 'value': valor, 'unit': '°C',
+            'timestamp': T0 + segundos * 1000, 'location': 'Enfermaria'}
+
+
+def _eventos(motor, leituras):
+    return [[(e['tipo'], e['level']) for e in motor.avaliar(_leitura(*l))] for l in leituras]
+
+
+def test_histerese_segura_o_episodio_ate_recuar_alem_do_limite(tmp_path):
+    motor = _motor(tmp_path)
+    assert _eventos(motor, [(0, 38.0), (10, 37.6), (20, 37.5), (30, 37.4), (40, 37.7)]) == [
+        [('disparo', 'HIGH')],
+        [],                          # 37.6 ainda dentro da histerese de 0.3
+        [],                          # 37.5 é exatamente o limite da histerese
+        [('normalizado', 'NORMAL')],
+        [],                          # abaixo do limite de entrada: não reabre
+    ]
+    assert _eventos(motor, [(50, 39.2), (60, 38.8), (70, 38.6)]) == [
+        [('disparo', 'CRITICAL')],
+        [],                          # crítico mantido pela histerese
+        [],                          # alivia para febre sem novo aviso
+    ]
+    assert motor.estados['ESP32_A'].nivel == 'HIGH'
+
+
+def test_duracao_minima_exige_condicao_continua(tmp_path):
+    motor = _motor(tmp_path, duracao_minima_s=60)
+    assert _eventos(motor, [(0, 38.0), (30, 38.1), (40, 37.0), (50, 38.0), (100, 38.2), (110, 38.3)]) == [
+        [], [],
+        [],                          # voltou ao normal: a contagem recomeça
+        [], [],                      # 50 s desde a retomada
+        [('disparo', 'HIGH')]
+    ]
+    # O episódio começa quando a condição começou, não quando foi notificado
+    assert motor.estados['ESP32_A'].ativo_desde == T0 + 50_000
+
+    # Episódio nunca notificado não gera aviso de normalização
+    assert _eventos(motor, [(120, 36.5), (130, 38.0), (140, 36.5)]) == [[('normalizado', 'NORMAL')], [], []]
+
+
+def test_supressao_de_lembretes(tmp_path):
+    motor = _motor(tmp_path, supressao_s=600)
+    leituras = [(0, 38.0), (60, 38.1), (300, 38.2), (600, 38.1), (700, 38.0), (1200, 38.0)]
+    assert _eventos(motor, leituras) == [
+        [('disparo', 'HIGH')], [], [], [('lembrete', 'HIGH')], [], [('lembrete', 'HIGH')]
+    ]
+    assert motor.suprimidas == 3
+
+    motor = _motor(tmp_path, supressao_s=600)
+    motor.avaliar(_leitura(0, 38.0, 'ESP32_B'))
+    for segundos in (60, 300):
+        motor.avaliar(_leitura(segundos, 38.0, 'ESP32_B'))
+    lembrete, = motor.avaliar(_leitura(600, 38.0, 'ESP32_B'))
+    assert 'persiste há 10 min, 4 leituras' in lembrete['message']
+
+
+def test_escalonamento_unico_por_episodio(tmp_path):
+    motor = _motor(tmp_path, escalonamento_s=900)
+    eventos = [motor.avaliar(_leitura(s, 39.5)) for s in (0, 600, 900, 1200, 1800)]
+    assert [[(e['tipo'], e['level']) for e in lista] for lista in eventos] == [
+        [('disparo', 'CRITICAL')], [], [('escalonamento', 'CRITICAL')], [], []
+    ]
+    assert eventos[2][0]['message'].startswith('⏫ Escalonado:')
+    assert '(persiste há 15 min)' in eventos[2][0]['message']
+
+    # Novo episódio pode escalonar de novo
+    assert _eventos(motor, [(1900, 36.5), (2000, 39.5), (2900, 39.6)]) == [
+        [('normalizado', 'NORMAL')], [('disparo', 'CRITICAL')], [('escalonamento', 'CRITICAL')]
+    ]
+
+
+def test_limite_por_hora_com_balde_de_fichas(tmp_path):
+    motor = _motor(tmp_path, supressao_s=60, limite_por_hora=2)
+    assert _eventos(motor, [(0, 38.0), (60, 38.0), (120, 38.0)]) == [
+        [('disparo', 'HIGH')], [('lembrete', 'HIGH')],
+        [],                          # sem fichas: lembrete descartado
+    ]
+    assert motor.limitadas == 1
+
+    # Uma ficha volta a cada 30 min (2 por hora)
+    assert _eventos(motor, [(1900, 38.0)]) == [[('lembrete', 'HIGH')]]
+    # Agravamento ignora o limite mesmo sem fichas
+    assert _eventos(motor, [(1960, 39.5)]) == [[('disparo', 'CRITICAL')]]
+    assert motor.limitadas == 1
+
+    # O balde é por dispositivo
+    assert _eventos(motor, [(1960, 38.0, 'ESP32_B')]) == [[('disparo', 'HIGH')]]
+
+
+def test_leituras_fora_de_ordem_nao_alteram_o_estado(tmp_path):
+    motor = _motor(tmp_path)
+    assert _eventos(motor, [(100, 38.0), (50, 36.5), (80, 39.5)]) == [[('disparo', 'HIGH')], [], []]
+    assert motor.estatisticas()['ativos'] == {'CRITICAL': 0, 'HIGH': 1, 'LOW': 0}
+
+    # Outros sensores e unidades são ignorados
+    assert motor.avaliar(_leitura(150, 36.0, sensor_type='humidity')) == []
+    assert motor.avaliar({**_leitura(150, 36.0), 'unit': '°F'}) == []
+
+    assert _eventos(motor, [(200, 36.5), (150, 38.5)]) == [[('normalizado', 'NORMAL')], []]
+    assert motor.estados['ESP32_A'].nivel is None
+    assert motor.avaliadas == 5
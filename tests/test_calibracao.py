@@ -0,0 +1,45 @@
+"""
+Calibração dos pesos: a avaliação dos candidatos ordena as doenças com os mesmos
+scores da triagem (combinar_fatores), inclusive nos empates de arredondamento
+"""
+
+import numpy as np
+
+from src.core.calibracao import CalibradorPesos
+from src.core.triagem_model import FATORES_SCORE, PESOS_PADRAO, TriagemMedica
+
+from test_pontuacao import _pacientes
+
+
+PADRAO = np.array([[PESOS_PADRAO[f] for f in FATORES_SCORE]])
+
+
+def test_empate_da_triagem_mantem_a_ordem_estavel():
+    # Mesmo score pela soma da triagem; o produto matricial colocaria a segunda à frente
+    fatores = np.array([[[0.0, 0.0, 0.0, 1.0], [0.0, 0.3, 0.1, 0.4]]])
+    scores = TriagemMedica.combinar_fatores(fatores[0], PADRAO[0])
+    assert scores[0] == scores[1]
+
+    top1, top3 = CalibradorPesos.avaliar(fatores, np.array([0]), PADRAO)
+    assert top1[0] == 1.0
+    top1, _ = CalibradorPesos.avaliar(fatores, np.array([1]), PADRAO)
+    assert top1[0] == 0.0
+
+
+def test_pesos_padrao_reproduzem_o_primeiro_diagnostico(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    por_regiao = {}
+    for paciente in _pacientes(triagem, 80, semente=11):
+        regiao = paciente['regiao_geografica']
+        _, fatores = triagem.calcular_fatores(paciente, regiao)
+        scores = triagem.combinar_fatores(fatores, PADRAO[0])
+        primeiro = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[0]
+        grupo = por_regiao.setdefault(regiao, ([], []))
+        grupo[0].append(fatores)
+        grupo[1].append(primeiro)
+
+    candidatos = np.vstack([PADRAO, CalibradorPesos.gerar_candidatos(0.25)])
+    for fatores, rotulos in por_regiao.values():
+        top1, _ = CalibradorPesos.avaliar(np.stack(fatores), np.array(rotulos), candidatos, tamanho_bloco=4)
+        assert top1[0] == 1.0
@@ -0,0 +1,60 @@
+"""
+Codificação do histórico: atendimentos antigos são reconstruídos com a base
+de conhecimento da época em que foram gravados
+"""
+
+import copy
+
+from src.core.triagem_model import TriagemMedica
+
+
+PACIENTE = {
+    'idade': 34,
+    'sexo': 'Feminino',
+    'peso': 62.0,
+    'temperatura': 39.4,
+    'pressao_sistolica': 118,
+    'pressao_diastolica': 76,
+    'frequencia_cardiaca': 104,
+    'sintomas': ['febre_alta', 'calafrios', 'dor_cabeca', 'sudorese'],
+    'evento_climatico': 'enchentes',
+    'tempo_sintomas': 4,
+    'historico_medico': [],
+    'populacao_vulneravel': False,
+    'regiao_geografica': 'brasil_norte'
+}
+
+
+def _editar_base(base):
+    """Nova prescrição, gravidade e incubação para todas as doenças"""
+    base = copy.deepcopy(base)
+    for dados_regiao in base['regioes'].values():
+        for dados_doenca in dados_regiao['doencas'].values():
+            for esquema in dados_doenca['medicamentos'].values():
+                esquema['nome'] = 'Medicamento Novo'
+                esquema['dosagem'] = '1 g'
+                esquema['frequencia'] = '1x ao dia'
+            dados_doenca['gravidade'] = 'critica'
+            dados_doenca['tempo_incubacao'] = '99 dias'
+    return base
+
+
+def test_resultado_sobrevive_a_edicao_da_base(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    original = dict(triagem.processar_triagem(dict(PACIENTE)))
+    assert 'modelo' in triagem.historico.obter(0)['resultado']._codificado
+
+    carregar = TriagemMedica._carregar_base_conhecimento
+    monkeypatch.setattr(TriagemMedica, '_carregar_base_conhecimento', lambda self: _editar_base(carregar(self)))
+    editada = TriagemMedica()
+    assert editada.historico.codificador.versao_base != triagem.historico.codificador.versao_base
+
+    assert dict(editada.historico.obter(0)['resultado']) == original
+    assert editada.historico.codificador.expandir(
+        editada.historico._ler_intervalo(0, 1)[0])['resultado'] == original
+
+    # Atendimentos novos usam a base editada
+    novo = dict(editada.processar_triagem(dict(PACIENTE)))
+    assert novo['medicamentos'] == 'Medicamento Novo'
+    assert dict(editada.historico.obter(1)['resultado']) == novo
@@ -0,0 +1,45 @@
+"""
+Coocorrência de sintomas sobre um histórico migrado do formato antigo
+(lista JSON com timestamps ISO)
+"""
+
+import json
+
+from src.core.triagem_model import TriagemMedica
+from src.utils.tempo import agora_ms, formatar_ms
+
+
+def _legado(timestamp, sintomas, diagnostico):
+    return {
+        'timestamp': timestamp,
+        'dados_paciente': {'idade': 30, 'sintomas': sintomas, 'regiao_geografica': 'brasil_norte'},
+        'resultado': {'diagnostico_principal': diagnostico, 'medicamentos': 'Paracetamol'}
+    }
+
+
+def test_historico_legado_iso(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agora = agora_ms()
+    atendimentos = [
+        _legado(formatar_ms(agora - dias * 86400000, '%Y-%m-%dT%H:%M:%S'), ['febre_alta', 'calafrios'], 'Malária')
+        for dias in (3, 2, 1)
+    ]
+    with open('historico_atendimentos.json', 'w', encoding='utf-8') as f:
+        json.dump(atendimentos, f)
+
+    triagem = TriagemMedica()
+    matrizes = triagem.coocorrencia.matrizes('brasil_norte', decaido=True)
+    assert triagem.coocorrencia.total_agregado == 3
+    assert 0 < matrizes['total'] <= 3
+
+    sintomas = matrizes['sintomas']
+    febre, calafrios = sintomas.index('febre_alta'), sintomas.index('calafrios')
+    assert triagem.coocorrencia.matrizes('brasil_norte')['sintoma_sintoma'][febre, calafrios] == 3
+
+
+def test_agregar_aceita_timestamp_iso(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    coocorrencia = triagem.coocorrencia
+    coocorrencia.adicionar(0, _legado('2024-03-01T08:15:00', ['febre_alta'], 'Malária'))
+    assert coocorrencia.matrizes('brasil_norte')['total'] == 1
@@ -0,0 +1,68 @@
+"""
+Livro-razão de estoque: gravação interrompida e consumo de medicamentos
+que deixaram de ser dispensados
+"""
+
+from src.core import estoque as modulo_estoque
+from src.core.estoque import EstoqueMedicamentos
+from src.utils.tempo import MS_POR_DIA
+
+
+def test_linha_interrompida_nao_engole_o_proximo_movimento(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    estoque = EstoqueMedicamentos(intervalo_snapshot=1)
+    estoque.definir_estoque_inicial('Doxiciclina 100mg comprimido', 90)
+    with open(estoque.movimentos_file, 'a', encoding='utf-8') as f:
+        f.write('{"timestamp": 1, "tipo": "entrada", "medic')
+
+    estoque = EstoqueMedicamentos(intervalo_snapshot=1000)
+    estoque.registrar_entrada('Doxiciclina 100mg comprimido', 50)
+    estoque.registrar_saida('Doxiciclina 100mg comprimido', 5)
+    assert estoque.obter_saldo('Doxiciclina 100mg comprimido') == 135
+
+    assert EstoqueMedicamentos().obter_saldo('Doxiciclina 100mg comprimido') == 135
+    estoque.reconstruir()
+    assert estoque.obter_saldo('Doxiciclina 100mg comprimido') == 135
+
+
+def test_consumo_decai_sem_dispensacao(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agora = [1_700_000_000_000]
+    monkeypatch.setattr(modulo_estoque, 'agora_ms', lambda: agora[0])
+    estoque = EstoqueMedicamentos()
+    medicamento = 'Paracetamol 750mg comprimido'
+    estoque.definir_estoque_inicial(medicamento, 60)
+    for _ in range(10):
+        estoque.registrar_saida(medicamento, 4)
+        agora[0] += MS_POR_DIA
+    assert [a['nivel'] for a in estoque.obter_alertas()] == ['REPOR']
+    consumo = estoque.obter_saldos()[medicamento]['consumo_medio_diario']
+
+    # Sem saídas por 30 dias: o consumo cai e o alerta de reposição some
+    agora[0] += 30 * MS_POR_DIA
+    assert estoque.obter_saldos()[medicamento]['consumo_medio_diario'] < consumo / 100
+    assert estoque.obter_alertas() == []
+    assert estoque.obter_saldos()[medicamento]['status'] == 'OK'
+
+
+def test_condutas_sem_produto_nao_movimentam_estoque(tmp_path, monkeypatch):
+    from src.core.triagem_model import TriagemMedica
+
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    paciente = {'idade': 40, 'peso': 70.0}
+    condutas = [
+        {'medicamentos': 'Suporte intensivo', 'dosagem': 'UTI + Hemodiálise', 'frequencia': 'Contínuo'},
+        {'medicamentos': 'Suporte clínico + Repouso', 'dosagem': 'Hidratação + Sintomáticos',
+         'frequencia': 'Conforme necessário'},
+    ]
+    sem_dose = {'medicamentos': 'Doxiciclina', 'dosagem': 'Conforme protocolo', 'frequencia': 'A critério'}
+    for resultado in condutas + [sem_dose]:
+        triagem._baixar_estoque(paciente, resultado)
+
+    # Só o produto dispensável sem posologia é sinalizado (uma prescrição)
+    assert triagem.estoque.obter_nao_controlados().keys() == {'Doxiciclina'}
+    consumo = triagem.posologia.consumo(
+        {'dados_paciente': paciente, 'resultado': resultado} for resultado in condutas + [sem_dose]
+    )
+    assert consumo['sem_posologia'] == {'Doxiciclina': 1}
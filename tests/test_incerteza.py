@@ -0,0 +1,45 @@
+"""
+Incerteza diagnóstica: sem ruído de medição, o diagnóstico mais provável é
+o da triagem exibida
+"""
+
+from src.core.triagem_model import TriagemMedica
+from src.utils.detection import detectar_febre_automatica
+
+from test_pontuacao import _pacientes
+
+
+SEM_RUIDO = {sinal: {'tipo': 'nenhum'} for sinal in
+             ('temperatura', 'pressao_sistolica', 'pressao_diastolica', 'frequencia_cardiaca')}
+
+
+def _primeiro(triagem, paciente):
+    analise = triagem.analisar_incerteza(dict(paciente), amostras=4, ruido=SEM_RUIDO, semente=1)
+    return next(iter(analise['diagnosticos']))
+
+
+def test_febre_informada_nao_e_retirada(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    discordancias = 0
+    for paciente in _pacientes(triagem, 80, semente=11):
+        # Febre relatada pelo paciente, temperatura normal na aferição
+        paciente['sintomas'] = list(dict.fromkeys(paciente['sintomas'] + ['febre']))
+        paciente['temperatura'] = 37.0
+        if triagem.verificar_paciente_saudavel(paciente):
+            continue
+        resultado = triagem.processar_triagem(dict(paciente))
+        discordancias += _primeiro(triagem, paciente) != resultado['diagnostico_principal']
+    assert discordancias == 0
+
+
+def test_sem_ruido_reproduz_a_triagem(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    for paciente in _pacientes(triagem, 80, semente=5):
+        # Como no formulário: febre detectada pela temperatura entra nos sintomas
+        paciente['sintomas'] = list(dict.fromkeys(paciente['sintomas'] + detectar_febre_automatica(paciente['temperatura'])))
+        if triagem.verificar_paciente_saudavel(paciente):
+            continue
+        resultado = triagem.processar_triagem(dict(paciente))
+        assert _primeiro(triagem, paciente) == resultado['diagnostico_principal']
@@ -0,0 +1,76 @@
+"""
+Pontuação dos diagnósticos: o score ponderado reproduz a soma escalar original
+(sintomas*0.45 + climatico*0.25 + populacao*0.15 + gravidade*0.15), bit a bit,
+para que o truncamento de score*100 não mude as probabilidades exibidas
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.core.triagem_model import TriagemMedica
+
+
+PESOS = np.array([0.45, 0.25, 0.15, 0.15])
+
+
+def _score_original(fator):
+    return fator[0] * 0.45 + fator[1] * 0.25 + fator[2] * 0.15 + fator[3] * 0.15
+
+
+@pytest.mark.parametrize('fator', [
+    (0.0, 0.1, 0.0, 0.3),
+    (0.0, 0.1, 0.3, 0.6),
+    (0.0, 0.1, 0.4, 0.5),
+    (0.0, 0.1, 0.8, 0.1),
+])
+def test_combinar_fatores_na_ordem_original(fator):
+    # Linhas em que outra ordem de soma cruza um ponto percentual inteiro
+    score = TriagemMedica.combinar_fatores(np.array([fator]), PESOS)[0]
+    assert score == _score_original(fator)
+    assert int(score * 100) == int(_score_original(fator) * 100)
+
+
+def _pacientes(triagem, quantidade, semente=7):
+    g = random.Random(semente)
+    regioes = triagem.base_conhecimento['regioes']
+    for _ in range(quantidade):
+        regiao = g.choice(sorted(regioes))
+        doencas = regioes[regiao]['doencas']
+        sintomas = sorted({s for d in doencas.values() for s in d['sintomas']})
+        eventos = sorted({e for d in doencas.values() for e in d['eventos_climaticos']})
+        yield {
+            'idade': g.randint(1, 90),
+            'sexo': g.choice(['Masculino', 'Feminino']),
+            'peso': round(g.uniform(8, 100), 1),
+            'temperatura': round(g.uniform(36.0, 40.5), 1),
+            'pressao_sistolica': g.randint(85, 160),
+            'pressao_diastolica': g.randint(50, 100),
+            'frequencia_cardiaca': g.randint(55, 135),
+            'sintomas': g.sample(sintomas, g.randint(1, min(6, len(sintomas)))),
+            'evento_climatico': g.choice(eventos + ['']),
+            'tempo_sintomas': g.randint(1, 14),
+            'historico_medico': [],
+            'populacao_vulneravel': g.random() < 0.3,
+            'regiao_geografica': regiao,
+        }
+
+
+def test_probabilidades_de_pacientes_fixos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    avaliados = 0
+    for paciente in _pacientes(triagem, 60):
+        if triagem.verificar_paciente_saudavel(paciente):
+            continue
+        regiao = paciente['regiao_geografica']
+        _, fatores = triagem.calcular_fatores(paciente, regiao)
+        scores = sorted((_score_original(f) for f in fatores), reverse=True)
+        assert list(triagem.combinar_fatores(fatores, triagem.obter_pesos(regiao))) == \
+            [_score_original(f) for f in fatores]
+
+        resultado = triagem.processar_triagem(dict(paciente))
+        assert resultado['probabilidade'] == min(int(scores[0] * 100), 95)
+        avaliados += 1
+    assert avaliados > 0
@@ -0,0 +1,84 @@
+"""
+Roda de temporização da presença: prazos além de uma volta, adiamento,
+antecipação, cancelamento e pausas maiores que uma volta, com relógio fixo
+"""
+
+import pytest
+
+from src.iot import presenca
+from src.iot.presenca import RodaTempo
+
+
+T0 = 1_700_000_000_000
+
+
+@pytest.fixture
+def roda(monkeypatch):
+    # Relógio fixo: o primeiro tique da roda é T0; 8 posições de 1 s (uma volta = 8 s)
+    monkeypatch.setattr(presenca, 'agora_ms', lambda: T0)
+    return RodaTempo(resolucao_ms=1000, posicoes=8)
+
+
+def _segundo_a_segundo(roda, ate_s, desde_s=0):
+    """Avança a roda um tique por vez, retornando {segundo: chaves vencidas}"""
+    vencidas = {}
+    for segundo in range(desde_s, ate_s + 1):
+        chaves = roda.avancar(T0 + segundo * 1000)
+        if chaves:
+            vencidas[segundo] = sorted(chaves)
+    return vencidas
+
+
+def test_prazo_alem_de_uma_volta(roda):
+    roda.agendar('a', T0 + 20_000)
+    roda.agendar('b', T0 + 4_500)
+    assert _segundo_a_segundo(roda, 30) == {4: ['b'], 20: ['a']}
+    assert len(roda) == 0
+
+
+def test_adiar_e_antecipar(roda):
+    roda.agendar('a', T0 + 5_000)
+    roda.agendar('a', T0 + 12_000)
+    roda.agendar('b', T0 + 10_000)
+    roda.agendar('b', T0 + 3_000)
+    assert _segundo_a_segundo(roda, 11) == {3: ['b']}
+    assert 'a' in roda and 'b' not in roda
+
+    # Adiado de novo quando a entrada antiga já foi revista
+    roda.agendar('a', T0 + 30_000)
+    assert _segundo_a_segundo(roda, 40, desde_s=12) == {30: ['a']}
+
+
+def test_cancelar(roda):
+    roda.agendar('a', T0 + 5_000)
+    roda.agendar('b', T0 + 5_000)
+    roda.cancelar('a')
+    roda.cancelar('inexistente')
+    assert 'a' not in roda and len(roda) == 1
+    assert _segundo_a_segundo(roda, 6) == {5: ['b']}
+
+    # Reagendar depois de cancelar vence uma única vez, mesmo com a entrada antiga na casa
+    roda.agendar('c', T0 + 10_000)
+    roda.cancelar('c')
+    roda.agendar('c', T0 + 10_000)
+    assert _segundo_a_segundo(roda, 30, desde_s=7) == {10: ['c']}
+
+
+def test_pausa_maior_que_uma_volta(roda):
+    roda.agendar('a', T0 + 3_000)
+    roda.agendar('b', T0 + 9_000)
+    roda.agendar('c', T0 + 22_000)
+    roda.agendar('d', T0 + 30_000)
+    roda.agendar('e', T0 + 30_000)
+    roda.agendar('e', T0 + 40_000)
+
+    # Um único avanço de 25 s (mais de três voltas) vence tudo o que ficou para trás
+    assert sorted(roda.avancar(T0 + 25_000)) == ['a', 'b', 'c']
+    assert roda.avancar(T0 + 20_000) == []
+    assert _segundo_a_segundo(roda, 45, desde_s=26) == {30: ['d'], 40: ['e']}
+
+
+def test_prazo_ja_vencido_sai_no_proximo_avanco(roda):
+    roda.avancar(T0 + 10_000)
+    roda.agendar('a', T0 + 2_000)
+    assert roda.avancar(T0 + 11_000) == ['a']
@@ -0,0 +1,53 @@
+"""
+Prevalência regional a partir dos desfechos confirmados: correções retiram o
+diagnóstico anterior e a observação vale na data do atendimento
+"""
+
+from src.core.triagem_model import TriagemMedica
+from src.utils.tempo import agora_ms, MS_POR_DIA
+
+
+def _atendimento(timestamp):
+    return {
+        'timestamp': timestamp,
+        'dados_paciente': {'idade': 30, 'sintomas': ['febre_alta'], 'regiao_geografica': 'brasil_norte'},
+        'resultado': {'diagnostico_principal': 'Malária', 'medicamentos': 'Observação clínica'}
+    }
+
+
+def _contagens(triagem):
+    return {r['doenca']: r['observacoes_recentes'] for r in triagem.prevalencia.resumo('brasil_norte')}
+
+
+def test_correcao_retira_o_diagnostico_anterior(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    primeira, segunda = list(triagem.base_conhecimento['regioes']['brasil_norte']['doencas'])[:2]
+    indice = triagem.historico.adicionar(_atendimento(agora_ms()))
+
+    triagem.registrar_desfecho(indice, primeira)
+    assert _contagens(triagem)[primeira] > 0.99
+
+    # Reconfirmação não conta de novo; correção move a observação
+    triagem.registrar_desfecho(indice, primeira)
+    assert _contagens(triagem)[primeira] < 1.01
+    triagem.registrar_desfecho(indice, segunda)
+    contagens = _contagens(triagem)
+    assert contagens[primeira] < 1e-9
+    assert 0.99 < contagens[segunda] < 1.01
+    assert sum(contagens.values()) < 1.01
+
+    # O log reaplicado reproduz o mesmo estado
+    recarregadas = _contagens(TriagemMedica())
+    assert all(abs(recarregadas[d] - contagens[d]) < 1e-6 for d in contagens)
+
+
+def test_desfecho_antigo_vale_na_data_do_atendimento(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    triagem = TriagemMedica()
+    doenca = next(iter(triagem.base_conhecimento['regioes']['brasil_norte']['doencas']))
+    meia_vida = triagem.prevalencia.meia_vida_ms
+    indice = triagem.historico.adicionar(_atendimento(agora_ms() - 2 * meia_vida))
+
+    triagem.registrar_desfecho(indice, doenca)
+    assert abs(_contagens(triagem)[doenca] - 0.25) < 0.01